@@ -2,19 +2,20 @@ import json
 import re
 from copy import deepcopy
 from datetime import UTC, datetime, timedelta
+from itertools import count
 from typing import TYPE_CHECKING, Dict
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
-from bgstally.constants import (DATETIME_FORMAT_ACTIVITY, DATETIME_FORMAT_JOURNAL, DATETIME_FORMAT_TITLE, FILE_SUFFIX, ApiSizeLookup,
+from bgstally.constants import (DATETIME_FORMAT_ACTIVITY, DATETIME_FORMAT_TITLE, FILE_SUFFIX, ApiSizeLookup,
                                 ApiSyntheticCZObjectiveType, ApiSyntheticEvent, ApiSyntheticScenarioType, CheckStates, DiscordActivity, DiscordChannel,
                                 DiscordPostStyle)
 from bgstally.debug import Debug
 from bgstally.missionlog import MissionLog
 from bgstally.state import State
-from bgstally.tick import Tick
-from bgstally.utils import _, __, add_dicts
+from bgstally.tick import TICKID_PREFIX_IMPORTED, Tick
+from bgstally.utils import _, __, add_dicts, parse_journal_timestamp
 from thirdparty.colors import *
 
 STATES_WAR = ['War', 'CivilWar']
@@ -97,6 +98,8 @@ SPACECZ_PILOTNAME_CORRESPONDENT = '$LUASC_Scenario_Warzone_NPC_WarzoneCorrespond
 CZ_GROUND_LOW_CB_MAX = 5000
 CZ_GROUND_MED_CB_MAX = 38000
 
+TIME_COMBAT_LOCATION_TIMEOUT = timedelta(minutes = 5) # Combat bonds this long after the last are no longer counted for the same CZ or scenario
+
 TW_CBS = {
     25000: 'r',                     # Revenant
     80000: 's',                     # Scout - 80k v18.06
@@ -110,6 +113,17 @@ TW_CBS = {
 }
 
 
+# Version of the activity file structure. Files with an older version are migrated when they are loaded. If the structure
+# is changed, increment this and add a migration function to Activity._migrate()
+ACTIVITY_SCHEMA_VERSION: int = 1
+
+# Set to True to cross-check the incrementally maintained zero activity flags against a full recalculation after every update
+VERIFY_ZERO_ACTIVITY: bool = False
+
+# Revisions are shared by all activities and only ever increase, so a copied or reloaded activity never reuses a revision
+_revisions = count(1)
+
+
 class SystemActivity(dict):
     """
     Utility class for working with system activity. Adds some accessor methods for ease of use.
@@ -161,6 +175,23 @@ class Activity:
 
         # Non-stored instance data. Remember to modify __deepcopy__() if these are changed or new data added.
         self.megaship_pat:re.Pattern = re.compile("^[a-z]{3}-[0-9]{3} ")  # e.g. kar-314 aquarius-class tanker
+        self.revision: int = next(_revisions) # Changed every time the activity is marked dirty or loaded, so cached aggregates can tell it has changed
+        self.loaded: bool = True # False if only the tick information has been populated from the index and the data is still on disk
+        self.active_factions: dict[str, set] = {} # key = system address, value = set of names of the factions in that system with activity
+
+
+    @property
+    def dirty(self) -> bool:
+        """
+        True if the activity has changed since it was last saved
+        """
+        return self._dirty
+
+
+    @dirty.setter
+    def dirty(self, value: bool):
+        if value: self.revision = next(_revisions)
+        self._dirty = value
 
 
     def load_legacy_data(self, filepath: str):
@@ -182,6 +213,7 @@ class Activity:
                         factions[faction['Faction']] = faction  # Just convert List to Dict, with faction name as key
 
                     self.systems[str(legacysystem['SystemAddress'])] = self._get_new_system_data(legacysystem['System'], str(legacysystem['SystemAddress']), factions)
+            self._migrate(0)
             self.recalculate_zero_activity()
 
 
@@ -193,9 +225,12 @@ class Activity:
             with open(filepath) as activityfile:
                 self._from_dict(json.load(activityfile))
                 self.recalculate_zero_activity()
+                self.revision = next(_revisions)
         except Exception as e:
             Debug.logger.info(f"Unable to load {filepath}")
 
+        self.loaded = True
+
 
     def save(self, filepath: str):
         """
@@ -203,9 +238,16 @@ class Activity:
         """
         if not self.dirty: return
 
-        with open(filepath, 'w') as activityfile:
-            json.dump(self._as_dict(), activityfile)
-            self.dirty = False
+        # Clear the flag before serialising so that any change made while saving is picked up on the next save
+        self.dirty = False
+        try:
+            data:str = json.dumps(self._as_dict())
+
+            with open(filepath, 'w') as activityfile:
+                activityfile.write(data)
+        except Exception:
+            self.dirty = True
+            raise
 
 
     def get_filename(self) -> str:
@@ -221,6 +263,8 @@ class Activity:
         """
         if self.tick_forced:
             return f"{str(self.tick_time.strftime(DATETIME_FORMAT_TITLE))} (" + (__("forced", lang=self.bgstally.state.discord_lang) if discord else _("forced")) + ")" # LANG: Appended to tick time if a forced tick
+        elif self.tick_id.startswith(TICKID_PREFIX_IMPORTED):
+            return f"{str(self.tick_time.strftime(DATETIME_FORMAT_TITLE))} (" + (__("imported", lang=self.bgstally.state.discord_lang) if discord else _("imported")) + ")" # LANG: Appended to tick time if a tick imported from journal files
         else:
             return f"{str(self.tick_time.strftime(DATETIME_FORMAT_TITLE))} (" + (__("game", lang=self.bgstally.state.discord_lang) if discord else _("game")) + ")" # LANG: Appended to tick time if a normal tick
 
@@ -296,11 +340,7 @@ class Activity:
         # Need to convert keys to list so we can delete as we iterate
         for system_address in list(self.systems.keys()):
             system = self.systems[system_address]
-            # Note that the missions log historically stores system name so we check for that, not system address.
-            # Potential for very rare bug here for systems with duplicate names.
-            if system['System'] in mission_systems or \
-                    self.bgstally.state.current_system_id == system_address or \
-                    sum(int(d['scooped']) for d in system['TWSandR'].values()) > 0:
+            if self._is_system_retained(system_address, system, mission_systems):
                 # The system has a current mission, or it's the current system, or it has TWSandR scoops - zero, don't delete
                 for faction_name, faction_data in system['Factions'].items():
                     system['Factions'][faction_name] = self._get_new_faction_data(faction_name, faction_data['FactionState'], faction_data['Influence'])
@@ -313,6 +353,40 @@ class Activity:
                 del self.systems[system_address]
 
         self.powerplay = {}
+        self.recalculate_zero_activity()
+
+
+    def get_next_activity(self, tick: Tick, forced: bool, mission_log: MissionLog) -> 'Activity':
+        """Create the Activity for the tick following this one. The result is the same as copying this activity and calling
+        clear_activity() on the copy, but only the systems that are kept are built, and this activity is left untouched.
+
+        Args:
+            tick (Tick): The new tick
+            forced (bool): True if the new tick was forced by the user
+            mission_log (MissionLog): The mission log, used to keep systems with active missions
+
+        Returns:
+            Activity: The new activity, with no activity recorded
+        """
+        result: Activity = Activity(self.bgstally, tick, cmdr=self.cmdr)
+        result.tick_forced = forced
+        result.loaded = self.loaded
+        mission_systems = mission_log.get_active_systems()
+
+        for system_address, system in self.systems.items():
+            if not self._is_system_retained(system_address, system, mission_systems): continue
+
+            new_system: dict = {key: deepcopy(value) for key, value in system.items() if key not in ('Factions', 'TWKills', 'TWSandR')}
+            new_system['Factions'] = {faction_name: self._get_new_faction_data(faction_name, faction_data['FactionState'], faction_data['Influence'])
+                                      for faction_name, faction_data in system['Factions'].items()}
+            new_system['TWKills'] = self._get_new_tw_kills_data()
+            # Note: system['TWSandR'] scooped data is carried forward, delivered data is cleared
+            new_system['TWSandR'] = {key: d | {'delivered': 0} for key, d in system['TWSandR'].items()}
+            result.systems[system_address] = new_system
+
+        result.dirty = True
+        result.recalculate_zero_activity()
+        return result
 
 
     def post_to_discord(self):
@@ -394,8 +468,6 @@ class Activity:
             current_system = self._get_new_system_data(journal_entry['StarSystem'], journal_entry['SystemAddress'], {})
             self.systems[str(journal_entry['SystemAddress'])] = current_system
 
-        self._update_system_data(current_system)
-
         if 'Factions' in journal_entry:
             for faction in journal_entry['Factions']:
                 if faction['Name'] == "Pilots' Federation Local Branch": continue
@@ -445,14 +517,14 @@ class Activity:
         system_tick_datetime: datetime|None = datetime.strptime(system_tick, DATETIME_FORMAT_ACTIVITY) if system_tick is not None and system_tick != "" else None
         if system_tick_datetime is not None:
             system_tick_datetime = system_tick_datetime.replace(tzinfo=UTC)
-            if system_tick_datetime < self.bgstally.tick.tick_time:
-                # System tick is older than the current tick, fetch it
-                self.bgstally.tick.fetch_system_tick(str(current_system['SystemAddress']))
-        else:
-            # No system tick, fetch it
-            self.bgstally.tick.fetch_system_tick(str(current_system['SystemAddress']))
 
-        self.recalculate_zero_activity()
+        if system_tick_datetime is None or system_tick_datetime < self.bgstally.tick.tick_time:
+            # No system tick, or it's older than the current tick, fetch it. A recently fetched tick is returned straight away
+            fetched_tick_datetime: datetime|None = self.bgstally.tick.fetch_system_tick(str(current_system['SystemAddress']))
+            if fetched_tick_datetime is not None and (system_tick_datetime is None or fetched_tick_datetime > system_tick_datetime):
+                current_system['TickTime'] = fetched_tick_datetime.strftime(DATETIME_FORMAT_ACTIVITY)
+
+        self.recalculate_zero_activity(current_system)
         state.current_system_id = str(current_system['SystemAddress'])
         current_system['tw_status'] = journal_entry.get('ThargoidWar', None)
 
@@ -463,6 +535,7 @@ class Activity:
         """
         self.dirty = True
         mission:dict = mission_log.get_mission(journal_entry['MissionID'])
+        changed_systems: dict = {}
 
         # BGS
         for faction_effect in journal_entry['FactionEffects']:
@@ -480,6 +553,7 @@ class Activity:
 
                     faction = system['Factions'].get(effect_faction_name)
                     if not faction: continue
+                    changed_systems[system_address] = system
 
                     if inftrend == "UpGood" or inftrend == "DownGood":
                         if effect_faction_name == journal_entry['Faction']:
@@ -500,6 +574,7 @@ class Activity:
 
                     faction = system['Factions'].get(effect_faction_name)
                     if not faction: continue
+                    changed_systems[system_address] = system
 
                     if effect_faction_name == journal_entry['Faction']:
                         inf_index: str|None = None
@@ -521,6 +596,7 @@ class Activity:
                     if mission['System'] != system['System']: continue
                     faction = system['Factions'].get(journal_entry['Faction'])
                     if not faction: continue
+                    changed_systems[system_address] = system
 
                     tw_stations = faction['TWStations']
                     if mission_station not in tw_stations:
@@ -586,7 +662,8 @@ class Activity:
                                 tw_stations[mission_station]['massacre']['o']['count'] += 1
                                 tw_stations[mission_station]['massacre']['o']['sum'] += mission.get('KillCount', -1)
 
-        self.recalculate_zero_activity()
+        for system in changed_systems.values():
+            self.recalculate_zero_activity(system)
         mission_log.delete_mission_by_id(journal_entry['MissionID'])
 
 
@@ -642,7 +719,7 @@ class Activity:
             if faction: faction['MissionFailed'] += 1
 
             mission_log.delete_mission_by_id(mission['MissionID'])
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(system, faction)
             break
 
 
@@ -664,7 +741,7 @@ class Activity:
             if total_earnings < base_value + bonus: total_earnings = base_value + bonus
 
             faction['CartData'] += total_earnings
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
 
     def organic_data_sold(self, journal_entry: Dict, state: State):
@@ -681,7 +758,7 @@ class Activity:
 
             for e in journal_entry['BioData']:
                 faction['ExoData'] += e['Value'] + e['Bonus']
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
 
     def bv_received(self, journal_entry: Dict, state: State, cmdr: str):
@@ -697,13 +774,8 @@ class Activity:
 
         # Check whether in megaship scenario for scenario tracking
         if state.last_megaship_approached != {}:
-            timedifference: datetime = datetime.strptime(journal_entry['timestamp'], DATETIME_FORMAT_JOURNAL) - datetime.strptime(state.last_megaship_approached['timestamp'], DATETIME_FORMAT_JOURNAL)
-            if timedifference > timedelta(minutes=5):
-                # Too long since we last entered a megaship scenario, we can't be sure we're fighting at that scenario, clear down
-                state.last_megaship_approached = {}
-            else:
-                # We're within the timeout, refresh timestamp and handle the CB
-                state.last_megaship_approached['timestamp'] = journal_entry['timestamp']
+            # Too long since we last entered a megaship scenario and we can't be sure we're fighting at that scenario, so it's cleared down
+            if self._refresh_combat_location(state.last_megaship_approached, journal_entry['timestamp']):
                 self._bv_megaship_scenario(journal_entry, current_system, state, cmdr)
 
 
@@ -724,7 +796,7 @@ class Activity:
                     faction['Bounties'] += (bv_info['Amount'] / 2)
                 else:
                     faction['Bounties'] += bv_info['Amount']
-                self.recalculate_zero_activity()
+                self.recalculate_zero_activity(current_system, faction)
 
 
     def cb_received(self, journal_entry: dict, state: State, cmdr: str):
@@ -745,24 +817,13 @@ class Activity:
 
         # Otherwise, must be on-ground or in-space CZ for CB kill tracking
         if state.last_settlement_approached != {}:
-            timedifference = datetime.strptime(journal_entry['timestamp'], DATETIME_FORMAT_JOURNAL) - datetime.strptime(state.last_settlement_approached['timestamp'], DATETIME_FORMAT_JOURNAL)
-            if timedifference > timedelta(minutes=5):
-                # Too long since we last approached a settlement, we can't be sure we're fighting at that settlement, clear down
-                state.last_settlement_approached = {}
-                # Fall through to check space CZs too
-            else:
-                # We're within the timeout, refresh timestamp and handle the CB
-                state.last_settlement_approached['timestamp'] = journal_entry['timestamp']
+            # Too long since we last approached a settlement and we can't be sure we're fighting at that settlement, so it's cleared down
+            if self._refresh_combat_location(state.last_settlement_approached, journal_entry['timestamp']):
                 self._cb_ground_cz(journal_entry, current_system, state, cmdr)
 
         elif state.last_spacecz_approached != {}:
-            timedifference = datetime.strptime(journal_entry['timestamp'], DATETIME_FORMAT_JOURNAL) - datetime.strptime(state.last_spacecz_approached['timestamp'], DATETIME_FORMAT_JOURNAL)
-            if timedifference > timedelta(minutes=5):
-                # Too long since we last entered a space cz, we can't be sure we're fighting at that cz, clear down
-                state.last_spacecz_approached = {}
-            else:
-                # We're within the timeout, refresh timestamp and handle the CB
-                state.last_spacecz_approached['timestamp'] = journal_entry['timestamp']
+            # Too long since we last entered a space cz and we can't be sure we're fighting at that cz, so it's cleared down
+            if self._refresh_combat_location(state.last_spacecz_approached, journal_entry['timestamp']):
                 self._cb_space_cz(journal_entry, current_system, state, cmdr)
 
 
@@ -779,7 +840,7 @@ class Activity:
             self.activity_updated(current_system['SystemAddress'])
 
             faction['CombatBonds'] += journal_entry['Amount']
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
 
     def cap_ship_bond_received(self, journal_entry: dict, cmdr: str):
@@ -808,7 +869,7 @@ class Activity:
             self.bgstally.api_manager.send_event(event, self, cmdr)
 
             self.activity_updated(current_system['SystemAddress'])
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
 
     def trade_purchased(self, journal_entry:dict, state:State):
@@ -832,7 +893,7 @@ class Activity:
             faction['TradeBuy'][bracket]['value'] += journal_entry['TotalCost']
             faction['TradeBuy'][bracket]['items'] += journal_entry['Count']
 
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
 
     def trade_sold(self, journal_entry:dict, state:State):
@@ -868,7 +929,7 @@ class Activity:
                 faction['TradeSell'][bracket]['value'] += journal_entry['TotalSale']
                 faction['TradeSell'][bracket]['items'] += journal_entry['Count']
 
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
 
     def ship_targeted(self, journal_entry: dict, state: State):
@@ -886,10 +947,12 @@ class Activity:
                                         'PilotName': journal_entry['PilotName'],
                                         'PilotName_Localised': journal_entry['PilotName_Localised']}
 
+            # Targeted ships are forgotten after a while, so long sessions of targeting ships that are never murdered don't build up
+            timestamp: datetime = parse_journal_timestamp(journal_entry['timestamp'])
             if journal_entry['PilotName'].startswith("$ShipName_Police"):
-                state.last_ships_targeted[journal_entry['PilotName']] = state.last_ship_targeted
+                state.last_ships_targeted.set(journal_entry['PilotName'], state.last_ship_targeted, timestamp)
             else:
-                state.last_ships_targeted[journal_entry['PilotName_Localised']] = state.last_ship_targeted
+                state.last_ships_targeted.set(journal_entry['PilotName_Localised'], state.last_ship_targeted, timestamp)
 
         if 'Faction' in journal_entry and state.last_spacecz_approached != {} and state.last_spacecz_approached.get('ally_faction') is not None:
             # In space CZ, check we're targeting the right faction
@@ -920,7 +983,7 @@ class Activity:
 
                 if faction:
                     faction['Murdered'] += 1
-                    self.recalculate_zero_activity()
+                    self.recalculate_zero_activity(current_system, faction)
 
                     self.activity_updated(current_system['SystemAddress'])
 
@@ -929,7 +992,7 @@ class Activity:
                 faction = current_system['Factions'].get(journal_entry['Faction'])
                 if faction:
                     faction['GroundMurdered'] += 1
-                    self.recalculate_zero_activity()
+                    self.recalculate_zero_activity(current_system, faction)
 
                     self.activity_updated(current_system['SystemAddress'])
 
@@ -1018,7 +1081,7 @@ class Activity:
             self.activity_updated(current_system['SystemAddress'])
 
             faction['SandR'][key] += count
-            self.recalculate_zero_activity()
+            self.recalculate_zero_activity(current_system, faction)
 
         # Handle TW S&R
         if not tw: return
@@ -1078,33 +1141,72 @@ class Activity:
                 state.last_settlement_approached = {}
 
 
-    def recalculate_zero_activity(self):
+    def recalculate_zero_activity(self, system: dict | None = None, faction_data: dict | None = None):
+        """For efficiency at display time, we store whether each system has had any activity in the data structure. The factions
+        with activity in each system are tracked, so when only one system or faction has changed, only that one needs to be checked.
+
+        Args:
+            system (dict | None, optional): The system that has changed. Defaults to None, which recalculates all systems.
+            faction_data (dict | None, optional): The faction in the system that has changed. Defaults to None, which recalculates all factions in the system.
+        """
+        if system is None:
+            self.active_factions = {}
+            for system in self.systems.values():
+                self._recalculate_system_zero_activity(system)
+        else:
+            self._recalculate_system_zero_activity(system, faction_data)
+
+        if VERIFY_ZERO_ACTIVITY: self.verify_zero_activity()
+
+
+    def verify_zero_activity(self):
         """
-        For efficiency at display time, we store whether each system has had any activity in the data structure
+        Cross-check the stored zero activity flags against a full recalculation. Raises AssertionError if any are wrong.
         """
-        for system in self.systems.values():
-            self._update_system_data(system)
-            system['zero_system_activity'] = True
+        for system_address, system in self.systems.items():
+            expected: bool = all(self._is_faction_data_zero(faction_data) for faction_data in system['Factions'].values()) \
+                and self._is_system_tw_data_zero(system)
+            if system['zero_system_activity'] != expected:
+                raise AssertionError(f"Zero activity flag for system {system.get('System')} ({system_address}) is {system['zero_system_activity']}, should be {expected}")
 
-            for faction_data in system['Factions'].values():
-                self._update_faction_data(faction_data)
-                if not self._is_faction_data_zero(faction_data):
-                    system['zero_system_activity'] = False
 
-            if system['zero_system_activity'] == False: continue
+    #
+    # Private functions
+    #
 
-            if sum(system['TWKills'].values()) > 0: system['zero_system_activity'] = False
+    def _recalculate_system_zero_activity(self, system: dict, faction_data: dict | None = None):
+        """Update the set of factions with activity for a system, and the system's zero activity flag
 
-            if system['zero_system_activity'] == False: continue
+        Args:
+            system (dict): The system
+            faction_data (dict | None, optional): The only faction that has changed. Defaults to None, which checks all factions.
+        """
+        active: set = self.active_factions.setdefault(str(system['SystemAddress']), set())
 
-            if sum(int(d['delivered']) for d in system['TWSandR'].values()) > 0: system['zero_system_activity'] = False
+        if faction_data is None:
+            active.clear()
+            factions = system['Factions'].items()
+        else:
+            factions = [(faction_data.get('Faction'), faction_data)]
 
-            if system['zero_system_activity'] == False: continue
+        for faction_name, faction in factions:
+            if self._is_faction_data_zero(faction): active.discard(faction_name)
+            else: active.add(faction_name)
 
+        system['zero_system_activity'] = len(active) == 0 and self._is_system_tw_data_zero(system)
+
+
+    def _is_system_tw_data_zero(self, system: dict) -> bool:
+        """Check whether there is no Thargoid War activity for a system
+
+        Args:
+            system (dict): The system
+
+        Returns:
+            bool: True if there is no TW activity
+        """
+        return sum(system['TWKills'].values()) == 0 and sum(int(d['delivered']) for d in system['TWSandR'].values()) == 0
 
-    #
-    # Private functions
-    #
 
     def _cb_tw(self, journal_entry:dict, current_system:dict):
         """
@@ -1113,9 +1215,30 @@ class Activity:
         tw_ship:str = TW_CBS.get(journal_entry.get('Reward', 0))
         if tw_ship: current_system['TWKills'][tw_ship] = current_system['TWKills'].get(tw_ship, 0) + 1
 
+        self.dirty = True
+        self.recalculate_zero_activity(current_system)
         self.activity_updated(current_system['SystemAddress'])
 
 
+    def _refresh_combat_location(self, location: dict, timestamp: str) -> bool:
+        """Check whether we're still fighting at a combat zone or megaship scenario. If we are, its timestamp is refreshed,
+        otherwise it has timed out and is cleared
+
+        Args:
+            location (dict): The settlement, space CZ or megaship scenario last approached, from the State
+            timestamp (str): The journal timestamp of the current event
+
+        Returns:
+            bool: True if we're still fighting there
+        """
+        if parse_journal_timestamp(timestamp) - parse_journal_timestamp(location['timestamp']) > TIME_COMBAT_LOCATION_TIMEOUT:
+            location.clear()
+            return False
+
+        location['timestamp'] = timestamp
+        return True
+
+
     def _cb_ground_cz(self, journal_entry: dict, current_system: dict, state: State, cmdr: str):
         """Combat bond received while we are in an active ground CZ
 
@@ -1209,7 +1332,7 @@ class Activity:
                 if previous_size != None: event[ApiSizeLookup[previous_size]] = -1
                 self.bgstally.api_manager.send_event(event, self, cmdr)
 
-        self.recalculate_zero_activity()
+        self.recalculate_zero_activity(current_system, faction)
 
 
     def _cb_space_cz(self, journal_entry: dict, current_system: dict, state: State, cmdr: str):
@@ -1276,6 +1399,8 @@ class Activity:
 
                 self.activity_updated(current_system['SystemAddress'])
 
+            self.recalculate_zero_activity(current_system, faction)
+
         # If we've already counted this CZ, exit
         if state.last_spacecz_approached.get('counted', False): return
 
@@ -1295,7 +1420,7 @@ class Activity:
         self.bgstally.api_manager.send_event(event, self, cmdr)
 
         self.activity_updated(current_system['SystemAddress'])
-        self.recalculate_zero_activity()
+        self.recalculate_zero_activity(current_system, faction)
 
 
     def _bv_megaship_scenario(self, journal_entry: dict, current_system: dict, state: State, cmdr: str):
@@ -1333,7 +1458,7 @@ class Activity:
         self.bgstally.api_manager.send_event(event, self, cmdr)
 
         self.activity_updated(current_system['SystemAddress'])
-        self.recalculate_zero_activity()
+        self.recalculate_zero_activity(current_system, opponent_faction)
 
 
     def _tw_sandr_handin(self, key:str, count:int, tally:bool):
@@ -1355,7 +1480,9 @@ class Activity:
                 count -= allocatable
                 self.dirty = True
 
-                if tally: self.activity_updated(system['SystemAddress'])
+                if tally:
+                    self.recalculate_zero_activity(system)
+                    self.activity_updated(system['SystemAddress'])
 
         # count can end up > 0 here - i.e. more S&R handed in than we originally logged as scooped. Ignore, as we don't know
         # where it originally came from
@@ -1394,6 +1521,24 @@ class Activity:
                 }
 
 
+    def _is_system_retained(self, system_address: str, system: dict, mission_systems: list) -> bool:
+        """Check whether a system is kept when the activity is cleared down for a new tick
+
+        Args:
+            system_address (str): The system address
+            system (dict): The system data
+            mission_systems (list): The names of the systems with active missions
+
+        Returns:
+            bool: True if the system has a current mission, is the current system or has TW search and rescue scoops
+        """
+        # Note that the missions log historically stores system name so we check for that, not system address.
+        # Potential for very rare bug here for systems with duplicate names.
+        return system['System'] in mission_systems or \
+               self.bgstally.state.current_system_id == system_address or \
+               sum(int(d['scooped']) for d in system['TWSandR'].values()) > 0
+
+
     def _get_new_system_data(self, system_name: str, system_address: str, faction_data: dict) -> dict:
         """Get a new data structure for storing system data
 
@@ -1508,7 +1653,33 @@ class Activity:
         return {'count': 5 if s else 0, 'enabled': CheckStates.STATE_ON, 'type': type}
 
 
-    def _update_system_data(self, system_data:dict):
+    def _migrate(self, schema_version: int):
+        """Upgrade loaded data from an older version of the activity file structure to the current version
+
+        Args:
+            schema_version (int): The version of the loaded data. Version 0 is any file saved before the version was stored.
+        """
+        # Each function upgrades from the version at its index to the next version
+        migrations: list = [self._migrate_to_v1]
+
+        for migration in migrations[schema_version:]:
+            migration()
+
+        Debug.logger.info(f"Migrated activity {self.tick_id} from schema version {schema_version} to {ACTIVITY_SCHEMA_VERSION}")
+        self.dirty = True
+
+
+    def _migrate_to_v1(self):
+        """
+        Upgrade from files saved before the schema version was stored, i.e. plugin versions up to 5.5.0
+        """
+        for system in self.systems.values():
+            self._migrate_system_data(system)
+            for faction_data in system['Factions'].values():
+                self._migrate_faction_data(faction_data)
+
+
+    def _migrate_system_data(self, system_data:dict):
         """
         Update system data structure for elements not present in previous versions of plugin
         """
@@ -1526,12 +1697,16 @@ class Activity:
 
     def _update_faction_data(self, faction_data: dict, faction_state: str|None = None, faction_inf: float|None = None):
         """
-        Update faction data structure for elements not present in previous versions of plugin
+        Update faction state and influence as it can change at any time post-tick
         """
-        # Update faction state and influence as it can change at any time post-tick
         if faction_state: faction_data['FactionState'] = faction_state
         if faction_inf: faction_data['Influence'] = faction_inf
 
+
+    def _migrate_faction_data(self, faction_data: dict):
+        """
+        Update faction data structure for elements not present in previous versions of plugin
+        """
         # From < v1.2.0 to 1.2.0
         if not 'SpaceCZ' in faction_data: faction_data['SpaceCZ'] = {}
         if not 'GroundCZ' in faction_data: faction_data['GroundCZ'] = {}
@@ -1571,8 +1746,8 @@ class Activity:
 
     def _is_faction_data_zero(self, faction_data: Dict):
         """
-        Check whether all information is empty or zero for a faction. _update_faction_data() is always called before this
-        so we can always assume here that the data is in the very latest structure.
+        Check whether all information is empty or zero for a faction. Data is migrated when it is loaded, so we can always
+        assume here that the data is in the very latest structure.
         """
         return sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction_data['MissionPoints'].items()) == 0 and \
                 sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction_data['MissionPointsSecondary'].items()) == 0 and \
@@ -1595,6 +1770,7 @@ class Activity:
         Return a Dictionary representation of our data, suitable for serializing
         """
         return {
+            'schemaversion': ACTIVITY_SCHEMA_VERSION,
             'tickid': self.tick_id,
             'ticktime': self.tick_time.strftime(DATETIME_FORMAT_ACTIVITY),
             'tickforced': self.tick_forced,
@@ -1617,6 +1793,9 @@ class Activity:
         self.systems = dict.get('systems', {})
         self.powerplay = dict.get('powerplay', {})
 
+        schema_version: int = dict.get('schemaversion', 0)
+        if schema_version < ACTIVITY_SCHEMA_VERSION: self._migrate(schema_version)
+
 
     # Comparator functions - we use the tick_time for sorting
 
@@ -1663,6 +1842,10 @@ class Activity:
         setattr(result, 'discord_notes', self.discord_notes)
         setattr(result, 'megaship_pat', self.megaship_pat)
         setattr(result, 'powerplay', self.powerplay)
+        setattr(result, '_dirty', self._dirty)
+        setattr(result, 'revision', next(_revisions))
+        setattr(result, 'loaded', self.loaded)
+        setattr(result, 'active_factions', {system_address: set(active) for system_address, active in self.active_factions.items()})
 
         # Deep copied items
         setattr(result, 'systems', deepcopy(self.systems, memo))
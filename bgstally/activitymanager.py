@@ -1,27 +1,45 @@
+import json
 from copy import deepcopy
-from datetime import datetime, timedelta
-from os import listdir, mkdir, path, remove, rename
-from threading import Thread
-from time import sleep
+from datetime import UTC, datetime, timedelta
+from os import listdir, mkdir, path, remove, rename, stat
+from threading import Lock, Thread
+from time import perf_counter, sleep
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
+    from bgstally.eventrouter import EventRouter
 
 from bgstally.activity import Activity
-from bgstally.constants import FILE_SUFFIX
+from bgstally.activitystore import META_ARCHIVE_MIGRATED, ActivityStore, available
+from bgstally.constants import DATETIME_FORMAT_ACTIVITY, FILE_SUFFIX, DataStore
 from bgstally.debug import Debug
-from bgstally.tick import Tick
+from bgstally.eventrouter import EVENTS_SYSTEM
+from bgstally.missionlog import MissionLog
+from bgstally.state import State
+from bgstally.tick import TICKID_PREFIX_IMPORTED, Tick
+from bgstally.utils import copy_json, sum_dicts
 from config import config
 
 FILE_LEGACY_CURRENTDATA = "Today Data.txt"
 FILE_LEGACY_PREVIOUSDATA = "Yesterday Data.txt"
 FOLDER_ACTIVITYDATA = "activitydata"
 FOLDER_ACTIVITYDATA_ARCHIVE = "archive"
+FILE_ACTIVITY_INDEX = "activity.index"
 KEEP_CURRENT_ACTIVITIES = 20
+STORE_MIGRATION_BATCH_SIZE = 20
 TIME_AUTOPOST_WORKER_PERIOD_S = 60 * 1  # 1 minutes
 
 
+class ActivityRollup:
+    """
+    Immutable aggregate of the systems data for a single tick, at a specific revision of its Activity
+    """
+    def __init__(self, activity: Activity):
+        self.revision: int = activity.revision
+        self.systems: dict = deepcopy(activity.systems)
+
+
 class ActivityManager:
     """
     Handles a list of Activity objects, each representing the data for a tick, handles updating activity, and manages
@@ -33,9 +51,21 @@ class ActivityManager:
 
         self.activity_data: list[Activity] = []
         self.current_activity: Activity|None = None
+        self.rollups: dict[str, ActivityRollup] = {} # key = tick_id, value = cached aggregate for that tick
+        self.index: dict[str, dict] = {} # key = tick_id, value = tick, file and summary information for that tick
+        self._index_lock: Lock = Lock() # The index is updated by the persistence worker when activity is written
+        self._deleted_ticks: list[str] = [] # Ticks to remove from the activity store on the next save
+        self.store: ActivityStore|None = None # Historical activity for all ticks, including archived ticks
 
+        start: float = perf_counter()
         self._load()
+        self._open_store()
         self._archive_old_activity()
+        self._save_index()
+
+        Debug.logger.info(f"Activity startup took {(perf_counter() - start) * 1000:.1f}ms: {len(self.activity_data)} ticks, "
+                          f"{sum(1 for activity in self.activity_data if not activity.loaded)} deferred, "
+                          f"{self._files_parsed} file(s) parsed")
 
         if self.activity_data == [] or self.current_activity == None:
             # Either no activity data, or the activity data file for the last stored tick has been manually deleted
@@ -47,14 +77,112 @@ class ActivityManager:
         self.autopost_thread.daemon = True
         self.autopost_thread.start()
 
+        if self.store is not None and self.store.get_meta(META_ARCHIVE_MIGRATED) is None:
+            # The current tick is changed on the main thread, so it is stored by the persistence worker on the next save
+            # rather than by the migration worker
+            self.current_activity.dirty = True
+            migration_thread: Thread = Thread(target=self._store_migration_worker, args=(self.current_activity.tick_id,),
+                                              name="BGSTally Activity store migration worker")
+            migration_thread.daemon = True
+            migration_thread.start()
+
+
+    def shut_down(self):
+        """
+        The plugin is shutting down. Must be called after all activity has been saved.
+        """
+        if self.store is not None: self.store.close()
+
 
     def save(self):
         """
         Save all activity data
         """
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> tuple[list[tuple[Activity, dict]], list[str]]:
+        """Take a copy of the data for every changed activity. Must be called on the main thread, where activity is changed.
+
+        Returns:
+            tuple[list[tuple[Activity, dict]], list[str]]: Each changed activity with a copy of its data, and the IDs of
+            ticks to remove from the activity store
+        """
+        changed: list[tuple[Activity, dict]] = []
+
         for activity in self.activity_data:
-            if activity.tick_id is None: continue
-            activity.save(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()))
+            if activity.tick_id is None or not activity.dirty: continue
+            # Clear the flag before copying, so that any change made afterwards is picked up on the next save
+            activity.dirty = False
+            changed.append((activity, copy_json(activity._as_dict())))
+
+        deleted: list[str] = self._deleted_ticks
+        self._deleted_ticks = []
+
+        return (changed, deleted)
+
+
+    def write(self, snapshot: tuple[list[tuple[Activity, dict]], list[str]]):
+        """Write a snapshot of changed activities to their files, the index and the activity store. If a write fails, the
+        activities that haven't been written are marked dirty again.
+
+        Args:
+            snapshot (tuple[list[tuple[Activity, dict]], list[str]]): The snapshot, from snapshot()
+        """
+        changed, deleted = snapshot
+
+        for tick_id in deleted:
+            self._delete_stored_activity(tick_id)
+
+        if changed == []: return
+
+        for i, (activity, data) in enumerate(changed):
+            try:
+                filepath: str = path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename())
+                encoded: str = json.dumps(data)
+                with open(filepath, 'w') as activityfile:
+                    activityfile.write(encoded)
+            except Exception:
+                for unwritten, unwritten_data in changed[i:]: unwritten.dirty = True
+                raise
+
+            self._update_index(data, filepath)
+            self._store_activity(data)
+
+        self._save_index()
+
+
+    def subscribe_journal_handlers(self, router: 'EventRouter', state: State, mission_log: MissionLog):
+        """Subscribe the activity journal event handlers. The handlers always update the activity in the journal context.
+
+        Args:
+            router (EventRouter): The event router
+            state (State): The state the handlers read and update
+            mission_log (MissionLog): The mission log the handlers read and update
+        """
+        router.subscribe(EVENTS_SYSTEM, "Activity.system_entered", lambda entry, context: context.activity.system_entered(entry, state), dirty=True)
+        router.subscribe(['ApproachSettlement'], "Activity.settlement_approached", lambda entry, context: context.activity.settlement_approached(entry, state), guard=lambda entry, context: context.state['Odyssey'], dirty=True)
+        router.subscribe(['Bounty'], "Activity.bv_received", lambda entry, context: context.activity.bv_received(entry, state, context.cmdr), dirty=True)
+        router.subscribe(['CapShipBond'], "Activity.cap_ship_bond_received", lambda entry, context: context.activity.cap_ship_bond_received(entry, context.cmdr), dirty=True)
+        router.subscribe(['Cargo'], "Activity.cargo", lambda entry, context: context.activity.cargo(entry))
+        router.subscribe(['CollectCargo'], "Activity.cargo_collected", lambda entry, context: context.activity.cargo_collected(entry, state), dirty=True)
+        router.subscribe(['CommitCrime'], "Activity.crime_committed", lambda entry, context: context.activity.crime_committed(entry, state), dirty=True)
+        router.subscribe(['EjectCargo'], "Activity.cargo_ejected", lambda entry, context: context.activity.cargo_ejected(entry), dirty=True)
+        router.subscribe(['FactionKillBond'], "Activity.cb_received", lambda entry, context: context.activity.cb_received(entry, state, context.cmdr), dirty=True)
+        router.subscribe(['MarketBuy'], "Activity.trade_purchased", lambda entry, context: context.activity.trade_purchased(entry, state), dirty=True)
+        router.subscribe(['MarketSell'], "Activity.trade_sold", lambda entry, context: context.activity.trade_sold(entry, state), dirty=True)
+        router.subscribe(['MissionCompleted'], "Activity.mission_completed", lambda entry, context: context.activity.mission_completed(entry, mission_log), dirty=True)
+        router.subscribe(['MissionFailed'], "Activity.mission_failed", lambda entry, context: context.activity.mission_failed(entry, mission_log), dirty=True)
+        router.subscribe(['PowerplayMerits'], "Activity.powerplay_merits", lambda entry, context: context.activity.powerplay_merits(entry), dirty=True)
+        router.subscribe(['RedeemVoucher'], "Activity.bv_redeemed", lambda entry, context: context.activity.bv_redeemed(entry, state), guard=lambda entry, context: entry.get('Type') == 'bounty', dirty=True)
+        router.subscribe(['RedeemVoucher'], "Activity.cb_redeemed", lambda entry, context: context.activity.cb_redeemed(entry, state), guard=lambda entry, context: entry.get('Type') == 'CombatBond', dirty=True)
+        router.subscribe(['Resurrect'], "Activity.player_resurrected", lambda entry, context: context.activity.player_resurrected(), dirty=True)
+        router.subscribe(['SearchAndRescue'], "Activity.search_and_rescue", lambda entry, context: context.activity.search_and_rescue(entry, state), dirty=True)
+        router.subscribe(['SellExplorationData', 'MultiSellExplorationData'], "Activity.exploration_data_sold", lambda entry, context: context.activity.exploration_data_sold(entry, state), dirty=True)
+        router.subscribe(['SellOrganicData'], "Activity.organic_data_sold", lambda entry, context: context.activity.organic_data_sold(entry, state), dirty=True)
+        router.subscribe(['ShipTargeted'], "Activity.ship_targeted", lambda entry, context: context.activity.ship_targeted(entry, state), dirty=True)
+        router.subscribe(['SupercruiseDestinationDrop'], "Activity.destination_dropped", lambda entry, context: context.activity.destination_dropped(entry, state), dirty=True)
+        router.subscribe(['SupercruiseEntry'], "Activity.supercruise", lambda entry, context: context.activity.supercruise(entry, state))
 
 
     def get_current_activity(self) -> Activity|None:
@@ -71,6 +199,23 @@ class ActivityManager:
         return self.activity_data[1:]
 
 
+    def load_activity(self, activity: Activity) -> Activity:
+        """Make sure an Activity's data is loaded. Previous ticks are only loaded from disk when they are first needed.
+
+        Args:
+            activity (Activity): The activity, which may only contain the tick information from the index
+
+        Returns:
+            Activity: The same activity, fully loaded
+        """
+        if not activity.loaded:
+            start: float = perf_counter()
+            activity.load(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()))
+            Debug.logger.debug(f"Loaded activity {activity.tick_id} on demand in {(perf_counter() - start) * 1000:.1f}ms")
+
+        return activity
+
+
     def query_activity(self, start_date: datetime) -> Activity:
         """Aggregate all activity back to and including the tick encompassing a given start date
 
@@ -81,24 +226,86 @@ class ActivityManager:
             Activity: A new Activity object containing the aggregated data.
         """
         result: Activity = Activity(self.bgstally)
+        rollups: list[dict] = []
+        oldest_tick_time: datetime|None = None
 
         # Iterate activities (already kept sorted by date, newest first)
         for activity in self.activity_data:
 
-            result = result + activity
+            rollups.append(self._get_rollup(activity).systems)
+            oldest_tick_time = activity.tick_time
 
             if activity.tick_time <= start_date:
                 # Once we reach an activity that is older than our start date, stop. Note that we have INCLUDED the
                 # activity which overlaps with the start_date
+                oldest_tick_time = None
                 break
 
+        if oldest_tick_time is not None and self.store is not None:
+            # The start date is earlier than all the ticks we hold, so include archived ticks from the store
+            rollups.append(self.store.query_systems(start_date, oldest_tick_time))
+
+        result.systems = sum_dicts(rollups)
         return result
 
 
+    def add_imported_activities(self, activities: list[Activity], since: datetime):
+        """Add activities reconstructed from journal files. Any activities imported previously for the same period are replaced.
+
+        Args:
+            activities (list[Activity]): The imported activities
+            since (datetime): The start of the imported period
+        """
+        replaced: list[Activity] = [activity for activity in self.activity_data
+                                    if (activity.tick_id or "").startswith(TICKID_PREFIX_IMPORTED) and activity.tick_time >= since]
+        imported_ids: set[str] = {activity.tick_id for activity in activities}
+
+        for activity in replaced:
+            self.rollups.pop(activity.tick_id, None)
+            if activity.tick_id in imported_ids: continue
+
+            # No longer imported, e.g. because a real tick has since been recorded in this period
+            with self._index_lock: self.index.pop(activity.tick_id, None)
+            self._deleted_ticks.append(activity.tick_id)
+            try:
+                remove(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()))
+            except FileNotFoundError:
+                pass
+
+        replaced_ids: set[str] = {activity.tick_id for activity in replaced}
+        self.activity_data = [activity for activity in self.activity_data if activity.tick_id not in replaced_ids]
+
+        for activity in activities:
+            activity.dirty = True
+            self.rollups.pop(activity.tick_id, None)
+            self.activity_data.append(activity)
+
+        self.activity_data.sort(reverse=True)
+        self.bgstally.persistence_manager.mark_dirty(DataStore.ACTIVITY)
+
+
+    def _get_rollup(self, activity: Activity) -> ActivityRollup:
+        """Get the cached aggregate for an activity, rebuilding it if the activity has changed since it was cached
+
+        Args:
+            activity (Activity): The activity
+
+        Returns:
+            ActivityRollup: The aggregate
+        """
+        self.load_activity(activity)
+        rollup: ActivityRollup|None = self.rollups.get(activity.tick_id)
+
+        if rollup is None or rollup.revision != activity.revision:
+            rollup = ActivityRollup(activity)
+            self.rollups[activity.tick_id] = rollup
+
+        return rollup
+
 
     def new_tick(self, tick: Tick, forced: bool) -> bool:
         """
-        New tick detected, duplicate the current Activity object or ignore if it's older than current tick.
+        New tick detected, create a new Activity object or ignore if it's older than current tick.
         """
 
         if tick.tick_time < self.current_activity.tick_time:
@@ -106,17 +313,10 @@ class ActivityManager:
             # but a new tick was then detected with an earlier timestamp. Ignore the tick in this situation.
             return False
         else:
-            # An inbound tick is newer than the current tick. Create a new Activity object.
-            # Note Activity uses a customised __deepcopy__ that only deep copies data, not class instances.
-            new_activity:Activity = deepcopy(self.current_activity)
-            new_activity.tick_id = tick.tick_id
-            new_activity.tick_time = tick.tick_time
-            new_activity.tick_forced = forced
-            new_activity.discord_webhook_data = {}
-            new_activity.discord_notes = ""
-            new_activity.dirty = False
-            new_activity.autopost = False
-            new_activity.clear_activity(self.bgstally.mission_log)
+            # An inbound tick is newer than the current tick. Create a new Activity object containing only the systems
+            # carried forward. The previous activity is kept as it is, without copying it.
+            new_activity: Activity = self.current_activity.get_next_activity(tick, forced, self.bgstally.mission_log)
+            self.rollups.pop(new_activity.tick_id, None)
             self.activity_data.append(new_activity)
             self.activity_data.sort(reverse=True)
             self.current_activity = new_activity
@@ -126,16 +326,37 @@ class ActivityManager:
 
     def _load(self):
         """
-        Load all activity data
+        Load all activity data. Only ticks that are not in the index (or have changed on disk since they were indexed)
+        and the current tick are parsed, all others are populated from the index and loaded on demand.
         """
+        self._files_parsed: int = 0
+        self._load_index()
+
         # Handle modern data from subfolder
         filepath = path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA)
         if not path.exists(filepath): mkdir(filepath)
 
+        indexed: dict[str, dict] = self.index
+        self.index = {}
+
         for activityfilename in listdir(filepath):
             if activityfilename.endswith(FILE_SUFFIX):
+                activityfilepath: str = path.join(filepath, activityfilename)
+                tick_id: str = activityfilename[:-len(FILE_SUFFIX)]
+                entry: dict|None = indexed.get(tick_id)
                 activity = Activity(self.bgstally, Tick(self.bgstally))
-                activity.load(path.join(filepath, activityfilename))
+
+                if entry is not None and tick_id != self.bgstally.tick.tick_id and self._index_entry_valid(entry, activityfilepath):
+                    activity.tick_id = tick_id
+                    activity.tick_time = datetime.strptime(entry['ticktime'], DATETIME_FORMAT_ACTIVITY).replace(tzinfo=UTC)
+                    activity.tick_forced = entry.get('tickforced', False)
+                    activity.loaded = False
+                    self.index[tick_id] = entry
+                else:
+                    activity.load(activityfilepath)
+                    self._files_parsed += 1
+                    if activity.tick_id == tick_id: self._update_index(activity._as_dict(), activityfilepath)
+
                 self.activity_data.append(activity)
                 if activity.tick_id == self.bgstally.tick.tick_id: self.current_activity = activity
 
@@ -148,6 +369,73 @@ class ActivityManager:
         self.activity_data.sort(reverse=True)
 
 
+    def _load_index(self):
+        """
+        Load the activity index
+        """
+        filepath: str = path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, FILE_ACTIVITY_INDEX)
+        if not path.exists(filepath): return
+
+        try:
+            with open(filepath) as indexfile:
+                self.index = json.load(indexfile)
+        except Exception as e:
+            Debug.logger.info(f"Unable to load {filepath}, all activity files will be parsed")
+            self.index = {}
+
+
+    def _save_index(self):
+        """
+        Save the activity index
+        """
+        with self._index_lock: data: str = json.dumps(self.index)
+        with open(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, FILE_ACTIVITY_INDEX), 'w') as indexfile:
+            indexfile.write(data)
+
+
+    def _index_entry_valid(self, entry: dict, filepath: str) -> bool:
+        """Check whether an index entry still matches its activity file on disk
+
+        Args:
+            entry (dict): The index entry
+            filepath (str): The full path to the activity file
+
+        Returns:
+            bool: True if the file is unchanged since it was indexed
+        """
+        try:
+            filestat = stat(filepath)
+        except OSError:
+            return False
+
+        return 'ticktime' in entry and entry.get('size') == filestat.st_size and entry.get('mtime') == filestat.st_mtime_ns
+
+
+    def _update_index(self, data: dict, filepath: str):
+        """Update the index entry for an activity from its data and activity file
+
+        Args:
+            data (dict): The activity data, as returned by Activity._as_dict()
+            filepath (str): The full path to the activity file
+        """
+        try:
+            filestat = stat(filepath)
+        except OSError:
+            return
+
+        systems: dict = data.get('systems', {})
+        entry: dict = {
+            'ticktime': data['ticktime'],
+            'tickforced': data.get('tickforced', False),
+            'size': filestat.st_size,
+            'mtime': filestat.st_mtime_ns,
+            'summary': {
+                'systems': len(systems),
+                'activesystems': sum(1 for system in systems.values() if not system.get('zero_system_activity', True))}}
+
+        with self._index_lock: self.index[data['tickid']] = entry
+
+
     def _convert_legacy_data(self, filepath: str, tick: Tick):
         """
         Convert a legacy activity data file to new location and format.
@@ -161,7 +449,9 @@ class ActivityManager:
 
         activity = Activity(self.bgstally, tick)
         activity.load_legacy_data(filepath)
-        activity.save(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()))
+        activityfilepath: str = path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename())
+        activity.save(activityfilepath)
+        self._update_index(activity._as_dict(), activityfilepath)
         self.activity_data.append(activity)
         if activity.tick_id == tick.tick_id: self.current_activity = activity
 
@@ -178,6 +468,10 @@ class ActivityManager:
         self.activity_data = self.activity_data[:KEEP_CURRENT_ACTIVITIES]
 
         for activity in activity_to_archive:
+            self.rollups.pop(activity.tick_id, None)
+            self.index.pop(activity.tick_id, None)
+            if self.store is not None and not self.store.has_tick(activity.tick_id):
+                self._store_activity(self.load_activity(activity)._as_dict())
             try:
                 Debug.logger.info(f"Archiving {activity.get_filename()}")
                 rename(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()),
@@ -190,6 +484,98 @@ class ActivityManager:
                 continue
 
 
+    def _open_store(self):
+        """
+        Open the historical activity store, if it is enabled and available
+        """
+        try:
+            enabled: bool = self.bgstally.config.activitystore().getboolean('enabled', True)
+        except Exception:
+            enabled = True
+
+        if not enabled: return
+        if not available():
+            Debug.logger.warning(f"SQLite is not available, activity will not be stored for archived ticks")
+            return
+
+        try:
+            self.store = ActivityStore(self.bgstally, path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA))
+        except Exception as e:
+            Debug.logger.error(f"Unable to open activity store", exc_info=e)
+            self.store = None
+
+
+    def _store_activity(self, data: dict):
+        """Write an activity to the historical activity store. A failure is logged and doesn't prevent the activity file being saved.
+
+        Args:
+            data (dict): The activity data, as returned by Activity._as_dict(). Must not be changed while it is stored.
+        """
+        if self.store is None: return
+
+        try:
+            self.store.save_activity(data)
+        except Exception as e:
+            Debug.logger.error(f"Unable to store activity {data.get('tickid')}", exc_info=e)
+
+
+    def _delete_stored_activity(self, tick_id: str):
+        """Remove a tick from the historical activity store. A failure is logged and doesn't prevent the activity files being saved.
+
+        Args:
+            tick_id (str): The tick ID
+        """
+        if self.store is None: return
+
+        try:
+            self.store.delete_tick(tick_id)
+        except Exception as e:
+            Debug.logger.error(f"Unable to remove stored activity {tick_id}", exc_info=e)
+
+
+    def _store_migration_worker(self, current_tick_id: str|None) -> None:
+        """One-off population of the historical activity store from the archived and current activity files. Ticks are
+        only stored if they are not already in the store. The current tick is skipped, as it is stored from memory by
+        the persistence worker.
+
+        Args:
+            current_tick_id (str|None): The ID of the current tick
+        """
+        Debug.logger.debug("Starting Activity store migration worker...")
+        start: float = perf_counter()
+        folder: str = path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA)
+        filepaths: list[str] = []
+
+        for subfolder in [path.join(folder, FOLDER_ACTIVITYDATA_ARCHIVE), folder]:
+            if not path.exists(subfolder): continue
+            filepaths += [path.join(subfolder, filename) for filename in listdir(subfolder) if filename.endswith(FILE_SUFFIX)]
+
+        count: int = 0
+
+        try:
+            for i in range(0, len(filepaths), STORE_MIGRATION_BATCH_SIZE):
+                if config.shutting_down: return
+
+                activities: list[dict] = []
+                for filepath in filepaths[i:i + STORE_MIGRATION_BATCH_SIZE]:
+                    tick_id: str = path.basename(filepath)[:-len(FILE_SUFFIX)]
+                    if tick_id == current_tick_id or self.store.has_tick(tick_id): continue
+
+                    # Loaded from file by this worker, so not shared with the main thread
+                    activity: Activity = Activity(self.bgstally, Tick(self.bgstally))
+                    activity.load(filepath)
+                    if activity.tick_id == tick_id: activities.append(activity._as_dict())
+
+                count += self.store.save_activities(activities)
+
+            self.store.set_meta(META_ARCHIVE_MIGRATED, datetime.now(UTC).strftime(DATETIME_FORMAT_ACTIVITY))
+        except Exception as e:
+            Debug.logger.error(f"Unable to populate activity store, it will be retried next time", exc_info=e)
+            return
+
+        Debug.logger.info(f"Activity store populated with {count} ticks in {(perf_counter() - start) * 1000:.1f}ms")
+
+
     def _autopost_worker(self) -> None:
         """
         Handle auto posting thread work
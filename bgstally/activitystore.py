@@ -0,0 +1,411 @@
+from datetime import datetime
+from os import path
+from threading import Lock
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.activity import Activity
+from bgstally.constants import DATETIME_FORMAT_ACTIVITY
+from bgstally.debug import Debug
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+FILENAME = "activity.db"
+STORE_SCHEMA_VERSION = 1
+METRIC_SEPARATOR = "/"
+METRIC_LIST_INDEX = "#"
+META_ARCHIVE_MIGRATED = "archive_migrated"
+METRICS_EXCLUDED: frozenset[str] = frozenset(['SystemAddress']) # Numeric identifiers rather than activity
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS ticks (id INTEGER PRIMARY KEY, tick_id TEXT NOT NULL UNIQUE, tick_time TEXT NOT NULL, tick_forced INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS ticks_time ON ticks (tick_time);
+CREATE TABLE IF NOT EXISTS systems (id INTEGER PRIMARY KEY, address TEXT NOT NULL UNIQUE, name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS systems_name ON systems (name);
+CREATE TABLE IF NOT EXISTS factions (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS metrics (tick INTEGER NOT NULL REFERENCES ticks (id) ON DELETE CASCADE,
+                                    system INTEGER NOT NULL REFERENCES systems (id),
+                                    faction INTEGER REFERENCES factions (id),
+                                    metric TEXT NOT NULL,
+                                    value REAL NOT NULL);
+DROP INDEX IF EXISTS metrics_tick;
+CREATE INDEX IF NOT EXISTS metrics_row ON metrics (tick, system, faction, metric);
+CREATE INDEX IF NOT EXISTS metrics_faction ON metrics (faction, metric, tick);
+CREATE INDEX IF NOT EXISTS metrics_system ON metrics (system, metric, tick);
+"""
+
+
+def available() -> bool:
+    """Check whether the activity store can be used, i.e. whether Python has been built with SQLite
+
+    Returns:
+        bool: True if the store is available
+    """
+    return sqlite3 is not None
+
+
+class ActivityStore:
+    """
+    Historical activity for every tick, stored in an SQLite database as one row per tick, system, faction and metric.
+    Only non-zero numeric values are stored, each metric being the path to the value within the faction (or system)
+    data, e.g. 'MissionPoints/3', 'SpaceCZ/h' or 'TradeSell/#0/profit'. Unlike the activity files, the store can be
+    queried over any range of ticks without loading each tick.
+    """
+
+    def __init__(self, bgstally: 'BGSTally', folder: str):
+        self.bgstally: BGSTally = bgstally
+        self.filepath: str = path.join(folder, FILENAME)
+
+        self._lock: Lock = Lock() # The connection is shared between the persistence worker and the main thread
+        self._connection: sqlite3.Connection|None = sqlite3.connect(self.filepath, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schemaversion', ?)", (str(STORE_SCHEMA_VERSION),))
+        self._connection.commit()
+
+
+    def close(self):
+        """
+        Close the store
+        """
+        with self._lock:
+            if self._connection is None: return
+            self._connection.close()
+            self._connection = None
+
+
+    def save_activity(self, data: dict):
+        """Store the activity for a tick, replacing anything previously stored for that tick. Only the metrics that have
+        changed since the tick was last stored are written.
+
+        Args:
+            data (dict): The activity data, as returned by Activity._as_dict()
+        """
+        with self._lock:
+            if self._connection is None: return
+
+            with self._connection:
+                self._save_tick(data)
+
+
+    def save_activities(self, activities: Iterator[dict]) -> int:
+        """Store the activity for a number of ticks in a single transaction
+
+        Args:
+            activities (Iterator[dict]): The activity data for each tick, as returned by Activity._as_dict()
+
+        Returns:
+            int: The number of activities stored
+        """
+        count: int = 0
+
+        with self._lock:
+            if self._connection is None: return 0
+
+            with self._connection:
+                for data in activities:
+                    self._save_tick(data)
+                    count += 1
+
+        return count
+
+
+    def delete_tick(self, tick_id: str):
+        """Remove a tick from the store
+
+        Args:
+            tick_id (str): The tick ID
+        """
+        with self._lock:
+            if self._connection is None: return
+
+            with self._connection:
+                self._connection.execute("DELETE FROM ticks WHERE tick_id = ?", (tick_id,))
+
+
+    def has_tick(self, tick_id: str) -> bool:
+        """Check whether a tick is stored
+
+        Args:
+            tick_id (str): The tick ID
+
+        Returns:
+            bool: True if the tick is stored
+        """
+        with self._lock:
+            if self._connection is None: return False
+            return self._connection.execute("SELECT 1 FROM ticks WHERE tick_id = ?", (tick_id,)).fetchone() is not None
+
+
+    def get_meta(self, key: str) -> str|None:
+        """Get a value stored against the store itself, e.g. to record one-off migrations
+
+        Args:
+            key (str): The key
+
+        Returns:
+            str | None: The value, or None if there is no value for the key
+        """
+        with self._lock:
+            if self._connection is None: return None
+            row: tuple|None = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return None if row is None else row[0]
+
+
+    def set_meta(self, key: str, value: str):
+        """Store a value against the store itself
+
+        Args:
+            key (str): The key
+            value (str): The value
+        """
+        with self._lock:
+            if self._connection is None: return
+
+            with self._connection:
+                self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+    def query_metrics(self, start_date: datetime, end_date: datetime|None = None, faction: str|None = None, system: str|None = None,
+                      metric: str|None = None) -> list[dict]:
+        """Get the totals of each metric for each system and faction, over all ticks starting in a range of dates. For
+        example, all INF for a faction in the last 30 days is query_metrics(now - 30 days, faction="X", metric="MissionPoints")
+        and ground CZ wins per system this month is query_metrics(start of month, metric="GroundCZ").
+
+        Args:
+            start_date (datetime): The earliest tick time to include
+            end_date (datetime | None, optional): Only include ticks before this time. Defaults to None, for all ticks since start_date.
+            faction (str | None, optional): Only include this faction. Defaults to None.
+            system (str | None, optional): Only include this system, by name. Defaults to None.
+            metric (str | None, optional): Only include this metric, or metrics within it, e.g. 'MissionPoints' includes
+            'MissionPoints/1' to 'MissionPoints/m'. Defaults to None.
+
+        Returns:
+            list[dict]: A list of totals, each a dict containing 'system', 'systemaddress', 'faction' (None for system
+            metrics), 'metric' and 'value'
+        """
+        conditions: list[str] = ["ticks.tick_time >= ?"]
+        params: list = [start_date.strftime(DATETIME_FORMAT_ACTIVITY)]
+
+        if end_date is not None:
+            conditions.append("ticks.tick_time < ?")
+            params.append(end_date.strftime(DATETIME_FORMAT_ACTIVITY))
+        if faction is not None:
+            conditions.append("metrics.faction = (SELECT id FROM factions WHERE name = ?)")
+            params.append(faction)
+        if system is not None:
+            conditions.append("metrics.system IN (SELECT id FROM systems WHERE name = ?)")
+            params.append(system)
+        if metric is not None:
+            # Match the metric itself, or any metric within it. '0' sorts immediately after the separator.
+            conditions.append("(metrics.metric = ? OR (metrics.metric > ? AND metrics.metric < ?))")
+            params += [metric, metric + METRIC_SEPARATOR, metric + chr(ord(METRIC_SEPARATOR) + 1)]
+
+        sql: str = "SELECT systems.name, systems.address, factions.name, metrics.metric, SUM(metrics.value) " \
+                   "FROM metrics JOIN ticks ON ticks.id = metrics.tick JOIN systems ON systems.id = metrics.system " \
+                   "LEFT JOIN factions ON factions.id = metrics.faction " \
+                   f"WHERE {' AND '.join(conditions)} " \
+                   "GROUP BY metrics.system, metrics.faction, metrics.metric " \
+                   "ORDER BY systems.name, factions.name, metrics.metric"
+
+        with self._lock:
+            if self._connection is None: return []
+            rows: list[tuple] = self._connection.execute(sql, params).fetchall()
+
+        return [{'system': row[0], 'systemaddress': row[1], 'faction': row[2], 'metric': row[3], 'value': self._to_number(row[4])}
+                for row in rows]
+
+
+    def query_systems(self, start_date: datetime, end_date: datetime) -> dict:
+        """Aggregate the stored activity for all ticks before end_date, back to and including the tick encompassing
+        start_date, into system data in the same structure as Activity.systems
+
+        Args:
+            start_date (datetime): The start date
+            end_date (datetime): Only include ticks before this time
+
+        Returns:
+            dict: The aggregated systems data, keyed by system address
+        """
+        with self._lock:
+            if self._connection is None: return {}
+
+            # The tick encompassing the start date is the latest tick that started on or before it
+            row: tuple|None = self._connection.execute("SELECT MAX(tick_time) FROM ticks WHERE tick_time <= ?",
+                                                       (start_date.strftime(DATETIME_FORMAT_ACTIVITY),)).fetchone()
+
+        first_tick_time: datetime = start_date if row is None or row[0] is None else \
+                                    datetime.strptime(row[0], DATETIME_FORMAT_ACTIVITY).replace(tzinfo=start_date.tzinfo)
+        systems: dict = {}
+        activity: Activity = Activity(self.bgstally)
+
+        for total in self.query_metrics(first_tick_time, end_date):
+            system: dict|None = systems.get(total['systemaddress'])
+            if system is None:
+                system = activity._get_new_system_data(total['system'], total['systemaddress'], {})
+                system['zero_system_activity'] = False
+                systems[total['systemaddress']] = system
+
+            if total['faction'] is None:
+                target: dict = system
+            else:
+                target = system['Factions'].get(total['faction'])
+                if target is None:
+                    target = activity._get_new_faction_data(total['faction'], "None", 0)
+                    system['Factions'][total['faction']] = target
+
+            self._set_metric(target, total['metric'], total['value'])
+
+        return systems
+
+
+    def _save_tick(self, data: dict):
+        """Store the data for a single tick. Must be called while holding the lock, within a transaction. If the tick is
+        already stored, only the metrics that have been added, changed or removed are written.
+
+        Args:
+            data (dict): The activity data, as returned by Activity._as_dict()
+        """
+        cursor: sqlite3.Cursor = self._connection.cursor()
+        cursor.execute("INSERT INTO ticks (tick_id, tick_time, tick_forced) VALUES (?, ?, ?) "
+                       "ON CONFLICT (tick_id) DO UPDATE SET tick_time = excluded.tick_time, tick_forced = excluded.tick_forced",
+                       (data['tickid'], data['ticktime'], 1 if data.get('tickforced') else 0))
+        tick: int = cursor.execute("SELECT id FROM ticks WHERE tick_id = ?", (data['tickid'],)).fetchone()[0]
+
+        # key = (system, faction, metric), value = metric value
+        stored: dict[tuple, int|float] = {(row[0], row[1], row[2]): row[3] for row in
+                                          cursor.execute("SELECT system, faction, metric, value FROM metrics WHERE tick = ?", (tick,))}
+        inserted: list[tuple] = []
+        updated: list[tuple] = []
+
+        for system_address, system_data in data.get('systems', {}).items():
+            system: int = self._get_system_id(cursor, str(system_address), system_data.get('System', ""))
+            metrics: list[tuple] = [(None, metric, value) for metric, value in self._flatten({k: v for k, v in system_data.items() if k != 'Factions'})]
+
+            for faction_name, faction_data in system_data.get('Factions', {}).items():
+                faction: int|None = None
+                for metric, value in self._flatten(faction_data):
+                    if faction is None: faction = self._get_faction_id(cursor, faction_name)
+                    metrics.append((faction, metric, value))
+
+            for faction, metric, value in metrics:
+                key: tuple = (system, faction, metric)
+                previous: int|float|None = stored.pop(key, None)
+                if previous is None: inserted.append((tick, system, faction, metric, value))
+                elif previous != value: updated.append((value, tick, system, faction, metric))
+
+        # Anything left over is no longer in the activity
+        cursor.executemany("DELETE FROM metrics WHERE tick = ? AND system = ? AND faction IS ? AND metric = ?",
+                           [(tick, system, faction, metric) for system, faction, metric in stored.keys()])
+        cursor.executemany("UPDATE metrics SET value = ? WHERE tick = ? AND system = ? AND faction IS ? AND metric = ?", updated)
+        cursor.executemany("INSERT INTO metrics (tick, system, faction, metric, value) VALUES (?, ?, ?, ?, ?)", inserted)
+
+
+    def _get_system_id(self, cursor: 'sqlite3.Cursor', address: str, name: str) -> int:
+        """Get the row ID for a system, adding it if necessary. Must be called while holding the lock.
+
+        Args:
+            cursor (sqlite3.Cursor): The cursor to use
+            address (str): The system address
+            name (str): The system name
+
+        Returns:
+            int: The row ID
+        """
+        row: tuple|None = cursor.execute("SELECT id, name FROM systems WHERE address = ?", (address,)).fetchone()
+        if row is None:
+            cursor.execute("INSERT INTO systems (address, name) VALUES (?, ?)", (address, name))
+            return cursor.lastrowid
+
+        if name != "" and row[1] != name:
+            cursor.execute("UPDATE systems SET name = ? WHERE id = ?", (name, row[0]))
+
+        return row[0]
+
+
+    def _get_faction_id(self, cursor: 'sqlite3.Cursor', name: str) -> int:
+        """Get the row ID for a faction, adding it if necessary. Must be called while holding the lock.
+
+        Args:
+            cursor (sqlite3.Cursor): The cursor to use
+            name (str): The faction name
+
+        Returns:
+            int: The row ID
+        """
+        row: tuple|None = cursor.execute("SELECT id FROM factions WHERE name = ?", (name,)).fetchone()
+        if row is not None: return row[0]
+
+        cursor.execute("INSERT INTO factions (name) VALUES (?)", (name,))
+        return cursor.lastrowid
+
+
+    def _flatten(self, data: dict|list, prefix: str = "") -> Iterator[tuple[str, int|float]]:
+        """Walk nested faction or system data, yielding the path and value of every non-zero numeric value
+
+        Args:
+            data (dict | list): The data
+            prefix (str, optional): The path to the data. Defaults to "".
+
+        Yields:
+            Iterator[tuple[str, int|float]]: The path and value of each non-zero number
+        """
+        items = data.items() if isinstance(data, dict) else ((f"{METRIC_LIST_INDEX}{i}", v) for i, v in enumerate(data))
+
+        for key, value in items:
+            if key in METRICS_EXCLUDED: continue
+            metric: str = f"{prefix}{key}"
+            if isinstance(value, (dict, list)):
+                yield from self._flatten(value, metric + METRIC_SEPARATOR)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool) and value != 0:
+                yield metric, value
+
+
+    def _set_metric(self, data: dict, metric: str, value: int|float):
+        """Set a value in nested faction or system data from its metric path, creating any missing levels
+
+        Args:
+            data (dict): The faction or system data
+            metric (str): The metric path
+            value (int | float): The value
+        """
+        keys: list[str] = metric.split(METRIC_SEPARATOR)
+        target: dict|list = data
+
+        for i, key in enumerate(keys):
+            last: bool = i == len(keys) - 1
+
+            if key.startswith(METRIC_LIST_INDEX) and isinstance(target, list):
+                index: int = int(key[len(METRIC_LIST_INDEX):])
+                while len(target) <= index: target.append({})
+                if last: target[index] = value
+                else: target = target[index]
+            elif isinstance(target, dict):
+                if last:
+                    target[key] = value
+                else:
+                    if not isinstance(target.get(key), (dict, list)):
+                        target[key] = [] if keys[i + 1].startswith(METRIC_LIST_INDEX) else {}
+                    target = target[key]
+            else:
+                Debug.logger.warning(f"Unable to restore stored activity metric {metric}")
+                return
+
+
+    def _to_number(self, value: float) -> int|float:
+        """Convert a stored value back to an int where it is a whole number, as most activity values are counts
+
+        Args:
+            value (float): The stored value
+
+        Returns:
+            int | float: The value
+        """
+        return int(value) if float(value).is_integer() else value
@@ -1,9 +1,11 @@
 
+from hashlib import sha256
 from json import JSONDecodeError
-from queue import Queue
+from os import path
+from random import uniform
 from re import match
 from threading import Thread
-from time import sleep
+from time import monotonic, sleep
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -12,8 +14,9 @@ if TYPE_CHECKING:
 import semantic_version
 from requests import Response
 
-from bgstally.constants import RequestMethod
+from bgstally.constants import FOLDER_OTHER_DATA, DataStore, RequestMethod
 from bgstally.debug import Debug
+from bgstally.outbox import Outbox
 from bgstally.requestmanager import BGSTallyRequest
 from bgstally.utils import get_by_path, string_to_alphanumeric
 
@@ -40,7 +43,10 @@ HEADER_APIVERSION = "apiversion"
 TIME_ACTIVITIES_WORKER_PERIOD_S = 60
 TIME_EVENTS_WORKER_PERIOD_S = 5
 TIME_OBJECTIVES_WORKER_PERIOD_S = 30
+TIME_EVENTS_BACKOFF_BASE_S = 10
+TIME_EVENTS_BACKOFF_MAX_S = 60 * 30     # 30 minutes
 BATCH_EVENTS_MAX_SIZE = 10
+FOLDER_OUTBOX = "outbox"
 
 
 class API:
@@ -65,6 +71,7 @@ class API:
             self.events_enabled: bool = True
             self.objectives_enabled: bool = True
             self.user_approved: bool = False
+            self.outbox_id: str = self._default_outbox_id()
 
             # Default API discovery state. Overridden by response from /discovery endpoint if it exists
             self._revert_discovery_to_defaults()
@@ -72,8 +79,13 @@ class API:
         # Used to store a single dict containing BGS activity when it's been updated.
         self.activity: dict|None = None
 
-        # Events queue is used to batch up events API messages. All batched messages are sent when the worker works.
-        self.events_queue: Queue = Queue()
+        # Events outbox is used to batch up events API messages. Events are stored on disk until the server has
+        # acknowledged them, and are sent in batches when the worker works. The outbox file is written by the persistence worker.
+        self.events_outbox: Outbox = Outbox(path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FOLDER_OUTBOX, f"{self.outbox_id}.jsonl"),
+                                            on_changed=lambda: self.bgstally.persistence_manager.mark_dirty(DataStore.OUTBOXES))
+        self.events_in_flight: bool = False
+        self.events_retry_time: float = 0
+        self.events_failures: int = 0
 
         # Received data state (transient, we don't save or load this)
         self.objectives: list = []
@@ -93,6 +105,17 @@ class API:
         self.discover(self.discovery_received)
 
 
+    def _default_outbox_id(self) -> str:
+        """
+        Return the outbox ID for an API that doesn't have one saved yet. It's derived from the URL rather than random, so
+        the same outbox is found again if we're restarted before the APIs are saved, and isn't deleted as unused.
+
+        Returns:
+            str: The outbox ID
+        """
+        return sha256(self.url.encode('utf-8')).hexdigest()[:16]
+
+
     def as_dict(self) -> dict:
         """
         Return a dict containing our user and discovery state
@@ -105,6 +128,7 @@ class API:
             'events_enabled': self.events_enabled,
             'objectives_enabled': self.objectives_enabled,
             'user_approved': self.user_approved,
+            'outbox_id': self.outbox_id,
 
             # Discovery state
             'name': self.name,
@@ -126,6 +150,7 @@ class API:
         self.events_enabled: bool = data.get('events_enabled', True)
         self.objectives_enabled: bool = data.get('objectives_enabled', True)
         self.user_approved: bool = data.get('user_approved', False)
+        self.outbox_id: str = data.get('outbox_id') or self._default_outbox_id()
 
         # Discovery state
         self.name: str = data['name']
@@ -176,6 +201,7 @@ class API:
             if self.bgstally.ui.frame: self.bgstally.ui.frame.after(1000, self.bgstally.ui.update_plugin_frame())
 
         self.events = discovery_data.get('events', EVENTS_FILTER_DEFAULTS)
+        self.bgstally.persistence_manager.mark_dirty(DataStore.APIS)
 
 
     def send_activity(self, activity:dict):
@@ -200,14 +226,24 @@ class API:
                 or not self.events_enabled \
                 or not ENDPOINT_EVENTS in self.endpoints \
                 or not self.bgstally.request_manager.url_valid(self.url):
-            with self.events_queue.mutex:
-                self.events_queue.queue.clear()
+            self.events_outbox.clear()
             return
 
         if event.get('event', '') not in self.events or self._is_filtered(event):
             return
 
-        self.events_queue.put(event)
+        self.events_outbox.append(event)
+
+
+    def wants_event(self, event_name:str) -> bool:
+        """
+        Return True if events are enabled for this API and it accepts events of the given type
+        """
+        return event_name in self.events \
+            and self.user_approved \
+            and self.events_enabled \
+            and ENDPOINT_EVENTS in self.endpoints \
+            and self.bgstally.request_manager.url_valid(self.url)
 
 
     def _revert_discovery_to_defaults(self):
@@ -278,7 +314,8 @@ class API:
     def _events_worker(self) -> None:
         """
         Handle events API. If there's queued events, this worker triggers a call to the events endpoint
-        on a regular time period, sending the currently queued batch of events.
+        on a regular time period, sending the oldest batch of events from the outbox. Only one batch is sent
+        at a time, and it stays in the outbox until the server has acknowledged it.
         """
         Debug.logger.debug("Starting Events API Worker...")
 
@@ -290,16 +327,61 @@ class API:
                     or not self.events_enabled \
                     or not ENDPOINT_EVENTS in self.endpoints \
                     or not self.bgstally.request_manager.url_valid(self.url):
-                with self.events_queue.mutex:
-                    self.events_queue.queue.clear()
+                self.events_outbox.clear()
+                continue
+
+            # Wait for the response to the last batch. The request manager always calls back, even if the request
+            # fails, so the batch is only sent again once it has definitely failed.
+            if self.events_in_flight: continue
+
+            # Backing off after a failure
+            if monotonic() < self.events_retry_time: continue
+
+            # Grab the oldest events in the outbox up to a maximum batch size
+            batch_size:int = max(int(get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'max_batch'], 0)), BATCH_EVENTS_MAX_SIZE)
+            last_seq, queued_events = self.events_outbox.peek(batch_size)
+            if len(queued_events) == 0: continue
+
+            url:str = self.url + get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'path'], ENDPOINT_EVENTS)
+            self.events_in_flight = True
+            self.bgstally.request_manager.queue_request(url, RequestMethod.POST, headers=self._get_headers(), payload=queued_events,
+                                                        data={'seq': last_seq}, callback=self._events_sent)
+
 
-            if self.events_queue.qsize() > 0:
-                url:str = self.url + get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'path'], ENDPOINT_EVENTS)
+    def _events_sent(self, success: bool, response: Response, request: BGSTallyRequest):
+        """A batch of events has been sent to the server
+
+        Args:
+            success (bool): True if the request was successful
+            response (Response): The Response object
+            request (BGSTallyRequest): The original BGSTallyRequest object
+        """
+        self.events_in_flight = False
+        status_code:int|None = getattr(response, 'status_code', None)
+
+        if success:
+            self.events_outbox.ack(request.data['seq'])
+            self.events_failures = 0
+            return
+
+        if status_code is not None and 400 <= status_code < 500 and status_code not in [408, 429]:
+            # The server has rejected these events, retrying won't help
+            Debug.logger.warning(f"Events rejected by {self.url} with status {status_code}, discarding batch")
+            self.events_outbox.ack(request.data['seq'])
+            return
+
+        # Exponential backoff with jitter, honouring any delay requested by the server
+        self.events_failures += 1
+        delay:float = min(TIME_EVENTS_BACKOFF_BASE_S * 2 ** (self.events_failures - 1), TIME_EVENTS_BACKOFF_MAX_S)
+        delay = uniform(delay / 2, delay)
+
+        try:
+            delay = max(delay, float(getattr(response, 'headers', {}).get('Retry-After', 0)))
+        except (TypeError, ValueError):
+            pass
 
-                # Grab all available events in the queue up to a maximum batch size
-                batch_size:int = max(int(get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'max_batch'], 0)), BATCH_EVENTS_MAX_SIZE)
-                queued_events:list = [self.events_queue.get(block=False) for _ in range(min(batch_size, self.events_queue.qsize()))]
-                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, headers=self._get_headers(), payload=queued_events)
+        Debug.logger.info(f"Unable to send events to {self.url}, {len(self.events_outbox)} events waiting, retrying in {delay:.0f}s")
+        self.events_retry_time = monotonic() + delay
 
 
     def _objectives_worker(self) -> None:
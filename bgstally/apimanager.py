@@ -1,17 +1,18 @@
 import json
 from datetime import UTC, datetime
 from enum import Enum
-from os import path
+from os import listdir, path, remove
 from typing import TYPE_CHECKING, Any
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
 from bgstally.activity import Activity
-from bgstally.api import API
+from bgstally.api import API, FOLDER_OUTBOX
 from bgstally.constants import DATETIME_FORMAT_API, FOLDER_OTHER_DATA
 from bgstally.debug import Debug
-from bgstally.utils import get_by_path
+from bgstally.outbox import Outbox
+from bgstally.utils import copy_json, get_by_path
 
 FILENAME = "apis.json"
 
@@ -33,6 +34,8 @@ class APIManager:
             # not create one by default.
             self.apis.append(API(self.bgstally))
 
+        self._delete_unused_outboxes()
+
 
     def load(self):
         """
@@ -54,14 +57,40 @@ class APIManager:
         """
         Save all APIs to disk
         """
-        apis_json:list = []
+        self.write(self.snapshot())
 
-        for api in self.apis:
-            apis_json.append(api.as_dict())
 
+    def snapshot(self) -> list:
+        """
+        Take a copy of all APIs, ready to write
+        """
+        return [copy_json(api.as_dict()) for api in self.apis]
+
+
+    def write(self, apis_json: list):
+        """
+        Write a snapshot of all APIs to disk
+        """
         file:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        data:str = json.dumps(apis_json)
         with open(file, 'w') as outfile:
-            json.dump(apis_json, outfile)
+            outfile.write(data)
+
+
+    def snapshot_outboxes(self) -> list[Outbox]:
+        """
+        Take a copy of the list of API events outboxes. The outboxes hold their own queued changes, so they can be
+        flushed from any thread.
+        """
+        return [api.events_outbox for api in self.apis]
+
+
+    def write_outboxes(self, outboxes: list[Outbox]):
+        """
+        Write any queued changes to each events outbox
+        """
+        for outbox in outboxes:
+            outbox.flush()
 
 
     def send_activity(self, activity:Activity, cmdr:str):
@@ -82,11 +111,45 @@ class APIManager:
             cmdr (str): The CMDR name
             mission (dict, optional): Information about the mission, if applicable. Defaults to {}.
         """
+        apis: list[API] = [api for api in self.apis if api.wants_event(event.get('event', ""))]
+        if not apis: return
+
         api_event: dict = self._build_api_event(event, activity, cmdr, mission)
-        for api in self.apis:
+        for api in apis:
             api.send_event(api_event)
 
 
+    def wants_event(self, event_name: str) -> bool:
+        """Check whether any API is interested in an event, so that events nobody wants can be skipped before any work is done
+
+        Args:
+            event_name (str): The journal event name
+
+        Returns:
+            bool: True if at least one API will accept the event
+        """
+        return any(api.wants_event(event_name) for api in self.apis)
+
+
+    def _delete_unused_outboxes(self):
+        """
+        Delete the outbox files left behind by APIs that have been removed
+        """
+        folder:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FOLDER_OUTBOX)
+        if not path.exists(folder): return
+
+        in_use:list[str] = [path.basename(api.events_outbox.filepath) for api in self.apis]
+
+        for filename in listdir(folder):
+            if filename in in_use or not filename.endswith((".jsonl", ".jsonl.tmp")): continue
+
+            try:
+                Debug.logger.info(f"Deleting outbox {filename} for a removed API")
+                remove(path.join(folder, filename))
+            except Exception as e:
+                Debug.logger.error(f"Unable to delete outbox {filename}", exc_info=e)
+
+
     def _build_api_activity(self, activity:Activity, cmdr:str):
         """
         Build an API-ready activity ready for sending. A dict matching the API spec is built from the Activity data.
@@ -2,7 +2,8 @@ import sys
 from functools import partial
 from os import mkdir, path
 from threading import Thread
-from time import sleep
+from time import perf_counter, sleep
+from typing import Callable
 
 import semantic_version
 from companion import SERVER_LIVE, CAPIData
@@ -13,16 +14,20 @@ from bgstally.activitymanager import ActivityManager
 from bgstally.apimanager import APIManager
 from bgstally.colonisation import Colonisation
 from bgstally.config import Config
-from bgstally.constants import FOLDER_OTHER_DATA, UpdateUIPolicy
+from bgstally.constants import FOLDER_OTHER_DATA, DataStore, UpdateUIPolicy
 from bgstally.debug import Debug
 from bgstally.discord import Discord
+from bgstally.eventrouter import EVENTS_SYSTEM, EventRouter, JournalContext
 from bgstally.factionmanager import FactionManager
 from bgstally.fleetcarrier import FleetCarrier
 from bgstally.formattermanager import ActivityFormatterManager
+from bgstally.journalimporter import JournalImporter
 from bgstally.market import Market
 from bgstally.missionlog import MissionLog
 from bgstally.objectivesmanager import ObjectivesManager
 from bgstally.overlay import Overlay
+from bgstally.persistencemanager import PersistenceManager
+from bgstally.profiler import HANDLER_TOTAL, Profiler
 from bgstally.requestmanager import RequestManager
 from bgstally.state import State
 from bgstally.targetmanager import TargetManager
@@ -86,6 +91,15 @@ class BGSTally:
         data_filepath = path.join(self.plugin_dir, FOLDER_OTHER_DATA)
         if not path.exists(data_filepath): mkdir(data_filepath)
 
+        # Profiler Class, needs to exist before any class that it instruments
+        self.profiler: Profiler = Profiler(self)
+
+        # Event Router Class, handlers are subscribed once all the classes that handle journal events exist
+        self.event_router: EventRouter = EventRouter(self)
+
+        # Persistence Class, needs to exist before any class that marks data as changed
+        self.persistence_manager: PersistenceManager = PersistenceManager(self)
+
         # Main Classes
         self.state: State = State(self)
         self.mission_log: MissionLog = MissionLog(self)
@@ -105,6 +119,23 @@ class BGSTally:
         self.objectives_manager: ObjectivesManager = ObjectivesManager(self)
         self.colonisation: Colonisation = Colonisation(self)
         self.faction_manager: FactionManager = FactionManager(self)
+        self.journal_importer: JournalImporter = JournalImporter(self)
+
+        # Data stores that are saved by the persistence manager when marked dirty. A snapshot of each store is taken on
+        # the main thread, where the data is changed, and then encoded and written on the persistence worker.
+        self.persistence_manager.register(DataStore.ACTIVITY, self.activity_manager.snapshot, self.activity_manager.write)
+        self.persistence_manager.register(DataStore.APIS, self.api_manager.snapshot, self.api_manager.write)
+        self.persistence_manager.register(DataStore.CMDRCACHE, self.target_manager.cmdr_lookup.snapshot, self.target_manager.cmdr_lookup.write)
+        self.persistence_manager.register(DataStore.FACTIONS, self.faction_manager.snapshot, self.faction_manager.write)
+        self.persistence_manager.register(DataStore.FLEETCARRIER, self.fleet_carrier.snapshot, self.fleet_carrier.write)
+        self.persistence_manager.register(DataStore.MISSIONLOG, self.mission_log.snapshot, self.mission_log.write)
+        self.persistence_manager.register(DataStore.OUTBOXES, self.api_manager.snapshot_outboxes, self.api_manager.write_outboxes)
+        self.persistence_manager.register(DataStore.STATE, self.state.snapshot, self.state.write)
+        self.persistence_manager.register(DataStore.TARGETLOG, self.target_manager.snapshot, self.target_manager.write)
+        self.persistence_manager.register(DataStore.TICK, self.tick.snapshot, self.tick.write)
+        self.persistence_manager.register(DataStore.WEBHOOKS, self.webhook_manager.snapshot, self.webhook_manager.write)
+
+        self._subscribe_journal_handlers()
 
         self.tick_thread: Thread = Thread(target=self._tick_worker, name="BGSTally Tick worker")
         self.tick_thread.daemon = True
@@ -117,15 +148,15 @@ class BGSTally:
         """
         self.ui.shut_down()
         self.colonisation.save('Shutdown')
-        self.save_data()
+        self.persistence_manager.shut_down()
+        self.activity_manager.shut_down()
+        self.request_manager.shut_down()
 
 
     def journal_entry(self, cmdr, is_beta, system, station, entry, state):
         """
         Parse an incoming journal entry and store the data we need
         """
-        dirty:bool = False
-
         # Live galaxy check
         try:
             if not monitor.is_live_galaxy() or is_beta: return
@@ -133,6 +164,11 @@ class BGSTally:
             self.debug.logger.error(f"The EDMC Version is too old, please upgrade to v5.6.0 or later", exc_info=e)
             return
 
+        # Skip events that no handler or API is interested in before doing any work
+        event_type: str = entry.get('event', "")
+        api_event_wanted: bool = self.api_manager.wants_event(event_type)
+        if not api_event_wanted and not self.event_router.handles(event_type): return
+
         # Total hack for now. We need cmdr in Activity to allow us to send it to the API when the user changes values in the UI.
         # What **should** happen is each Activity object should be associated with a single CMDR, and then all reporting
         # kept separate per CMDR.
@@ -142,218 +178,102 @@ class BGSTally:
             return
         activity.cmdr = cmdr
 
-        if entry.get('event') in ['StartUp', 'Location', 'FSDJump', 'CarrierJump']:
-            activity.system_entered(entry, self.state)
-            self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-            self.ui.show_system_info(entry.get('SystemAddress'))
-            dirty = True
-
-        mission:dict|None = self.mission_log.get_mission(entry.get('MissionID'))
-
-        match entry.get('event'):
-            case 'ApproachSettlement' if state['Odyssey']:
-                activity.settlement_approached(entry, self.state)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'Bounty':
-                activity.bv_received(entry, self.state, cmdr)
-                dirty = True
-
-            case 'CapShipBond':
-                activity.cap_ship_bond_received(entry, cmdr)
-                dirty = True
-
-            case 'Cargo':
-                activity.cargo(entry)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-
-            case 'CargoTransfer':
-                self.fleet_carrier.cargo_transfer(entry)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'CarrierDepositFuel':
-                self.fleet_carrier.deposit_fuel(entry)
-
-            case 'CarrierJumpCancelled':
-                self.fleet_carrier.jump_cancelled(entry)
-
-            case 'CarrierJumpRequest':
-                self.fleet_carrier.jump_requested(entry)
-
-            case 'CarrierLocation':
-                self.fleet_carrier.carrier_location(entry)
-
-            case 'CarrierStats':
-                self.fleet_carrier.stats_received(entry)
-
-            case 'CarrierTradeOrder':
-                self.fleet_carrier.trade_order(entry)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-
-            case 'CollectCargo':
-                activity.cargo_collected(entry, self.state)
-                dirty = True
-
-            case 'ColonisationSystemClaim':
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'ColonisationBeaconDeployed':
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'ColonisationConstructionDepot':
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'ColonisationContribution':
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'CommitCrime':
-                activity.crime_committed(entry, self.state)
-                dirty = True
-
-            case 'Died':
-                self.target_manager.died(entry, system)
-
-            case 'Docked':
-                self.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.state.station_faction) # Default to existing value
-                self.state.station_type = entry.get('StationType', "")
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                self.ui.show_station_info(station, self.state.station_faction)
-                dirty = True
-
-            case 'EjectCargo':
-                activity.cargo_ejected(entry)
-                dirty = True
-
-            case 'FactionKillBond':
-                activity.cb_received(entry, self.state, cmdr)
-                dirty = True
-
-            case 'Friends' if entry.get('Status') == "Requested":
-                self.target_manager.friend_request(entry, system)
-
-            case 'Friends' if entry.get('Status') == "Added":
-                self.target_manager.friend_added(entry, system)
+        profiler: Profiler = self.profiler
+        profiling: bool = profiler.enabled
+        if profiling: start: float = perf_counter()
 
-            case 'Interdicted':
-                self.target_manager.interdicted(entry, system)
-
-            case 'Location' | 'StartUp' if entry.get('Docked') == True:
-                self.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.state.station_faction) # Default to existing value
-                self.ui.show_station_info(station, self.state.station_faction)
-                dirty = True
+        # Fetch the mission before the handlers run, as they remove completed and failed missions from the mission log
+        mission:dict|None = self.mission_log.get_mission(entry.get('MissionID')) if api_event_wanted else None
 
-            case 'Loadout':
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
+        dirty:bool = self.event_router.dispatch(entry, JournalContext(cmdr, is_beta, system, station, state, activity))
 
-            case 'Market':
-                self.market.load()
-                self.fleet_carrier.market(entry)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-
-            case 'MarketBuy':
-                activity.trade_purchased(entry, self.state)
-                self.fleet_carrier.market_activity(entry)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-
-                dirty = True
-
-            case 'MarketSell':
-                activity.trade_sold(entry, self.state)
-                self.fleet_carrier.market_activity(entry)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'MissionAbandoned':
-                self.mission_log.delete_mission_by_id(entry.get('MissionID'))
-                dirty = True
-
-            case 'MissionAccepted':
-                self.mission_log.add_mission(entry.get('Name', ""), entry.get('Faction', ""), entry.get('MissionID', ""), entry.get('Expiry', ""),
-                                             entry.get('DestinationSystem', ""), entry.get('DestinationSettlement', ""), system, station,
-                                             entry.get('Count', -1), entry.get('PassengerCount', -1), entry.get('KillCount', -1),
-                                             entry.get('TargetFaction', ""))
-                dirty = True
-
-            case 'MissionCompleted':
-                activity.mission_completed(entry, self.mission_log)
-                dirty = True
-
-            case 'MissionFailed':
-                activity.mission_failed(entry, self.mission_log)
-                dirty = True
-
-            case 'PowerplayMerits':
-                activity.powerplay_merits(entry)
-                dirty = True
-
-            case 'ReceiveText':
-                self.target_manager.received_text(entry, system)
-
-            case 'RedeemVoucher' if entry.get('Type') == 'bounty':
-                activity.bv_redeemed(entry, self.state)
-                dirty = True
-
-            case 'RedeemVoucher' if entry.get('Type') == 'CombatBond':
-                activity.cb_redeemed(entry, self.state)
-                dirty = True
-
-            case 'Resurrect':
-                activity.player_resurrected()
-                dirty = True
-
-            case 'SearchAndRescue':
-                activity.search_and_rescue(entry, self.state)
-                dirty = True
-
-            case 'SellExplorationData' | 'MultiSellExplorationData':
-                activity.exploration_data_sold(entry, self.state)
-                dirty = True
+        api_manager: APIManager = profiler.wrap(self.api_manager, "APIManager", event_type)
+        if dirty:
+            self.persistence_manager.mark_dirty(DataStore.ACTIVITY, DataStore.STATE)
+            api_manager.send_activity(activity, cmdr)
 
-            case 'SellOrganicData':
-                activity.organic_data_sold(entry, self.state)
-                dirty = True
+        if api_event_wanted: api_manager.send_event(entry, activity, cmdr, mission)
 
-            case 'ShipTargeted':
-                activity.ship_targeted(entry, self.state)
-                self.target_manager.ship_targeted(entry, system)
-                dirty = True
+        if profiling: profiler.record(event_type, HANDLER_TOTAL, perf_counter() - start)
 
-            case 'Shipyard' | 'StoredShips' | 'ShipyardSwap' | 'ShipyardTransfer':
-                self.fleet_carrier.shipyard_event(entry)
 
-            case 'SupercruiseDestinationDrop':
-                activity.destination_dropped(entry, self.state)
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
+    def _subscribe_journal_handlers(self):
+        """
+        Subscribe all journal event handlers to the event router. Handlers for the same event are called in the order
+        they are subscribed here.
+        """
+        router: EventRouter = self.event_router
+
+        # State
+        router.subscribe(['Docked'], "BGSTally.docked", self._docked, dirty=True)
+        router.subscribe(['Location', 'StartUp'], "BGSTally.docked_on_startup", self._docked_on_startup, guard=lambda entry, context: entry.get('Docked') == True, dirty=True)
+        router.subscribe(['Undocked'], "BGSTally.undocked", self._undocked, guard=lambda entry, context: entry.get('Taxi') == False)
+
+        # Activity
+        self.activity_manager.subscribe_journal_handlers(router, self.state, self.mission_log)
+
+        # Market and Fleet Carrier
+        router.subscribe(['Market'], "Market.load", lambda entry, context: self.market.load())
+        router.subscribe(['CargoTransfer'], "FleetCarrier.cargo_transfer", lambda entry, context: self.fleet_carrier.cargo_transfer(entry), dirty=True)
+        router.subscribe(['CarrierDepositFuel'], "FleetCarrier.deposit_fuel", lambda entry, context: self.fleet_carrier.deposit_fuel(entry))
+        router.subscribe(['CarrierJumpCancelled'], "FleetCarrier.jump_cancelled", lambda entry, context: self.fleet_carrier.jump_cancelled(entry))
+        router.subscribe(['CarrierJumpRequest'], "FleetCarrier.jump_requested", lambda entry, context: self.fleet_carrier.jump_requested(entry))
+        router.subscribe(['CarrierLocation'], "FleetCarrier.carrier_location", lambda entry, context: self.fleet_carrier.carrier_location(entry))
+        router.subscribe(['CarrierStats'], "FleetCarrier.stats_received", lambda entry, context: self.fleet_carrier.stats_received(entry))
+        router.subscribe(['CarrierTradeOrder'], "FleetCarrier.trade_order", lambda entry, context: self.fleet_carrier.trade_order(entry))
+        router.subscribe(['Market'], "FleetCarrier.market", lambda entry, context: self.fleet_carrier.market(entry))
+        router.subscribe(['MarketBuy', 'MarketSell'], "FleetCarrier.market_activity", lambda entry, context: self.fleet_carrier.market_activity(entry))
+        router.subscribe(['Shipyard', 'StoredShips', 'ShipyardSwap', 'ShipyardTransfer'], "FleetCarrier.shipyard_event", lambda entry, context: self.fleet_carrier.shipyard_event(entry))
+
+        # Missions
+        self.mission_log.subscribe_journal_handlers(router)
+
+        # CMDR interactions. Text messages are only of interest in the 'local' channel, as that's the current system.
+        router.subscribe(['Died'], "TargetManager.died", lambda entry, context: self.target_manager.died(entry, context.system))
+        router.subscribe(['Friends'], "TargetManager.friend_request", lambda entry, context: self.target_manager.friend_request(entry, context.system), guard=lambda entry, context: entry.get('Status') == "Requested")
+        router.subscribe(['Friends'], "TargetManager.friend_added", lambda entry, context: self.target_manager.friend_added(entry, context.system), guard=lambda entry, context: entry.get('Status') == "Added")
+        router.subscribe(['Interdicted'], "TargetManager.interdicted", lambda entry, context: self.target_manager.interdicted(entry, context.system))
+        router.subscribe(['ReceiveText'], "TargetManager.received_text", lambda entry, context: self.target_manager.received_text(entry, context.system), guard=lambda entry, context: entry.get('Channel') == "local")
+        router.subscribe(['ShipTargeted'], "TargetManager.ship_targeted", lambda entry, context: self.target_manager.ship_targeted(entry, context.system))
+        router.subscribe(['WingInvite'], "TargetManager.team_invite", lambda entry, context: self.target_manager.team_invite(entry, context.system))
+
+        # Colonisation
+        colonisation_entry: Callable[[dict, JournalContext], None] = lambda entry, context: self.colonisation.journal_entry(context.cmdr, context.is_beta, context.system, context.station, entry, context.state)
+        router.subscribe(EVENTS_SYSTEM + ['Cargo', 'CarrierTradeOrder', 'Docked', 'Loadout', 'Market', 'MarketBuy', 'MarketSell', 'SupercruiseEntry'],
+                         "Colonisation.journal_entry", colonisation_entry)
+        router.subscribe(['Undocked'], "Colonisation.journal_entry", colonisation_entry, guard=lambda entry, context: entry.get('Taxi') == False)
+        router.subscribe(['ApproachSettlement'], "Colonisation.journal_entry", colonisation_entry, guard=lambda entry, context: context.state['Odyssey'])
+        router.subscribe(['CargoTransfer', 'ColonisationSystemClaim', 'ColonisationBeaconDeployed', 'ColonisationConstructionDepot', 'ColonisationContribution',
+                          'SupercruiseDestinationDrop', 'SupercruiseExit'],
+                         "Colonisation.journal_entry", colonisation_entry, dirty=True)
+
+        # UI
+        router.subscribe(EVENTS_SYSTEM, "UI.show_system_info", lambda entry, context: self.ui.show_system_info(entry.get('SystemAddress')))
+
+
+    def _docked(self, entry: dict, context: JournalContext):
+        """
+        Docked at a station
+        """
+        self.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.state.station_faction) # Default to existing value
+        self.state.station_type = entry.get('StationType', "")
+        self.ui.show_station_info(context.station, self.state.station_faction)
 
-            case 'SupercruiseEntry':
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                activity.supercruise(entry, self.state)
 
-            case 'SupercruiseExit':
-                # This doesn't work. There has to be a way to figure out which body we're orbiting/near
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-                dirty = True
-
-            case 'Undocked' if entry.get('Taxi') == False:
-                self.state.station_faction = ""
-                self.state.station_type = ""
-                self.colonisation.journal_entry(cmdr, is_beta, system, station, entry, state)
-
-            case 'WingInvite':
-                self.target_manager.team_invite(entry, system)
+    def _docked_on_startup(self, entry: dict, context: JournalContext):
+        """
+        Already docked at a station when the game started or the location was reported
+        """
+        self.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.state.station_faction) # Default to existing value
+        self.ui.show_station_info(context.station, self.state.station_faction)
 
-        if dirty:
-            self.save_data()
-            self.api_manager.send_activity(activity, cmdr)
 
-        self.api_manager.send_event(entry, activity, cmdr, mission)
+    def _undocked(self, entry: dict, context: JournalContext):
+        """
+        Undocked from a station
+        """
+        self.state.station_faction = ""
+        self.state.station_type = ""
 
 
     def capi_fleetcarrier(self, data: CAPIData):
@@ -390,22 +310,6 @@ class BGSTally:
             return tick_success
 
 
-    def save_data(self):
-        """
-        Save all data structures
-        """
-        # TODO: Don't need to save all this all the time, be more selective
-        self.mission_log.save()
-        self.target_manager.save()
-        self.tick.save()
-        self.activity_manager.save()
-        self.state.save()
-        self.fleet_carrier.save()
-        self.api_manager.save()
-        self.webhook_manager.save()
-        self.faction_manager.save()
-
-
     def new_tick(self, force: bool, uipolicy: UpdateUIPolicy):
         """
         Start a new tick.
@@ -413,6 +317,8 @@ class BGSTally:
         if force: self.tick.force_tick()
         if not self.activity_manager.new_tick(self.tick, force): return
 
+        self.persistence_manager.mark_dirty(DataStore.ACTIVITY, DataStore.TICK)
+
         match uipolicy:
             case UpdateUIPolicy.IMMEDIATE:
                 self.ui.update_plugin_frame()
@@ -436,4 +342,5 @@ class BGSTally:
 
             sleep(TIME_TICK_WORKER_PERIOD_S)
 
-            self.check_tick(UpdateUIPolicy.LATER) # Must not update UI directly from a thread
+            if self.tick.poll_due():
+                self.check_tick(UpdateUIPolicy.LATER) # Must not update UI directly from a thread
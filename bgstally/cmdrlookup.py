@@ -0,0 +1,205 @@
+import json
+from collections import OrderedDict
+from datetime import UTC, datetime
+from functools import partial
+from os import path
+from threading import Lock, Timer
+from time import time
+from typing import TYPE_CHECKING
+
+from requests import Response
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.constants import FOLDER_OTHER_DATA, DataStore, RequestMethod
+from bgstally.debug import Debug
+from bgstally.requestmanager import BGSTallyRequest
+
+FILENAME = "cmdrcache.json"
+URL_INARA_API = "https://inara.cz/inapi/v1/"
+DATETIME_FORMAT_INARA = "%Y-%m-%dT%H:%M:%SZ"
+
+BATCH_DELAY_S = 5             # Wait this long after the first lookup for more CMDRs to send in the same request
+BATCH_SIZE_MAX = 20           # Maximum number of CMDRs looked up in a single Inara request
+CACHE_ENTRIES_MAX = 2000      # Maximum number of CMDR profiles kept, the least recently used are dropped first
+CACHE_TTL_S = 60 * 60 * 24 * 7 # CMDR profiles are looked up again after a week
+
+INARA_STATUS_OK = 200
+INARA_STATUS_NO_RESULTS = 204
+PROFILE_FIELDS = {'commanderRanksPilot': 'ranks', 'commanderSquadron': 'squadron', 'inaraURL': 'inaraURL'}
+
+
+class CmdrLookup:
+    """
+    Looks up CMDR profiles on Inara. Lookups are collected for a few seconds and sent as a single Inara request with one
+    getCommanderProfile event per CMDR, and a CMDR that is already being looked up isn't requested again. Profiles are kept
+    in a size-limited cache, saved to disk, and looked up again once they are a week old.
+    """
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+        # Cached profiles, keyed on CMDR name, least recently used first: {'profile': dict, 'fetched': epoch seconds}
+        self.profiles: OrderedDict[str, dict] = OrderedDict()
+        # CMDRs being looked up, with the callbacks waiting for each of them
+        self.waiting: dict[str, list[callable]] = {}
+        # CMDRs waiting to be sent in the next batch
+        self.queued: list[str] = []
+        self.hits: int = 0
+        self.requests: int = 0
+
+        self._timer: Timer|None = None
+        self._lock: Lock = Lock()
+        self.load()
+
+
+    def lookup(self, cmdr_name: str, callback: callable) -> dict|None:
+        """Look up a CMDR's profile. A cached profile is returned straight away, otherwise the CMDR is looked up in the
+        background and the callback is called with (cmdr_name, profile) when the response arrives. The profile is None if
+        the lookup failed.
+
+        Args:
+            cmdr_name (str): The CMDR name
+            callback (callable): The function to call with the profile if it isn't cached
+
+        Returns:
+            dict|None: The cached profile, or None if it is being looked up
+        """
+        with self._lock:
+            cached: dict|None = self.profiles.get(cmdr_name)
+            if cached is not None and time() - cached['fetched'] < CACHE_TTL_S:
+                self.profiles.move_to_end(cmdr_name)
+                self.hits += 1
+                return cached['profile']
+
+            if cmdr_name in self.waiting:
+                Debug.logger.debug(f"Lookup for CMDR {cmdr_name} already in progress, waiting for its response")
+                self.waiting[cmdr_name].append(callback)
+                return None
+
+            self.waiting[cmdr_name] = [callback]
+            self.queued.append(cmdr_name)
+
+            if self._timer is None:
+                self._timer = Timer(BATCH_DELAY_S, self._send_batches)
+                self._timer.name = "BGSTally CMDR lookup worker"
+                self._timer.daemon = True
+                self._timer.start()
+
+        return None
+
+
+    def get_stats(self) -> dict:
+        """Get lookup statistics
+
+        Returns:
+            dict: The number of cached profiles, cache hits, Inara requests sent and CMDRs waiting for a response
+        """
+        with self._lock:
+            return {'cached': len(self.profiles), 'hits': self.hits, 'requests': self.requests, 'waiting': len(self.waiting)}
+
+
+    def load(self):
+        """
+        Load the cached profiles from file
+        """
+        file: str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        if not path.exists(file): return
+
+        try:
+            with open(file) as json_file:
+                profiles: dict = json.load(json_file)
+        except Exception as e:
+            Debug.logger.info(f"Unable to load {file}")
+            return
+
+        oldest: float = time() - CACHE_TTL_S
+        self.profiles = OrderedDict((cmdr_name, cached) for cmdr_name, cached in profiles.items() if cached.get('fetched', 0) > oldest)
+
+
+    def save(self):
+        """
+        Save the cached profiles to file, dropping any that have expired
+        """
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> dict:
+        """
+        Take a copy of the cached profiles that haven't expired, ready to write
+        """
+        oldest: float = time() - CACHE_TTL_S
+        with self._lock:
+            return {cmdr_name: cached for cmdr_name, cached in self.profiles.items() if cached['fetched'] > oldest}
+
+
+    def write(self, profiles: dict):
+        """
+        Write a snapshot of the cached profiles to file
+        """
+        file: str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        with open(file, 'w') as outfile:
+            json.dump(profiles, outfile)
+
+
+    def _send_batches(self):
+        """
+        Send all queued lookups to Inara, in batches of up to BATCH_SIZE_MAX CMDRs per request
+        """
+        with self._lock:
+            self._timer = None
+            queued: list[str] = self.queued
+            self.queued = []
+            self.requests += (len(queued) + BATCH_SIZE_MAX - 1) // BATCH_SIZE_MAX
+
+        for i in range(0, len(queued), BATCH_SIZE_MAX):
+            batch: list[str] = queued[i:i + BATCH_SIZE_MAX]
+            timestamp: str = datetime.now(UTC).strftime(DATETIME_FORMAT_INARA)
+            payload: dict = {
+                'header': {
+                    'appName': self.bgstally.plugin_name,
+                    'appVersion': str(self.bgstally.version),
+                    'isBeingDeveloped': "false",
+                    'APIkey': self.bgstally.config.apikey_inara()
+                },
+                'events': [{'eventName': "getCommanderProfile", 'eventTimestamp': timestamp, 'eventData': {'searchName': cmdr_name}} for cmdr_name in batch]
+            }
+
+            self.bgstally.request_manager.queue_request(URL_INARA_API, RequestMethod.POST, callback=partial(self._batch_received, batch), payload=payload)
+
+
+    def _batch_received(self, batch: list[str], success: bool, response: Response, request: BGSTallyRequest):
+        """
+        A batch of lookups has returned, cache the profiles and pass them to everyone waiting for them
+        """
+        events: list = []
+        if success:
+            try:
+                events = response.json().get('events', [])
+            except Exception as e:
+                Debug.logger.warning(f"Invalid response from Inara: {e}")
+
+        results: dict[str, dict|None] = {}
+        now: float = time()
+
+        with self._lock:
+            # Inara returns the events in the order they were sent
+            for cmdr_name, event in zip(batch, events):
+                status: int = event.get('eventStatus', 0) if isinstance(event, dict) else 0
+                if status not in (INARA_STATUS_OK, INARA_STATUS_NO_RESULTS): continue
+
+                # A CMDR with no Inara profile is cached too, so they aren't looked up again every time they're seen
+                event_data: dict = event.get('eventData', {}) if status == INARA_STATUS_OK else {}
+                profile: dict = {field: event_data[key] for key, field in PROFILE_FIELDS.items() if key in event_data}
+                results[cmdr_name] = profile
+
+                self.profiles.pop(cmdr_name, None)
+                self.profiles[cmdr_name] = {'profile': profile, 'fetched': now}
+                if len(self.profiles) > CACHE_ENTRIES_MAX: self.profiles.popitem(last=False)
+
+            callbacks: dict[str, list[callable]] = {cmdr_name: self.waiting.pop(cmdr_name, []) for cmdr_name in batch}
+
+        if len(results) > 0: self.bgstally.persistence_manager.mark_dirty(DataStore.CMDRCACHE)
+
+        for cmdr_name, cmdr_callbacks in callbacks.items():
+            for callback in cmdr_callbacks:
+                callback(cmdr_name, results.get(cmdr_name))
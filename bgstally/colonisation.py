@@ -24,6 +24,11 @@ CARGO_FILENAME = 'Cargo.json'
 MARKET_FILENAME = 'Market.json'
 RE_IGNORE_PATTERN = r"(^\$|[A-Z0-9]{3}-[A-Z0-9]{3}$| \| [A-Z]{4}$)" # Pattern to ignore stations like carriers, scenarios, etc.
 
+# Keys that are indexed for fast lookup of systems, builds and progress
+SYSTEM_INDEX_KEYS = ['SystemAddress', 'StarSystem', 'Name']
+BUILD_INDEX_KEYS = ['BuildID', 'MarketID']
+PROGRESS_INDEX_KEYS = ['MarketID', 'ProjectID']
+
 # Services we use for different types of import
 SYSTEM_SERVICE = Spansh()
 BODY_SERVICE = EDSM()
@@ -69,6 +74,11 @@ class Colonisation:
         self.progress:list = []    # Construction progress data
         self.dirty:bool = False
 
+        # Lookup indexes, maintained as systems, builds and progress are added, modified, removed and loaded
+        self._system_index:dict[str, dict] = {k: {} for k in SYSTEM_INDEX_KEYS}         # value -> system
+        self._build_index:dict[str, dict] = {k: {} for k in BUILD_INDEX_KEYS}           # value -> (system, build)
+        self._progress_index:dict[str, dict] = {k: {} for k in PROGRESS_INDEX_KEYS}     # value -> progress
+
         self.cargo:dict = {}       # Local store of our current cargo
         self.carrier_cargo:dict = {} # Local store of our current carrier cargo
         self.carrier_buy:dict = {}   # Local store of our current carrier buy orders
@@ -249,7 +259,9 @@ class Colonisation:
                     return
 
                 # Update the system details
-                if system.get('Name', None) == None: system['Name'] = self.current_system
+                if system.get('Name', None) == None:
+                    system['Name'] = self.current_system
+                    self._index_system(system)
 
                 # Update the build details
                 data:dict = {}
@@ -416,6 +428,9 @@ class Colonisation:
     @catch_exceptions
     def get_system(self, key:str, value) -> dict | None:
         ''' Get a system by any attribute '''
+        if key in SYSTEM_INDEX_KEYS:
+            return self._find_indexed_system(key, value)
+
         for i, system in enumerate(self.get_all_systems()):
             if system.get(key) != None and system.get(key) == value:
                 return system
@@ -441,12 +456,10 @@ class Colonisation:
     @catch_exceptions
     def find_system(self, data:dict) -> dict|None:
         ''' Find a system by address, system name, or plan name '''
-        system:dict|None = None
-        for m in ['SystemAddress', 'StarSystem', 'Name']:
+        for m in SYSTEM_INDEX_KEYS:
             if data.get(m, None) != None:
-                for i, system in enumerate(self.get_all_systems()):
-                    if system.get(m) != None and system.get(m) == data.get(m):
-                        return system
+                system:dict|None = self._find_indexed_system(m, data.get(m))
+                if system != None: return system
         return None
 
 
@@ -471,6 +484,7 @@ class Colonisation:
         if data.get('Name', None) == None: data['Name'] = data.get('StarSystem', '')
         if data.get('Builds', None) == None: data['Builds'] = []
         self.systems.append(data)
+        self._index_system(data)
         if rcsync == True and data.get('StarSystem', "") != "":
             RavenColonial(self).upsert_system(data)
             # Get the list of projects and initialize them!
@@ -508,6 +522,9 @@ class Colonisation:
             system[k] = v
             changed[k] = v
 
+        # Replacing the build list can drop builds, so their index entries have to go too
+        if any(k in SYSTEM_INDEX_KEYS or k == 'Builds' for k in changed): self._reindex()
+
         # If we are hiding the system, stop tracking all builds
         if system.get('Hidden', False) == True:
             self.bgstally.ui.window_progress.update_display()
@@ -563,6 +580,7 @@ class Colonisation:
         ''' Delete a system '''
         systems = self.get_all_systems() # It's a sorted list, index isn't reliable unless sorted!
         del systems[sysnum]
+        self._reindex()
         self.save('System removed')
 
 
@@ -573,11 +591,8 @@ class Colonisation:
             return build.get('State', BuildState.PLANNED)
 
         # If we have a progress entry, use that
-        for p in self.progress:
-            #if p.get('MarketID') == build.get('MarketID') and p.get('ConstructionComplete', False) == True:
-            #        return BuildState.COMPLETE
-            if p.get('MarketID') == build.get('MarketID'):
-                return BuildState.PROGRESS
+        if self._find_indexed_progress('MarketID', build.get('MarketID')) != None:
+            return BuildState.PROGRESS
 
         # Otherwise, use the state of the build
         return build.get('State', BuildState.PLANNED)
@@ -609,6 +624,13 @@ class Colonisation:
     @catch_exceptions
     def find_build_any(self, data:dict) -> list:
         ''' Find a build in any system and return the system and build '''
+        # An existing/known build?
+        for m in BUILD_INDEX_KEYS:
+            if data.get(m, None) != None:
+                found:tuple|None = self._find_indexed_build(m, data.get(m))
+                if found != None: return list(found)
+
+        # Fall back to fuzzy matching in each system
         for system in self.get_all_systems():
             build:dict|None = self.find_build(system, data)
             if build != None: return [system, build]
@@ -631,8 +653,13 @@ class Colonisation:
             return builds[0]
 
         # An existing/known build?
-        for m in ['BuildID', 'MarketID']:
+        for m in BUILD_INDEX_KEYS:
             if data.get(m, None) != None:
+                found:tuple|None = self._find_indexed_build(m, data.get(m))
+                if found != None and found[0] is system: return found[1]
+                if found == None: continue
+
+                # The same value is also used in another system, so check this one directly
                 for build in builds:
                     if build.get(m, None) == data.get(m, None):
                         return build
@@ -732,6 +759,7 @@ class Colonisation:
             system['Builds'].insert(row, data)
         else:
             system['Builds'].append(data)
+        self._index_build(system, data)
 
         # Update RC if appropriate and we have enough data about the system.
         if silent == False and system.get('RCSync', False) == True and system.get('SystemAddress', None) != None and \
@@ -790,6 +818,7 @@ class Colonisation:
 
         # Remove build
         build:dict = system['Builds'].pop(ind)
+        self._reindex()
 
         # Delete the project if it's in progress
         if system.get('RCSync', False) == True and build.get('MarketID', None) != None:
@@ -868,14 +897,16 @@ class Colonisation:
                 build[k] = v.strip() if isinstance(v, str) else v
                 changed[k] = v.strip() if isinstance(v, str) else v
 
+        if any(k in BUILD_INDEX_KEYS for k in changed): self._reindex()
+
         # Send our updates back to RavenColonial if we're tracking this system and have the details required
         if silent == False and changed != {} and \
             system.get('RCSync', False) == True and system.get('SystemAddress', None) != None and \
             build.get('Layout', None) != None and build.get('BodyNum', None) != None:
             RavenColonial(self).upsert_site(system, build)
-            for p in self.progress:
-                if p.get('ProjectID', None) != None and p.get('MarketID', None) == build.get('MarketID'):
-                    RavenColonial(self).upsert_project(system, build, p)
+            p:dict|None = self._find_indexed_progress('MarketID', build.get('MarketID'))
+            if p != None and p.get('ProjectID', None) != None:
+                RavenColonial(self).upsert_project(system, build, p)
 
         if changed != {}:
             self.save(f"Build modified {changed}")
@@ -1029,6 +1060,7 @@ class Colonisation:
 
         prog:dict = {'MarketID': id, 'Required': {}, 'Delivered': {}}
         self.progress.append(prog)
+        self._index_progress(prog)
 
         self.dirty = True
         return prog
@@ -1036,10 +1068,10 @@ class Colonisation:
 
     @catch_exceptions
     def find_progress(self, id:int|str) -> dict|None:
-        ''' Find and return progress for a given market '''
-        for p in self.progress:
-            if p.get('MarketID', 0) == id or p.get('ProjectID', '') == id:
-                return p
+        ''' Find and return progress for a given market or project '''
+        for m in PROGRESS_INDEX_KEYS:
+            p:dict|None = self._find_indexed_progress(m, id)
+            if p != None: return p
         return None
 
     @catch_exceptions
@@ -1079,6 +1111,7 @@ class Colonisation:
 
             if progress.get(k) != v and k in self.progress_keys:
                 progress[k] = v
+                if k in PROGRESS_INDEX_KEYS: self._index_progress(progress)
                 self.dirty = True
 
         if self.dirty == False: return
@@ -1157,6 +1190,69 @@ class Colonisation:
         self.market = market
 
 
+    def _reindex(self) -> None:
+        ''' Rebuild all the lookup indexes from scratch '''
+        self._system_index = {k: {} for k in SYSTEM_INDEX_KEYS}
+        self._build_index = {k: {} for k in BUILD_INDEX_KEYS}
+        self._progress_index = {k: {} for k in PROGRESS_INDEX_KEYS}
+
+        for system in self.systems:
+            self._index_system(system)
+        for progress in self.progress:
+            self._index_progress(progress)
+
+
+    def _index_system(self, system:dict) -> None:
+        ''' Add a system and its builds to the indexes. The first system with a given value wins, as with a linear search '''
+        for k in SYSTEM_INDEX_KEYS:
+            if system.get(k, None) != None: self._system_index[k].setdefault(system[k], system)
+
+        for build in system.get('Builds', []):
+            self._index_build(system, build)
+
+
+    def _index_build(self, system:dict, build:dict) -> None:
+        ''' Add a build to the indexes '''
+        for k in BUILD_INDEX_KEYS:
+            if build.get(k, None) != None: self._build_index[k].setdefault(build[k], (system, build))
+
+
+    def _index_progress(self, progress:dict) -> None:
+        ''' Add a progress record to the indexes '''
+        for k in PROGRESS_INDEX_KEYS:
+            if progress.get(k, None) != None: self._progress_index[k].setdefault(progress[k], progress)
+
+
+    def _find_indexed_system(self, key:str, value) -> dict|None:
+        ''' Look up a system in the index, rebuilding the index if the entry is out of date '''
+        if value == None: return None
+        system:dict|None = self._system_index[key].get(value)
+        if system != None and system.get(key) != value:
+            self._reindex()
+            system = self._system_index[key].get(value)
+        return system
+
+
+    def _find_indexed_build(self, key:str, value) -> tuple|None:
+        ''' Look up a (system, build) pair in the index, rebuilding the index if the entry is out of date '''
+        if value == None: return None
+        found:tuple|None = self._build_index[key].get(value)
+        if found != None and found[1].get(key) != value:
+            self._reindex()
+            found = self._build_index[key].get(value)
+        return found
+
+
+    def _find_indexed_progress(self, key:str, value) -> dict|None:
+        ''' Look up a progress record in the index, rebuilding the index if the entry is out of date '''
+        if value == None: return None
+        progress:dict|None = self._progress_index[key].get(value)
+        if progress != None and progress.get(key) != value:
+            self._reindex()
+            progress = self._progress_index[key].get(value)
+        return progress
+
+
     def _generate_buildid(self, market_id:int|None = None) -> str:
         ''' Generate a unique build id '''
         return f"x{int(time.time())}" if market_id == None else f"&{market_id}"
@@ -1277,6 +1373,8 @@ class Colonisation:
             p['Delivered'] = newd
             self.progress.append(p)
 
+        self._reindex()
+
         # This is configuration that can get messed up during an upgrade, no problem, just ignore it and move on.
         try:
             self.cmdr = dict.get('Commander', None)
@@ -89,6 +89,70 @@ class Config(object):
         return result
 
 
+    def persistence(self) -> dict | None:
+        """Fetch all information about the data persistence configuration
+
+        Returns:
+            dict | None: The persistence configuration
+        """
+        result: dict | None = None
+
+        try:
+            result = self.config['persistence']
+        except KeyError as e:
+            Debug.logger.error(f"Tried to access persistence config which doesn't exist", exc_info=e)
+
+        return result
+
+
+    def profiler(self) -> dict | None:
+        """Fetch all information about the journal profiler configuration
+
+        Returns:
+            dict | None: The profiler configuration
+        """
+        result: dict | None = None
+
+        try:
+            result = self.config['profiler']
+        except KeyError as e:
+            Debug.logger.error(f"Tried to access profiler config which doesn't exist", exc_info=e)
+
+        return result
+
+
+    def journalimport(self) -> dict | None:
+        """Fetch all information about the journal import configuration
+
+        Returns:
+            dict | None: The journal import configuration
+        """
+        result: dict | None = None
+
+        try:
+            result = self.config['journalimport']
+        except KeyError as e:
+            Debug.logger.error(f"Tried to access journal import config which doesn't exist", exc_info=e)
+
+        return result
+
+
+    def activitystore(self) -> dict | None:
+        """Fetch all information about the historical activity store configuration
+
+        Returns:
+            dict | None: The activity store configuration
+        """
+        result: dict | None = None
+
+        try:
+            result = self.config['activitystore']
+        except KeyError as e:
+            Debug.logger.error(f"Tried to access activity store config which doesn't exist", exc_info=e)
+
+        return result
+
+
     def overlay_frame(self, name: str) -> dict | None:
         """Fetch all information about a given overlay panel
 
@@ -55,6 +55,20 @@ class FleetCarrierJump(str, Enum):
     Jumping = 'Jumping'
     Cooldown = 'Cooldown'
 
+# Data stores registered with the PersistenceManager
+class DataStore(str, Enum):
+    ACTIVITY = 'activity'
+    APIS = 'apis'
+    CMDRCACHE = 'cmdrcache'
+    FACTIONS = 'factions'
+    FLEETCARRIER = 'fleetcarrier'
+    MISSIONLOG = 'missionlog'
+    OUTBOXES = 'outboxes'
+    STATE = 'state'
+    TARGETLOG = 'targetlog'
+    TICK = 'tick'
+    WEBHOOKS = 'webhooks'
+
 class DiscordPostStyle(str, Enum):
     TEXT = 'Text'
     EMBED = 'Embed'
@@ -1,5 +1,10 @@
+import hashlib
+import json
+from collections import OrderedDict, deque
 from copy import deepcopy
 from datetime import UTC, datetime
+from threading import Lock, Timer
+from time import monotonic
 
 from requests import Response
 from typing import TYPE_CHECKING
@@ -31,6 +36,28 @@ URL_CLOCK_IMAGE: str = "https://upload.wikimedia.org/wikipedia/commons/thumb/8/8
 URL_GITHUB: str = "https://github.com/aussig/BGS-Tally/wiki"
 URL_LOGO: str = "https://raw.githubusercontent.com/wiki/aussig/BGS-Tally/images/logo-square-white.png"
 
+# Discord rate limits: https://discord.com/developers/docs/topics/rate-limits
+HTTP_TOO_MANY_REQUESTS: int = 429
+RETRY_AFTER_DEFAULT_S: float = 5.0 # Used if Discord rate limits a request without saying how long to wait
+
+CONTENT_HASHES_MAX: int = 1000 # Maximum number of posted messages whose content is remembered, to skip unchanged updates
+
+
+class WebhookQueue:
+    """
+    Requests waiting to be sent to a single webhook. Discord rate limits each webhook separately, so each webhook has its
+    own queue and only one request to a webhook is in progress at a time.
+    """
+    def __init__(self):
+        # Requests not yet sent, each a dict containing 'url', 'method', 'payload', 'params' and 'data'
+        self.jobs:deque[dict] = deque()
+        # True if a request to this webhook is in progress
+        self.in_flight:bool = False
+        # The monotonic time before which no request should be sent to this webhook, because its rate limit is used up
+        self.blocked_until:float = 0.0
+        # Timer to send the next request when the rate limit resets
+        self.timer:Timer|None = None
+
 
 class Discord:
     """
@@ -39,6 +66,12 @@ class Discord:
     def __init__(self, bgstally: 'BGSTally'):
         self.bgstally: BGSTally = bgstally
 
+        self.webhook_queues:dict[str, WebhookQueue] = {}
+        # Hash of the content of each message we've posted, by (webhook uuid, channel, message id), least recently posted first
+        self.content_hashes:OrderedDict[tuple, str] = OrderedDict()
+        self.stats:dict[str, int] = {'posted': 0, 'skipped': 0, 'coalesced': 0, 'delayed': 0}
+        self._lock:Lock = Lock()
+
 
     def post_plaintext(self, discord_text:str, webhooks_data:dict|None, channel:DiscordChannel, callback:callable):
         """
@@ -55,6 +88,8 @@ class Discord:
         else:
             avatar_url:str = URL_LOGO
 
+        content_hash:str = self._get_content_hash(discord_text, avatar_url)
+
         for webhook in webhooks.values():
             webhook_url:str = webhook.get('url')
             if not self._is_webhook_valid(webhook_url): continue
@@ -63,7 +98,7 @@ class Discord:
             specific_webhook_data:dict = {} if webhooks_data is None else webhooks_data.get(webhook.get('uuid', ""), webhook)
 
             utc_time_now:str = datetime.now(UTC).strftime(DATETIME_FORMAT) + " " + __("game", lang=self.bgstally.state.discord_lang) # LANG: Discord date/time suffix for game time
-            data:dict = {'channel': channel, 'callback': callback, 'webhookdata': specific_webhook_data} # Data that's carried through the request queue and back to the callback
+            data:dict = {'channel': channel, 'callback': callback, 'webhookdata': specific_webhook_data, 'webhookurl': webhook_url, 'contenthash': content_hash} # Data that's carried through the request queue and back to the callback
 
             # Fetch the previous post ID, if present, from the webhook data for the channel we're posting in. May be the default True / False value
             previous_messageid:str = specific_webhook_data.get(channel, None)
@@ -72,29 +107,32 @@ class Discord:
                 # No previous post
                 if discord_text == "": return
 
-                discord_text += ("```ansi\n" + blue(__("Posted at: {date_time} | {plugin_name} v{version}", lang=self.bgstally.state.discord_lang)) + "```").format(date_time=utc_time_now, plugin_name=self.bgstally.plugin_name, version=str(self.bgstally.version)) # LANG: Discord message footer, legacy text mode
+                post_text:str = discord_text + ("```ansi\n" + blue(__("Posted at: {date_time} | {plugin_name} v{version}", lang=self.bgstally.state.discord_lang)) + "```").format(date_time=utc_time_now, plugin_name=self.bgstally.plugin_name, version=str(self.bgstally.version)) # LANG: Discord message footer, legacy text mode
                 url:str = webhook_url
-                payload:dict = {'content': discord_text,
+                payload:dict = {'content': post_text,
                                 'username': self.bgstally.state.DiscordUsername.get(),
                                 'avatar_url': avatar_url,
                                 'embeds': []}
 
-                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, callback=self._request_complete, data=data)
+                # Ask Discord to wait until the message is created, so it replies with the message ID we need to update it later
+                self._send(webhook_url, url, RequestMethod.POST, payload=payload, params={'wait': 'true'}, data=data)
             else:
                 # Previous post
                 if discord_text != "":
-                    discord_text += ("```ansi\n" + green(__("Updated at: {date_time} | {plugin_name} v{version}", lang=self.bgstally.state.discord_lang)) + "```").format(date_time=utc_time_now, plugin_name=self.bgstally.plugin_name, version=str(self.bgstally.version)) # LANG: Discord message footer, legacy text mode
+                    if self._is_unchanged(specific_webhook_data, channel, previous_messageid, content_hash): continue
+
+                    post_text:str = discord_text + ("```ansi\n" + green(__("Updated at: {date_time} | {plugin_name} v{version}", lang=self.bgstally.state.discord_lang)) + "```").format(date_time=utc_time_now, plugin_name=self.bgstally.plugin_name, version=str(self.bgstally.version)) # LANG: Discord message footer, legacy text mode
                     url:str = f"{webhook_url}/messages/{previous_messageid}"
-                    payload:dict = {'content': discord_text,
+                    payload:dict = {'content': post_text,
                                     'username': self.bgstally.state.DiscordUsername.get(),
                                     'avatar_url': avatar_url,
                                     'embeds': []}
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, callback=self._request_complete, data=data)
+                    self._send(webhook_url, url, RequestMethod.PATCH, payload=payload, data=data)
                 else:
                     url:str = f"{webhook_url}/messages/{previous_messageid}"
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.DELETE, callback=self._request_complete, data=data)
+                    self._send(webhook_url, url, RequestMethod.DELETE, data=data)
 
 
     def post_embed(self, title: str, description: str, fields: list, webhooks_data: dict|None, channel: DiscordChannel, callback: callable):
@@ -124,6 +162,8 @@ class Discord:
         else:
             avatar_url:str = URL_LOGO
 
+        content_hash:str = self._get_content_hash(title, description, fields, avatar_url)
+
         for webhook in webhooks.values():
             webhook_url: str = webhook.get('url')
             if not self._is_webhook_valid(webhook_url): continue
@@ -131,7 +171,7 @@ class Discord:
             # Get the previous state for this webhook's uuid from the passed in data, if it exists. Default to the state from the webhook manager
             specific_webhook_data: dict = {} if webhooks_data is None else webhooks_data.get(webhook.get('uuid', ""), webhook)
 
-            data: dict = {'channel': channel, 'callback': callback, 'webhookdata': specific_webhook_data} # Data that's carried through the request queue and back to the callback
+            data: dict = {'channel': channel, 'callback': callback, 'webhookdata': specific_webhook_data, 'webhookurl': webhook_url, 'contenthash': content_hash} # Data that's carried through the request queue and back to the callback
 
             # Fetch the previous post ID, if present, from the webhook data for the channel we're posting in. May be the default True / False value
             previous_messageid: str = specific_webhook_data.get(channel, None)
@@ -148,10 +188,12 @@ class Discord:
                     'avatar_url': avatar_url,
                     'embeds': [embed]}
 
-                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, params={'wait': 'true'}, callback=self._request_complete, data=data)
+                self._send(webhook_url, url, RequestMethod.POST, payload=payload, params={'wait': 'true'}, data=data)
             else:
                 # Previous post
                 if fields is not None and fields != []:
+                    if self._is_unchanged(specific_webhook_data, channel, previous_messageid, content_hash): continue
+
                     embed: dict = self._get_embed(title, description, fields, True)
                     url: str = f"{webhook_url}/messages/{previous_messageid}"
                     payload: dict = {
@@ -160,35 +202,209 @@ class Discord:
                         'avatar_url': avatar_url,
                         'embeds': [embed]}
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, callback=self._request_complete, data=data)
+                    self._send(webhook_url, url, RequestMethod.PATCH, payload=payload, data=data)
                 else:
                     url: str = f"{webhook_url}/messages/{previous_messageid}"
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.DELETE, callback=self._request_complete, data=data)
+                    self._send(webhook_url, url, RequestMethod.DELETE, data=data)
+
+
+    def get_stats(self) -> dict:
+        """Get counts of the Discord posts that have been sent, skipped because they were unchanged, combined with a
+        later update to the same message, and delayed by Discord rate limits
+
+        Returns:
+            dict: The counts, and the number of requests waiting to be sent
+        """
+        with self._lock:
+            return self.stats | {'pending': sum(len(queue.jobs) for queue in self.webhook_queues.values())}
 
 
     def _request_complete(self, success:bool, response:Response, request:BGSTallyRequest):
         """
         A discord request has completed
         """
-        if not success:
-            if request.method == RequestMethod.PATCH:
-                # If a PATCH (message update) fails, we can try again with a POST (message create). Note the URL is not the same.
-                self.bgstally.request_manager.queue_request(get_by_path(request.data, ['webhookdata', 'url']), RequestMethod.POST, payload=request.payload, params={'wait': 'true'}, callback=self._request_complete, data=request.data)
-            else:
-                # If POSTs or DELETEs fail, we can't do anything more
-                Debug.logger.warning(f"Unable to post message to Discord. Reason: '{response.reason}' Content: '{response.content}' URL: '{request.endpoint}'")
+        webhook_url:str = request.data.get('webhookurl')
+        rate_limit_s:float = self._get_rate_limit_delay(response)
+
+        with self._lock:
+            queue:WebhookQueue = self.webhook_queues[webhook_url]
+            queue.in_flight = False
+            if rate_limit_s > 0: queue.blocked_until = monotonic() + rate_limit_s
+
+        try:
+            if not success:
+                if response is not None and response.status_code == HTTP_TOO_MANY_REQUESTS:
+                    # Rate limited, so send the same request again once the rate limit resets
+                    Debug.logger.info(f"Discord rate limit reached, retrying in {rate_limit_s}s. URL: '{request.endpoint}'")
+                    with self._lock: self.stats['delayed'] += 1
+                    self._send(webhook_url, request.endpoint, request.method, payload=request.payload, params=request.params, data=request.data, first=True)
+                elif request.method == RequestMethod.PATCH:
+                    # If a PATCH (message update) fails, we can try again with a POST (message create). Note the URL is not the same.
+                    self._send(webhook_url, get_by_path(request.data, ['webhookdata', 'url']), RequestMethod.POST, payload=request.payload, params={'wait': 'true'}, data=request.data, first=True)
+                else:
+                    # If POSTs or DELETEs fail, we can't do anything more
+                    Debug.logger.warning(f"Unable to post message to Discord. Reason: '{response.reason if response is not None else None}' Content: '{response.content if response is not None else None}' URL: '{request.endpoint}'")
+
+                return
+
+            # Discord only returns the message for updates, and for new posts if we asked it to wait for the message to be created
+            messageid:str = ""
+            if request.method == RequestMethod.PATCH or (request.method == RequestMethod.POST and request.params.get('wait') == 'true'):
+                try:
+                    messageid = response.json().get('id', "")
+                except ValueError:
+                    Debug.logger.warning(f"Invalid response from Discord, no message ID. URL: '{request.endpoint}'")
+
+                uuid:str|None = request.data.get('webhookdata', {}).get('uuid')
+                if uuid is not None and messageid != "":
+                    with self._lock:
+                        self.content_hashes.pop((uuid, request.data.get('channel'), messageid), None)
+                        self.content_hashes[(uuid, request.data.get('channel'), messageid)] = request.data.get('contenthash')
+                        if len(self.content_hashes) > CONTENT_HASHES_MAX: self.content_hashes.popitem(last=False)
+
+            with self._lock: self.stats['posted'] += 1
+
+            # This callback is the one we stashed in data - i.e. a callback to where the discord post request originated
+            callback:callable = request.data.get('callback')
+            if callback:
+                callback(request.data.get('channel'), request.data.get('webhookdata'), messageid)
+        finally:
+            # Always move on to the next request for this webhook, so nothing waiting for it is held up
+            self._dispatch(webhook_url)
+
 
+    def _send(self, webhook_url:str, url:str, method:RequestMethod, payload:dict|None = None, params:dict = {}, data:dict|None = None, first:bool = False):
+        """Queue a request to a webhook. If an update or deletion of the same message is already waiting to be sent, it is
+        replaced by this one, so a burst of updates to a message is sent as a single update of the latest content.
+
+        Args:
+            webhook_url (str): The webhook URL, which identifies the webhook queue
+            url (str): The URL to send the request to
+            method (RequestMethod): The request method
+            payload (dict | None, optional): The request payload. Defaults to None.
+            params (dict, optional): The request parameters. Defaults to {}.
+            data (dict | None, optional): The data carried through to the callback. Defaults to None.
+            first (bool, optional): True to send this request before any others waiting for the webhook. Defaults to False.
+        """
+        if not self.bgstally.request_manager.url_valid(url):
+            Debug.logger.info(f"Attempted to post to Discord using {url} which is not a well-formed URL")
+            # Move on to any other requests waiting for this webhook
+            if webhook_url in self.webhook_queues: self._dispatch(webhook_url)
             return
 
-        # This callback is the one we stashed in data - i.e. a callback to where the discord post request originated
-        callback:callable = request.data.get('callback')
-        if callback:
-            if request.method == RequestMethod.DELETE:
-                callback(request.data.get('channel'), request.data.get('webhookdata'), "")
+        job:dict = {'url': url, 'method': method, 'payload': payload, 'params': params, 'data': data}
+
+        with self._lock:
+            queue:WebhookQueue|None = self.webhook_queues.get(webhook_url)
+            if queue is None:
+                queue = WebhookQueue()
+                self.webhook_queues[webhook_url] = queue
+
+            waiting:dict|None = None
+            if method in (RequestMethod.PATCH, RequestMethod.DELETE):
+                waiting = next((j for j in queue.jobs if j['url'] == url and j['method'] in (RequestMethod.PATCH, RequestMethod.DELETE)), None)
+
+            if waiting is None:
+                if first: queue.jobs.appendleft(job)
+                else: queue.jobs.append(job)
+            elif not first:
+                # A later update to the same message replaces the waiting one. A retried request is older than the waiting
+                # one, so is dropped.
+                waiting.update(job)
+                self.stats['coalesced'] += 1
             else:
-                response_json:dict = response.json()
-                callback(request.data.get('channel'), request.data.get('webhookdata'), response_json.get('id', ""))
+                self.stats['coalesced'] += 1
+
+        self._dispatch(webhook_url)
+
+
+    def _dispatch(self, webhook_url:str):
+        """Send the next request waiting for a webhook, unless a request is already in progress for it or its rate limit
+        is used up, in which case the request is sent when the rate limit resets.
+
+        Args:
+            webhook_url (str): The webhook URL
+        """
+        with self._lock:
+            queue:WebhookQueue = self.webhook_queues[webhook_url]
+            if queue.in_flight or len(queue.jobs) == 0: return
+
+            delay_s:float = queue.blocked_until - monotonic()
+            if delay_s > 0:
+                if queue.timer is None:
+                    queue.timer = Timer(delay_s, self._rate_limit_reset, args=[webhook_url])
+                    queue.timer.daemon = True
+                    queue.timer.start()
+                return
+
+            job:dict = queue.jobs.popleft()
+            queue.in_flight = True
+
+        self.bgstally.request_manager.queue_request(job['url'], job['method'], payload=job['payload'], params=job['params'], callback=self._request_complete, data=job['data'])
+
+
+    def _rate_limit_reset(self, webhook_url:str):
+        """The rate limit for a webhook has reset, so send the next waiting request
+
+        Args:
+            webhook_url (str): The webhook URL
+        """
+        with self._lock:
+            self.webhook_queues[webhook_url].timer = None
+
+        self._dispatch(webhook_url)
+
+
+    def _get_rate_limit_delay(self, response:Response|None) -> float:
+        """Get the time to wait before sending another request to a webhook, from the rate limit headers in a response
+
+        Args:
+            response (Response | None): The response
+
+        Returns:
+            float: The time to wait in seconds, 0 if there is no need to wait
+        """
+        if response is None: return 0.0
+
+        try:
+            if response.status_code == HTTP_TOO_MANY_REQUESTS:
+                return float(response.headers.get('Retry-After', RETRY_AFTER_DEFAULT_S))
+            elif response.headers.get('X-RateLimit-Remaining') == "0":
+                return float(response.headers.get('X-RateLimit-Reset-After', 0))
+        except ValueError:
+            return RETRY_AFTER_DEFAULT_S
+
+        return 0.0
+
+
+    def _is_unchanged(self, webhook_data:dict, channel:DiscordChannel, messageid:str, content_hash:str) -> bool:
+        """Check whether a message already has exactly the content we're about to update it with
+
+        Args:
+            webhook_data (dict): The webhook data for the message
+            channel (DiscordChannel): The channel
+            messageid (str): The message ID
+            content_hash (str): The hash of the new content
+
+        Returns:
+            bool: True if the content is unchanged, so there's no need to update the message
+        """
+        with self._lock:
+            if self.content_hashes.get((webhook_data.get('uuid'), channel, messageid)) != content_hash: return False
+
+            self.stats['skipped'] += 1
+            return True
+
+
+    def _get_content_hash(self, *content) -> str:
+        """Get a hash of the content of a post, excluding the posted / updated time
+
+        Returns:
+            str: The hash
+        """
+        h = hashlib.shake_128(json.dumps([self.bgstally.state.DiscordUsername.get(), *content], default=str).encode("utf-8"), usedforsecurity=False)
+        return h.hexdigest(16)
 
 
     def _get_embed(self, title: str | None = None, description: str | None = None, fields: list[dict[str, str]] | None = None, update: bool = False) -> dict[str, any]:
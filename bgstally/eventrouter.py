@@ -0,0 +1,105 @@
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from bgstally.activity import Activity
+    from bgstally.bgstally import BGSTally
+    from bgstally.profiler import Profiler
+
+# Journal events that report the system the CMDR is in
+EVENTS_SYSTEM = ['StartUp', 'Location', 'FSDJump', 'CarrierJump']
+
+
+class JournalContext:
+    """
+    Everything passed to journal handlers alongside the journal entry itself
+    """
+    def __init__(self, cmdr: str, is_beta: bool, system: str, station: str, state: dict, activity: 'Activity'):
+        self.cmdr: str = cmdr
+        self.is_beta: bool = is_beta
+        self.system: str = system
+        self.station: str = station
+        self.state: dict = state
+        self.activity: Activity = activity
+
+
+class JournalSubscription:
+    """
+    A single journal handler, with the optional guard that must pass before it is called
+    """
+    def __init__(self, name: str, handler: Callable[[dict, JournalContext], None], guard: Callable[[dict, JournalContext], bool] | None = None, dirty: bool = False):
+        self.name: str = name
+        self.handler: Callable[[dict, JournalContext], None] = handler
+        self.guard: Callable[[dict, JournalContext], bool] | None = guard
+        self.dirty: bool = dirty
+
+
+class EventRouter:
+    """
+    Routes journal events to the handlers that have subscribed to them. Handlers are held in lists keyed by event
+    name, so finding the handlers for an event is a single lookup, and events with no subscribers can be skipped
+    before any work is done.
+    """
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+        self.subscriptions: dict[str, list[JournalSubscription]] = {}
+
+
+    def subscribe(self, events: list[str], name: str, handler: Callable[[dict, JournalContext], None],
+                  guard: Callable[[dict, JournalContext], bool] | None = None, dirty: bool = False) -> None:
+        """Subscribe a handler to one or more journal events. Handlers for the same event are called in the order they subscribed.
+
+        Args:
+            events (list[str]): The journal event names to handle
+            name (str): The name of the handler, used in logs and by the profiler
+            handler (Callable[[dict, JournalContext], None]): The function to call with the journal entry and context
+            guard (Callable[[dict, JournalContext], bool] | None, optional): If supplied, the handler is only called when this returns True. Defaults to None.
+            dirty (bool, optional): True if the handler changes activity or state data. Defaults to False.
+        """
+        subscription: JournalSubscription = JournalSubscription(name, handler, guard, dirty)
+        for event in events:
+            self.subscriptions.setdefault(event, []).append(subscription)
+
+
+    def handles(self, event: str) -> bool:
+        """Check whether any handler has subscribed to an event. Guards are not checked.
+
+        Args:
+            event (str): The journal event name
+
+        Returns:
+            bool: True if there are subscribers
+        """
+        return event in self.subscriptions
+
+
+    def dispatch(self, entry: dict, context: JournalContext) -> bool:
+        """Call all handlers subscribed to a journal entry's event, whose guards pass
+
+        Args:
+            entry (dict): The journal entry
+            context (JournalContext): The context for the handlers
+
+        Returns:
+            bool: True if any handler that was called changes activity or state data
+        """
+        event: str = entry.get('event', "")
+        subscriptions: list[JournalSubscription] | None = self.subscriptions.get(event)
+        if subscriptions is None: return False
+
+        profiler: Profiler = self.bgstally.profiler
+        dirty: bool = False
+
+        for subscription in subscriptions:
+            if subscription.guard is not None and not subscription.guard(entry, context): continue
+
+            if profiler.enabled:
+                start: float = perf_counter()
+                subscription.handler(entry, context)
+                profiler.record(event, subscription.name, perf_counter() - start)
+            else:
+                subscription.handler(entry, context)
+
+            dirty = dirty or subscription.dirty
+
+        return dirty
@@ -6,7 +6,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
-from bgstally.constants import FOLDER_OTHER_DATA
+from bgstally.constants import FOLDER_OTHER_DATA, DataStore
 from bgstally.debug import Debug
 
 FILENAME = "factions.json"
@@ -42,10 +42,28 @@ class FactionManager:
     def save(self):
         """Save state to file
         """
+        self.write(self.snapshot())
 
+
+    def snapshot(self) -> list[str]:
+        """Take a copy of the favourite factions, ready to write
+
+        Returns:
+            list[str]: The favourite faction names
+        """
+        return list(self.factions)
+
+
+    def write(self, factions: list[str]):
+        """Write a snapshot of the favourite factions to file
+
+        Args:
+            factions (list[str]): The snapshot
+        """
         file = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        data = json.dumps(factions)
         with open(file, 'w') as outfile:
-            json.dump(self.factions, outfile)
+            outfile.write(data)
 
 
     def is_favourite(self, faction_name: str) -> bool:
@@ -70,4 +88,4 @@ class FactionManager:
         else:
             if faction_name in self.factions:
                 self.factions.remove(faction_name)
-        self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FACTIONS)
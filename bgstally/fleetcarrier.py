@@ -11,9 +11,9 @@ if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
 from bgstally.constants import (DATETIME_FORMAT_JSON, FOLDER_OTHER_DATA, TAG_OVERLAY_HIGHLIGHT, DiscordChannel, FleetCarrierJump,
-                                FleetCarrierType)
+                                FleetCarrierType, DataStore)
 from bgstally.debug import Debug
-from bgstally.utils import _, __, catch_exceptions, get_by_path
+from bgstally.utils import _, __, catch_exceptions, copy_json, get_by_path
 from thirdparty.colors import *
 
 FILENAME = "fleetcarrier.json"
@@ -605,6 +605,7 @@ class FleetCarrier:
 
         self.locker = self._update_locker(self.data)
         self.itinerary = self._update_itinerary(self.data)
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
         # All the following are time sensitive or updated locally
         # so only use the CAPI data for them if we haven't docked in the last N seconds
@@ -650,7 +651,7 @@ class FleetCarrier:
             Debug.logger.error(f"Carrier space mismatch, clearing modification time")
             self.last_modified = 0
 
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
         self.bgstally.ui.window_fc.update_display()
 
 
@@ -715,7 +716,7 @@ class FleetCarrier:
             self.itinerary[0]['departureTime'] = None
             self.itinerary[0]['visitDurationSeconds'] = None
 
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
         if self.jump_state == FleetCarrierJump.Jumping:
             self.jump_state = FleetCarrierJump.Cooldown
@@ -804,7 +805,7 @@ class FleetCarrier:
         self.overview['departureScheduled'] = None
 
         self.bgstally.ui.window_fc.update_display()
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
 
     @catch_exceptions
@@ -897,7 +898,7 @@ class FleetCarrier:
                 self.locker['normal'][mat]['price'] = 0
 
             self.bgstally.ui.window_fc.update_display()
-            if self.bgstally.dev_mode == True: self.save()
+            self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
             return
 
         # A new commodity order
@@ -930,7 +931,7 @@ class FleetCarrier:
             self.last_modified = 0
 
         self.bgstally.ui.window_fc.update_display()
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
 
     @catch_exceptions
@@ -985,7 +986,7 @@ class FleetCarrier:
                 deets['price'] = 0
 
         self.bgstally.ui.window_fc.update_display()
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
 
     @catch_exceptions
@@ -1020,7 +1021,7 @@ class FleetCarrier:
                 self.last_modified = 0
 
         self.bgstally.ui.window_fc.update_display()
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
 
     @catch_exceptions
@@ -1053,7 +1054,7 @@ class FleetCarrier:
             self.cargo['normal'][comm]['stock'] = 0
 
         self.bgstally.ui.window_fc.update_display()
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
 
     @catch_exceptions
@@ -1093,7 +1094,7 @@ class FleetCarrier:
                 self.shipyard['overview']['totalValue'] = total_value
 
         self.bgstally.ui.window_fc.update_display()
-        if self.bgstally.dev_mode == True: self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.FLEETCARRIER)
 
     def _parse_date(self, date:str) -> datetime:
         """ Parse a datetime. We only have two formats """
@@ -1287,7 +1288,19 @@ class FleetCarrier:
     @catch_exceptions
     def save(self) -> None:
         """ Save state to file """
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> dict:
+        """ Take a copy of our state, ready to write """
+        return copy_json(self._as_dict())
+
+
+    def write(self, snapshot:dict) -> None:
+        """ Write a snapshot of our state to file """
         ind:int = 4 if self.bgstally.dev_mode == True else 0
         file:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        # Serialise before opening the file, so a failure can't leave a truncated file behind
+        data:str = json.dumps(snapshot, indent=ind)
         with open(file, 'w') as outfile:
-            json.dump(self._as_dict(), outfile, indent=ind)
+            outfile.write(data)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING
+from threading import Lock
+from typing import TYPE_CHECKING, Callable
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
@@ -9,6 +10,8 @@ from bgstally.constants import DiscordActivity, DiscordPostStyle, FavouriteActiv
 from bgstally.debug import Debug
 from bgstally.utils import _
 
+RENDER_CACHE_SIZE = 500
+
 
 class BaseActivityFormatterInterface(ABC):
     """The base interface for discord formatters
@@ -21,6 +24,8 @@ class BaseActivityFormatterInterface(ABC):
             bgstally (BGSTally): The BGSTally object
         """
         self.bgstally: BGSTally = bgstally
+        self._render_cache: dict[tuple, str] = {}
+        self._render_cache_lock: Lock = Lock()
 
 
     @abstractmethod
@@ -111,6 +116,45 @@ class BaseActivityFormatterInterface(ABC):
         return False
 
 
+    def get_render_options(self) -> tuple:
+        """Get the user options that change the rendered text for a system. Override this in subclasses that use further
+        options when rendering, and include the options returned from this base method.
+
+        Returns:
+            tuple: The option values, for use in a render cache key
+        """
+        return (self.bgstally.state.favourite_activity_mode, tuple(self.bgstally.faction_manager.factions))
+
+
+    def get_cached_render(self, data: dict, key: tuple, render: Callable[[], str]) -> str:
+        """Get rendered text for a fragment of activity, such as a system, only calling the render function if the
+        fragment data, the render options or the key have changed since the text was last rendered.
+
+        Args:
+            data (dict): The activity data that is rendered, e.g. the system dict
+            key (tuple): Further values that change the rendered text, e.g. the language and activity mode
+            render (Callable[[], str]): The function that renders the text
+
+        Returns:
+            str: The rendered text
+        """
+        cache_key: tuple = (key, self.get_render_options(), hash(repr(data)))
+
+        with self._render_cache_lock:
+            text: str|None = self._render_cache.get(cache_key)
+        if text is not None: return text
+
+        text = render()
+
+        with self._render_cache_lock:
+            if len(self._render_cache) >= RENDER_CACHE_SIZE:
+                # Discard the oldest entry, activity data that has since changed will never be asked for again
+                del self._render_cache[next(iter(self._render_cache))]
+            self._render_cache[cache_key] = text
+
+        return text
+
+
 
     @abstractmethod
     def get_text(self, activity: Activity, activity_mode: DiscordActivity, system_names: list|None = None, lang: str|None = None) -> str:
@@ -36,6 +36,16 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
         return _("Default") # LANG: Name of default output formatter
 
 
+    def get_render_options(self) -> tuple:
+        """Get the user options that change the rendered text for a system
+
+        Returns:
+            tuple: The option values, for use in a render cache key
+        """
+        state = self.bgstally.state
+        return super().get_render_options() + (state.secondary_inf, state.detailed_inf, state.detailed_trade, state.abbreviate_faction_names)
+
+
     def get_overlay(self, activity: Activity, activity_mode: DiscordActivity, system_names: list|None = None, lang: str|None = None) -> str:
         """Get the in-game overlay text for a given instance of Activity. The in-game overlay
         doesn't support any ANSI colouring and very few UTF-8 special characters. Basically,
@@ -90,17 +100,7 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
             if system_names is not None and system['System'] not in system_names: continue
             if not self.include_system(system): continue
 
-            system_text: str = ""
-
-            if activity_mode == DiscordActivity.THARGOIDWAR or activity_mode == DiscordActivity.BOTH:
-                system_text += self._build_tw_system(system, True, lang)
-
-            if (activity_mode == DiscordActivity.BGS or activity_mode == DiscordActivity.BOTH) and system.get('tw_status') is None:
-                for faction in system['Factions'].values():
-                    if faction['Enabled'] != CheckStates.STATE_ON: continue
-                    if not self.include_faction(faction): continue
-
-                    system_text += self._build_faction(faction, True, lang)
+            system_text: str = self._get_system_text(system, activity_mode, True, lang)
 
             if system_text != "":
                 system_text = system_text.replace("'", "")
@@ -142,17 +142,7 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
             if system_names is not None and system['System'] not in system_names: continue
             if not self.include_system(system): continue
 
-            system_text: str = ""
-
-            if activity_mode == DiscordActivity.THARGOIDWAR or activity_mode == DiscordActivity.BOTH:
-                system_text += self._build_tw_system(system, discord, lang)
-
-            if (activity_mode == DiscordActivity.BGS or activity_mode == DiscordActivity.BOTH) and system.get('tw_status') is None:
-                for faction in system['Factions'].values():
-                    if faction['Enabled'] != CheckStates.STATE_ON: continue
-                    if not self.include_faction(faction): continue
-
-                    system_text += self._build_faction(faction, discord, lang)
+            system_text: str = self._get_system_text(system, activity_mode, discord, lang)
 
             if system_text != "":
                 if discord:
@@ -174,6 +164,50 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
         return text.replace("'", "")
 
 
+    def _get_system_text(self, system: dict, activity_mode: DiscordActivity, discord: bool, lang: str|None) -> str:
+        """Get formatted text for the activity in a system, excluding the system name. The text is only rendered again if
+        the system activity or the render options have changed.
+
+        Args:
+            system (dict): The system data
+            activity_mode (DiscordActivity): Determines the type(s) of activity to include
+            discord (bool): True if the output is destined for Discord
+            lang (str): The language code for this post.
+
+        Returns:
+            str: The output text
+        """
+        return self.get_cached_render(system, (activity_mode, discord, lang),
+                                      lambda: self._build_system(system, activity_mode, discord, lang))
+
+
+    def _build_system(self, system: dict, activity_mode: DiscordActivity, discord: bool, lang: str|None) -> str:
+        """Generate formatted text for the activity in a system, excluding the system name
+
+        Args:
+            system (dict): The system data
+            activity_mode (DiscordActivity): Determines the type(s) of activity to include
+            discord (bool): True if the output is destined for Discord
+            lang (str): The language code for this post.
+
+        Returns:
+            str: The output text
+        """
+        system_text: str = ""
+
+        if activity_mode == DiscordActivity.THARGOIDWAR or activity_mode == DiscordActivity.BOTH:
+            system_text += self._build_tw_system(system, discord, lang)
+
+        if (activity_mode == DiscordActivity.BGS or activity_mode == DiscordActivity.BOTH) and system.get('tw_status') is None:
+            for faction in system['Factions'].values():
+                if faction['Enabled'] != CheckStates.STATE_ON: continue
+                if not self.include_faction(faction): continue
+
+                system_text += self._build_faction(faction, discord, lang)
+
+        return system_text
+
+
     def _build_faction(self, faction: dict, discord: bool, lang: str|None) -> str:
         """Generate formatted text for a faction
 
@@ -0,0 +1,579 @@
+import json
+import multiprocessing
+import sys
+from bisect import bisect_right
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import UTC, datetime, timedelta
+from heapq import merge
+from os import path
+from threading import Event, Thread
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Iterator
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.activity import Activity
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA
+from bgstally.debug import Debug
+from bgstally.eventrouter import EVENTS_SYSTEM, EventRouter, JournalContext
+from bgstally.journalparser import list_journal_files, parse_journal_file
+from bgstally.missionlog import MissionLog
+from bgstally.state import SHIPS_TARGETED_MAX, TIME_SHIPS_TARGETED_EXPIRY, State
+from bgstally.tick import TICKID_PREFIX_IMPORTED, Tick
+from bgstally.utils import ExpiringDict, get_by_path
+from config import config
+
+FILENAME = "journalimport.json"
+JOURNALIMPORT_PROCESSES_DEFAULT = 4
+TICK_INTERVAL = timedelta(hours = 24)
+TICK_GAP_TOLERANCE = timedelta(hours = 25) # Gaps between recorded ticks longer than this are filled with estimated ticks
+TIME_WARMUP = timedelta(days = 7) # Journals from this long before the import period are replayed to pick up missions and location, but not counted
+CANCEL_CHECK_EVENTS = 1000
+
+
+class JournalImportResult:
+    """
+    The outcome of a journal import
+    """
+    def __init__(self, since: datetime):
+        self.since: datetime = since
+        self.activities: list[Activity] = []
+        self.files: int = 0
+        self.events: int = 0
+        self.duration_s: float = 0.0
+        self.unchanged: bool = False
+        self.cancelled: bool = False
+        self.failed: bool = False
+        self.marker: dict = {}
+
+
+class JournalImporter:
+    """
+    Reconstructs activity for past ticks from the game journal files, for example after a fresh install or for periods
+    when EDMC wasn't running. Files are parsed in parallel in a pool of processes, and the events of interest are then
+    replayed in timestamp order through the same handlers as live events, into one Activity per tick.
+
+    Ticks that BGS-Tally recorded live are never changed. Past tick times aren't known for the periods we are filling,
+    so these are estimated at 24 hour intervals from the recorded ticks.
+    """
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+        self.thread: Thread | None = None
+        self.processes: int = JOURNALIMPORT_PROCESSES_DEFAULT
+        self._cancel: Event = Event()
+
+        try:
+            self.processes = self.bgstally.config.journalimport().getint('processes', JOURNALIMPORT_PROCESSES_DEFAULT)
+        except Exception:
+            pass
+
+
+    def running(self) -> bool:
+        """Check whether an import is in progress
+
+        Returns:
+            bool: True if importing
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+
+    def start(self, since: datetime, progress_callback: Callable[[int, int], None] | None = None,
+              complete_callback: Callable[[JournalImportResult], None] | None = None, journal_dir: str | None = None) -> bool:
+        """Start importing journal files in the background. Must be called from the main thread, and the callbacks are also
+        called on the main thread.
+
+        Args:
+            since (datetime): Import activity from this time onwards
+            progress_callback (Callable[[int, int], None] | None, optional): Called with the number of files parsed so far and the total number of files. Defaults to None.
+            complete_callback (Callable[[JournalImportResult], None] | None, optional): Called when the import has finished. Defaults to None.
+            journal_dir (str | None, optional): The folder containing the journal files. Defaults to None, which uses the EDMC journal folder.
+
+        Returns:
+            bool: True if the import was started, False if an import is already running
+        """
+        if self.running(): return False
+
+        self._cancel.clear()
+        job: _ImportJob = self._prepare(since, journal_dir)
+
+        self.thread = Thread(target=self._worker, args=(job, progress_callback, complete_callback), name="BGSTally Journal Import worker")
+        self.thread.daemon = True
+        self.thread.start()
+
+        return True
+
+
+    def run(self, since: datetime, journal_dir: str | None = None) -> JournalImportResult:
+        """Import journal files, blocking until finished. Must be called from the main thread.
+
+        Args:
+            since (datetime): Import activity from this time onwards
+            journal_dir (str | None, optional): The folder containing the journal files. Defaults to None, which uses the EDMC journal folder.
+
+        Returns:
+            JournalImportResult: The outcome of the import
+        """
+        self._cancel.clear()
+        result: JournalImportResult = self._import(self._prepare(since, journal_dir), None)
+        self._complete(result, None)
+
+        return result
+
+
+    def cancel(self):
+        """
+        Cancel the running import. Nothing is changed by a cancelled import.
+        """
+        self._cancel.set()
+
+
+    def _prepare(self, since: datetime, journal_dir: str | None) -> '_ImportJob':
+        """
+        Gather everything the import needs from the live plugin, on the main thread
+        """
+        known_ticks: list[datetime] = sorted({activity.tick_time for activity in self.bgstally.activity_manager.activity_data
+                                              if not (activity.tick_id or "").startswith(TICKID_PREFIX_IMPORTED)})
+
+        return _ImportJob(since=since,
+                          journal_dir=journal_dir or str(config.get_str('journaldir') or config.default_journal_dir),
+                          boundaries=self._get_tick_boundaries(known_ticks, since),
+                          current_tick_time=self.bgstally.tick.tick_time,
+                          state=_ReplayState(self.bgstally.state))
+
+
+    def _get_tick_boundaries(self, known_ticks: list[datetime], since: datetime) -> list[tuple[datetime, bool]]:
+        """Get the start time of every tick in the import period, estimating any ticks that weren't recorded
+
+        Args:
+            known_ticks (list[datetime]): The recorded tick times, oldest first
+            since (datetime): The start of the import period
+
+        Returns:
+            list[tuple[datetime, bool]]: The tick times, oldest first, and whether each is estimated
+        """
+        if not known_ticks: return []
+        boundaries: list[tuple[datetime, bool]] = []
+
+        # Before the oldest recorded tick
+        tick_time: datetime = known_ticks[0]
+        while tick_time > since:
+            tick_time -= TICK_INTERVAL
+            boundaries.append((tick_time, True))
+
+        # Between recorded ticks, where ticks were missed
+        for i, known_tick in enumerate(known_ticks):
+            boundaries.append((known_tick, False))
+            if i + 1 == len(known_ticks) or known_ticks[i + 1] - known_tick <= TICK_GAP_TOLERANCE: continue
+
+            tick_time = known_tick + TICK_INTERVAL
+            while tick_time < known_ticks[i + 1] - (TICK_GAP_TOLERANCE - TICK_INTERVAL):
+                boundaries.append((tick_time, True))
+                tick_time += TICK_INTERVAL
+
+        return sorted(boundaries)
+
+
+    def _worker(self, job: '_ImportJob', progress_callback: Callable[[int, int], None] | None,
+                complete_callback: Callable[[JournalImportResult], None] | None):
+        """
+        Run an import in the background thread
+        """
+        Debug.logger.debug("Starting Journal Import Worker...")
+
+        try:
+            result: JournalImportResult = self._import(job, progress_callback)
+        except Exception as e:
+            Debug.logger.error(f"Journal import failed", exc_info=e)
+            result = JournalImportResult(job.since)
+            result.failed = True
+
+        # Activities are changed from the main thread, so apply the results there
+        ui = getattr(self.bgstally, 'ui', None)
+        if ui is not None and ui.frame is not None:
+            ui.frame.after(0, self._complete, result, complete_callback)
+
+        Debug.logger.debug("Finished Journal Import Worker")
+
+
+    def _import(self, job: '_ImportJob', progress_callback: Callable[[int, int], None] | None) -> JournalImportResult:
+        """
+        Parse and replay all journal files for an import
+        """
+        start: float = perf_counter()
+        result: JournalImportResult = JournalImportResult(job.since)
+
+        # Files started after the current tick only contain live activity, which is never imported
+        files: list[dict] = [file for file in list_journal_files(job.journal_dir, job.since - TIME_WARMUP) if file['started'] < job.current_tick_time]
+        result.marker = {'since': job.since.strftime(DATETIME_FORMAT_JOURNAL),
+                         'files': {file['name']: {'size': file['size'], 'mtime': file['mtime']} for file in files}}
+
+        if self._is_unchanged(result.marker):
+            result.unchanged = True
+            return result
+
+        replay: _ReplayPlugin = _ReplayPlugin(job.state)
+        router: EventRouter = self._get_replay_router(replay)
+
+        parsed: list[list[dict]] | None = self._parse_files(files, frozenset(router.subscriptions.keys()),
+                                                            (job.since - TIME_WARMUP).strftime(DATETIME_FORMAT_JOURNAL), progress_callback)
+        if parsed is None:
+            result.cancelled = True
+            return result
+
+        result.files = len(files)
+        result.activities = self._replay(merge(*parsed, key=lambda entry: entry.get('timestamp', "")), job, replay, router, result)
+        if self._cancel.is_set(): result.cancelled = True
+
+        result.duration_s = perf_counter() - start
+        Debug.logger.info(f"Journal import took {result.duration_s:.1f}s: {result.files} file(s), {result.events} event(s), {len(result.activities)} tick(s)")
+
+        return result
+
+
+    def _parse_files(self, files: list[dict], events: frozenset[str], since: str,
+                     progress_callback: Callable[[int, int], None] | None) -> list[list[dict]] | None:
+        """Parse journal files, in a pool of processes where possible
+
+        Args:
+            files (list[dict]): The journal files
+            events (frozenset[str]): The names of the events to keep
+            since (str): Only keep events with a journal timestamp on or after this
+            progress_callback (Callable[[int, int], None] | None): Called after each file is parsed
+
+        Returns:
+            list[list[dict]] | None: The events from each file, in the same order as the files, or None if cancelled
+        """
+        # Worker processes can't be spawned from a frozen (packaged) EDMC, so parse in this thread there
+        if self.processes > 0 and len(files) > 1 and not getattr(sys, 'frozen', False):
+            try:
+                return self._parse_files_pool(files, events, since, progress_callback)
+            except (BrokenProcessPool, OSError) as e:
+                Debug.logger.warning(f"Unable to parse journal files in parallel, parsing in the background thread instead", exc_info=e)
+
+        parsed: list[list[dict]] = []
+        for file in files:
+            if self._cancel.is_set(): return None
+            parsed.append(self._parse_file(file, events, since))
+            self._progress(progress_callback, len(parsed), len(files))
+
+        return parsed
+
+
+    def _parse_files_pool(self, files: list[dict], events: frozenset[str], since: str,
+                          progress_callback: Callable[[int, int], None] | None) -> list[list[dict]] | None:
+        """
+        Parse journal files in a pool of processes
+        """
+        parsed: list[list[dict]] = [[] for _ in files]
+        done: int = 0
+
+        with ProcessPoolExecutor(max_workers=min(self.processes, len(files)), mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures: dict[Future, int] = {executor.submit(parse_journal_file, file['path'], events, since): i for i, file in enumerate(files)}
+
+            for future in as_completed(futures):
+                if self._cancel.is_set():
+                    for pending in futures: pending.cancel()
+                    return None
+
+                try:
+                    parsed[futures[future]] = future.result()
+                except OSError as e:
+                    Debug.logger.warning(f"Unable to read journal file {files[futures[future]]['name']}", exc_info=e)
+
+                done += 1
+                self._progress(progress_callback, done, len(files))
+
+        return parsed
+
+
+    def _parse_file(self, file: dict, events: frozenset[str], since: str) -> list[dict]:
+        """
+        Parse a single journal file in this thread
+        """
+        try:
+            return parse_journal_file(file['path'], events, since)
+        except OSError as e:
+            Debug.logger.warning(f"Unable to read journal file {file['name']}", exc_info=e)
+            return []
+
+
+    def _replay(self, entries: Iterator[dict], job: '_ImportJob', replay: '_ReplayPlugin', router: EventRouter,
+                result: JournalImportResult) -> list[Activity]:
+        """Replay journal events in timestamp order into an Activity for each estimated tick
+
+        Args:
+            entries (Iterator[dict]): The journal events, oldest first
+            job (_ImportJob): The import job
+            replay (_ReplayPlugin): The stand-in for the plugin used by the replayed activities
+            router (EventRouter): The event router for the replay
+            result (JournalImportResult): The result, updated with the number of events replayed
+
+        Returns:
+            list[Activity]: The activity for each estimated tick that had any activity
+        """
+        state: _ReplayState = job.state
+        since: str = job.since.strftime(DATETIME_FORMAT_JOURNAL)
+        tick_starts: list[str] = [tick_time.strftime(DATETIME_FORMAT_JOURNAL) for tick_time, estimated in job.boundaries]
+        activities: dict[int, Activity] = {}
+
+        # Events in ticks that aren't being imported still need to be replayed, to keep the location and missions
+        # up to date, so they are replayed into a scratch activity that is thrown away
+        scratch: Activity = Activity(replay, Tick(replay))
+        scratch_boundary: int | None = None
+
+        for entry in entries:
+            if result.events % CANCEL_CHECK_EVENTS == 0 and self._cancel.is_set(): break
+            result.events += 1
+
+            timestamp: str = entry.get('timestamp', "")
+            boundary: int = bisect_right(tick_starts, timestamp) - 1
+
+            if timestamp >= since and boundary >= 0 and job.boundaries[boundary][1]:
+                activity: Activity | None = activities.get(boundary)
+                if activity is None:
+                    tick: Tick = Tick(replay)
+                    tick.set_imported(job.boundaries[boundary][0])
+                    activity = Activity(replay, tick)
+                    activities[boundary] = activity
+            else:
+                if boundary != scratch_boundary:
+                    scratch = Activity(replay, Tick(replay))
+                    scratch_boundary = boundary
+                activity = scratch
+
+            activity.cmdr = state.cmdr
+            router.dispatch(entry, JournalContext(state.cmdr, False, state.system, state.station, {'Odyssey': state.odyssey}, activity))
+
+        imported: list[Activity] = []
+        for activity in activities.values():
+            if activity.systems == {} and activity.powerplay == {}: continue
+
+            # Hand the activity over to the live plugin
+            activity.bgstally = self.bgstally
+            activity.autopost = False
+            imported.append(activity)
+
+        return imported
+
+
+    def _get_replay_router(self, replay: '_ReplayPlugin') -> EventRouter:
+        """
+        Get an event router for replaying journals, with the same activity and mission handlers as live events. The
+        location and docking state that EDMC tracks for live events is tracked here instead.
+        """
+        router: EventRouter = EventRouter(self.bgstally)
+        state: _ReplayState = replay.state
+
+        router.subscribe(['LoadGame'], "JournalImporter.game_loaded", lambda entry, context: state.game_loaded(entry))
+        router.subscribe(EVENTS_SYSTEM, "JournalImporter.system_entered", lambda entry, context: state.system_entered(entry))
+        router.subscribe(['Docked'], "JournalImporter.docked", lambda entry, context: state.docked(entry))
+        router.subscribe(['Undocked'], "JournalImporter.undocked", lambda entry, context: state.undocked(entry))
+
+        self.bgstally.activity_manager.subscribe_journal_handlers(router, state, replay.mission_log)
+        replay.mission_log.subscribe_journal_handlers(router)
+
+        return router
+
+
+    def _complete(self, result: JournalImportResult, complete_callback: Callable[[JournalImportResult], None] | None):
+        """
+        An import has finished, add the imported activity. Called on the main thread.
+        """
+        self.thread = None
+
+        if not (result.unchanged or result.cancelled or result.failed):
+            # Replace everything imported since the start of the tick containing the start of the import period
+            since: datetime = min([activity.tick_time for activity in result.activities], default=result.since)
+            self.bgstally.activity_manager.add_imported_activities(result.activities, min(since, result.since))
+            self._save_marker(result.marker)
+
+        if complete_callback is not None: complete_callback(result)
+
+
+    def _progress(self, progress_callback: Callable[[int, int], None] | None, done: int, total: int):
+        """
+        Report progress, on the main thread if there is a UI
+        """
+        if progress_callback is None: return
+
+        ui = getattr(self.bgstally, 'ui', None)
+        if ui is not None and ui.frame is not None and self.running():
+            ui.frame.after(0, progress_callback, done, total)
+        else:
+            progress_callback(done, total)
+
+
+    def _is_unchanged(self, marker: dict) -> bool:
+        """Check whether all journal files in the import period have already been imported and are unchanged since
+
+        Args:
+            marker (dict): The marker for this import
+
+        Returns:
+            bool: True if there is nothing new to import
+        """
+        previous: dict = self._load_marker()
+        if previous.get('since', marker['since']) > marker['since']: return False
+
+        previous_files: dict = previous.get('files', {})
+        return all(previous_files.get(name) == file for name, file in marker['files'].items())
+
+
+    def _load_marker(self) -> dict:
+        """
+        Load the marker recording the journal files imported last time
+        """
+        file: str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        if not path.exists(file): return {}
+
+        try:
+            with open(file) as json_file:
+                return json.load(json_file)
+        except Exception as e:
+            Debug.logger.info(f"Unable to load {file}")
+            return {}
+
+
+    def _save_marker(self, marker: dict):
+        """
+        Save the marker recording the journal files imported
+        """
+        file: str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        with open(file, 'w') as outfile:
+            json.dump(marker, outfile)
+
+
+class _ImportJob:
+    """
+    Everything an import needs from the live plugin, gathered on the main thread before the import starts
+    """
+    def __init__(self, since: datetime, journal_dir: str, boundaries: list[tuple[datetime, bool]], current_tick_time: datetime, state: '_ReplayState'):
+        self.since: datetime = since
+        self.journal_dir: str = journal_dir
+        self.boundaries: list[tuple[datetime, bool]] = boundaries
+        self.current_tick_time: datetime = current_tick_time
+        self.state: _ReplayState = state
+
+
+class _FixedValue:
+    """
+    Stands in for a tk variable whose value was copied when the import started, as tk variables can only be read on the main thread
+    """
+    def __init__(self, value: str):
+        self.value: str = value
+
+
+    def get(self) -> str:
+        return self.value
+
+
+class _ReplayState:
+    """
+    The state used by the activity handlers while replaying journals, so the live state is never changed. User preferences
+    are copied from the live state when the import starts. Also tracks the CMDR, location and game mode, which EDMC tracks
+    for live events.
+    """
+    def __init__(self, state: State):
+        # User preferences
+        self.discord_lang: str | None = state.discord_lang
+        self.showmerits: bool = state.showmerits
+        self.EnableSystemActivityByDefault: _FixedValue = _FixedValue(state.EnableSystemActivityByDefault.get())
+
+        # Activity handler state, as State
+        self.current_system_id: str = ""
+        self.station_faction: str = ""
+        self.station_type: str = ""
+        self.last_settlement_approached: dict = {}
+        self.last_spacecz_approached: dict = {}
+        self.last_megaship_approached: dict = {}
+        self.last_ships_targeted: ExpiringDict = ExpiringDict(SHIPS_TARGETED_MAX, TIME_SHIPS_TARGETED_EXPIRY)
+        self.last_ship_targeted: dict = {}
+
+        # Journal state
+        self.cmdr: str | None = None
+        self.system: str | None = None
+        self.station: str | None = None
+        self.odyssey: bool = False
+
+
+    def game_loaded(self, entry: dict):
+        """
+        A game session has started
+        """
+        self.cmdr = entry.get('Commander', self.cmdr)
+        self.odyssey = entry.get('Odyssey', False)
+
+
+    def system_entered(self, entry: dict):
+        """
+        The current system has been reported
+        """
+        self.system = entry.get('StarSystem', self.system)
+
+        if entry.get('Docked') == True:
+            self.station = entry.get('StationName')
+            self.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.station_faction)
+        elif entry.get('event') != 'CarrierJump':
+            self.station = None
+
+
+    def docked(self, entry: dict):
+        """
+        Docked at a station
+        """
+        self.station = entry.get('StationName')
+        self.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.station_faction)
+        self.station_type = entry.get('StationType', "")
+
+
+    def undocked(self, entry: dict):
+        """
+        Undocked from a station
+        """
+        self.station = None
+        if entry.get('Taxi') == False:
+            self.station_faction = ""
+            self.station_type = ""
+
+
+class _ReplayPlugin:
+    """
+    Stands in for the plugin for activities being replayed from journals, so that replaying never changes live data,
+    sends events to APIs or updates the UI. Only the parts of the plugin used by the journal handlers are provided.
+    """
+    def __init__(self, state: _ReplayState):
+        self.state: _ReplayState = state
+        self.tick: _ReplayPlugin = self
+        self.tick_time: datetime = datetime.now(UTC)
+        self.ui: _ReplayPlugin = self
+        self.api_manager: _ReplayPlugin = self
+        self.market: _ReplayPlugin = self
+        self.persistence_manager: _ReplayPlugin = self
+        self.mission_log: MissionLog = MissionLog(self, load=False)
+
+
+    def fetch_system_tick(self, system_address: str):
+        pass
+
+
+    def show_system_activity(self, system_address: str):
+        pass
+
+
+    def show_warning(self, message: str):
+        pass
+
+
+    def send_event(self, *args, **kwargs):
+        pass
+
+
+    def mark_dirty(self, *stores):
+        pass
+
+
+    def available(self, market_id: int) -> bool:
+        # Market data is only available for the current market, never for past ones
+        return False
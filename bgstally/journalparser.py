@@ -0,0 +1,121 @@
+# Parsing of journal files for the journal importer. Only the standard library is used here, so this module can be
+# imported cheaply by the worker processes that parse journal files in parallel.
+import json
+import re
+from datetime import UTC, datetime
+from os import listdir, path, stat
+from typing import Iterable, Iterator
+
+# Journal file names are either 'Journal.2024-05-01T123456.01.log' or the older 'Journal.240501123456.01.log'
+RE_JOURNAL_FILENAME = re.compile(r"^Journal\.(\d{4}-\d{2}-\d{2}T\d{6}|\d{12})\.\d{2}\.log$")
+RE_EVENT = re.compile(r'"event"\s*:\s*"([^"]+)"')
+DATETIME_FORMAT_JOURNAL_FILENAME = "%Y-%m-%dT%H%M%S"
+DATETIME_FORMAT_JOURNAL_FILENAME_LEGACY = "%y%m%d%H%M%S"
+EVENT_FILEHEADER = "Fileheader"
+
+
+def list_journal_files(journal_dir: str, since: datetime | None = None) -> list[dict]:
+    """List the journal files in a folder, oldest first
+
+    Args:
+        journal_dir (str): The journal folder
+        since (datetime | None, optional): Only list files started on or after this time. Defaults to None, which lists all files.
+
+    Returns:
+        list[dict]: The name, full path, start time, size and modified time of each file
+    """
+    result: list[dict] = []
+
+    for filename in listdir(journal_dir):
+        started: datetime | None = journal_file_started(filename)
+        if started is None or (since is not None and started < since): continue
+
+        filepath: str = path.join(journal_dir, filename)
+        filestat = stat(filepath)
+        result.append({'name': filename, 'path': filepath, 'started': started, 'size': filestat.st_size, 'mtime': filestat.st_mtime_ns})
+
+    return sorted(result, key=lambda f: f['started'])
+
+
+def journal_file_started(filename: str) -> datetime | None:
+    """Get the time a journal file was started from its name
+
+    Args:
+        filename (str): The journal file name
+
+    Returns:
+        datetime | None: The start time, or None if this isn't a journal file
+    """
+    match: re.Match | None = RE_JOURNAL_FILENAME.match(filename)
+    if match is None: return None
+
+    timestamp: str = match.group(1)
+    date_format: str = DATETIME_FORMAT_JOURNAL_FILENAME if "T" in timestamp else DATETIME_FORMAT_JOURNAL_FILENAME_LEGACY
+    return datetime.strptime(timestamp, date_format).replace(tzinfo=UTC)
+
+
+def parse_journal_file(filepath: str, events: frozenset[str], since: str = "") -> list[dict]:
+    """Parse a journal file, keeping only the events of interest. Files from the beta or legacy galaxy are ignored.
+
+    Args:
+        filepath (str): The journal file
+        events (frozenset[str]): The names of the events to keep
+        since (str, optional): Only keep events with a journal timestamp on or after this. Defaults to "", which keeps all events.
+
+    Returns:
+        list[dict]: The journal entries, in the order they are in the file
+    """
+    entries: Iterator[dict] = _decode(_select(_read_lines(filepath), events | {EVENT_FILEHEADER}))
+
+    result: list[dict] = []
+    for entry in entries:
+        event: str | None = entry.get('event')
+        if event == EVENT_FILEHEADER:
+            if not _is_live_galaxy(entry): return []
+            continue
+        if event not in events or entry.get('timestamp', "") < since: continue
+        result.append(entry)
+
+    return result
+
+
+def _read_lines(filepath: str) -> Iterator[str]:
+    """
+    Read a journal file line by line
+    """
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as file:
+        yield from file
+
+
+def _select(lines: Iterable[str], events: frozenset[str]) -> Iterator[str]:
+    """
+    Pick out the lines for the events of interest, without decoding the JSON of any other lines
+    """
+    for line in lines:
+        match: re.Match | None = RE_EVENT.search(line)
+        if match is not None and match.group(1) in events: yield line
+
+
+def _decode(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    Decode journal lines, skipping any that are incomplete or corrupt
+    """
+    for line in lines:
+        try:
+            entry: dict = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(entry, dict): yield entry
+
+
+def _is_live_galaxy(fileheader: dict) -> bool:
+    """
+    Check whether a journal file is from the live galaxy, i.e. game version 4 or later and not a beta
+    """
+    gameversion: str = str(fileheader.get('gameversion', ""))
+    if "beta" in gameversion.lower(): return False
+
+    try:
+        return int(gameversion.split(".")[0]) >= 4
+    except ValueError:
+        return False
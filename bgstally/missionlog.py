@@ -1,29 +1,63 @@
 import json
 from datetime import UTC, datetime, timedelta
+from heapq import heappop, heappush
+from itertools import count
 from os import path, remove
+from threading import Thread
+from time import sleep
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
+    from bgstally.eventrouter import EventRouter, JournalContext
 
-from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, DataStore
 from bgstally.debug import Debug
+from config import config
 
 FILENAME = "missionlog.json"
 FILENAME_LEGACY = "MissionLog.txt"
 TIME_MISSION_EXPIRY_D = 7
+TIME_EXPIRY_WORKER_PERIOD_S = 60 * 15 # 15 minutes
 
 
 class MissionLog:
     """
     Handle a log of all in-progress missions
     """
-    def __init__(self, bgstally: 'BGSTally'):
+    def __init__(self, bgstally: 'BGSTally', load: bool = True):
         self.bgstally: BGSTally = bgstally
-        self.missionlog = []
+        self._missions: dict = {}                   # key = MissionID, value = mission dict, in the order the missions were added
+        self._system_refcounts: dict[str, int] = {} # key = system name, value = number of missions from that system
+        self._expiry_heap: list = []                # Heap of (expiry datetime, sequence, MissionID)
+        self._expiry_sequence = count()             # Tie-breaker so MissionIDs are never compared on the heap
+        if not load: return
+
         self.load()
         self._expire_old_missions()
 
+        self.expiry_thread: Thread = Thread(target=self._expiry_worker, name="BGSTally MissionLog expiry worker")
+        self.expiry_thread.daemon = True
+        self.expiry_thread.start()
+
+
+    @property
+    def missionlog(self) -> list:
+        """
+        A copy of the list of missions. This is what is persisted. Assign a new list to replace the missions.
+        """
+        return list(self._missions.values())
+
+
+    @missionlog.setter
+    def missionlog(self, missionlog: list):
+        self._missions = {}
+        self._system_refcounts = {}
+        self._expiry_heap = []
+
+        for mission in missionlog:
+            self._add(mission)
+
 
     def load(self):
         """
@@ -54,9 +88,34 @@ class MissionLog:
         """
         Save state to file
         """
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> list:
+        """
+        Take a copy of the missionlog, ready to write. Missions aren't changed once they are added, so only the list is copied.
+        """
+        return self.missionlog
+
+
+    def write(self, missionlog: list):
+        """
+        Write a snapshot of the missionlog to file
+        """
         file = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        data = json.dumps(missionlog)
         with open(file, 'w') as outfile:
-            json.dump(self.missionlog, outfile)
+            outfile.write(data)
+
+
+    def subscribe_journal_handlers(self, router: 'EventRouter'):
+        """Subscribe the mission journal event handlers
+
+        Args:
+            router (EventRouter): The event router
+        """
+        router.subscribe(['MissionAbandoned'], "MissionLog.delete_mission_by_id", lambda entry, context: self.delete_mission_by_id(entry.get('MissionID')), dirty=True)
+        router.subscribe(['MissionAccepted'], "MissionLog.add_mission", self._mission_accepted, dirty=True)
 
 
     def get_missionlog(self):
@@ -72,9 +131,7 @@ class MissionLog:
         """
         if missionid is None: return None
 
-        for mission in self.missionlog:
-            if mission['MissionID'] == missionid: return mission
-        return None
+        return self._missions.get(missionid)
 
 
     def add_mission(self, name: str, faction: str, missionid: str, expiry: str,
@@ -84,51 +141,137 @@ class MissionLog:
         """
         Add a mission to the missionlog
         """
-        self.missionlog.append({'Name': name, 'Faction': faction, 'MissionID': missionid, 'Expiry': expiry,
-                                'DestinationSystem': destination_system, 'DestinationSettlement': destination_settlement, 'System': system_name, 'Station': station_name,
-                                'CommodityCount': commodity_count, 'PassengerCount': passenger_count, 'KillCount': kill_count,
-                                'TargetFaction': target_faction})
+        mission: dict = {'Name': name, 'Faction': faction, 'MissionID': missionid, 'Expiry': expiry,
+                         'DestinationSystem': destination_system, 'DestinationSettlement': destination_settlement, 'System': system_name, 'Station': station_name,
+                         'CommodityCount': commodity_count, 'PassengerCount': passenger_count, 'KillCount': kill_count,
+                         'TargetFaction': target_faction}
+        self._add(mission)
+        self.bgstally.persistence_manager.mark_dirty(DataStore.MISSIONLOG)
 
 
     def delete_mission_by_id(self, missionid: str):
         """
         Delete the mission with the given id from the missionlog
         """
-        for i in range(len(self.missionlog)):
-            if self.missionlog[i]['MissionID'] == missionid:
-                self.missionlog.pop(i)
-                break
+        mission: dict | None = self.get_mission(missionid)
+        if mission is None: return
+
+        self._remove_mission(mission)
+        self.bgstally.persistence_manager.mark_dirty(DataStore.MISSIONLOG)
 
 
     def delete_mission_by_index(self, missionindex: int):
         """
         Delete the mission at the given index from the missionlog
         """
-        self.missionlog.pop(missionindex)
+        missionid = list(self._missions.keys())[missionindex]
+        self._remove_mission(self._missions[missionid])
+        self.bgstally.persistence_manager.mark_dirty(DataStore.MISSIONLOG)
 
 
     def get_active_systems(self):
         """
         Return a list of systems that have currently active missions
         """
-        systems = [x['System'] for x in self.missionlog]
-        # De-dupe before returning
-        return list(dict.fromkeys(systems))
+        return list(self._system_refcounts.keys())
+
+
+    def _mission_accepted(self, entry: dict, context: 'JournalContext'):
+        """
+        A mission has been accepted
+        """
+        self.add_mission(entry.get('Name', ""), entry.get('Faction', ""), entry.get('MissionID', ""), entry.get('Expiry', ""),
+                         entry.get('DestinationSystem', ""), entry.get('DestinationSettlement', ""), context.system, context.station,
+                         entry.get('Count', -1), entry.get('PassengerCount', -1), entry.get('KillCount', -1),
+                         entry.get('TargetFaction', ""))
 
 
     def _expire_old_missions(self):
         """
         Clear out all missions older than 7 days from the mission log
         """
-        for mission in reversed(self.missionlog):
-            # Old missions pre v1.11.0 and missions with missing expiry dates don't have Expiry stored. Set to 7 days ahead for safety
-            if not 'Expiry' in mission or mission['Expiry'] == "": mission['Expiry'] = (datetime.now(UTC) + timedelta(days = TIME_MISSION_EXPIRY_D)).strftime(DATETIME_FORMAT_JOURNAL)
+        expired_before: datetime = datetime.now(UTC) - timedelta(days = TIME_MISSION_EXPIRY_D)
+        changed: bool = False
+
+        while self._expiry_heap and self._expiry_heap[0][0] < expired_before:
+            # Keep missions for a while after they have expired, so we can log failed missions correctly
+            expiry_timestamp, sequence, missionid = heappop(self._expiry_heap)
+            mission: dict | None = self._missions.get(missionid)
+            if mission is None or self._parse_expiry(mission) != expiry_timestamp: continue # Already deleted, or re-added since
+
+            self._remove_mission(mission)
+            changed = True
+
+        if changed:
+            persistence_manager = getattr(self.bgstally, 'persistence_manager', None)
+            if persistence_manager is not None: persistence_manager.mark_dirty(DataStore.MISSIONLOG)
+
+
+    def _expiry_worker(self) -> None:
+        """
+        Periodically expire old missions, so they don't stay in the log until the next restart
+        """
+        Debug.logger.debug("Starting MissionLog Expiry Worker...")
+
+        while True:
+            if config.shutting_down:
+                Debug.logger.debug("Shutting down MissionLog Expiry Worker...")
+                return
+
+            sleep(TIME_EXPIRY_WORKER_PERIOD_S)
+
+            if not self._expiry_heap or self._expiry_heap[0][0] >= datetime.now(UTC) - timedelta(days = TIME_MISSION_EXPIRY_D): continue
+
+            # The mission log is changed from the main thread, so do the expiry there too
+            ui = getattr(self.bgstally, 'ui', None)
+            if ui is not None and ui.frame is not None:
+                ui.frame.after(0, self._expire_old_missions)
+
+
+    def _parse_expiry(self, mission: dict) -> datetime:
+        """Get the expiry time of a mission
+
+        Args:
+            mission (dict): The mission
+
+        Returns:
+            datetime: The tz-aware expiry timestamp
+        """
+        # Old missions pre v1.11.0 and missions with missing expiry dates don't have Expiry stored. Set to 7 days ahead for safety
+        if not 'Expiry' in mission or mission['Expiry'] == "": mission['Expiry'] = (datetime.now(UTC) + timedelta(days = TIME_MISSION_EXPIRY_D)).strftime(DATETIME_FORMAT_JOURNAL)
+
+        # Need to do this shenanegans to parse a tz-aware timestamp from a string
+        return datetime.strptime(mission['Expiry'], DATETIME_FORMAT_JOURNAL).replace(tzinfo=UTC)
+
+
+    def _add(self, mission: dict):
+        """Add a mission to the mission log and indexes. A mission with the same MissionID as an existing one replaces it.
 
-            # Need to do this shenanegans to parse a tz-aware timestamp from a string
-            expiry_timestamp: datetime = datetime.strptime(mission['Expiry'], DATETIME_FORMAT_JOURNAL)
-            expiry_timestamp = expiry_timestamp.replace(tzinfo=UTC)
+        Args:
+            mission (dict): The mission
+        """
+        missionid = mission.get('MissionID')
+        existing: dict | None = self._missions.get(missionid)
+        if existing is not None:
+            Debug.logger.info(f"Mission {missionid} is already in the mission log, replacing it")
+            self._remove_mission(existing)
+
+        self._missions[missionid] = mission
+        system: str|None = mission.get('System')
+        self._system_refcounts[system] = self._system_refcounts.get(system, 0) + 1
+        heappush(self._expiry_heap, (self._parse_expiry(mission), next(self._expiry_sequence), missionid))
+
+
+    def _remove_mission(self, mission: dict):
+        """Remove a specific mission from the mission log and indexes. Its expiry heap entry is discarded when it reaches
+        the top of the heap.
+
+        Args:
+            mission (dict): The mission
+        """
+        del self._missions[mission.get('MissionID')]
 
-            timedifference = datetime.now(UTC) - expiry_timestamp
-            if timedifference > timedelta(days = TIME_MISSION_EXPIRY_D):
-                # Keep missions for a while after they have expired, so we can log failed missions correctly
-                self.missionlog.remove(mission)
+        system: str|None = mission.get('System')
+        refcount: int = self._system_refcounts.get(system, 0) - 1
+        if refcount > 0: self._system_refcounts[system] = refcount
+        else: self._system_refcounts.pop(system, None)
@@ -0,0 +1,267 @@
+import json
+from collections import deque
+from os import makedirs, path, replace
+from threading import Lock
+from typing import Callable
+
+from bgstally.debug import Debug
+
+OUTBOX_CAP_TARGET_RATIO = 0.9               # When full, discard old items until the outbox is this proportion of the maximum size
+OUTBOX_COMPACT_ACKED_MIN = 200              # Rewrite the file once at least this many acknowledged entries have built up
+OUTBOX_MAX_SIZE_BYTES = 5 * 1024 * 1024     # 5 MB
+
+
+class Outbox:
+    """
+    A durable, append-only queue of items waiting to be delivered. Items are appended to a JSON lines file and stay
+    there until they are acknowledged, so nothing is lost if a send fails or EDMC is restarted. The file is periodically
+    compacted to remove acknowledged items, and capped in size by discarding the oldest items.
+
+    Changes are held in memory until flush() is called, so queueing an item never waits for the disk. The on_changed
+    callback is called whenever there are changes waiting to be flushed.
+
+    The file contains two types of line: {"seq": n, "data": {...}} for each queued item, and {"ack": n} to record
+    that all items up to and including sequence number n have been delivered.
+    """
+    def __init__(self, filepath: str, max_size_bytes: int = OUTBOX_MAX_SIZE_BYTES, on_changed: Callable[[], None]|None = None):
+        self.filepath: str = filepath
+        self.max_size_bytes: int = max_size_bytes
+        self.on_changed: Callable[[], None]|None = on_changed
+
+        self._lock: Lock = Lock()
+        self._write_lock: Lock = Lock() # Held while writing the file, so flushes from different threads don't overlap
+        self._pending: deque[tuple[int, dict, int]] = deque() # (seq, data, size in bytes)
+        self._unwritten: list[str] = [] # Lines waiting to be appended to the file
+        self._rewrite_required: bool = False # True if the whole file needs to be rewritten on the next flush
+        self._last_seq: int = 0
+        self._size_bytes: int = 0 # The size of the file once all changes have been flushed
+        self._acked_since_compact: int = 0
+
+        makedirs(path.dirname(self.filepath), exist_ok=True)
+        self._load()
+
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+    def append(self, data: dict) -> None:
+        """Add an item to the outbox
+
+        Args:
+            data (dict): The item, which must be JSON serialisable
+        """
+        with self._lock:
+            self._last_seq += 1
+            line: str = json.dumps({'seq': self._last_seq, 'data': data}) + "\n"
+            self._append_line(line)
+            self._pending.append((self._last_seq, data, len(line)))
+
+            if self._size_bytes > self.max_size_bytes:
+                self._enforce_cap()
+
+        self._changed()
+
+
+    def peek(self, count: int) -> tuple[int, list[dict]]:
+        """Get the oldest items in the outbox without removing them
+
+        Args:
+            count (int): The maximum number of items to fetch
+
+        Returns:
+            tuple[int, list[dict]]: The sequence number of the last item returned (0 if none) and the list of items
+        """
+        with self._lock:
+            items: list[tuple[int, dict, int]] = [self._pending[i] for i in range(min(count, len(self._pending)))]
+
+        if len(items) == 0: return 0, []
+        return items[-1][0], [item[1] for item in items]
+
+
+    def ack(self, seq: int) -> None:
+        """Acknowledge delivery of all items up to and including the given sequence number, removing them from the outbox
+
+        Args:
+            seq (int): The sequence number of the last delivered item
+        """
+        with self._lock:
+            acked: int = 0
+            while len(self._pending) > 0 and self._pending[0][0] <= seq:
+                self._pending.popleft()
+                acked += 1
+
+            if acked == 0: return
+
+            self._acked_since_compact += acked
+
+            if len(self._pending) == 0:
+                # Nothing left, so we can simply empty the file
+                self._schedule_rewrite()
+            elif self._acked_since_compact >= OUTBOX_COMPACT_ACKED_MIN:
+                self._schedule_rewrite()
+            else:
+                self._append_line(json.dumps({'ack': seq}) + "\n")
+
+        self._changed()
+
+
+    def clear(self) -> None:
+        """
+        Discard all items in the outbox
+        """
+        with self._lock:
+            if len(self._pending) == 0 and self._size_bytes == 0: return
+            self._pending.clear()
+            self._schedule_rewrite()
+
+        self._changed()
+
+
+    def flush(self) -> None:
+        """
+        Write any changes to the outbox file
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self._rewrite_required and len(self._unwritten) == 0: return
+
+                rewrite: bool = self._rewrite_required
+                if rewrite:
+                    lines: list[str] = [json.dumps({'seq': seq, 'data': data}) + "\n" for seq, data, _ in self._pending]
+                else:
+                    lines = self._unwritten
+
+                self._unwritten = []
+                self._rewrite_required = False
+
+            if rewrite: success: bool = self._rewrite(lines)
+            else: success = self._write_lines(lines)
+
+            if not success:
+                # Try again with a full rewrite next time, so the file ends up consistent
+                with self._lock: self._rewrite_required = True
+
+
+    def _load(self) -> None:
+        """
+        Load pending items from the outbox file, replaying acknowledgements
+        """
+        if not path.exists(self.filepath): return
+
+        items: dict[int, tuple[int, dict, int]] = {}
+        acked_seq: int = 0
+
+        try:
+            with open(self.filepath, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry: dict = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Most likely a partial line written when EDMC was closed, skip it
+                        continue
+
+                    if 'ack' in entry:
+                        acked_seq = max(acked_seq, int(entry['ack']))
+                    elif 'seq' in entry:
+                        seq: int = int(entry['seq'])
+                        items[seq] = (seq, entry.get('data', {}), len(line))
+                        self._last_seq = max(self._last_seq, seq)
+        except Exception as e:
+            Debug.logger.info(f"Unable to load {self.filepath}")
+            return
+
+        self._pending = deque(items[seq] for seq in sorted(items.keys()) if seq > acked_seq)
+        self._last_seq = max(self._last_seq, acked_seq)
+
+        # Start each session with a compact file
+        self._schedule_rewrite()
+        self.flush()
+
+        if len(self._pending) > 0:
+            Debug.logger.info(f"Loaded {len(self._pending)} undelivered items from {self.filepath}")
+
+
+    def _enforce_cap(self) -> None:
+        """
+        Discard the oldest items until the outbox fits within its size limit. Must be called with the lock held.
+        Items are discarded down to a little below the limit, so we don't rewrite the file on every append when full.
+        """
+        pending_size: int = sum(item[2] for item in self._pending)
+        target_size: int = int(self.max_size_bytes * OUTBOX_CAP_TARGET_RATIO)
+        discarded: int = 0
+
+        while len(self._pending) > 1 and pending_size > target_size:
+            pending_size -= self._pending.popleft()[2]
+            discarded += 1
+
+        if discarded > 0:
+            Debug.logger.warning(f"Outbox {self.filepath} is full, discarded {discarded} oldest items")
+
+        self._schedule_rewrite()
+
+
+    def _schedule_rewrite(self) -> None:
+        """
+        Rewrite the outbox file on the next flush, so it contains only the pending items. Must be called with the lock held.
+        """
+        self._rewrite_required = True
+        self._unwritten = []
+        self._size_bytes = sum(item[2] for item in self._pending)
+        self._acked_since_compact = 0
+
+
+    def _append_line(self, line: str) -> None:
+        """
+        Queue a single line to be appended to the outbox file on the next flush. Must be called with the lock held.
+        """
+        if not self._rewrite_required: self._unwritten.append(line)
+        self._size_bytes += len(line)
+
+
+    def _changed(self) -> None:
+        """
+        Let the owner know there are changes waiting to be flushed
+        """
+        if self.on_changed is not None: self.on_changed()
+
+
+    def _rewrite(self, lines: list[str]) -> bool:
+        """Replace the outbox file with the given lines
+
+        Args:
+            lines (list[str]): The lines
+
+        Returns:
+            bool: True if the file was written
+        """
+        temp_filepath: str = self.filepath + ".tmp"
+
+        try:
+            with open(temp_filepath, 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+            replace(temp_filepath, self.filepath)
+        except Exception as e:
+            Debug.logger.error(f"Unable to write {self.filepath}", exc_info=e)
+            return False
+
+        return True
+
+
+    def _write_lines(self, lines: list[str]) -> bool:
+        """Append lines to the outbox file
+
+        Args:
+            lines (list[str]): The lines
+
+        Returns:
+            bool: True if the lines were written
+        """
+        try:
+            with open(self.filepath, 'a', encoding='utf-8') as file:
+                file.writelines(lines)
+        except Exception as e:
+            Debug.logger.error(f"Unable to write {self.filepath}", exc_info=e)
+            return False
+
+        return True
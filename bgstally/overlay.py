@@ -1,7 +1,9 @@
 import textwrap
+from collections import OrderedDict
 from datetime import timedelta
-from threading import Event
-from typing import TYPE_CHECKING
+from threading import Event, Lock
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Hashable
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
@@ -26,6 +28,95 @@ WIDTH_CHARACTER_LARGE = 7
 HEIGHT_CHARACTER_NORMAL = 14
 HEIGHT_CHARACTER_LARGE = 20
 MAX_LINES_PER_PANEL = 30
+WRAP_WIDTH = 80
+WRAP_CACHE_SIZE = 64
+
+
+class OverlayFrameLayout:
+    """
+    The geometry and colours of a single overlay frame, parsed once from its config section
+    """
+    def __init__(self, name: str, fi: dict):
+        self.name: str = name
+        self.text_size: str = fi['text_size']
+        self.character_width: int = WIDTH_CHARACTER_NORMAL if self.text_size == "normal" else WIDTH_CHARACTER_LARGE
+        self.line_height: int = HEIGHT_CHARACTER_NORMAL if self.text_size == "normal" else HEIGHT_CHARACTER_LARGE
+        self.ttl: int = int(fi['ttl'])
+        self.title_colour: str = fi['title_colour']
+        self.text_colour: str = fi['text_colour']
+        self.border_colour: str = fi['border_colour']
+        self.fill_colour: str = fi['fill_colour']
+        self.x: int = int(fi['x'])
+        self.y: int = int(fi['y'])
+        self.w: int = int(fi['w'])
+        self.h: int = int(fi['h'])
+        self.x_center: bool = bool(fi.get('x_center', False))
+        self.y_center: bool = bool(fi.get('y_center', False))
+        self.justification: str = fi.get('justification', "left")
+        self.anchor: str = fi.get('anchor', "nw")
+
+
+    def get_position(self, message_width: int, message_height: int, is_modern_overlay: bool) -> tuple[int, int]:
+        """Get the position of a message in this frame
+
+        Args:
+            message_width (int): The width of the message
+            message_height (int): The height of the message
+            is_modern_overlay (bool): True if EDMCModernOverlay is handling centering and right / bottom alignment
+
+        Returns:
+            tuple[int, int]: The x and y position
+        """
+        # Let EDMCModernOverlay handle centering and right alignment via define_plugin_group for frame_names we've fully registered.
+        if is_modern_overlay:
+            if self.x_center:
+                x: int = int(WIDTH_OVERLAY / 2) + self.x   # Let EDMCModernOverlay plugin group handle horizontally centering
+            elif self.x < 0:
+                x: int = WIDTH_OVERLAY # Let EDMCModernOverlay plugin group handle right offset
+            else:
+                x: int = self.x
+        else:
+            if self.x_center:
+                x: int = int((WIDTH_OVERLAY - message_width) / 2) + self.x   # Horizontally centred, offset by 'x' where 'x' can be negative
+            elif self.x < 0:
+                x: int = WIDTH_OVERLAY + self.x # Negative 'x', offset from right of overlay
+            else:
+                x: int = self.x
+
+        if is_modern_overlay:
+            if self.y_center:
+                y: int = int(HEIGHT_OVERLAY / 2) + self.y   # Let EDMCModernOverlay plugin group handle vertically centering
+            elif self.y < 0:
+                y: int = HEIGHT_OVERLAY # Let EDMCModernOverlay plugin group handle bottom offset
+            else:
+                y: int = self.y
+        else:
+            if self.y_center:
+                y: int = int((HEIGHT_OVERLAY - message_height) / 2) + self.y # Vertically centred, offset by 'y' where 'y' can be negative
+            elif self.y < 0:
+                y: int = HEIGHT_OVERLAY + self.y # Negative 'y', offset from bottom of overlay
+            else:
+                y: int = self.y
+
+        return x, y
+
+
+class OverlayMessageLayout:
+    """
+    A message wrapped into lines for a frame, with its size
+    """
+    def __init__(self, frame: OverlayFrameLayout, message: str, title: str | None):
+        self.segments: list[str] = []
+
+        # Put the title first
+        if title != None and title != '':
+            self.segments.append(f"{TAG_OVERLAY_HIGHLIGHT}{title}")
+        for line in message.splitlines():
+            self.segments += textwrap.wrap(line, width = WRAP_WIDTH, subsequent_indent = '  ')
+
+        self.width: int = len(max(self.segments, key = len, default = "")) * frame.character_width
+        self.height: int = len(self.segments) * frame.line_height
+
 
 class Overlay:
     """
@@ -39,6 +130,9 @@ class Overlay:
         self.problem_displaying: bool = False
 
         self.stoppers:dict[str, Event] = {}
+        self.frames: dict[str, OverlayFrameLayout] = {} # key = frame name, value = parsed frame config
+        self.wrapped: OrderedDict[tuple, OverlayMessageLayout] = OrderedDict() # LRU cache, key = (frame name, message, title)
+        self._wrapped_lock: Lock = Lock() # Messages are displayed from the UI worker and the main thread
 
         overlay_config: dict | None = self.bgstally.config.overlay()
         if overlay_config is not None:
@@ -51,82 +145,41 @@ class Overlay:
             HEIGHT_CHARACTER_LARGE = int(overlay_config.get('line_height_large', HEIGHT_CHARACTER_LARGE))
             MAX_LINES_PER_PANEL = int(overlay_config.get('max_lines_per_panel', MAX_LINES_PER_PANEL))
 
+        self.load_frames()
         self._check_overlay()
 
         self._setup_plugin_groups() # Setup plugin groups for EDMCModernOverlay if available
 
         self._declare_ready()
 
-    def display_message(self, frame_name: str, message: str, fit_to_text: bool = False, ttl_override: int = None, text_colour_override: str = None, title_colour_override: str = None, title: str = None):
+    def display_message(self, frame_name: str, message: str, fit_to_text: bool = False, ttl_override: int = None, text_colour_override: str = None, title_colour_override: str = None, title: str = None) -> bool:
         """
-        Display a message in the overlay
+        Display a message in the overlay. Returns True if the message was sent to the overlay.
         """
-        if self.edmcoverlay == None: return
-        if not self.bgstally.state.enable_overlay: return
-        if message == "": return
+        if self.edmcoverlay == None: return False
+        if not self.bgstally.state.enable_overlay: return False
+        if message == "": return False
 
         try:
-            fi: dict | None = self.bgstally.config.overlay_frame(frame_name)
-            if fi is None: return
-
-            # Split text on line breaks, then limit length of each line
-            lines: list = message.splitlines()
-            segments: list = []
-
-            # Put the title first
-            if title != None and title != '':
-                segments += f"{TAG_OVERLAY_HIGHLIGHT}{title}"
-            for line in lines:
-                segments += textwrap.wrap(line, width = 80, subsequent_indent = '  ')
-
-            message_width: int = len(max(segments, key = len)) * WIDTH_CHARACTER_NORMAL if fi['text_size'] == "normal" else len(max(segments, key = len)) * WIDTH_CHARACTER_LARGE
-            message_height: int = len(segments) * HEIGHT_CHARACTER_NORMAL if fi['text_size'] == "normal" else len(segments) * HEIGHT_CHARACTER_LARGE
-            ttl: int = ttl_override if ttl_override else int(fi['ttl'])
-            title_colour: str = title_colour_override if title_colour_override else fi['title_colour']
-            text_colour: str = text_colour_override if text_colour_override else fi['text_colour']
-
-            # Let EDMCModernOverlay handle centering and right alignment via define_plugin_group for frame_names we've fully registered.
-            x_center = fi.get('x_center', False)
-            x_value = int(fi['x'])
-            if self.is_modern_overlay:
-                if x_center:
-                    x: int = int(WIDTH_OVERLAY / 2) + x_value   # Let EDMCModernOverlay plugin group handle horizontally centering
-                elif x_value < 0:
-                    x: int = WIDTH_OVERLAY # Let EDMCModernOverlay plugin group handle right offset
-                else:
-                    x: int = x_value
-            else:
-                if x_center:
-                    x: int = int((WIDTH_OVERLAY - message_width) / 2) + x_value   # Horizontally centred, offset by 'x' where 'x' can be negative
-                elif x_value < 0:
-                    x: int = WIDTH_OVERLAY + x_value # Negative 'x', offset from right of overlay
-                else:
-                    x: int = x_value
-
-            y_center = fi.get('y_center', False)
-            y_value = int(fi['y'])
-            if self.is_modern_overlay:
-                if y_center:
-                    y: int = int(HEIGHT_OVERLAY / 2) + y_value   # Let EDMCModernOverlay plugin group handle vertically centering
-                elif y_value < 0:
-                    y: int = HEIGHT_OVERLAY # Let EDMCModernOverlay plugin group handle bottom offset
-                else:
-                    y: int = y_value
-            else:
-                if fi.get('y_center', False):
-                    y: int = int((HEIGHT_OVERLAY - message_height) / 2) + y_value # Vertically centred, offset by 'y' where 'y' can be negative
-                elif y_value < 0:
-                    y: int = HEIGHT_OVERLAY + y_value # Negative 'y', offset from bottom of overlay
-                else:
-                    y: int = y_value
+            frame: OverlayFrameLayout | None = self.get_frame(frame_name)
+            if frame is None: return False
+
+            layout: OverlayMessageLayout = self._get_message_layout(frame, message, title)
+            segments: list = layout.segments
+            message_width: int = layout.width
+            message_height: int = layout.height
+            ttl: int = ttl_override if ttl_override else frame.ttl
+            title_colour: str = title_colour_override if title_colour_override else frame.title_colour
+            text_colour: str = text_colour_override if text_colour_override else frame.text_colour
+            x, y = frame.get_position(message_width, message_height, self.is_modern_overlay)
 
             # Border. Only send if background shading isn't handled by EDMCModernOverlay.
-            if fi['border_colour'] and fi['fill_colour'] and not self.supports_modern_overlay_backgrounds:
-                self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", fi['border_colour'], fi['fill_colour'], x, y, message_width + 30 if fit_to_text else fi['w'], message_height + 10 if fit_to_text else fi['h'], ttl=ttl)
+            if frame.border_colour and frame.fill_colour and not self.supports_modern_overlay_backgrounds:
+                self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", frame.border_colour, frame.fill_colour, x, y, message_width + 30 if fit_to_text else frame.w, message_height + 10 if fit_to_text else frame.h, ttl=ttl)
 
             yoffset: int = 0
             index: int = 0
-            message_x: int = x if self.is_modern_overlay and x_center else x + 10 # Let EDMCModernOverlay handle centering via the plugin group definition.
+            message_x: int = x if self.is_modern_overlay and frame.x_center else x + 10 # Let EDMCModernOverlay handle centering via the plugin group definition.
 
             while index <= MAX_LINES_PER_PANEL:
                 if index < len(segments):
@@ -136,20 +189,21 @@ class Overlay:
                     else:
                         if index < MAX_LINES_PER_PANEL:
                             # Line has content
-                            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", segments[index], text_colour, message_x, y + 5 + yoffset, ttl=ttl, size=fi['text_size'])
+                            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", segments[index], text_colour, message_x, y + 5 + yoffset, ttl=ttl, size=frame.text_size)
                         else:
                             # Last line
-                            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", "[...]", text_colour, message_x, y + 5 + yoffset, ttl=ttl, size=fi['text_size'])
+                            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", "[...]", text_colour, message_x, y + 5 + yoffset, ttl=ttl, size=frame.text_size)
 
                         yoffset += HEIGHT_CHARACTER_NORMAL
                 else:
                     # Unused line, clear
-                    self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", "", text_colour, message_x, y + 5 + yoffset, ttl=ttl, size=fi['text_size'])
+                    self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", "", text_colour, message_x, y + 5 + yoffset, ttl=ttl, size=frame.text_size)
                     yoffset += HEIGHT_CHARACTER_NORMAL
 
                 index += 1
 
             self.problem_displaying = False
+            return True
 
         except Exception as e:
             if not self.problem_displaying:
@@ -157,6 +211,102 @@ class Overlay:
                 self.problem_displaying = True
                 Debug.logger.warning(f"Could not display overlay message", exc_info=e)
 
+            return False
+
+
+    def get_frame_ttl(self, frame_name: str) -> int:
+        """Get the configured time to live for messages in a frame
+
+        Args:
+            frame_name (str): The frame name
+
+        Returns:
+            int: The time to live in seconds, or 0 if the frame doesn't exist
+        """
+        frame: OverlayFrameLayout | None = self.get_frame(frame_name)
+        return frame.ttl if frame is not None else 0
+
+
+    def load_frames(self):
+        """
+        Parse the configuration for all overlay frames. Must be called again if the overlay configuration changes.
+        """
+        frames: dict[str, OverlayFrameLayout] = {}
+
+        for frame_name in self.bgstally.config.overlay_frame_names():
+            frame: OverlayFrameLayout | None = self._load_frame(frame_name)
+            if frame is not None: frames[frame_name] = frame
+
+        self.frames = frames
+        with self._wrapped_lock:
+            self.wrapped.clear()
+
+
+    def get_frame(self, frame_name: str) -> OverlayFrameLayout | None:
+        """Get the layout for an overlay frame
+
+        Args:
+            frame_name (str): The frame name
+
+        Returns:
+            OverlayFrameLayout | None: The layout, or None if the frame isn't configured
+        """
+        frame: OverlayFrameLayout | None = self.frames.get(frame_name)
+        if frame is None:
+            # Not configured when the frames were loaded, check the config again so the error is logged
+            frame = self._load_frame(frame_name)
+            if frame is not None: self.frames[frame_name] = frame
+
+        return frame
+
+
+    def _load_frame(self, frame_name: str) -> OverlayFrameLayout | None:
+        """Parse the configuration for an overlay frame
+
+        Args:
+            frame_name (str): The frame name
+
+        Returns:
+            OverlayFrameLayout | None: The layout, or None if the frame isn't configured or its configuration is invalid
+        """
+        fi: dict | None = self.bgstally.config.overlay_frame(frame_name)
+        if fi is None: return None
+
+        try:
+            return OverlayFrameLayout(frame_name, fi)
+        except Exception as e:
+            Debug.logger.warning(f"Invalid configuration for overlay frame '{frame_name}'", exc_info=e)
+            return None
+
+
+    def _get_message_layout(self, frame: OverlayFrameLayout, message: str, title: str | None) -> OverlayMessageLayout:
+        """Get a message wrapped into lines for a frame, from the cache if it has been displayed recently
+
+        Args:
+            frame (OverlayFrameLayout): The frame
+            message (str): The message
+            title (str | None): The title, if any
+
+        Returns:
+            OverlayMessageLayout: The wrapped message
+        """
+        key: tuple = (frame.name, message, title)
+
+        with self._wrapped_lock:
+            layout: OverlayMessageLayout | None = self.wrapped.get(key)
+            if layout is not None:
+                self.wrapped.move_to_end(key)
+                return layout
+
+        layout = OverlayMessageLayout(frame, message, title)
+
+        with self._wrapped_lock:
+            self.wrapped[key] = layout
+            while len(self.wrapped) > WRAP_CACHE_SIZE:
+                self.wrapped.popitem(last=False)
+
+        return layout
+
 
     def display_indicator(self, frame_name: str, ttl_override: int = None, fill_colour_override: str = None, border_colour_override: str = None):
         """
@@ -166,13 +316,13 @@ class Overlay:
         if not self.bgstally.state.enable_overlay: return
 
         try:
-            fi: dict | None = self.bgstally.config.overlay_frame(frame_name)
-            if fi is None: return
+            frame: OverlayFrameLayout | None = self.get_frame(frame_name)
+            if frame is None: return
 
-            ttl: int = ttl_override if ttl_override else int(fi['ttl'])
-            fill_colour: str = fill_colour_override if fill_colour_override else fi['fill_colour']
-            border_colour: str = border_colour_override if border_colour_override else fi['border_colour']
-            self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", border_colour, fill_colour, int(fi['x']), int(fi['y']), int(fi['w']), int(fi['h']), ttl=ttl)
+            ttl: int = ttl_override if ttl_override else frame.ttl
+            fill_colour: str = fill_colour_override if fill_colour_override else frame.fill_colour
+            border_colour: str = border_colour_override if border_colour_override else frame.border_colour
+            self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", border_colour, fill_colour, frame.x, frame.y, frame.w, frame.h, ttl=ttl)
 
             self.problem_displaying = False
 
@@ -191,18 +341,18 @@ class Overlay:
         if not self.bgstally.state.enable_overlay: return
 
         try:
-            fi: dict | None = self.bgstally.config.overlay_frame(frame_name)
-            if fi is None: return
+            frame: OverlayFrameLayout | None = self.get_frame(frame_name)
+            if frame is None: return
 
-            ttl: int = ttl_override if ttl_override else int(fi['ttl'])
-            bar_width: int = int(int(fi['w']) * progress)
+            ttl: int = ttl_override if ttl_override else frame.ttl
+            bar_width: int = int(frame.w * progress)
             bar_height: int = 10
 
             #vect:list = [{'x':int(cx+(coords['x']*hw)), 'y':int(cy-(coords['y']*hh))]
 
-            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}", message, fi['text_colour'], int(fi['x']) + 10, int(fi['y']) + 5, ttl=ttl, size=fi['text_size'])
-            self.edmcoverlay.send_shape(f"bgstally-bar-{frame_name}", "rect", "#ffffff", fi['fill_colour'], int(fi['x']) + 10, int(fi['y']) + 20, bar_width, bar_height, ttl=ttl)
-            self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", "#ffffff", fi['border_colour'], int(fi['x']) + 10 + bar_width, int(fi['y']) + 20, int(fi['w']) - bar_width, bar_height, ttl=ttl)
+            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}", message, frame.text_colour, frame.x + 10, frame.y + 5, ttl=ttl, size=frame.text_size)
+            self.edmcoverlay.send_shape(f"bgstally-bar-{frame_name}", "rect", "#ffffff", frame.fill_colour, frame.x + 10, frame.y + 20, bar_width, bar_height, ttl=ttl)
+            self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", "#ffffff", frame.border_colour, frame.x + 10 + bar_width, frame.y + 20, frame.w - bar_width, bar_height, ttl=ttl)
 
             self.problem_displaying = False
 
@@ -271,14 +421,14 @@ class Overlay:
             if frame_name in progress_bar_frames:
                 base_id_prefixes.append(f"bgstally-bar-{frame_name}")
 
-            fi: dict | None = self.bgstally.config.overlay_frame(frame_name)
-            if fi is not None:
-                background_color = fi['fill_colour']
-                background_border_color = fi['border_colour']
-                justification = fi.get("justification", "left")
-                anchor = fi.get("anchor", "nw")
-                x_center = fi.get("x_center", False)
-                y_center = fi.get("y_center", False)
+            frame: OverlayFrameLayout | None = self.get_frame(frame_name)
+            if frame is not None:
+                background_color = frame.fill_colour
+                background_border_color = frame.border_colour
+                justification = frame.justification
+                anchor = frame.anchor
+                x_center = frame.x_center
+                y_center = frame.y_center
 
                 # Make anchor assumptions based on x_center and y_center configs
                 if x_center and y_center:
@@ -428,3 +578,74 @@ class Overlay:
             return False
 
         return True
+
+
+class OverlayPanel:
+    """
+    A message frame on the overlay that is refreshed periodically. Each panel declares the inputs its text is built from,
+    and the text is only rebuilt when those inputs change. The message is only sent to the overlay when the text has
+    changed, or the previous message is about to expire.
+    """
+    def __init__(self, overlay: Overlay, frame_name: str, render: Callable[[], dict | None], inputs: Callable[[], Hashable] | None = None, refresh_margin_s: float = 0):
+        """Constructor
+
+        Args:
+            overlay (Overlay): The overlay
+            frame_name (str): The overlay frame to display the panel in
+            render (Callable[[], dict | None]): Builds the panel, returning the keyword arguments for Overlay.display_message(), or None if there is nothing to display
+            inputs (Callable[[], Hashable] | None, optional): Returns a value that changes whenever the rendered panel would change. Defaults to None, to render the panel on every update.
+            refresh_margin_s (float, optional): Resend the message this long before it expires, usually the update period. Defaults to 0.
+        """
+        self.overlay: Overlay = overlay
+        self.frame_name: str = frame_name
+        self.render: Callable[[], dict | None] = render
+        self.inputs: Callable[[], Hashable] | None = inputs
+        self.refresh_margin_s: float = refresh_margin_s
+
+        self.version: int = 0 # Incremented every time the rendered panel changes
+        self.renders: int = 0 # The number of times the panel has been rendered
+        self.sends: int = 0 # The number of times the panel has been sent to the overlay
+
+        self._inputs_key: Hashable = None
+        self._rendered: dict | None = None
+        self._sent_version: int | None = None
+        self._expires: float = 0
+
+
+    def update(self) -> bool:
+        """Rebuild the panel if its inputs have changed, and send it to the overlay if it has changed or is about to expire
+
+        Returns:
+            bool: True if the panel was sent to the overlay
+        """
+        key: Hashable = self.inputs() if self.inputs is not None else None
+
+        if self.inputs is None or key != self._inputs_key or self.renders == 0:
+            rendered: dict | None = self.render()
+            if rendered is not None and rendered.get('message', "") == "": rendered = None
+            self.renders += 1
+            self._inputs_key = key
+
+            if rendered != self._rendered:
+                self._rendered = rendered
+                self.version += 1
+
+        if self._rendered is None: return False
+
+        now: float = monotonic()
+        if self._sent_version == self.version and now < self._expires - self.refresh_margin_s: return False
+
+        if not self.overlay.display_message(self.frame_name, **self._rendered): return False
+
+        ttl: int = self._rendered.get('ttl_override') or self.overlay.get_frame_ttl(self.frame_name)
+        self._sent_version = self.version
+        self._expires = now + ttl
+        self.sends += 1
+        return True
+
+
+    def invalidate(self):
+        """
+        Force the panel to be sent on the next update, e.g. because another message has been displayed in the same frame
+        """
+        self._sent_version = None
@@ -0,0 +1,264 @@
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.constants import DataStore
+from bgstally.debug import Debug
+from bgstally.profiler import EVENT_TYPE_SAVE
+from config import config
+
+TIME_COALESCE_WINDOW_S = 5
+TIME_SNAPSHOT_POLL_S = 0.5 # How often the worker checks for shutdown while waiting for the main thread to take snapshots
+
+
+class PersistenceStore:
+    """
+    A single registered data store, with its snapshot and write functions and write statistics
+    """
+    def __init__(self, name: DataStore, snapshot_function: Callable[[], Any], write_function: Callable[[Any], None]):
+        self.name: DataStore = name
+        self.snapshot_function: Callable[[], Any] = snapshot_function
+        self.write_function: Callable[[Any], None] = write_function
+        self.dirty: bool = False
+        self.writes: int = 0
+        self.writes_avoided: int = 0
+        self.time_spent_s: float = 0.0
+
+
+class PersistenceManager:
+    """
+    Handles selective, coalesced saving of plugin data. Managers register their stores once and then mark
+    them dirty whenever their data changes. A background worker waits for changes, lets further changes
+    accumulate for a short window, and then writes only the stores that actually changed.
+
+    Data is changed on the main thread, so each store is saved in two steps: a cheap snapshot (a copy of the data)
+    is taken on the main thread, and the snapshot is then encoded and written to disk by the worker.
+    """
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+        self.stores: dict[DataStore, PersistenceStore] = {}
+        self.coalesce_window_s: float = self._get_coalesce_window()
+
+        self._lock: Lock = Lock()        # Protects dirty flags and statistics
+        self._write_lock: Lock = Lock()  # Ensures a store is never written by two threads at once
+        self._changed: Event = Event()
+        self._stopping: bool = False
+
+        self.thread: Thread = Thread(target=self._worker, name="BGSTally Persistence worker")
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def register(self, name: DataStore, snapshot_function: Callable[[], Any], write_function: Callable[[Any], None]) -> None:
+        """Register a data store
+
+        Args:
+            name (DataStore): The store
+            snapshot_function (Callable[[], Any]): Called on the main thread to take a copy of the data to save. This should be cheap, with no encoding or I/O.
+            write_function (Callable[[Any], None]): Called with a snapshot, normally on the persistence worker, to encode it and write it to disk
+        """
+        with self._lock:
+            self.stores[name] = PersistenceStore(name, snapshot_function, write_function)
+
+
+    def mark_dirty(self, *names: DataStore) -> None:
+        """Flag one or more stores as changed, so they will be written on the next flush
+
+        Args:
+            *names (DataStore): The stores to mark
+        """
+        with self._lock:
+            for name in names:
+                store: PersistenceStore | None = self.stores.get(name)
+                if store is None:
+                    Debug.logger.warning(f"Tried to mark unregistered persistence store '{name.value}' as dirty")
+                    continue
+
+                if store.dirty:
+                    # Already waiting to be written, so this change is coalesced into the pending write
+                    store.writes_avoided += 1
+                else:
+                    store.dirty = True
+
+        self._changed.set()
+
+
+    def flush(self, name: DataStore | None = None, force: bool = False) -> None:
+        """Synchronously snapshot and write dirty stores. Must be called from the main thread.
+
+        Args:
+            name (DataStore | None, optional): Only flush this store. Defaults to None, which flushes all stores.
+            force (bool, optional): Write the store(s) even if they are not marked dirty. Defaults to False.
+        """
+        with self._lock:
+            if name is None:
+                stores: list[PersistenceStore] = list(self.stores.values())
+            elif name in self.stores:
+                stores = [self.stores[name]]
+            else:
+                stores = []
+
+        for store, snapshot in self._take_snapshots(stores, force):
+            self._write(store, snapshot)
+
+
+    def shut_down(self) -> None:
+        """
+        Shutdown barrier. Stop the background worker, wait for any in-progress write and then write every
+        store synchronously so nothing is lost on exit.
+        """
+        self._stopping = True
+        self._changed.set()
+        if self.thread.is_alive(): self.thread.join(timeout=self.coalesce_window_s + 5)
+
+        self.flush(force=True)
+
+        stats: dict = self.get_stats()
+        Debug.logger.info(f"Persistence: {stats['writes']} writes, {stats['writes_avoided']} writes avoided, {stats['time_spent_s']:.3f}s spent writing")
+
+
+    def get_stats(self) -> dict:
+        """Get statistics on writes performed, writes avoided by coalescing and time spent writing
+
+        Returns:
+            dict: Totals, plus a 'stores' key containing the statistics for each individual store
+        """
+        with self._lock:
+            stores: dict = {store.name.value: {'writes': store.writes,
+                                               'writes_avoided': store.writes_avoided,
+                                               'time_spent_s': store.time_spent_s,
+                                               'dirty': store.dirty} for store in self.stores.values()}
+
+        return {'writes': sum(s['writes'] for s in stores.values()),
+                'writes_avoided': sum(s['writes_avoided'] for s in stores.values()),
+                'time_spent_s': sum(s['time_spent_s'] for s in stores.values()),
+                'stores': stores}
+
+
+    def _take_snapshots(self, stores: list[PersistenceStore], force: bool = False) -> list[tuple[PersistenceStore, Any]]:
+        """Take snapshots of stores that are dirty. Must be called from the main thread.
+
+        Args:
+            stores (list[PersistenceStore]): The stores
+            force (bool, optional): Take snapshots of the stores even if they are not dirty. Defaults to False.
+
+        Returns:
+            list[tuple[PersistenceStore, Any]]: Each store with its snapshot, ready to write
+        """
+        snapshots: list[tuple[PersistenceStore, Any]] = []
+
+        for store in stores:
+            with self._lock:
+                if not store.dirty and not force: continue
+                # Clear the flag before taking the snapshot, so any change made afterwards is picked up next time
+                store.dirty = False
+
+            try:
+                snapshots.append((store, store.snapshot_function()))
+            except Exception as e:
+                Debug.logger.error(f"Unable to take snapshot of persistence store '{store.name.value}'", exc_info=e)
+                with self._lock: store.dirty = True
+
+        return snapshots
+
+
+    def _write(self, store: PersistenceStore, snapshot: Any) -> None:
+        """Write a snapshot of a single store
+
+        Args:
+            store (PersistenceStore): The store to write
+            snapshot (Any): The snapshot taken from the store
+        """
+        with self._write_lock:
+            start: float = perf_counter()
+            try:
+                store.write_function(snapshot)
+            except Exception as e:
+                Debug.logger.error(f"Unable to save persistence store '{store.name.value}'", exc_info=e)
+                with self._lock: store.dirty = True
+                return
+
+            duration_s: float = perf_counter() - start
+            with self._lock:
+                store.writes += 1
+                store.time_spent_s += duration_s
+
+            if self.bgstally.profiler.enabled: self.bgstally.profiler.record(EVENT_TYPE_SAVE, f"PersistenceManager.{store.name.value}", duration_s)
+
+
+    def _flush_background(self) -> None:
+        """
+        Write all dirty stores from the worker thread. The snapshots are taken on the main thread, and then
+        written here.
+        """
+        with self._lock:
+            stores: list[PersistenceStore] = [store for store in self.stores.values() if store.dirty]
+
+        ui = getattr(self.bgstally, 'ui', None)
+        # Without a UI there is no main thread loop to take snapshots, so leave dirty for the next flush or shutdown
+        if stores == [] or ui is None or ui.frame is None: return
+
+        snapshots: list[tuple[PersistenceStore, Any]] = []
+        taken: Event = Event()
+        ui.frame.after(0, self._take_background_snapshots, stores, snapshots, taken)
+
+        while not taken.wait(TIME_SNAPSHOT_POLL_S):
+            # If we are shutting down, the snapshots are never taken and all stores are written by the shutdown barrier
+            if (config.shutting_down or self._stopping) and not taken.is_set(): return
+
+        for store, snapshot in snapshots:
+            self._write(store, snapshot)
+
+
+    def _take_background_snapshots(self, stores: list[PersistenceStore], snapshots: list, taken: Event) -> None:
+        """Take snapshots for the background worker. Runs on the main thread.
+
+        Args:
+            stores (list[PersistenceStore]): The stores
+            snapshots (list): Filled with each store and its snapshot
+            taken (Event): Set once the snapshots have been taken
+        """
+        if self._stopping: return
+
+        snapshots.extend(self._take_snapshots(stores))
+        taken.set()
+
+
+    def _get_coalesce_window(self) -> float:
+        """Fetch the coalescing window from config, falling back to the default
+
+        Returns:
+            float: The number of seconds to wait for further changes before writing
+        """
+        try:
+            return self.bgstally.config.persistence().getfloat('coalesce_window', TIME_COALESCE_WINDOW_S)
+        except Exception:
+            return TIME_COALESCE_WINDOW_S
+
+
+    def _worker(self) -> None:
+        """
+        Handle persistence thread work
+        """
+        Debug.logger.debug("Starting Persistence Worker...")
+
+        while True:
+            # Block until something changes, no polling
+            self._changed.wait()
+
+            if config.shutting_down or self._stopping:
+                Debug.logger.debug("Shutting down Persistence Worker...")
+                return
+
+            # Let further changes accumulate so bursts of events result in a single write per store
+            sleep(self.coalesce_window_s)
+            self._changed.clear()
+
+            if config.shutting_down or self._stopping:
+                Debug.logger.debug("Shutting down Persistence Worker...")
+                return
+
+            self._flush_background()
@@ -0,0 +1,220 @@
+import csv
+import json
+from collections import deque
+from math import ceil
+from threading import Lock
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.debug import Debug
+
+PROFILER_SAMPLES_DEFAULT = 1000
+HISTOGRAM_BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500]
+HANDLER_TOTAL = "journal_entry"
+EVENT_TYPE_SAVE = "(save)"
+
+
+class ProfileStats:
+    """
+    Timing statistics for a single handler processing a single event type. The most recent samples are kept
+    in a rolling window for percentiles and the histogram, the count, total and max cover the whole session.
+    """
+    def __init__(self, event_type: str, handler: str, max_samples: int = PROFILER_SAMPLES_DEFAULT):
+        self.event_type: str = event_type
+        self.handler: str = handler
+        self.samples: deque[float] = deque(maxlen=max_samples)
+        self.count: int = 0
+        self.total_s: float = 0.0
+        self.max_s: float = 0.0
+
+
+    def record(self, duration_s: float) -> None:
+        """Record a single timing
+
+        Args:
+            duration_s (float): The time taken, in seconds
+        """
+        self.samples.append(duration_s)
+        self.count += 1
+        self.total_s += duration_s
+        if duration_s > self.max_s: self.max_s = duration_s
+
+
+    def percentile(self, pct: float) -> float:
+        """Get a percentile of the rolling window, using the nearest-rank method
+
+        Args:
+            pct (float): The percentile, 0 - 100
+
+        Returns:
+            float: The time in seconds, or 0 if there are no samples
+        """
+        if len(self.samples) == 0: return 0.0
+        ordered: list[float] = sorted(self.samples)
+        return ordered[max(0, ceil(pct / 100 * len(ordered)) - 1)]
+
+
+    def histogram(self) -> list[int]:
+        """Get the rolling window as a histogram
+
+        Returns:
+            list[int]: The number of samples in each bucket of HISTOGRAM_BUCKETS_MS, plus a final bucket for anything slower
+        """
+        result: list[int] = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for sample in self.samples:
+            sample_ms: float = sample * 1000
+            bucket: int = next((i for i, limit in enumerate(HISTOGRAM_BUCKETS_MS) if sample_ms <= limit), len(HISTOGRAM_BUCKETS_MS))
+            result[bucket] += 1
+
+        return result
+
+
+    def as_dict(self) -> dict:
+        """Get the statistics as a dict, with times in milliseconds
+
+        Returns:
+            dict: The statistics
+        """
+        return {'event_type': self.event_type,
+                'handler': self.handler,
+                'count': self.count,
+                'mean_ms': round(self.total_s / self.count * 1000, 4) if self.count > 0 else 0.0,
+                'p50_ms': round(self.percentile(50) * 1000, 4),
+                'p99_ms': round(self.percentile(99) * 1000, 4),
+                'max_ms': round(self.max_s * 1000, 4),
+                'histogram': self.histogram()}
+
+
+class Profiler:
+    """
+    Optional instrumentation for the journal hot path. When enabled, records the wall time spent handling each
+    event type, broken down by the handler that was called. When disabled, nothing is wrapped or timed.
+    """
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+        self.stats: dict[tuple[str, str], ProfileStats] = {}
+        self.enabled: bool = False
+        self.max_samples: int = PROFILER_SAMPLES_DEFAULT
+        self._lock: Lock = Lock()
+
+        try:
+            profiler_config = self.bgstally.config.profiler()
+            self.enabled = profiler_config.getboolean('enabled', False)
+            self.max_samples = profiler_config.getint('samples', PROFILER_SAMPLES_DEFAULT)
+        except Exception:
+            pass
+
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Switch profiling on or off
+
+        Args:
+            enabled (bool): True to start profiling
+        """
+        self.enabled = enabled
+        Debug.logger.info(f"Profiling {'enabled' if enabled else 'disabled'}")
+
+
+    def wrap(self, target: Any, name: str, event_type: str) -> Any:
+        """Wrap an object so that calls to its methods are timed against an event type
+
+        Args:
+            target (Any): The object to wrap
+            name (str): The name to record calls against, the method name is appended
+            event_type (str): The event type being handled
+
+        Returns:
+            Any: A timing proxy for the object, or the object itself if profiling is disabled
+        """
+        if not self.enabled or target is None: return target
+        return _ProfiledTarget(self, target, name, event_type)
+
+
+    def record(self, event_type: str, handler: str, duration_s: float) -> None:
+        """Record a single timing
+
+        Args:
+            event_type (str): The event type being handled
+            handler (str): The handler that was timed
+            duration_s (float): The time taken, in seconds
+        """
+        with self._lock:
+            stats: ProfileStats | None = self.stats.get((event_type, handler))
+            if stats is None:
+                stats = ProfileStats(event_type, handler, self.max_samples)
+                self.stats[(event_type, handler)] = stats
+            stats.record(duration_s)
+
+
+    def reset(self) -> None:
+        """
+        Clear all recorded timings
+        """
+        with self._lock:
+            self.stats = {}
+
+
+    def get_stats(self) -> list[dict]:
+        """Get a snapshot of all statistics, slowest mean first
+
+        Returns:
+            list[dict]: The statistics for each event type and handler
+        """
+        with self._lock:
+            result: list[dict] = [stats.as_dict() for stats in self.stats.values()]
+
+        return sorted(result, key=lambda s: s['mean_ms'], reverse=True)
+
+
+    def dump_json(self, filepath: str) -> None:
+        """Write all statistics to a JSON file
+
+        Args:
+            filepath (str): The file to write
+        """
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json.dump({'histogram_buckets_ms': HISTOGRAM_BUCKETS_MS, 'stats': self.get_stats(), 'memory': self.bgstally.state.get_memory_stats()}, file, indent=4)
+
+
+    def dump_csv(self, filepath: str) -> None:
+        """Write all statistics to a CSV file, with one column per histogram bucket
+
+        Args:
+            filepath (str): The file to write
+        """
+        bucket_titles: list[str] = [f"<={limit}ms" for limit in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+
+        with open(filepath, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['event_type', 'handler', 'count', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms'] + bucket_titles)
+            for stats in self.get_stats():
+                writer.writerow([stats['event_type'], stats['handler'], stats['count'], stats['mean_ms'],
+                                 stats['p50_ms'], stats['p99_ms'], stats['max_ms']] + stats['histogram'])
+
+
+class _ProfiledTarget:
+    """
+    Proxy that times every method call made on the wrapped object
+    """
+    def __init__(self, profiler: Profiler, target: Any, name: str, event_type: str):
+        self._profiler: Profiler = profiler
+        self._target: Any = target
+        self._name: str = name
+        self._event_type: str = event_type
+
+
+    def __getattr__(self, attr: str) -> Any:
+        value: Any = getattr(self._target, attr)
+        if not callable(value): return value
+
+        def timed(*args, **kwargs) -> Any:
+            start: float = perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                self._profiler.record(self._event_type, f"{self._name}.{attr}", perf_counter() - start)
+
+        return timed
@@ -1,15 +1,15 @@
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 import re
 import time
 from functools import partial
-import requests
+from threading import Lock
 from requests import Response
 from typing import TYPE_CHECKING
 
 from bgstally.constants import RequestMethod, BuildState
 from bgstally.requestmanager import BGSTallyRequest
 from bgstally.debug import Debug
-from bgstally.utils import _, get_by_path, catch_exceptions
+from bgstally.utils import _, get_by_path, catch_exceptions, copy_json
 
 if TYPE_CHECKING:
     from colonisation import Colonisation
@@ -17,7 +17,6 @@ if TYPE_CHECKING:
 
 RC_API = 'https://ravencolonial100-awcbdvabgze4c5cq.canadacentral-01.azurewebsites.net/api'
 RC_COOLDOWN = 30
-TIMEOUT=10
 
 EDSM_BODIES = 'https://www.edsm.net/api-system-v1/bodies?systemName='
 EDSM_STATIONS = 'https://www.edsm.net/api-system-v1/stations?systemName='
@@ -26,13 +25,117 @@ EDSM_COOLDOWN = (3600 * 24)
 
 SPANSH_API = 'https://spansh.co.uk/api'
 SPANSH_COOLDOWN = (3600 * 24)
+
+CACHE_ENTRIES_MAX = 100
+LOOKUP_CONCURRENCY = 2 # EDSM and Spansh are only used for independent lookups, so more than one can be in progress at a time
+
+
+class CachedResponse:
+    """
+    A response answered from the ServiceClient cache. Only the parsed body is kept, and each caller gets its own copy of it
+    """
+    def __init__(self, etag:str, body:dict|list):
+        self.status_code:int = 200
+        self.reason:str = "OK"
+        self.headers:dict = {'ETag': etag}
+        self.content:bytes = b''
+        self._body:dict|list = body
+
+
+    def json(self) -> dict|list:
+        return copy_json(self._body)
+
+
+class ServiceClient:
+    """
+    Sends requests to RavenColonial, EDSM and Spansh through the request manager so that they never block EDMC.
+
+    Identical GET requests that are already in flight are sent once, with every caller's callback run when the response
+    arrives. GET responses that carry an ETag have their parsed body cached and are revalidated with If-None-Match, so an
+    unchanged resource is answered from the cache.
+
+    Callbacks update the colonisation windows, so they are always run on the main thread.
+    """
+    def __init__(self, bgstally:'BGSTally'):
+        self.bgstally:BGSTally = bgstally
+        self._pending:dict[str, list[callable]] = {} # In flight GET requests, keyed by URL, with their callbacks
+        self._cache:dict[str, tuple[str, dict|list]] = {} # ETag and parsed body, keyed by URL
+        self._lock:Lock = Lock()
+
+        for url in [EDSM_SYSTEM, SPANSH_API]:
+            self.bgstally.request_manager.set_host_concurrency(urlparse(url).netloc, LOOKUP_CONCURRENCY)
+
+
+    def request(self, url:str, method:RequestMethod, callback:callable = None, headers:dict = {}, payload:dict|list|None = None) -> None:
+        """Queue a request. The callback is called on the main thread with (success, response, request) when the response arrives.
+
+        Args:
+            url (str): The URL to call
+            method (RequestMethod): The request method
+            callback (callable, optional): The function to call with the response. Defaults to None.
+            headers (dict, optional): Request headers. Defaults to {}.
+            payload (dict|list|None, optional): JSON payload for requests that send data. Defaults to None.
+        """
+        if method != RequestMethod.GET:
+            if callback is not None: callback = partial(self._main_thread, callback)
+            self.bgstally.request_manager.queue_request(url, method, callback=callback, headers=headers, payload=payload)
+            return
+
+        with self._lock:
+            if url in self._pending:
+                Debug.logger.debug(f"Request for {url} already in flight, waiting for its response")
+                if callback is not None: self._pending[url].append(callback)
+                return
+            self._pending[url] = [callback] if callback is not None else []
+            cached:tuple|None = self._cache.get(url)
+
+        if cached is not None:
+            headers = headers | {'If-None-Match': cached[0]}
+
+        self.bgstally.request_manager.queue_request(url, method, callback=partial(self._response, url), headers=headers)
+
+
+    def _response(self, url:str, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """
+        Handle the response to a GET request, update the cache and pass it to everyone waiting for it
+        """
+        with self._lock:
+            callbacks:list[callable] = self._pending.pop(url, [])
+
+            if response is not None and response.status_code == 304 and url in self._cache:
+                Debug.logger.debug(f"{url} not modified, using cached response")
+                response = CachedResponse(*self._cache[url])
+            elif success and response.headers.get('ETag') is not None:
+                self._cache.pop(url, None)
+                try:
+                    self._cache[url] = (response.headers['ETag'], response.json())
+                except ValueError:
+                    Debug.logger.debug(f"{url} response isn't JSON, not caching it")
+                if len(self._cache) > CACHE_ENTRIES_MAX: self._cache.pop(next(iter(self._cache)))
+
+        for callback in callbacks:
+            self._main_thread(callback, success, response, request)
+
+
+    def _main_thread(self, callback:callable, success:bool, response:Response|CachedResponse, request:BGSTallyRequest) -> None:
+        """
+        Run a callback on the main thread, or straight away if the UI isn't there to schedule it
+        """
+        ui = getattr(self.bgstally, 'ui', None)
+        if ui is not None and ui.frame is not None:
+            ui.frame.after(0, callback, success, response, request)
+        else:
+            callback(success, response, request)
+
+
 class RavenColonial:
     """
     Class to handle all the data syncing between the colonisation system and RavenColonial.com. It also handles retrieving
     system and body data from Spansh/EDSM as required
 
     It syncs systems and sites, projects, contributions and fleet carrier cargo.
-    Many requests are queued to the request manager to avoid blocking EDMC but some are done synchronously where appropriate.
+    All requests are queued through a ServiceClient so they don't block EDMC, and the colonisation windows update as the
+    responses arrive.
     """
     _instance = None
 
@@ -106,7 +209,9 @@ class RavenColonial:
             "appDevelopment": 'True'
         }
 
+        self.client:ServiceClient = ServiceClient(self.bgstally)
         self._cache:dict = {} # Cache of responses and response times used to reduce API calls
+        self._creating:set = set() # MarketIDs of projects currently being created
         self._initialized = True
 
 
@@ -132,8 +237,8 @@ class RavenColonial:
 
 
     @catch_exceptions
-    def load_system(self, id64:str|None = None, rev:str|None = None, sync:bool = False) -> None:
-        """ Retrieve the rcdata data with the latest system data from RC when we start. """
+    def load_system(self, id64:str|None = None, rev:str|None = None) -> None:
+        """ Retrieve the rcdata data with the latest system data from RC. The system is merged when the response arrives. """
 
         # Implement cooldown and revision tracking
         if self._cache.get(id64, None) == None: self._cache[id64] = {}
@@ -152,12 +257,7 @@ class RavenColonial:
         #data:dict = response.json()
 
         url:str = f"{RC_API}/v2/system/{id64}"
-        if sync == True:  # For requested refreshes only
-            response:Response = requests.get(url, headers=self._headers(), timeout=TIMEOUT)
-            self._load_callback(response.status_code == 200, response)
-            return
-
-        self.bgstally.request_manager.queue_request(url, RequestMethod.GET, headers=self._headers(), callback=self._load_callback)
+        self.client.request(url, RequestMethod.GET, headers=self._headers(), callback=self._load_callback)
 
 
     @catch_exceptions
@@ -171,24 +271,44 @@ class RavenColonial:
         system_name:str = system.get('StarSystem', '')
         # Query the system to see if it exists
         url:str = f"{RC_API}/v2/system/{quote(system_name)}"
-        response:Response = requests.get(url, headers=self._headers(), timeout=TIMEOUT)
+        self.client.request(url, RequestMethod.GET, headers=self._headers(), callback=partial(self._upsert_system_callback, system))
+
+
+    @catch_exceptions
+    def _upsert_system_callback(self, system:dict, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of querying RavenColonial for a system we're upserting """
+        system_name:str = system.get('StarSystem', '')
 
         # Add a new system to RavenColonial
-        if response.status_code == 404:
+        if response != None and response.status_code == 404:
             url:str = f"{RC_API}/v2/system/{quote(system_name)}/import/"
-            response:Response = requests.post(url, headers=self._headers(), timeout=TIMEOUT)
+            self.client.request(url, RequestMethod.POST, headers=self._headers(), callback=partial(self._import_system_callback, system))
+            return
 
-            if response.status_code != 200:
-                Debug.logger.error(f"Failed to import system {system_name}: {response.status_code}")
-                return
+        if success == False:
+            Debug.logger.error(f"Failed to query system {system_name}: {response}")
+            return
 
-            # Add Builds since (despite the url including /sites) upsert_system only deals with the system not the sites
-            for b in system.get('Builds', []):
-                self.upsert_site(system, b)
+        self._put_system(system, response.json())
 
 
-        # Either the data from the original GET or the data from the import.
-        data:dict = response.json()
+    @catch_exceptions
+    def _import_system_callback(self, system:dict, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of importing a new system into RavenColonial """
+        if success == False or response.status_code != 200:
+            Debug.logger.error(f"Failed to import system {system.get('StarSystem', '')}: {response}")
+            return
+
+        # Add Builds since (despite the url including /sites) upsert_system only deals with the system not the sites
+        for b in system.get('Builds', []):
+            self.upsert_site(system, b)
+
+        self._put_system(system, response.json())
+
+
+    def _put_system(self, system:dict, data:dict) -> None:
+        """ Send our system changes to RC, given its current data from either the original GET or the import """
+        system_name:str = system.get('StarSystem', '')
 
         # RC has updates since our last update so merge RC data (either from the original get or from the import) with system data
         if system.get('Rev', 0) < data.get('rev'):
@@ -208,11 +328,18 @@ class RavenColonial:
         payload['architect'] = self.colonisation.cmdr if system.get('Architect', None) == None else system.get('Architect', '')
 
         url:str = f"{RC_API}/v2/system/{quote(system_name)}/sites"
-        response:Response = requests.put(url, json=payload, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code != 200:
-            Debug.logger.error(f"{url} {response} {response.content}")
+        self.client.request(url, RequestMethod.PUT, payload=payload, headers=self._headers(),
+                            callback=partial(self._response_callback, f"RavenColonial system upserted {system_name} {payload}"))
+
+
+    @catch_exceptions
+    def _response_callback(self, message:str, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Log the result of a request that we don't need any data back from """
+        if success == False or response.status_code not in [200, 202]:
+            Debug.logger.error(f"{request.endpoint} {response} {response.content if response != None else ''}")
+            return
 
-        Debug.logger.info(f"RavenColonial system upserted {system_name} {payload}")
+        Debug.logger.info(message)
 
 
     @catch_exceptions
@@ -224,13 +351,8 @@ class RavenColonial:
             return
 
         url:str = f"{RC_API}/project/{project_id}/complete"
-
-        response:Response = requests.post(url, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code not in [200, 202]:
-            Debug.logger.error(f"{url} {response} {response.content}")
-            return
-
-        Debug.logger.info(f"RavenColonial project completed {project_id}")
+        self.client.request(url, RequestMethod.POST, headers=self._headers(),
+                            callback=partial(self._response_callback, f"RavenColonial project completed {project_id}"))
 
 
     @catch_exceptions
@@ -242,13 +364,8 @@ class RavenColonial:
             return
 
         url:str = f"{RC_API}/project/{project_id}"
-
-        response:Response = requests.delete(url, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code not in [200, 202]:
-            Debug.logger.error(f"{url} {response} {response.content}")
-            return
-
-        Debug.logger.info(f"RavenColonial project deleted {project_id}")
+        self.client.request(url, RequestMethod.DELETE, headers=self._headers(),
+                            callback=partial(self._response_callback, f"RavenColonial project deleted {project_id}"))
 
 
     @catch_exceptions
@@ -262,6 +379,7 @@ class RavenColonial:
         # Create an ID if necessary
         if data.get('BuildID', None) == None:
             data['BuildID'] = self.colonisation._generate_buildid(data.get('MarketID', None))
+            self.colonisation._index_build(system, data)
 
         # Add a name since RC requires one at creation but not later
         if data.get('Name', None) == None:
@@ -279,11 +397,16 @@ class RavenColonial:
         payload:dict = {'update': [update], 'delete':[]}
 
         url:str = f"{RC_API}/v2/system/{system.get('SystemAddress')}/sites"
-        response:Response = requests.put(url, json=payload, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code != 200:
-            Debug.logger.error(f"{url} {response} {response.content}")
+        self.client.request(url, RequestMethod.PUT, payload=payload, headers=self._headers(), callback=partial(self._site_callback, system))
+        Debug.logger.debug(f"RavenColonial site upsert queued {data.get('Name', '')} {update}")
+
+
+    @catch_exceptions
+    def _site_callback(self, system:dict, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of modifying a site in RavenColonial """
+        if success == False:
+            Debug.logger.error(f"{request.endpoint} {response} {response.content if response != None else ''}")
 
-        Debug.logger.debug(f"RavenColonial site upserted {data.get('Name', '')} {update}")
         # Refresh the system info
         if system.get('SystemAddress', None) != None:
             self.load_system(system.get('SystemAddress', ''), system.get('Rev', 0))
@@ -305,11 +428,8 @@ class RavenColonial:
 
         payload:dict = {'update': [], 'delete':[build.get('BuildID')]}
         url:str = f"{RC_API}/v2/system/{system.get('SystemAddress')}/sites"
-        response:Response = requests.put(url, json=payload, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code != 200:
-            Debug.logger.error(f"{url} {self._headers()} {response} {response.content}")
-
-        Debug.logger.info(f"RavenColonial site removed {build.get('Name', '')}")
+        self.client.request(url, RequestMethod.PUT, payload=payload, headers=self._headers(),
+                            callback=partial(self._response_callback, f"RavenColonial site removed {build.get('Name', '')}"))
 
     @catch_exceptions
     def update_build_order(self, system:dict) -> None:
@@ -324,11 +444,8 @@ class RavenColonial:
             payload['orderIDs'].append(b.get('BuildID', None))
 
         url:str = f"{RC_API}/v2/system/{system.get('SystemAddress')}/sites"
-        response:Response = requests.put(url, json=payload, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code != 200:
-            Debug.logger.error(f"{url} {response} {response.content}")
-
-        Debug.logger.info(f"RavenColonial site order updated for system {system.get('StarSystem', '')}")
+        self.client.request(url, RequestMethod.PUT, payload=payload, headers=self._headers(),
+                            callback=partial(self._response_callback, f"RavenColonial site order updated for system {system.get('StarSystem', '')}"))
 
 
     def _merge_system_data(self, data:dict) -> None:
@@ -455,24 +572,35 @@ class RavenColonial:
 
 
     @catch_exceptions
-    def create_project(self, system:dict, build:dict, progress:dict) -> str|None:
-        """ Create a new project in RavenColonial """
+    def create_project(self, system:dict, build:dict, progress:dict) -> None:
+        """ Create a new project in RavenColonial. The project is updated with our progress once it has been created. """
 
         if self.is_editable() == False:
             Debug.logger.info("Not creating project in RavenColonial")
             return
 
+        if build.get('MarketID', None) in self._creating:
+            Debug.logger.debug(f"Project for {build.get('MarketID', None)} is already being created")
+            return
+        self._creating.add(build.get('MarketID', None))
+
         # Use /api/System/{systemAddress}/{marketid} to query for an existing project
-        # and return it if one exists already
+        # and use it if one exists already
         Debug.logger.debug(f"{system.get('SystemAddress', '')}")
         url:str = f"{RC_API}/system/{system.get('SystemAddress', '')}/{build.get('MarketID', '')}"
-        response:Response = requests.get(url, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code == 200:
+        self.client.request(url, RequestMethod.GET, headers=self._headers(), callback=partial(self._existing_project_callback, system, build, progress))
+
+
+    @catch_exceptions
+    def _existing_project_callback(self, system:dict, build:dict, progress:dict, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of querying RavenColonial for an existing project, creating one if there isn't """
+        if success == True:
             data:dict = response.json()
             projectid:str|None = data.get('buildId', None)
             if projectid != None:
                 Debug.logger.info(f"Project already exists in RavenColonial {projectid}")
-                return projectid
+                self._project_created(system, build, progress, projectid)
+                return
 
         payload:dict = {}
         for k, v in self.project_params.items():
@@ -494,32 +622,52 @@ class RavenColonial:
                 payload[k] = rcval
 
         url:str = f"{RC_API}/project/"
-        response:Response = requests.put(url, json=payload, headers=self._headers(), timeout=TIMEOUT)
+        self.client.request(url, RequestMethod.PUT, payload=payload, headers=self._headers(), callback=partial(self._create_project_callback, system, build, progress))
+
+
+    @catch_exceptions
+    def _create_project_callback(self, system:dict, build:dict, progress:dict, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of creating a project in RavenColonial and link it to us """
         projectid:str|None = None
 
-        if response.status_code in [200, 202]:
+        if response != None and response.status_code in [200, 202]:
             data:dict = response.json()
             projectid = data.get('buildId', None)
 
-        if response.status_code == 409:
+        if response != None and response.status_code == 409:
             # This probably only happens if someone's done something weird like deleting & recreating a build.
             projectid = build.get('ProjectID', None)
 
         if projectid == None:
-            Debug.logger.error(f"Project not found {response} {response.content}")
+            Debug.logger.error(f"Project not found {response} {response.content if response != None else ''}")
+            self._creating.discard(build.get('MarketID', None))
             return
 
         self.colonisation.update_progress(progress.get('MarketID', 0), {'ProjectID': projectid}, True)
 
         # Link the project to us.
         url:str = f"{RC_API}/project/{projectid}/link/{self.colonisation.cmdr}"
-        response:Response = requests.put(url, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code not in [200, 202]:
-            Debug.logger.error(f"{url} {response} {response.content}")
+        self.client.request(url, RequestMethod.PUT, headers=self._headers(), callback=partial(self._link_project_callback, system, build, progress, projectid))
+
+
+    @catch_exceptions
+    def _link_project_callback(self, system:dict, build:dict, progress:dict, projectid:str, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of linking a new project to us """
+        if success == False or response.status_code not in [200, 202]:
+            Debug.logger.error(f"{request.endpoint} {response} {response.content if response != None else ''}")
+            self._creating.discard(build.get('MarketID', None))
             return
 
         Debug.logger.info(f"RavenColonial project created {projectid}")
-        return projectid
+        self._project_created(system, build, progress, projectid)
+
+
+    def _project_created(self, system:dict, build:dict, progress:dict, projectid:str) -> None:
+        """ Record the project ID against our progress and send the progress to RavenColonial """
+        self._creating.discard(build.get('MarketID', None))
+        progress['ProjectID'] = projectid
+        self.colonisation._index_progress(progress)
+        self.upsert_project(system, build, progress)
 
 
     @catch_exceptions
@@ -530,13 +678,10 @@ class RavenColonial:
             Debug.logger.info("Not updating project in RavenColonial")
             return
 
-        # Create project if we don't have an id.
+        # Create project if we don't have an id, this will call us again once it exists.
         if progress.get('ProjectID', None) == None:
-            projectid:str|None = self.create_project(system, build, progress)
-            if projectid == None:
-                Debug.logger.error("Failed to create project in RavenColonial")
-                return
-            progress['ProjectID'] = projectid
+            self.create_project(system, build, progress)
+            return
 
         # Update project
         payload:dict = {}
@@ -558,7 +703,7 @@ class RavenColonial:
         self._cache[progress.get('ProjectID', '')] = payload
 
         url:str = f"{RC_API}/project/{progress.get('ProjectID')}"
-        self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, headers=self._headers(), callback=self._project_callback)
+        self.client.request(url, RequestMethod.PATCH, payload=payload, headers=self._headers(), callback=self._project_callback)
 
 
     @catch_exceptions
@@ -591,21 +736,27 @@ class RavenColonial:
 
         url:str = f"{RC_API}/project/poll"
         payload:list = [projectid]
-        response:Response = requests.post(url, headers=self._headers(), json=payload, timeout=10)
-        if response.status_code != 200:
-            Debug.logger.error(f"Error for {url} {response} {response.content}")
+        self.client.request(url, RequestMethod.POST, payload=payload, headers=self._headers(), callback=partial(self._poll_project_callback, progress))
+
+
+    @catch_exceptions
+    def _poll_project_callback(self, progress:dict, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of polling RavenColonial for a project's last update, loading it if it has changed """
+        if success == False or response.status_code != 200:
+            Debug.logger.error(f"Error for {request.endpoint} {response} {response.content if response != None else ''}")
             return
 
         if response.content == '0001-01-01T00:00:00+00:00':
             Debug.logger.error(f"Error with load project, doesn't exist")
             return
 
+        projectid:str = request.payload[0]
         data:dict = response.json()
         if re.sub(r"\.\d+\+00:00$", "Z", data[projectid]) == progress.get('Updated', ''):
             return
 
         url = f"{RC_API}/project/{projectid}"
-        self.bgstally.request_manager.queue_request(url, RequestMethod.GET, headers=self._headers(), callback=self._load_project_callback)
+        self.client.request(url, RequestMethod.GET, headers=self._headers(), callback=self._load_project_callback)
 
 
     @catch_exceptions
@@ -650,12 +801,8 @@ class RavenColonial:
 
         # Which of the following to use?
         url:str = f"{RC_API}/project/{project_id}/contribute/{self.colonisation.cmdr}"
-        response:Response = requests.post(url, json=payload, headers=self._headers(), timeout=TIMEOUT)
-        if response.status_code not in [200, 202]:
-            Debug.logger.error(f"{url} {response} {response.content}")
-            return
-
-        Debug.logger.debug(f"RavenColonial project contribution accepted {project_id}")
+        self.client.request(url, RequestMethod.POST, payload=payload, headers=self._headers(),
+                            callback=partial(self._response_callback, f"RavenColonial project contribution accepted {project_id}"))
 
 
     @catch_exceptions
@@ -667,7 +814,7 @@ class RavenColonial:
 
         payload:dict = {comm : cargo.get(comm, 0) for comm in self.bgstally.ui.commodities.keys()}
         url:str = f"{RC_API}/fc/{marketid}/cargo"
-        self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, headers=self._headers(), callback=self._carrier_callback)
+        self.client.request(url, RequestMethod.POST, payload=payload, headers=self._headers(), callback=self._carrier_callback)
         return
 
 
@@ -722,12 +869,15 @@ class EDSM:
             return
 
         url:str = f"{EDSM_STATIONS}{quote(system_name)}"
-        RavenColonial(self).bgstally.request_manager.queue_request(url, RequestMethod.GET, callback=self._stations)
+        RavenColonial(self).client.request(url, RequestMethod.GET, callback=self._stations)
 
 
     @catch_exceptions
     def _stations(self, success:bool, response:Response, request:BGSTallyRequest) -> None:
         ''' Process the results of querying ESDM for the stations in a system '''
+        if success == False:
+            Debug.logger.error(f"Stations query failed {response}")
+            return
 
         data:dict = response.json()
         if data.get('name', None) == None:
@@ -806,13 +956,17 @@ class EDSM:
             return
 
         url:str = f"{EDSM_SYSTEM}{quote(system_name)}"
-        RavenColonial(self).bgstally.request_manager.queue_request(url, RequestMethod.GET, callback=self._system_callback)
+        RavenColonial(self).client.request(url, RequestMethod.GET, callback=self._system_callback)
         return
 
 
     @catch_exceptions
     def _system_callback(self, success:bool, response:Response, request:BGSTallyRequest) -> None:
         ''' Process the results of querying ESDM for the system details '''
+        if success == False:
+            Debug.logger.error(f"System query failed {response}")
+            return
+
         data:dict = response.json()
         if data.get('name', None) == None:
             Debug.logger.warning(f"system didn't contain a name, ignoring")
@@ -853,15 +1007,16 @@ class EDSM:
             return
 
         url:str = f"{EDSM_BODIES}{quote(system_name)}"
-        # We're going to do this synchronously since we need the data before we can proceed and it's a one-time call.
-        response:Response = requests.get(url, headers=RavenColonial(self).base_headers, timeout=TIMEOUT)
-        if response.status_code == 200:
-            self._bodies(True, response)
+        RavenColonial(self).client.request(url, RequestMethod.GET, headers=RavenColonial(self).base_headers, callback=self._bodies)
         return
 
 
+    @catch_exceptions
     def _bodies(self, success:bool, response:Response, request:BGSTallyRequest|None = None) -> None:
         ''' Process the results of querying ESDM for the bodies in a system '''
+        if success == False:
+            Debug.logger.error(f"Bodies query failed {response}")
+            return
 
         data:dict = response.json()
         if data.get('name', None) == None:
@@ -944,26 +1099,44 @@ class Spansh:
         return self._get_details(system_name, 'bodies')
 
     @catch_exceptions
-    def _get_by_name(self, system_name:str) -> dict|None:
-        """ Retrieve the system address from Spansh """
+    def _get_by_name(self, system_name:str, callback:callable) -> None:
+        """ Retrieve the system address, from local data if we have it or from Spansh. The callback is called with the address, or None if it isn't found. """
+        if not hasattr(RavenColonial(self), '_initialized'):
+            callback(None)
+            return
+
         system:dict|None = RavenColonial(self).colonisation.find_system({'StarSystem': system_name})
         if system == None:
             Debug.logger.info(f"Unknown system {system_name}")
+            callback(None)
             return
 
         system_address:int|None = system.get('SystemAddress', None)
         if system_address != None:
             Debug.logger.debug(f"System {system_name} has address {system_address} in local data")
-            return system_address
+            callback(system_address)
+            return
 
         url:str = f"{SPANSH_API}/search?q={quote(system_name)}"
-        response:Response = requests.get(url, headers=RavenColonial(self).base_headers, timeout=TIMEOUT)
-        if response.status_code != 200:
-            Debug.logger.error(f"Query system response for {system_name}: {response.status_code}")
-            return None
+        RavenColonial(self).client.request(url, RequestMethod.GET, headers=RavenColonial(self).base_headers, callback=partial(self._get_by_name_callback, system_name, callback))
+
+
+    @catch_exceptions
+    def _get_by_name_callback(self, system_name:str, callback:callable, success:bool, response:Response, request:BGSTallyRequest) -> None:
+        """ Process the results of searching Spansh for a system by name """
+        if success == False:
+            Debug.logger.error(f"Query system response for {system_name}: {response}")
+            callback(None)
+            return
+
         data:dict = response.json()
+        results:list = data.get('results', [])
+        if len(results) == 0:
+            Debug.logger.info(f"System {system_name} not found on Spansh")
+            callback(None)
+            return
 
-        return get_by_path(data.get('results',[])[0], ['record'], None)
+        callback(get_by_path(results[0], ['record', 'id64'], None))
 
 
     @catch_exceptions
@@ -995,19 +1168,18 @@ class Spansh:
         # Do it the efficient way since we have the address
         if system.get('SystemAddress', None) != None:
             url:str = f"{SPANSH_API}/system/{system.get('SystemAddress', None)}"
-            RavenColonial(self).bgstally.request_manager.queue_request(url, RequestMethod.GET, callback=partial(self._callback, system, which))
+            RavenColonial(self).client.request(url, RequestMethod.GET, callback=partial(self._callback, system, which))
             return
 
         url:str = f"{SPANSH_API}/search?q={quote(system_name)}"
-        response:Response = requests.get(url, headers=RavenColonial(self).base_headers, timeout=TIMEOUT)
-        RavenColonial(self).bgstally.request_manager.queue_request(url, RequestMethod.GET, callback=partial(self._callback, system, which))
+        RavenColonial(self).client.request(url, RequestMethod.GET, callback=partial(self._callback, system, which))
 
 
     @catch_exceptions
     def _callback(self, system:dict, which: str, success:bool, response:Response, request:BGSTallyRequest) -> None:
         ''' Process the results of querying Spansh for the system details '''
         if success == False:
-            Debug.logger.error(f"System query failed {response.content}")
+            Debug.logger.error(f"System query failed {response.content if response != None else ''}")
             return
 
         data:dict = response.json()
@@ -1,8 +1,9 @@
-from queue import Queue
+from collections import deque
 from re import IGNORECASE, compile, match
-from threading import Thread
-from time import sleep
+from threading import Condition, Lock, Thread
+from time import perf_counter, time
 from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
@@ -14,8 +15,9 @@ from bgstally.constants import RequestMethod
 from bgstally.debug import Debug
 from config import config
 
-TIME_WORKER_PERIOD_S = 1
+CONCURRENCY_PER_HOST_DEFAULT = 1 # Requests to a single host are processed in order by default, as e.g. Discord edits rely on earlier posts
 TIMEOUT_S = 30
+WORKERS_MAX = 4
 
 
 class BGSTallyRequest:
@@ -41,6 +43,10 @@ class BGSTallyRequest:
         self.data:dict|None = data
         # The number of attempts made to send this request
         self.attempts:int = attempts
+        # The host this request is sent to, used to select the queue and session
+        self.host:str = urlparse(endpoint).netloc.lower()
+        # When this request was queued, used for queue wait metrics
+        self.queued_at:float = perf_counter()
 
     def __str__(self):
         """
@@ -57,9 +63,38 @@ class BGSTallyRequest:
                     f"  attempts: {self.attempts} \n"
 
 
+class HostStats:
+    """
+    Throughput and queue wait metrics for a single host
+    """
+    def __init__(self):
+        self.started:float = time()
+        self.requests:int = 0
+        self.failures:int = 0
+        self.time_request_s:float = 0.0
+        self.time_wait_s:float = 0.0
+        self.time_wait_max_s:float = 0.0
+
+
+    def as_dict(self, pending:int, active:int) -> dict:
+        """
+        Return the metrics as a dict
+        """
+        elapsed:float = max(time() - self.started, 1)
+        return {'requests': self.requests,
+                'failures': self.failures,
+                'pending': pending,
+                'active': active,
+                'throughput_per_min': self.requests * 60 / elapsed,
+                'request_avg_s': self.time_request_s / self.requests if self.requests > 0 else 0.0,
+                'wait_avg_s': self.time_wait_s / self.requests if self.requests > 0 else 0.0,
+                'wait_max_s': self.time_wait_max_s}
+
+
 class RequestManager:
     """
-    Handles the queuing and processing of requests
+    Handles the queuing and processing of requests. Each host has its own queue and keep-alive session, and a pool of
+    workers processes the queues so that a slow host doesn't hold up requests to other hosts.
     """
     def __init__(self, bgstally: 'BGSTally'):
         self.bgstally: BGSTally = bgstally
@@ -70,11 +105,25 @@ class RequestManager:
             r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})' # ...or ip
             r'(?::\d+)?' # optional port
             r'(?:/?|[/?]\S+)$', IGNORECASE)
-        self.request_queue:Queue = Queue()
 
-        self.request_thread: Thread = Thread(target=self._worker, name="BGSTally Request worker")
-        self.request_thread.daemon = True
-        self.request_thread.start()
+        self.host_queues:dict[str, deque[BGSTallyRequest]] = {}
+        self.host_active:dict[str, int] = {}
+        self.host_concurrency:dict[str, int] = {}
+        self.host_stats:dict[str, HostStats] = {}
+        self.sessions:dict[str, requests.Session] = {}
+        # Callbacks are run one at a time, as many of them change shared state (e.g. colonisation data from RavenColonial,
+        # EDSM and Spansh) and weren't written to run concurrently. Requests are still sent in parallel.
+        self.callback_lock:Lock = Lock()
+
+        self._condition:Condition = Condition()
+        self._next_host:int = 0
+
+        self.request_threads:list[Thread] = []
+        for i in range(WORKERS_MAX):
+            thread:Thread = Thread(target=self._worker, name=f"BGSTally Request worker {i + 1}")
+            thread.daemon = True
+            thread.start()
+            self.request_threads.append(thread)
 
 
     def queue_request(self, endpoint:str, method:RequestMethod, callback:callable = None, params:dict = {}, headers:dict = {}, stream:bool = False, payload:dict|None = None, data:dict|None = None, attempts:int = 0) -> None:
@@ -86,8 +135,50 @@ class RequestManager:
             return
 
         headers:dict = {'User-Agent': f"{self.bgstally.plugin_name}/{self.bgstally.version}"} | headers
+        request:BGSTallyRequest = BGSTallyRequest(endpoint, method, callback, params, headers, stream, payload, data, attempts)
+
+        with self._condition:
+            if request.host not in self.host_queues:
+                self.host_queues[request.host] = deque()
+                self.host_active[request.host] = 0
+                self.host_stats[request.host] = HostStats()
 
-        self.request_queue.put(BGSTallyRequest(endpoint, method, callback, params, headers, stream, payload, data, attempts))
+            self.host_queues[request.host].append(request)
+            self._condition.notify()
+
+
+    def set_host_concurrency(self, host:str, limit:int) -> None:
+        """Set the maximum number of requests that can be in progress at the same time to a host
+
+        Args:
+            host (str): The host name, e.g. 'discord.com'
+            limit (int): The maximum number of concurrent requests
+        """
+        with self._condition:
+            self.host_concurrency[host.lower()] = max(1, limit)
+            self._condition.notify_all()
+
+
+    def shut_down(self) -> None:
+        """
+        Wake any idle workers so they can see that EDMC is shutting down, and log the metrics for each host
+        """
+        with self._condition:
+            self._condition.notify_all()
+
+        for host, stats in self.get_stats().items():
+            Debug.logger.info(f"Requests to {host}: {stats['requests']} requests, {stats['failures']} failures, "
+                              f"{stats['request_avg_s']:.3f}s average, {stats['wait_max_s']:.3f}s maximum wait")
+
+
+    def get_stats(self) -> dict:
+        """Get throughput and queue wait metrics for each host
+
+        Returns:
+            dict: A dict keyed by host name, each containing the metrics for that host
+        """
+        with self._condition:
+            return {host: stats.as_dict(len(self.host_queues[host]), self.host_active[host]) for host, stats in self.host_stats.items()}
 
 
     def url_valid(self, url:str) -> bool:
@@ -98,6 +189,84 @@ class RequestManager:
         return match(self.re_url, url) is not None
 
 
+    def _next_request(self) -> BGSTallyRequest | None:
+        """
+        Fetch the next request that can be processed, honouring the per-host concurrency limits. Hosts are visited in
+        turn so that a busy host can't starve the others. Must be called while holding the condition.
+        """
+        hosts:list[str] = list(self.host_queues.keys())
+
+        for i in range(len(hosts)):
+            host:str = hosts[(self._next_host + i) % len(hosts)]
+            if len(self.host_queues[host]) == 0: continue
+            if self.host_active[host] >= self.host_concurrency.get(host, CONCURRENCY_PER_HOST_DEFAULT): continue
+
+            self._next_host = (self._next_host + i + 1) % len(hosts)
+            self.host_active[host] += 1
+            return self.host_queues[host].popleft()
+
+        return None
+
+
+    def _get_session(self, host:str) -> requests.Session:
+        """
+        Get the keep-alive session for a host, creating it if necessary
+        """
+        with self._condition:
+            session:requests.Session | None = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                self.sessions[host] = session
+
+        return session
+
+
+    def _process(self, request:BGSTallyRequest) -> bool:
+        """
+        Send a single request and call its callback. Returns True if the request succeeded.
+        """
+        Debug.logger.info(f"Processing {request.method} request {request.endpoint}")
+
+        session:requests.Session = self._get_session(request.host)
+        response:Response = None
+        try:
+            match request.method:
+                case RequestMethod.GET: response = session.get(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
+                case RequestMethod.POST: response = session.post(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
+                case RequestMethod.PUT: response = session.put(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
+                case RequestMethod.PATCH: response = session.patch(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
+                case RequestMethod.DELETE: response = session.delete(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
+                case RequestMethod.HEAD: response = session.head(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
+                case RequestMethod.OPTIONS: response = session.options(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
+                case _:
+                    Debug.logger.warning(f"Invalid request method {request.method}")
+                    self._callback(request, False, response)
+                    return False
+
+            response.raise_for_status()
+
+        except requests.exceptions.RequestException as e:
+            Debug.logger.info(f"Request failure {request.endpoint}: {str(e)}")
+            self._callback(request, False, response)
+            return False
+
+        else:
+            # Success
+            Debug.logger.info(f"Request success {request.endpoint}")
+            self._callback(request, True, response)
+            return True
+
+
+    def _callback(self, request:BGSTallyRequest, success:bool, response:Response) -> None:
+        """
+        Call the callback for a request, if it has one
+        """
+        if not request.callback: return
+
+        with self.callback_lock:
+            request.callback(success, response, request)
+
+
     def _worker(self) -> None:
         """
         Handle request thread work
@@ -105,43 +274,37 @@ class RequestManager:
         Debug.logger.debug("Starting Request Worker...")
 
         while True:
+            # Fetch the next request. Blocks until a request is available for a host that has capacity.
+            with self._condition:
+                request:BGSTallyRequest | None = self._next_request()
+                while request is None:
+                    if config.shutting_down:
+                        Debug.logger.debug("Shutting down RequestManager Worker...")
+                        return
+
+                    self._condition.wait()
+                    request = self._next_request()
+
             if config.shutting_down:
                 Debug.logger.debug("Shutting down RequestManager Worker...")
                 return
 
-            sleep(TIME_WORKER_PERIOD_S)
-
-            # Fetch from the queue. Blocks indefinitely until an item is available.
-            request:BGSTallyRequest = self.request_queue.get()
-
-            if not isinstance(request, BGSTallyRequest):
-                Debug.logger.error(f"Queued request was not an instance of BGSTallyRequest")
-                continue
-
-            Debug.logger.info(f"Processing {request.method} request {request.endpoint}")
+            wait_s:float = perf_counter() - request.queued_at
+            start:float = perf_counter()
+            success:bool = False
 
-            response:Response = None
             try:
-                match request.method:
-                    case RequestMethod.GET: response = requests.get(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case RequestMethod.POST: response = requests.post(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
-                    case RequestMethod.PUT: response = requests.put(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
-                    case RequestMethod.PATCH: response = requests.patch(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
-                    case RequestMethod.DELETE: response = requests.delete(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case RequestMethod.HEAD: response = requests.head(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case RequestMethod.OPTIONS: response = requests.options(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case _:
-                        Debug.logger.warning(f"Invalid request method {request.type}")
-                        if request.callback: request.callback(False, response, request)
-                        continue
-
-                response.raise_for_status()
-
-            except requests.exceptions.RequestException as e:
-                Debug.logger.info(f"Request failure {request.endpoint}: {str(e)}")
-                if request.callback: request.callback(False, response, request)
-
-            else:
-                # Success
-                Debug.logger.info(f"Request success {request.endpoint}")
-                if request.callback: request.callback(True, response, request)
+                success = self._process(request)
+            except Exception as e:
+                Debug.logger.error(f"Unhandled exception processing request {request.endpoint}", exc_info=e)
+            finally:
+                with self._condition:
+                    self.host_active[request.host] -= 1
+                    stats:HostStats = self.host_stats[request.host]
+                    stats.requests += 1
+                    if not success: stats.failures += 1
+                    stats.time_request_s += perf_counter() - start
+                    stats.time_wait_s += wait_s
+                    stats.time_wait_max_s = max(stats.time_wait_max_s, wait_s)
+                    # A slot has become free for this host
+                    self._condition.notify()
@@ -1,12 +1,18 @@
 import tkinter as tk
+from datetime import timedelta
+from sys import getsizeof
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
 from bgstally.constants import CheckStates, DiscordActivity, FavouriteActivity
+from bgstally.utils import ExpiringDict
 from config import config
 
+SHIPS_TARGETED_MAX = 100                            # Maximum number of recently targeted ships remembered
+TIME_SHIPS_TARGETED_EXPIRY = timedelta(minutes = 30) # Targeted ships are forgotten after this long
+
 
 class State:
     """
@@ -85,7 +91,7 @@ class State:
         self.last_settlement_approached:dict = {}
         self.last_spacecz_approached:dict = {}
         self.last_megaship_approached:dict = {}
-        self.last_ships_targeted:dict = {}
+        self.last_ships_targeted:ExpiringDict = ExpiringDict(SHIPS_TARGETED_MAX, TIME_SHIPS_TARGETED_EXPIRY)
         self.last_ship_targeted:dict = {}
 
         self.refresh()
@@ -124,47 +130,74 @@ class State:
         self.fc_cooldown:str = str(self.FcCooldown.get())
 
 
+    def get_memory_stats(self) -> dict:
+        """Get the size of the non-persistent state that is built up while playing
+
+        Returns:
+            dict: Statistics for the targeted ships, and the approximate size in bytes of each combat zone context
+        """
+        return {'last_ships_targeted': self.last_ships_targeted.get_stats(),
+                'last_settlement_approached_bytes': getsizeof(self.last_settlement_approached),
+                'last_spacecz_approached_bytes': getsizeof(self.last_spacecz_approached),
+                'last_megaship_approached_bytes': getsizeof(self.last_megaship_approached)}
+
+
     def save(self):
         """
         Save our state
         """
+        self.write(self.snapshot())
 
-        # UI preference fields
-        config.set('BGST_Status', self.Status.get())
-        config.set('BGST_ColonisationStatus', self.ColonisationStatus.get())
-        config.set('BGST_ShowZeroActivity', self.ShowZeroActivitySystems.get())
-        config.set('BGST_AbbreviateFactions', self.AbbreviateFactionNames.get())
-        config.set('BGST_SecondaryInf', self.IncludeSecondaryInf.get())
-        config.set('BGST_DiscordUsername', self.DiscordUsername.get())
-        config.set('BGST_EnableOverlay', self.EnableOverlay.get())
-        config.set('BGST_EnableOverlayCurrentTick', self.EnableOverlayCurrentTick.get())
-        config.set('BGST_EnableOverlayActivity', self.EnableOverlayActivity.get())
-        config.set('BGST_EnableOverlayTWProgress', self.EnableOverlayTWProgress.get())
-        config.set('BGST_EnableOverlaySystem', self.EnableOverlaySystem.get())
-        config.set('BGST_EnableOverlayWarning', self.EnableOverlayWarning.get())
-        config.set('BGST_EnableOverlayCMDR', self.EnableOverlayCMDR.get())
-        config.set('BGST_EnableOverlayObjectives', self.EnableOverlayObjectives.get())
-        config.set('BGST_OverlayObjectivesMode', self.OverlayObjectivesMode.get())
-        config.set('BGST_EnableOverlayColonisation', self.EnableOverlayColonisation.get())
-        config.set('BGST_EnableSystemActivityByDefault', self.EnableSystemActivityByDefault.get())
-        config.set('BGST_EnableShowMerits', self.EnableShowMerits.get())
-        config.set('BGST_DetailedInf', self.DetailedInf.get())
-        config.set('BGST_DetailedTrade', self.DetailedTrade.get())
-        config.set('BGST_DiscordActivity', self.DiscordActivity.get())
-        config.set('BGST_DiscordAvatarURL', self.DiscordAvatarURL.get())
-        config.set('BGST_DiscordBGSTWAutomatic', self.DiscordBGSTWAutomatic.get())
-        config.set('BGST_FcCargo', self.FcCargo.get())
-        config.set('BGST_FcLocker', self.FcLocker.get())
-        config.set('BGST_FcCooldown', self.FcCooldown.get())
-        config.set('BGST_ColonisationMaxCommodities', self.ColonisationMaxCommodities.get())
-        config.set('BGST_EnableProgressScrollbar', self.EnableProgressScrollbar.get())
-        config.set('BGST_ColonisationRCAPIKey', self.ColonisationRCAPIKey.get())
-        config.set('BGST_FavouriteActivityMode', self.FavouriteActivityMode.get())
-        config.set('BGST_UseColonisationName', self.UseColonisationName.get())
 
-        # Persistent values
-        config.set('BGST_CurrentSystemID', self.current_system_id if self.current_system_id != None else "")
-        config.set('BGST_StationFaction', self.station_faction if self.station_faction != None else "")
-        config.set('BGST_StationType', self.station_type if self.station_type != None else "")
-        config.set('BGST_DiscordLang', self.discord_lang if self.discord_lang != None else "")
-        config.set('BGST_DiscordFormatter', self.discord_formatter if self.discord_formatter != None else "")
+    def snapshot(self) -> dict:
+        """
+        Take a copy of our state, ready to write. Must be called on the main thread, as it reads tk variables.
+        """
+        return {
+            # UI preference fields
+            'BGST_Status': self.Status.get(),
+            'BGST_ColonisationStatus': self.ColonisationStatus.get(),
+            'BGST_ShowZeroActivity': self.ShowZeroActivitySystems.get(),
+            'BGST_AbbreviateFactions': self.AbbreviateFactionNames.get(),
+            'BGST_SecondaryInf': self.IncludeSecondaryInf.get(),
+            'BGST_DiscordUsername': self.DiscordUsername.get(),
+            'BGST_EnableOverlay': self.EnableOverlay.get(),
+            'BGST_EnableOverlayCurrentTick': self.EnableOverlayCurrentTick.get(),
+            'BGST_EnableOverlayActivity': self.EnableOverlayActivity.get(),
+            'BGST_EnableOverlayTWProgress': self.EnableOverlayTWProgress.get(),
+            'BGST_EnableOverlaySystem': self.EnableOverlaySystem.get(),
+            'BGST_EnableOverlayWarning': self.EnableOverlayWarning.get(),
+            'BGST_EnableOverlayCMDR': self.EnableOverlayCMDR.get(),
+            'BGST_EnableOverlayObjectives': self.EnableOverlayObjectives.get(),
+            'BGST_OverlayObjectivesMode': self.OverlayObjectivesMode.get(),
+            'BGST_EnableOverlayColonisation': self.EnableOverlayColonisation.get(),
+            'BGST_EnableSystemActivityByDefault': self.EnableSystemActivityByDefault.get(),
+            'BGST_EnableShowMerits': self.EnableShowMerits.get(),
+            'BGST_DetailedInf': self.DetailedInf.get(),
+            'BGST_DetailedTrade': self.DetailedTrade.get(),
+            'BGST_DiscordActivity': self.DiscordActivity.get(),
+            'BGST_DiscordAvatarURL': self.DiscordAvatarURL.get(),
+            'BGST_DiscordBGSTWAutomatic': self.DiscordBGSTWAutomatic.get(),
+            'BGST_FcCargo': self.FcCargo.get(),
+            'BGST_FcLocker': self.FcLocker.get(),
+            'BGST_FcCooldown': self.FcCooldown.get(),
+            'BGST_ColonisationMaxCommodities': self.ColonisationMaxCommodities.get(),
+            'BGST_EnableProgressScrollbar': self.EnableProgressScrollbar.get(),
+            'BGST_ColonisationRCAPIKey': self.ColonisationRCAPIKey.get(),
+            'BGST_FavouriteActivityMode': self.FavouriteActivityMode.get(),
+            'BGST_UseColonisationName': self.UseColonisationName.get(),
+
+            # Persistent values
+            'BGST_CurrentSystemID': self.current_system_id if self.current_system_id != None else "",
+            'BGST_StationFaction': self.station_faction if self.station_faction != None else "",
+            'BGST_StationType': self.station_type if self.station_type != None else "",
+            'BGST_DiscordLang': self.discord_lang if self.discord_lang != None else "",
+            'BGST_DiscordFormatter': self.discord_formatter if self.discord_formatter != None else ""}
+
+
+    def write(self, snapshot: dict):
+        """
+        Write a snapshot of our state to config
+        """
+        for key, value in snapshot.items():
+            config.set(key, value)
@@ -1,21 +1,25 @@
 import json
 import os.path
 import re
+from collections import OrderedDict
 from copy import copy
 from datetime import UTC, datetime, timedelta
+from functools import partial
+from threading import Lock
 
-from requests import Response
-
-from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, CmdrInteractionReason, RequestMethod
+from bgstally.cmdrlookup import CmdrLookup
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, CmdrInteractionReason, DataStore
 from bgstally.debug import Debug
-from bgstally.requestmanager import BGSTallyRequest
 from bgstally.utils import _, __
 from thirdparty.colors import *
 
-FILENAME = "targetlog.json"
+FILENAME = "targetlog.jsonl"
+LEGACY_FILENAME = "targetlog.json"
+TARGET_LOG_COMPACT_STALE_MIN = 500 # Rewrite the file once it holds at least this many expired entries, and more expired than live
+TARGET_LOG_MAX = 10000             # Maximum number of entries kept in the target log
+TARGET_LOG_TRIM_RATIO = 1.1        # Trim the log back to its maximum size once it's this much over
 TIME_TARGET_LOG_EXPIRY_D = 90
-URL_INARA_API = "https://inara.cz/inapi/v1/"
-DATETIME_FORMAT_INARA = "%Y-%m-%dT%H:%M:%SZ"
+CMDR_CACHE_MAX = 500 # Maximum number of CMDRs seen this session whose latest sighting is remembered
 
 
 class TargetManager:
@@ -26,43 +30,112 @@ class TargetManager:
 
     def __init__(self, bgstally):
         self.bgstally = bgstally
-        self.targetlog = []
-        self.cmdr_cache = {}
+        self.targetlog: list[dict] = []
+        self.latest_targets: dict[str, dict] = {} # The latest log entry for each CMDR
+        self.cmdr_cache: OrderedDict[str, dict] = OrderedDict()
+        self.cmdr_lookup: CmdrLookup = CmdrLookup(bgstally)
+
+        self.next_index: int = 0          # The index given to the next log entry, unique for this session
+        self.unsaved: list[dict] = []     # Entries added since the file was last written
+        self.stale_lines: int = 0         # Lines in the file for entries that have since expired
+        self.rewrite_required: bool = False
+        self._lock: Lock = Lock()
         self.load()
-        self._expire_old_targets()
 
 
     def load(self):
         """
         Load state from file
         """
-        file = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        file: str = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        legacy_file: str = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, LEGACY_FILENAME)
+        targets: list[dict] = []
+
         if os.path.exists(file):
             try:
-                with open(file) as json_file:
-                    self.targetlog = json.load(json_file)
+                with open(file, encoding='utf-8') as json_file:
+                    for line in json_file:
+                        try:
+                            targets.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            # A partly written line from a crash, skip it
+                            self.stale_lines += 1
             except Exception as e:
                 Debug.logger.info(f"Unable to load {file}")
+        elif os.path.exists(legacy_file):
+            # TODO: Remove migration from the old single JSON list file in future version
+            try:
+                with open(legacy_file) as json_file:
+                    targets = json.load(json_file)
+                self.rewrite_required = True
+            except Exception as e:
+                Debug.logger.info(f"Unable to load {legacy_file}")
+
+        for target in targets:
+            target['index'] = self.next_index
+            self.next_index += 1
+
+        self.targetlog = targets
+        self.latest_targets = {target['TargetName']: target for target in targets}
+        self._expire_old_targets()
 
 
     def save(self):
         """
-        Save state to file
+        Save state to file. New entries are appended, and the file is only rewritten in full when enough entries have
+        expired, or when entries have been deleted.
+        """
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> tuple[bool, list[dict]]:
+        """
+        Take the entries to write. Entries aren't changed once they are logged, so only the list is copied.
+
+        Returns:
+            tuple[bool, list[dict]]: True and all entries if the file must be rewritten, otherwise False and the new entries to append
+        """
+        with self._lock:
+            rewrite: bool = self.rewrite_required or self.stale_lines > max(TARGET_LOG_COMPACT_STALE_MIN, len(self.targetlog))
+            targets: list[dict] = list(self.targetlog) if rewrite else self.unsaved
+
+            if rewrite:
+                self.stale_lines = 0
+                self.rewrite_required = False
+            self.unsaved = []
+
+        return (rewrite, targets)
+
+
+    def write(self, snapshot: tuple[bool, list[dict]]):
+        """
+        Write a snapshot of entries to file. If the write fails, the whole file is rewritten next time.
         """
-        file = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
-        with open(file, 'w') as outfile:
-            json.dump(self.targetlog, outfile)
+        rewrite, targets = snapshot
+        file: str = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+
+        try:
+            if rewrite:
+                lines: list[str] = [json.dumps(target) + "\n" for target in targets]
+                temp_file: str = file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as outfile:
+                    outfile.writelines(lines)
+                os.replace(temp_file, file)
+
+                legacy_file: str = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, LEGACY_FILENAME)
+                if os.path.exists(legacy_file): os.remove(legacy_file)
+            elif len(targets) > 0:
+                with open(file, 'a', encoding='utf-8') as outfile:
+                    outfile.writelines([json.dumps(target) + "\n" for target in targets])
+        except Exception:
+            with self._lock: self.rewrite_required = True
+            raise
 
 
     def get_targetlog(self):
         """
         Get the current target log
         """
-        index:int = 0
-        for target in self.targetlog:
-            target['index'] = index
-            index += 1
-
         return self.targetlog
 
 
@@ -70,7 +143,28 @@ class TargetManager:
         """
         Look up and return latest information on a CMDR
         """
-        return next((item for item in reversed(self.targetlog) if item['TargetName'] == cmdr_name), None)
+        return self.latest_targets.get(cmdr_name)
+
+
+    def delete_targets(self, indexes:list[int]):
+        """Delete entries from the target log
+
+        Args:
+            indexes (list[int]): The indexes of the entries to delete
+        """
+        indexes: set[int] = set(indexes)
+
+        with self._lock:
+            deleted: list[dict] = [target for target in self.targetlog if target['index'] in indexes]
+            if len(deleted) == 0: return
+
+            # Update the list in place, as the CMDRs window holds on to it
+            self.targetlog[:] = [target for target in self.targetlog if target['index'] not in indexes]
+            self.unsaved = [target for target in self.unsaved if target['index'] not in indexes]
+            self._reindex_cmdrs({target['TargetName'] for target in deleted})
+            self.rewrite_required = True
+
+        self.bgstally.persistence_manager.mark_dirty(DataStore.TARGETLOG)
 
 
     def ship_targeted(self, journal_entry: dict, system: str):
@@ -107,7 +201,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending:self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_to_log(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -127,7 +221,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_to_log(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -151,7 +245,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_to_log(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -173,7 +267,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_to_log(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -201,7 +295,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
             cmdr_data, different, pending = self._fetch_cmdr_info(killer_name[5:], cmdr_data)
-            if different and not pending: self.targetlog.append(cmdr_data)
+            if different and not pending: self._add_to_log(cmdr_data)
             if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -224,7 +318,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_to_log(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -244,7 +338,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_to_log(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -305,6 +399,7 @@ class TargetManager:
             # We have cached data. Check whether it's different enough to make a new log entry for this CMDR.
             # Different enough: Any of System, SquadronID, Ship and LegalStatus don't match (if blank in the new data, ignore).
             cmdr_cache_data:dict = self.cmdr_cache[cmdr_name]
+            self.cmdr_cache.move_to_end(cmdr_name)
             if cmdr_data.get('System') == cmdr_cache_data.get('System') \
                 and (cmdr_data.get('SquadronID') == cmdr_cache_data.get('SquadronID') or cmdr_cache_data.get('SquadronID') == "----") \
                 and (cmdr_data.get('Ship') == cmdr_cache_data.get('Ship') or cmdr_data.get('Ship') == "----") \
@@ -322,65 +417,95 @@ class TargetManager:
             cmdr_data_copy['Reason'] = cmdr_data.get('Reason', CmdrInteractionReason.SCANNED)
             cmdr_data_copy['Timestamp'] = cmdr_data.get('Timestamp')
             # Re-cache the data with the latest updates
-            self.cmdr_cache[cmdr_name] = cmdr_data_copy
+            self._cache_cmdr(cmdr_name, cmdr_data_copy)
             return cmdr_data_copy, True, False
 
-        # CMDR data not in cache, create a background request to fetch Inara data
-        payload = {
-            'header': {
-                'appName': self.bgstally.plugin_name,
-                'appVersion': str(self.bgstally.version),
-                'isBeingDeveloped': "false",
-                'APIkey': self.bgstally.config.apikey_inara()
-            },
-            'events': [
-                {
-                    'eventName': "getCommanderProfile",
-                    'eventTimestamp': datetime.now(UTC).strftime(DATETIME_FORMAT_INARA),
-                    'eventData': {
-                        'searchName': cmdr_name
-                    }
-                }
-            ]
-        }
-
-        self.bgstally.request_manager.queue_request(URL_INARA_API, RequestMethod.POST, callback=self._inara_data_received, payload=payload, data=cmdr_data)
-
-        return cmdr_data, True, True
-
-
-    def _inara_data_received(self, success:bool, response:Response, request:BGSTallyRequest):
-        """
-        A queued inara request has returned data, process it
-        """
-        if success:
-            cmdr_data:dict = request.data
-            response_data = response.json()
-            if 'events' in response_data and len(response_data['events']) > 0 and 'eventData' in response_data['events'][0]:
-                event_data = response_data['events'][0]['eventData']
-
-                if 'commanderRanksPilot' in event_data:
-                    cmdr_data['ranks'] = event_data['commanderRanksPilot']
-                if 'commanderSquadron' in event_data:
-                    cmdr_data['squadron'] = event_data['commanderSquadron']
-                if 'inaraURL' in event_data:
-                    cmdr_data['inaraURL'] = event_data['inaraURL']
-
-        # In all cases (even Inara failure) add the CMDR to the cache and log because we will at least have in-game data for them
-        self.cmdr_cache[cmdr_data['TargetName']] = cmdr_data
-        self.targetlog.append(cmdr_data)
+        # CMDR data not in cache, use their Inara profile if we have it, otherwise look it up in the background
+        profile: dict|None = self.cmdr_lookup.lookup(cmdr_name, partial(self._cmdr_profile_received, cmdr_data))
+        if profile is None: return cmdr_data, True, True
+
+        cmdr_data |= profile
+        self._cache_cmdr(cmdr_name, cmdr_data)
+        return cmdr_data, True, False
+
+
+    def _cmdr_profile_received(self, cmdr_data:dict, cmdr_name:str, profile:dict|None):
+        """
+        A CMDR's Inara profile lookup has returned, log the sighting that was waiting for it
+        """
+        if cmdr_name in self.cmdr_cache:
+            # The CMDR was seen more than once while the lookup was in progress, so treat this as a repeat sighting
+            cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
+        else:
+            # In all cases (even Inara failure) add the CMDR to the cache and log because we will at least have in-game data for them
+            if profile is not None: cmdr_data |= profile
+            self._cache_cmdr(cmdr_name, cmdr_data)
+            different = True
+
+        if different: self._add_to_log(cmdr_data)
         self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
+    def _cache_cmdr(self, cmdr_name:str, cmdr_data:dict):
+        """
+        Remember the latest sighting of a CMDR, forgetting the least recently seen CMDR if there are too many
+        """
+        self.cmdr_cache.pop(cmdr_name, None)
+        self.cmdr_cache[cmdr_name] = cmdr_data
+        if len(self.cmdr_cache) > CMDR_CACHE_MAX: self.cmdr_cache.popitem(last=False)
+
+
+    def _add_to_log(self, cmdr_data:dict):
+        """
+        Add an entry to the target log and flag it for saving
+        """
+        with self._lock:
+            # Each entry is a separate object, as the same sighting data is shared with the CMDR cache
+            target: dict = cmdr_data | {'index': self.next_index}
+            self.next_index += 1
+
+            self.targetlog.append(target)
+            self.latest_targets[target['TargetName']] = target
+            self.unsaved.append(target)
+            self._expire_old_targets()
+
+        self.bgstally.persistence_manager.mark_dirty(DataStore.TARGETLOG)
+
+
     def _expire_old_targets(self):
         """
-        Clear out all old targets from the target log
+        Clear out old targets from the front of the target log, and the oldest targets if the log is too long.
+        Must be called with the lock held, or before the log is shared.
         """
-        for target in reversed(self.targetlog):
-            # Need to do this shenanegans to parse a tz-aware timestamp from a string
-            target_timestamp: datetime = datetime.strptime(target['Timestamp'], DATETIME_FORMAT_JOURNAL)
-            target_timestamp = target_timestamp.replace(tzinfo=UTC)
+        expiry: str = (datetime.now(UTC) - timedelta(days = TIME_TARGET_LOG_EXPIRY_D)).strftime(DATETIME_FORMAT_JOURNAL)
+        expired: int = 0
+
+        # Entries are added in time order and journal timestamps sort as strings, so only the oldest entries need checking
+        while expired < len(self.targetlog) and self.targetlog[expired]['Timestamp'] < expiry:
+            expired += 1
+
+        # Drop entries in bulk once the log is over its maximum size, so we don't do this on every new entry
+        if len(self.targetlog) - expired > TARGET_LOG_MAX * TARGET_LOG_TRIM_RATIO:
+            expired = len(self.targetlog) - TARGET_LOG_MAX
+
+        if expired == 0: return
 
-            timedifference: datetime = datetime.now(UTC) - target_timestamp
-            if timedifference > timedelta(days = TIME_TARGET_LOG_EXPIRY_D):
-                self.targetlog.remove(target)
+        removed: list[dict] = self.targetlog[:expired]
+        del self.targetlog[:expired]
+        self.stale_lines += expired
+        self._reindex_cmdrs({target['TargetName'] for target in removed})
+
+
+    def _reindex_cmdrs(self, cmdr_names:set[str]):
+        """
+        Update the latest log entry for CMDRs that have had entries removed. Must be called with the lock held.
+        """
+        for cmdr_name in cmdr_names:
+            self.latest_targets.pop(cmdr_name, None)
+
+        remaining: set[str] = set(cmdr_names)
+        for target in reversed(self.targetlog):
+            if len(remaining) == 0: break
+            if target['TargetName'] in remaining:
+                self.latest_targets[target['TargetName']] = target
+                remaining.discard(target['TargetName'])
@@ -2,6 +2,8 @@ import hashlib
 from datetime import UTC, datetime, timedelta
 from functools import partial
 from json import JSONDecodeError
+from threading import Lock
+from time import monotonic
 from typing import TYPE_CHECKING
 
 import plug
@@ -12,16 +14,21 @@ if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
 from bgstally.constants import (DATETIME_FORMAT_ACTIVITY, DATETIME_FORMAT_DISPLAY, DATETIME_FORMAT_TICK_DETECTOR_GALAXY, DATETIME_FORMAT_TICK_DETECTOR_SYSTEM,
-                                RequestMethod)
+                                DataStore, RequestMethod)
 from bgstally.debug import Debug
 from bgstally.requestmanager import BGSTallyRequest
 from bgstally.utils import _
 from config import config
 
 TICKID_UNKNOWN = "unknown_tickid"
+TICKID_PREFIX_IMPORTED = "imp-"
 URL_GALAXY_TICK_DETECTOR = "http://tick.infomancer.uk/galtick.json"
 URL_SYSTEM_TICK_DETECTOR = "http://tickapi.infomancer.uk/system/tick_by_addr"
 
+TIME_TICK_POLL_WINDOW = timedelta(hours = 2)  # Poll the galaxy tick every time we're asked from this long before the next predicted tick
+TIME_TICK_POLL_IDLE = timedelta(minutes = 15) # Outside that window, poll this often in case the tick is early
+TIME_SYSTEM_TICK_CACHE_S = 60 * 5             # Fetched system ticks older than the galaxy tick are re-used for 5 minutes
+
 class Tick:
     """
     Information about a tick
@@ -31,21 +38,53 @@ class Tick:
         self.bgstally: BGSTally = bgstally
         self.tick_id: str = TICKID_UNKNOWN
         self.tick_time: datetime = (datetime.now(UTC) - timedelta(days = 30)) # Default to a tick a month old
+        self.last_polled: datetime|None = None
+        self.etag: str|None = None
+        self.last_modified: str|None = None
+        # System ticks we've fetched, keyed on system address: (system tick time, monotonic time fetched)
+        self.system_ticks: dict[str, tuple[datetime, float]] = {}
+        self.system_ticks_in_flight: set[str] = set()
+        self.system_ticks_lock: Lock = Lock()
         if load: self.load()
 
 
+    def poll_due(self) -> bool:
+        """Check whether the galaxy tick should be polled now. Polling is frequent from shortly before the next predicted
+        tick until a new tick is found, and rare the rest of the time.
+
+        Returns:
+            bool: True if the galaxy tick should be fetched
+        """
+        now: datetime = datetime.now(UTC)
+        if self.last_polled is None: return True
+
+        # The prediction is only useful if we know when the last galaxy tick was
+        if self.tick_id == TICKID_UNKNOWN or self.tick_id.startswith("frc-"): return True
+        if now >= self.next_predicted() - TIME_TICK_POLL_WINDOW: return True
+
+        return now >= self.last_polled + TIME_TICK_POLL_IDLE
+
+
     def fetch_tick(self):
         """
         Tick check and counter reset
         """
+        # Only ask for the tick data if it has changed since we last fetched it
+        headers: dict[str, str] = {}
+        if self.etag is not None: headers['If-None-Match'] = self.etag
+        if self.last_modified is not None: headers['If-Modified-Since'] = self.last_modified
+
         try:
-            response = requests.get(URL_GALAXY_TICK_DETECTOR, timeout=10)
+            self.last_polled = datetime.now(UTC)
+            response = requests.get(URL_GALAXY_TICK_DETECTOR, headers=headers, timeout=10)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             Debug.logger.error(f"Unable to fetch latest tick from {URL_GALAXY_TICK_DETECTOR}: {str(e)}")
             plug.show_error(_("{plugin_name} WARNING: Unable to fetch latest tick").format(plugin_name=self.bgstally.plugin_name)) # LANG: Main window error message
             return None
         else:
+            if response.status_code == 304: return False
+
             tick_data: dict[str, str] = response.json()
             tick_time_raw: str|None = tick_data.get('lastGalaxyTick')
 
@@ -62,48 +101,99 @@ class Tick:
                 self.tick_time = tick_time
                 h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
                 self.tick_id = f"zoy-{h.hexdigest(10)}"
+                self.bgstally.persistence_manager.mark_dirty(DataStore.TICK)
+
+                # Systems fetched before this tick are likely to have ticked since, so fetch them again next time
+                with self.system_ticks_lock:
+                    self.system_ticks = {address: cached for address, cached in self.system_ticks.items() if cached[0] >= tick_time}
 
+                # Keep the validators only once the tick data has been accepted, so a bad response is fetched in full next time
+                self.etag = response.headers.get('ETag')
+                self.last_modified = response.headers.get('Last-Modified')
                 return True
 
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+
         return False
 
 
-    def fetch_system_tick(self, system_address: str):
-        """
-        Tick check and counter reset
+    def fetch_system_tick(self, system_address: str) -> datetime|None:
+        """Fetch the tick for a system. A recently fetched tick is returned straight away, otherwise it's fetched in the
+        background and stored in the current activity when it arrives. Only one fetch per system is made at a time.
+
+        Args:
+            system_address (str): The system address
+
+        Returns:
+            datetime|None: The cached system tick time, or None if it is being fetched
         """
+        with self.system_ticks_lock:
+            cached: tuple[datetime, float]|None = self.system_ticks.get(system_address)
+            if cached is not None and (cached[0] >= self.tick_time or monotonic() - cached[1] < TIME_SYSTEM_TICK_CACHE_S):
+                return cached[0]
+
+            if system_address in self.system_ticks_in_flight: return None
+            self.system_ticks_in_flight.add(system_address)
+
         params: dict[str, str] = {'sysAddr': system_address}
         data: dict[str, str] = {'SystemAddress': system_address}
 
         self.bgstally.request_manager.queue_request(URL_SYSTEM_TICK_DETECTOR, RequestMethod.POST, params=params, data=data, callback=self._system_tick_received)
+        return None
 
 
     def _system_tick_received(self, success: bool, response: Response, request: BGSTallyRequest):
         """
         Callback for system tick request
         """
+        system_address: str|None = request.data.get('SystemAddress') if request.data is not None else None
+        retrying: bool = False
+
+        try:
+            retrying = self._process_system_tick(success, response, request)
+        finally:
+            # A retry keeps the fetch in flight, so entering the system again in the meantime doesn't start another one
+            if not retrying:
+                with self.system_ticks_lock:
+                    self.system_ticks_in_flight.discard(system_address)
+
+
+    def _process_system_tick(self, success: bool, response: Response, request: BGSTallyRequest) -> bool:
+        """Handle a system tick response
+
+        Args:
+            success (bool): True if the request succeeded
+            response (Response): The response
+            request (BGSTallyRequest): The request
+
+        Returns:
+            bool: True if another fetch has been scheduled for this system
+        """
         from bgstally.activity import Activity
 
+        retrying: bool = False
+
         if not success:
             Debug.logger.error(f"Unable to fetch system tick from {request.endpoint}: {response}")
             plug.show_error(_("{plugin_name} WARNING: Unable to fetch system tick").format(plugin_name=self.bgstally.plugin_name)) # LANG: Main window error message
-            return
+            return False
 
         try:
             tick_data: dict[str, any] = response.json()
         except JSONDecodeError:
             Debug.logger.warning(f"System tick data is invalid (JSON parse)")
-            return
+            return False
 
         if not isinstance(tick_data, dict):
             Debug.logger.warning(f"System tick data is invalid (not a dict)")
-            return
+            return False
 
         tick_time_raw: str|None = tick_data.get('timestamp')
 
         if tick_time_raw is None:
             Debug.logger.warning(f"System tick data is invalid (no timestamp)")
-            return
+            return False
 
         tick_time: datetime = datetime.strptime(tick_time_raw, DATETIME_FORMAT_TICK_DETECTOR_SYSTEM)
         tick_time = tick_time.replace(tzinfo=UTC)
@@ -111,10 +201,14 @@ class Tick:
 
         if system_address is None:
             Debug.logger.warning(f"No system address in system tick callback data")
-            return
-        elif system_address != self.bgstally.state.current_system_id:
+            return False
+
+        with self.system_ticks_lock:
+            self.system_ticks[system_address] = (tick_time, monotonic())
+
+        if system_address != self.bgstally.state.current_system_id:
             Debug.logger.warning(f"No longer in same system as system tick callback data")
-            return
+            return False
 
         if tick_time < self.tick_time:
             # The system tick we've just fetched is older than the current galaxy tick, which must mean it hasn't been updated yet. Trigger another fetch
@@ -122,6 +216,7 @@ class Tick:
             Debug.logger.warning(f"System tick is older than the current galaxy tick - triggering another deferred fetch")
             if self.bgstally.ui.frame:
                 params: dict[str, str] = {'sysAddr': system_address}
+                retrying = True
 
                 if request.attempts < 3:
                     # Fast refresh initially, in case the only reason the tick hasn't refreshed is because nobody has visited the system and sent over EDDN
@@ -133,13 +228,15 @@ class Tick:
 
         # Store the system tick in the system activity.
         current_activity: Activity = self.bgstally.activity_manager.get_current_activity()
-        if current_activity is None: return
+        if current_activity is None: return retrying
 
         system: dict[str, any] = current_activity.get_system_by_address(system_address)
-        if system is None: return
+        if system is None: return retrying
 
         system['TickTime'] = tick_time.strftime(DATETIME_FORMAT_ACTIVITY)
         current_activity.dirty = True
+        self.bgstally.persistence_manager.mark_dirty(DataStore.ACTIVITY)
+        return retrying
 
 
     def force_tick(self):
@@ -150,6 +247,20 @@ class Tick:
         self.tick_time = datetime.now(tz=UTC)
         h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
         self.tick_id = f"frc-{h.hexdigest(10)}"
+        self.bgstally.persistence_manager.mark_dirty(DataStore.TICK)
+
+
+    def set_imported(self, tick_time: datetime):
+        """Set this to an estimated past tick, reconstructed when importing journal files
+
+        Args:
+            tick_time (datetime): The estimated tick time
+        """
+        # Generate a 24-digit tick id prefixed with "imp-" to signify an imported tick. The id only depends on the tick time, so
+        # importing the same tick again replaces it rather than duplicating it
+        self.tick_time = tick_time
+        h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
+        self.tick_id = f"{TICKID_PREFIX_IMPORTED}{h.hexdigest(10)}"
 
 
     def load(self):
@@ -171,8 +282,23 @@ class Tick:
         """
         Save tick status to config
         """
-        config.set('BGST_LastTick', self.tick_id)
-        config.set('BGST_TickTime', self.tick_time.strftime(DATETIME_FORMAT_TICK_DETECTOR_GALAXY))
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> tuple[str, str]:
+        """
+        Take a copy of the tick status, ready to write
+        """
+        return (self.tick_id, self.tick_time.strftime(DATETIME_FORMAT_TICK_DETECTOR_GALAXY))
+
+
+    def write(self, snapshot: tuple[str, str]):
+        """
+        Write a snapshot of the tick status to config
+        """
+        tick_id, tick_time = snapshot
+        config.set('BGST_LastTick', tick_id)
+        config.set('BGST_TickTime', tick_time)
 
 
     def get_formatted(self, format: str = DATETIME_FORMAT_DISPLAY, tick_time: datetime|None = None) -> str:
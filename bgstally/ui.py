@@ -20,16 +20,19 @@ from bgstally.activity import STATES_ELECTION, STATES_WAR, Activity
 from bgstally.constants import (DATETIME_FORMAT_ACTIVITY, FOLDER_ASSETS, FOLDER_DATA, FONT_HEADING_2, FONT_SMALL, TAG_OVERLAY_HIGHLIGHT, CheckStates,
                                 DiscordActivity, FavouriteActivity, UpdateUIPolicy)
 from bgstally.debug import Debug
-from bgstally.utils import _, available_langs, catch_exceptions, get_by_path, get_localised_filepath, human_format
+from bgstally.overlay import OverlayPanel
+from bgstally.utils import _, available_langs, catch_exceptions, clear_translation_cache, get_by_path, get_localised_filepath, human_format
 from bgstally.widgets import EntryPlus
 from bgstally.windows.activity import WindowActivity
 from bgstally.windows.api import WindowAPI
 from bgstally.windows.cmdrs import WindowCMDRs
 from bgstally.windows.colonisation import ColonisationWindow
 from bgstally.windows.fleetcarrier import WindowFleetCarrier
+from bgstally.windows.journalimport import WindowJournalImport
 from bgstally.windows.legend import WindowLegend
 from bgstally.windows.objectives import WindowObjectives
 from bgstally.windows.objectives_overlay_settings import WindowObjectivesOverlaySettings
+from bgstally.windows.profiler import WindowProfiler
 from bgstally.windows.progress import ProgressWindow
 from config import config
 from thirdparty.tksheet import Sheet
@@ -87,6 +90,15 @@ class UI:
         self.report_cmdr_data:dict|None = None
         self.warning:str|None = None
 
+        # Overlay panels that are refreshed periodically by the worker
+        self.panel_tick:OverlayPanel = OverlayPanel(self.bgstally.overlay, "tick", self._render_tick_panel, lambda: self.bgstally.tick.tick_time, TIME_WORKER_PERIOD_S)
+        self.panel_system_tick:OverlayPanel = OverlayPanel(self.bgstally.overlay, "system_tick", self._render_system_tick_panel, self._get_system_tick_panel_inputs, TIME_WORKER_PERIOD_S)
+        self.panel_tickwarn:OverlayPanel = OverlayPanel(self.bgstally.overlay, "tickwarn", self._render_tickwarn_panel, None, TIME_WORKER_PERIOD_S)
+        self.panel_pinned_systems:OverlayPanel = OverlayPanel(self.bgstally.overlay, "system_info", self._render_pinned_systems_panel, self._get_pinned_systems_panel_inputs, TIME_WORKER_PERIOD_S)
+        self.panel_objectives:OverlayPanel = OverlayPanel(self.bgstally.overlay, "objectives", self._render_objectives_panel, self._get_objectives_panel_inputs, TIME_WORKER_PERIOD_S)
+        self.panel_colonisation:OverlayPanel = OverlayPanel(self.bgstally.overlay, "colonisation", lambda: {'message': self.window_progress.as_text(False), 'fit_to_text': True}, None, TIME_WORKER_PERIOD_S)
+        self.panel_carrier:OverlayPanel = OverlayPanel(self.bgstally.overlay, "fleetcarrier", lambda: {'message': self.bgstally.fleet_carrier.update_overlay(), 'fit_to_text': True}, None, TIME_WORKER_PERIOD_S)
+
         # RavenColonial API key management
         self.apikey:nb.EntryMenu
         self.apikey_label:tk.Label
@@ -99,6 +111,8 @@ class UI:
         self.window_objectives_overlay_settings:WindowObjectivesOverlaySettings = WindowObjectivesOverlaySettings(self.bgstally)
         self.window_colonisation:ColonisationWindow = ColonisationWindow(self.bgstally)
         self.window_progress:ProgressWindow = ProgressWindow(self.bgstally)
+        self.window_profiler:WindowProfiler = WindowProfiler(self.bgstally)
+        self.window_journalimport:WindowJournalImport = WindowJournalImport(self.bgstally)
 
         # TODO: When we support multiple APIs, this will no longer be a single instance window
         self.window_api:WindowAPI = WindowAPI(self.bgstally, self.bgstally.api_manager.apis[0])
@@ -408,6 +422,8 @@ class UI:
         ttk.Separator(frame, orient=tk.HORIZONTAL).grid(row=current_row, columnspan=2, padx=10, pady=1, sticky=tk.EW); current_row += 1
         nb.Label(frame, text=_("Advanced"), font=FONT_HEADING_2).grid(row=current_row, column=0, padx=10, sticky=tk.NW) # LANG: Preferences heading
         tk.Button(frame, text=_("Force Tick"), command=self._confirm_force_tick, bg="red", fg="white").grid(row=current_row, column=1, padx=10, sticky=tk.W); current_row += 1 # LANG: Preferences button label
+        tk.Button(frame, text=_("Show Profiler"), command=self._show_profiler_window).grid(row=current_row, column=1, padx=10, pady=2, sticky=tk.W); current_row += 1 # LANG: Preferences button label
+        tk.Button(frame, text=_("Import Journals"), command=self._show_journalimport_window).grid(row=current_row, column=1, padx=10, pady=2, sticky=tk.W); current_row += 1 # LANG: Preferences button label
 
         return frame
 
@@ -416,6 +432,8 @@ class UI:
         """
         Preferences frame has been saved (from EDMC core or any plugin)
         """
+        # The EDMC UI language may have changed, so forget translations into the current language
+        clear_translation_cache()
         self.update_plugin_frame()
         self._load_commodities()
 
@@ -530,6 +548,7 @@ class UI:
         """
         langs_by_name: dict = {v: k for k, v in self.languages.items()}  # Codes by name
         self.bgstally.state.discord_lang = langs_by_name.get(self.language.get()) or ''  # or '' used here due to Default being None above
+        clear_translation_cache()
 
 
     def _formatter_modified(self, event=None):
@@ -580,34 +599,11 @@ class UI:
 
             current_activity: Activity = self.bgstally.activity_manager.get_current_activity()
 
-            # Current Galaxy and System Tick Times
+            # Current Galaxy and System Tick Times, and Tick Warning
             if self.bgstally.state.enable_overlay_current_tick:
-                self.bgstally.overlay.display_message("tick", _("Galaxy Tick: {tick_time}").format(tick_time=self.bgstally.tick.get_formatted(DATETIME_FORMAT_OVERLAY)), True) # LANG: Overlay galaxy tick message
-
-                if current_activity is not None:
-                    current_system: dict|None = current_activity.get_current_system()
-                    system_tick: str|None = current_system.get('TickTime') if current_system is not None else None
-
-                    if system_tick is not None and system_tick != "":
-                        system_tick_datetime: datetime = datetime.strptime(system_tick, DATETIME_FORMAT_ACTIVITY)
-                        system_tick_datetime = system_tick_datetime.replace(tzinfo=UTC)
-
-                        tick_text: str = _("System Tick: {tick_time}").format(tick_time=self.bgstally.tick.get_formatted(DATETIME_FORMAT_OVERLAY, tick_time = system_tick_datetime)) # LANG: Overlay system tick message
-
-                        if system_tick_datetime < self.bgstally.tick.tick_time:
-                            self.bgstally.overlay.display_message("system_tick", tick_text, True, text_colour_override="#FF0000")
-                        else:
-                            self.bgstally.overlay.display_message("system_tick", tick_text, True)
-
-            # Tick Warning
-            minutes_delta:int = int((datetime.now(UTC) - self.bgstally.tick.next_predicted()) / timedelta(minutes=1))
-            if self.bgstally.state.enable_overlay_current_tick:
-                if datetime.now(UTC) > self.bgstally.tick.next_predicted() + timedelta(minutes = TIME_TICK_ALERT_M):
-                    self.bgstally.overlay.display_message("tickwarn", _("Tick {minutes_delta}m Overdue (Estimated)").format(minutes_delta=minutes_delta), True) # LANG: Overlay overdue tick message
-                elif datetime.now(UTC) > self.bgstally.tick.next_predicted():
-                    self.bgstally.overlay.display_message("tickwarn", _("Past Estimated Tick Time"), True, text_colour_override="#FFA500") # LANG: Overlay past estimated time tick message
-                elif datetime.now(UTC) > self.bgstally.tick.next_predicted() - timedelta(minutes = TIME_TICK_ALERT_M):
-                    self.bgstally.overlay.display_message("tickwarn", _("Within {minutes_to_tick}m of Next Tick (Estimated)").format(minutes_to_tick=TIME_TICK_ALERT_M), True, text_colour_override="yellow") # LANG: Overlay close to tick message
+                self.panel_tick.update()
+                if current_activity is not None: self.panel_system_tick.update()
+                self.panel_tickwarn.update()
 
             # Activity Indicator
             if self.bgstally.state.enable_overlay_activity and self.indicate_activity:
@@ -631,11 +627,10 @@ class UI:
                     if report_system is not None:
                         self.bgstally.overlay.display_message("system_info", self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, [report_system['System']], lang=self.bgstally.state.discord_lang), fit_to_text=True)
                     self.activity_system_address = None
+                    self.panel_pinned_systems.invalidate()
                 else:
                     # Report pinned systems
-                    pinned_systems:list = current_activity.get_pinned_systems()
-                    if pinned_systems is not None and pinned_systems != []:
-                        self.bgstally.overlay.display_message("system_info", self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, pinned_systems, lang=self.bgstally.state.discord_lang), fit_to_text=True, ttl_override=TIME_WORKER_PERIOD_S + 2) # Overlay pinned systems message
+                    self.panel_pinned_systems.update()
 
             system_and_station_info:str = ""
 
@@ -654,6 +649,7 @@ class UI:
 
             if system_and_station_info != "":
                 self.bgstally.overlay.display_message("system_info", system_and_station_info, fit_to_text=True)
+                self.panel_pinned_systems.invalidate()
 
             # CMDR Information
             if self.bgstally.state.enable_overlay_cmdr and self.report_cmdr_data is not None:
@@ -675,54 +671,149 @@ class UI:
 
             # Objectives
             if self.bgstally.state.enable_overlay_objectives and self.bgstally.objectives_manager.get_objectives() != []:
-                mode: int = self.bgstally.state.overlay_objectives_mode
-                objectives_text: str = ""
-                show_objectives: bool = False
-
-                # Check if we're within TIME_TICK_OBJECTIVES_REFRESH_S  of objectives changing (for modes 0-2)
-                time_since_change: timedelta|None = None
-                if self.bgstally.objectives_manager.objectives_changed_timestamp:
-                    time_since_change = datetime.now(UTC) - self.bgstally.objectives_manager.objectives_changed_timestamp
-
-                match mode:
-                    case 0:  # Notification for new objectives
-                        if (time_since_change is not None and
-                            time_since_change.total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S and
-                            self.bgstally.objectives_manager.objectives_change_type == "new"):
-                            objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_notification()
-                            show_objectives = True
-
-                    case 1:  # Full text for new objectives
-                        if (time_since_change is not None and
-                            time_since_change.total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S and
-                            self.bgstally.objectives_manager.objectives_change_type == "new"):
-                            objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_details(use_changed_objective=True)
-                            show_objectives = True
-
-                    case 2: # Full text for new and updated objectives
-                        if time_since_change is not None and time_since_change.total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S:
-                            objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_details(use_changed_objective=True)
-                            show_objectives = True
-
-                    case 3:  # Always show top priority objective
-                        objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_details(use_changed_objective=False)
-                        show_objectives = True
-
-                    case 4:  # Always show all objectives
-                        objectives_text = self.bgstally.objectives_manager.get_overlay_objectives()
-                        show_objectives = True
-
-                if show_objectives and objectives_text:
-                    self.bgstally.overlay.display_message("objectives", objectives_text, fit_to_text=True, title=self.bgstally.objectives_manager.get_title())
+                self.panel_objectives.update()
 
             # Colonisation
             if self.bgstally.state.enable_overlay_colonisation:
-                colonisation_text: str = self.window_progress.as_text(False)
-                self.bgstally.overlay.display_message("colonisation", colonisation_text, fit_to_text=True)
+                self.panel_colonisation.update()
 
             if self.bgstally.state.enable_overlay_carrier:
-                carrier_text: str = self.bgstally.fleet_carrier.update_overlay()
-                self.bgstally.overlay.display_message("fleetcarrier", carrier_text, fit_to_text=True)
+                self.panel_carrier.update()
+
+
+    def _render_tick_panel(self) -> dict:
+        """
+        Build the overlay galaxy tick panel
+        """
+        return {'message': _("Galaxy Tick: {tick_time}").format(tick_time=self.bgstally.tick.get_formatted(DATETIME_FORMAT_OVERLAY)), 'fit_to_text': True} # LANG: Overlay galaxy tick message
+
+
+    def _get_system_tick_panel_inputs(self) -> tuple:
+        """
+        Get the data the overlay system tick panel is built from
+        """
+        current_activity: Activity|None = self.bgstally.activity_manager.get_current_activity()
+        current_system: dict|None = current_activity.get_current_system() if current_activity is not None else None
+        return (current_system.get('TickTime') if current_system is not None else None, self.bgstally.tick.tick_time)
+
+
+    def _render_system_tick_panel(self) -> dict|None:
+        """
+        Build the overlay system tick panel
+        """
+        system_tick: str|None = self._get_system_tick_panel_inputs()[0]
+        if system_tick is None or system_tick == "": return None
+
+        system_tick_datetime: datetime = datetime.strptime(system_tick, DATETIME_FORMAT_ACTIVITY)
+        system_tick_datetime = system_tick_datetime.replace(tzinfo=UTC)
+
+        tick_text: str = _("System Tick: {tick_time}").format(tick_time=self.bgstally.tick.get_formatted(DATETIME_FORMAT_OVERLAY, tick_time = system_tick_datetime)) # LANG: Overlay system tick message
+
+        if system_tick_datetime < self.bgstally.tick.tick_time:
+            return {'message': tick_text, 'fit_to_text': True, 'text_colour_override': "#FF0000"}
+        else:
+            return {'message': tick_text, 'fit_to_text': True}
+
+
+    def _render_tickwarn_panel(self) -> dict|None:
+        """
+        Build the overlay tick warning panel
+        """
+        minutes_delta:int = int((datetime.now(UTC) - self.bgstally.tick.next_predicted()) / timedelta(minutes=1))
+        if datetime.now(UTC) > self.bgstally.tick.next_predicted() + timedelta(minutes = TIME_TICK_ALERT_M):
+            return {'message': _("Tick {minutes_delta}m Overdue (Estimated)").format(minutes_delta=minutes_delta), 'fit_to_text': True} # LANG: Overlay overdue tick message
+        elif datetime.now(UTC) > self.bgstally.tick.next_predicted():
+            return {'message': _("Past Estimated Tick Time"), 'fit_to_text': True, 'text_colour_override': "#FFA500"} # LANG: Overlay past estimated time tick message
+        elif datetime.now(UTC) > self.bgstally.tick.next_predicted() - timedelta(minutes = TIME_TICK_ALERT_M):
+            return {'message': _("Within {minutes_to_tick}m of Next Tick (Estimated)").format(minutes_to_tick=TIME_TICK_ALERT_M), 'fit_to_text': True, 'text_colour_override': "yellow"} # LANG: Overlay close to tick message
+        else:
+            return None
+
+
+    def _get_pinned_systems_panel_inputs(self) -> tuple:
+        """
+        Get the data the overlay pinned systems panel is built from
+        """
+        current_activity: Activity|None = self.bgstally.activity_manager.get_current_activity()
+        if current_activity is None: return (None,)
+
+        return (current_activity.tick_id, current_activity.revision, tuple(current_activity.get_pinned_systems()), self.bgstally.state.discord_lang)
+
+
+    def _render_pinned_systems_panel(self) -> dict|None:
+        """
+        Build the overlay pinned systems panel
+        """
+        current_activity: Activity|None = self.bgstally.activity_manager.get_current_activity()
+        if current_activity is None: return None
+
+        pinned_systems:list = current_activity.get_pinned_systems()
+        if pinned_systems is None or pinned_systems == []: return None
+
+        return {'message': self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, pinned_systems, lang=self.bgstally.state.discord_lang),
+                'fit_to_text': True, 'ttl_override': TIME_WORKER_PERIOD_S + 2} # Overlay pinned systems message
+
+
+    def _get_objectives_panel_inputs(self) -> tuple:
+        """
+        Get the data the overlay objectives panel is built from. Objectives expire, so the panel is also rebuilt every minute.
+        """
+        objectives_manager = self.bgstally.objectives_manager
+        current_activity: Activity|None = self.bgstally.activity_manager.get_current_activity()
+        now: datetime = datetime.now(UTC)
+        recently_changed: bool = objectives_manager.objectives_changed_timestamp is not None and \
+                                 (now - objectives_manager.objectives_changed_timestamp).total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S
+
+        return (self.bgstally.state.overlay_objectives_mode, objectives_manager.objectives_changed_timestamp, objectives_manager.objectives_change_type, recently_changed,
+                current_activity.tick_id if current_activity is not None else None, current_activity.revision if current_activity is not None else None,
+                now.replace(second=0, microsecond=0))
+
+
+    def _render_objectives_panel(self) -> dict|None:
+        """
+        Build the overlay objectives panel
+        """
+        mode: int = self.bgstally.state.overlay_objectives_mode
+        objectives_text: str = ""
+        show_objectives: bool = False
+
+        # Check if we're within TIME_TICK_OBJECTIVES_REFRESH_S  of objectives changing (for modes 0-2)
+        time_since_change: timedelta|None = None
+        if self.bgstally.objectives_manager.objectives_changed_timestamp:
+            time_since_change = datetime.now(UTC) - self.bgstally.objectives_manager.objectives_changed_timestamp
+
+        match mode:
+            case 0:  # Notification for new objectives
+                if (time_since_change is not None and
+                    time_since_change.total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S and
+                    self.bgstally.objectives_manager.objectives_change_type == "new"):
+                    objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_notification()
+                    show_objectives = True
+
+            case 1:  # Full text for new objectives
+                if (time_since_change is not None and
+                    time_since_change.total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S and
+                    self.bgstally.objectives_manager.objectives_change_type == "new"):
+                    objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_details(use_changed_objective=True)
+                    show_objectives = True
+
+            case 2: # Full text for new and updated objectives
+                if time_since_change is not None and time_since_change.total_seconds() <= TIME_TICK_OBJECTIVES_REFRESH_S:
+                    objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_details(use_changed_objective=True)
+                    show_objectives = True
+
+            case 3:  # Always show top priority objective
+                objectives_text = self.bgstally.objectives_manager.get_overlay_objectives_details(use_changed_objective=False)
+                show_objectives = True
+
+            case 4:  # Always show all objectives
+                objectives_text = self.bgstally.objectives_manager.get_overlay_objectives()
+                show_objectives = True
+
+        if not show_objectives or not objectives_text: return None
+
+        return {'message': objectives_text, 'fit_to_text': True, 'title': self.bgstally.objectives_manager.get_title()}
+
 
     def _previous_ticks_popup(self):
         """
@@ -745,6 +836,7 @@ class UI:
         """
         Display the appropriate activity data window, using data from the passed in activity object
         """
+        self.bgstally.activity_manager.load_activity(activity)
         existing_activity_window:WindowActivity|None = self.window_activity.get(activity.tick_id)
         if existing_activity_window is not None:
             existing_activity_window.show(activity)
@@ -786,6 +878,20 @@ class UI:
         self.window_colonisation.show()
 
 
+    def _show_profiler_window(self):
+        """
+        Display the journal profiler window
+        """
+        self.window_profiler.show()
+
+
+    def _show_journalimport_window(self):
+        """
+        Display the journal import window
+        """
+        self.window_journalimport.show()
+
+
     def _confirm_force_tick(self):
         """
         Force a tick when user clicks button
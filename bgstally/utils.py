@@ -1,16 +1,18 @@
 import functools
 import re
+import sys
 import traceback
 import threading
-from datetime import datetime
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
 from math import floor
 from copy import deepcopy
 from os import listdir, path
 from os.path import join
 from pathlib import Path
 from re import Pattern, compile, Match
-from typing import Any, Callable, Tuple
-from bgstally.constants import DATETIME_FORMAT_JSON, DATETIME_FORMAT_CARRIER
+from typing import Any, Callable, Iterable, Tuple
+from bgstally.constants import DATETIME_FORMAT_JSON, DATETIME_FORMAT_CARRIER, DATETIME_FORMAT_JOURNAL
 
 import semantic_version
 
@@ -24,6 +26,8 @@ PAT_HUMAN_READABLE_NUM_OR_PERC:Pattern = compile(r"^(\d*\.?\d*)([KkMmBbTt%]?)$")
 
 # Language codes for languages that should be omitted
 BLOCK_LANGS: list = []
+# Maximum number of strings translated into the current EDMC language that are remembered
+TRANSLATION_CACHE_SIZE = 2048
 # Assign the current EDMC version to the variable.
 edmc_version: semantic_version.Version = appversion()
 
@@ -67,6 +71,9 @@ def __(string: str, lang: str|None) -> str:
     it safely returns the string translated in the plugin's currently active language
     or falls back to the original string.
 
+    The translations for each language are loaded from the plugin's strings file once, when first needed, and
+    are then looked up without any further file access. Call clear_translation_cache() to load them again.
+
     Args:
         string (str): The string to translate.
         lang (str): The language code to use for translation.
@@ -74,9 +81,9 @@ def __(string: str, lang: str|None) -> str:
     Returns:
         str: The translated string, or the original string if translation is not possible.
     """
-    # Return the original string if the language is empty, None, or the fallback language.
+    # Return the string translated into the current language if the language is empty.
     if lang == "":
-        return _(string)  # LANG: Ignore
+        return _translate_current(string)
 
     # Return original string and log warning if language is None.
     elif lang is None:
@@ -88,7 +95,12 @@ def __(string: str, lang: str|None) -> str:
     elif lang == translations_obj.FALLBACK:
         return string
 
-    # Attempt to translate the string using the translations object.
+    table: dict[str, str]|None = _translation_tables.get(lang)
+    if table is None: table = _load_translation_table(lang)
+
+    if table: return table.get(string, string)
+
+    # Fall back to the translations object if the table couldn't be loaded
     try:
         return translations_obj.translate(string, context=__file__, lang=lang)
     except KeyError as e:
@@ -99,18 +111,70 @@ def __(string: str, lang: str|None) -> str:
         return string
 
 
-def available_langs() -> dict[str | None, str]:
-    """Return a dict containing our available plugin language names by code.
+def clear_translation_cache() -> None:
+    """Forget all remembered translations, so they are loaded again when next needed. Call this when the language
+    used for translations changes.
+    """
+    _translation_tables.clear()
+    _translate_current.cache_clear()
+
+
+# Flat tables of translated strings by original string, indexed by language code
+_translation_tables: dict[str, dict[str, str]] = {}
+
+
+@functools.lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
+def _translate_current(string: str) -> str:
+    """Translate a string into the plugin's currently active language, remembering the result
+
+    Args:
+        string (str): The string to translate.
 
     Returns:
-        dict[str | None, str]: The available language names indexed by language code
+        str: The translated string
     """
-    l10n_path:str | Path
+    return _(string)  # LANG: Ignore
+
+
+def _load_translation_table(lang: str) -> dict[str, str]:
+    """Load all the plugin's translated strings for a language into a flat table
+
+    Args:
+        lang (str): The language code
+
+    Returns:
+        dict[str, str]: The translated strings by original string, which is empty if they can't be loaded
+    """
+    table: dict[str, str] = {}
+
+    try:
+        table = dict(translations_obj.contents(lang, _get_l10n_path()))
+    except (AttributeError, KeyError, OSError) as e:
+        Debug.logger.error(f"Unable to load translations for '{lang}': {e}")
+
+    _translation_tables[lang] = table
+    return table
+
+
+def _get_l10n_path() -> str | Path:
+    """Get the path to the plugin's translation files, in the form expected by the EDMC translations object
 
+    Returns:
+        str | Path: The path to the translation files
+    """
     if edmc_version < semantic_version.Version('5.12.0'):
-        l10n_path = join(bgstally.globals.this.plugin_dir, l10n.LOCALISATION_DIR)
+        return join(bgstally.globals.this.plugin_dir, l10n.LOCALISATION_DIR)
     else:
-        l10n_path = Path(join(bgstally.globals.this.plugin_dir, l10n.LOCALISATION_DIR))
+        return Path(join(bgstally.globals.this.plugin_dir, l10n.LOCALISATION_DIR))
+
+
+def available_langs() -> dict[str | None, str]:
+    """Return a dict containing our available plugin language names by code.
+
+    Returns:
+        dict[str | None, str]: The available language names indexed by language code
+    """
+    l10n_path:str | Path = _get_l10n_path()
 
     available: set[str] = {x[:-len('.strings')] for x in listdir(l10n_path)
                            if x.endswith('.strings')
@@ -367,31 +431,77 @@ def add_dicts(d1: dict, d2: dict) -> dict:
     """
 
     # Copy on first entry to the function
-    result: dict = deepcopy(d1)
-
-    def _recursive_add(d1: dict, d2: dict) -> dict:
-        for d2k, d2v in d2.items():
-            d1v = d1.get(d2k)
-            if isinstance(d1v, dict):
-                # We have a dict in d1
-                if isinstance(d2v, dict):
-                    # We have a dict in d2. Recursively merge nested dictionaries (otherwise, just use d1 dict).
-                    d1[d2k] = _recursive_add(d1v, d2v)
-            elif isinstance(d2v, dict):
-                # We have a dict in d2, but not in d1. Copy the d2 dict into d1.
-                d1[d2k] = deepcopy(d2v)
-            elif d1v is None:
-                # No matching key in d1. Copy the d2 value into d1.
-                d1[d2k] = deepcopy(d2v)
-            elif is_number(d1v) and is_number(d2v):
-                # Add numeric values
-                d1[d2k] = d1v + d2v
-
-            # For non-numeric values, do nothing so d1 wins
-
-        return d1
-
-    return _recursive_add(result, d2)
+    return _add_dict_into(deepcopy(d1), d2)
+
+
+def sum_dicts(dicts: Iterable[dict]) -> dict:
+    """Sum a sequence of dicts in order, with the same rules as add_dicts(), i.e. the result is equal to
+    add_dicts(add_dicts(add_dicts({}, d1), d2), d3)... None of the dicts are modified by this function.
+
+    Unlike repeatedly calling add_dicts(), the running total is not copied at each step, so the cost is
+    proportional to the total size of the dicts rather than the number of dicts multiplied by the size of the result.
+
+    Args:
+        dicts (Iterable[dict]): The dicts to sum
+
+    Returns:
+        dict: The summed dict
+    """
+    result: dict = {}
+    for d in dicts:
+        _add_dict_into(result, d)
+
+    return result
+
+
+def copy_json(data: Any) -> Any:
+    """Copy JSON style data, i.e. nested dicts and lists of immutable values. This is much faster than deepcopy(),
+    as there is no memo and only dicts and lists are copied, so it can be used to take a snapshot of data on the
+    main thread that is encoded later on another thread.
+
+    Args:
+        data (Any): The data to copy
+
+    Returns:
+        Any: The copy
+    """
+    if type(data) is dict: return {key: copy_json(value) for key, value in data.items()}
+    if type(data) is list: return [copy_json(value) for value in data]
+    return data
+
+
+def _add_dict_into(d1: dict, d2: dict) -> dict:
+    """Sum each individual numeric value from d2 into d1, modifying d1. Any values taken from d2 are copied,
+    so d2 is never modified and never shares data with d1.
+
+    Args:
+        d1 (dict): The dict to add to
+        d2 (dict): The dict to add
+
+    Returns:
+        dict: d1
+    """
+    for d2k, d2v in d2.items():
+        d1v = d1.get(d2k)
+        if isinstance(d1v, dict):
+            # We have a dict in d1
+            if isinstance(d2v, dict):
+                # We have a dict in d2. Recursively merge nested dictionaries (otherwise, just use d1 dict).
+                d1[d2k] = _add_dict_into(d1v, d2v)
+        elif isinstance(d2v, dict):
+            # We have a dict in d2, but not in d1. Copy the d2 dict into d1.
+            d1[d2k] = deepcopy(d2v)
+        elif d1v is None:
+            # No matching key in d1. Copy the d2 value into d1.
+            d1[d2k] = deepcopy(d2v)
+        elif is_number(d1v) and is_number(d2v):
+            # Add numeric values
+            d1[d2k] = d1v + d2v
+
+        # For non-numeric values, do nothing so d1 wins
+
+    return d1
+
 
 def str_truncate(s:str, length:int = 20, elipsis:str = '…', loc:str = 'right') -> str:
     """ Truncate a string to a specified length, adding an ellipsis if the string is longer than the specified length. """
@@ -409,6 +519,20 @@ def str_truncate(s:str, length:int = 20, elipsis:str = '…', loc:str = 'right')
             return s[:length - len(elipsis)] + elipsis
 
 
+@functools.lru_cache(maxsize=64)
+def parse_journal_timestamp(timestamp: str) -> datetime:
+    """Parse a journal timestamp. Recently parsed timestamps are cached, so the timestamp of an event is only parsed once
+    however many handlers need it, and timestamps kept from earlier events don't need parsing again.
+
+    Args:
+        timestamp (str): The journal timestamp
+
+    Returns:
+        datetime: The timestamp as a UTC datetime
+    """
+    return datetime.strptime(timestamp, DATETIME_FORMAT_JOURNAL).replace(tzinfo=UTC)
+
+
 def catch_exceptions(func):
     """ Generic exception handler called via decorators """
     @functools.wraps(func)
@@ -466,3 +590,105 @@ class DelayQueue:
         if key in self.queue:
             self.queue[key].cancel()
             del self.queue[key]
+
+
+class ExpiringDict:
+    """
+    A dict that is limited in size and in the age of its entries, for state that is only needed for a short time but would
+    otherwise grow for as long as EDMC is running. Ages are measured using journal timestamps rather than the clock, so
+    replaying old journals expires entries the same way as live play. When full, the least recently set entry is dropped.
+    """
+    def __init__(self, max_entries: int, max_age: timedelta):
+        self.max_entries: int = max_entries
+        self.max_age: timedelta = max_age
+        self.expired: int = 0
+        self.evicted: int = 0
+        self.peak: int = 0
+        self._entries: OrderedDict[Any, tuple[Any, datetime]] = OrderedDict() # Value and time set, least recently set first
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._entries
+
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get an entry
+
+        Args:
+            key (Any): The key
+            default (Any, optional): The value to return if there is no entry. Defaults to None.
+
+        Returns:
+            Any: The value
+        """
+        entry: tuple|None = self._entries.get(key)
+        return default if entry is None else entry[0]
+
+
+    def set(self, key: Any, value: Any, timestamp: datetime) -> None:
+        """Set an entry, and expire any entries that are too old
+
+        Args:
+            key (Any): The key
+            value (Any): The value
+            timestamp (datetime): The time the entry was set, normally the journal event timestamp
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (value, timestamp)
+        self.expire(timestamp)
+
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+        self.peak = max(self.peak, len(self._entries))
+
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        """Remove an entry and return it
+
+        Args:
+            key (Any): The key
+            default (Any, optional): The value to return if there is no entry. Defaults to None.
+
+        Returns:
+            Any: The value
+        """
+        entry: tuple|None = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+
+    def clear(self) -> None:
+        """
+        Remove all entries
+        """
+        self._entries.clear()
+
+
+    def expire(self, timestamp: datetime) -> None:
+        """Remove all entries that are too old
+
+        Args:
+            timestamp (datetime): The current time, normally the latest journal event timestamp
+        """
+        oldest: datetime = timestamp - self.max_age
+        while len(self._entries) > 0:
+            key, entry = next(iter(self._entries.items()))
+            if entry[1] >= oldest: break
+            del self._entries[key]
+            self.expired += 1
+
+
+    def get_stats(self) -> dict:
+        """Get statistics for this dict, including its approximate memory use
+
+        Returns:
+            dict: The current and peak number of entries, the number expired and evicted, and the approximate size in bytes
+        """
+        size_bytes: int = sys.getsizeof(self._entries) + sum(sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[0])
+                                                             for key, entry in self._entries.items())
+        return {'entries': len(self._entries), 'peak': self.peak, 'expired': self.expired, 'evicted': self.evicted, 'size_bytes': size_bytes}
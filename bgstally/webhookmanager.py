@@ -6,8 +6,9 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from bgstally.bgstally import BGSTally
 
-from bgstally.constants import FOLDER_OTHER_DATA, DiscordChannel
+from bgstally.constants import FOLDER_OTHER_DATA, DataStore, DiscordChannel
 from bgstally.debug import Debug
+from bgstally.utils import copy_json
 from thirdparty.colors import *
 
 FILENAME = "webhooks.json"
@@ -41,9 +42,24 @@ class WebhookManager:
         """
         Save state to file
         """
+        self.write(self.snapshot())
+
+
+    def snapshot(self) -> dict:
+        """
+        Take a copy of our state, ready to write
+        """
+        return copy_json(self._as_dict())
+
+
+    def write(self, snapshot: dict):
+        """
+        Write a snapshot of our state to file
+        """
         file = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        data = json.dumps(snapshot)
         with open(file, 'w') as outfile:
-            json.dump(self._as_dict(), outfile)
+            outfile.write(data)
 
 
     def set_webhooks_from_list(self, data: list):
@@ -56,7 +72,7 @@ class WebhookManager:
         self.data['webhooks'] = []
 
         if data is None or data == []:
-            self.save()
+            self.bgstally.persistence_manager.mark_dirty(DataStore.WEBHOOKS)
             return
 
         for webhook in data:
@@ -73,7 +89,7 @@ class WebhookManager:
                     DiscordChannel.POWERPLAY: webhook[8]
                 })
 
-        self.save()
+        self.bgstally.persistence_manager.mark_dirty(DataStore.WEBHOOKS)
 
 
     def get_webhooks_as_dict(self, channel:DiscordChannel|None = None) -> list:
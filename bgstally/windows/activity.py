@@ -23,6 +23,7 @@ from thirdparty.ScrollableNotebook import ScrollableNotebook
 from thirdparty.Tooltip import ToolTip
 
 LIMIT_TABS = 60
+TIME_DISCORD_PREVIEW_DELAY_MS = 250
 
 
 class WindowActivity:
@@ -35,6 +36,7 @@ class WindowActivity:
         self.activity: Activity = activity
         self.toplevel: tk.Toplevel|None = None
         self.window_geometry: dict|None = None
+        self.discord_preview_after_id: str|None = None
 
         self.image_tab_active_enabled: PhotoImage = PhotoImage(file = path.join(self.bgstally.plugin_dir, FOLDER_ASSETS, "tab_active_enabled.png"))
         self.image_tab_active_part_enabled: PhotoImage = PhotoImage(file = path.join(self.bgstally.plugin_dir, FOLDER_ASSETS, "tab_active_part_enabled.png"))
@@ -57,6 +59,7 @@ class WindowActivity:
         # If we already have a window, save its geometry and close it before we create a new one.
         if self.toplevel is not None and self.toplevel.winfo_exists():
             self._store_window_geometry()
+            self._cancel_discord_field_update()
             self.toplevel.destroy()
 
         self.toplevel = tk.Toplevel(self.bgstally.ui.frame)
@@ -412,7 +415,7 @@ class WindowActivity:
 
             tab_index += 1
 
-        self._update_discord_field(activity)
+        self._render_discord_field(activity)
 
         # Ignore all scroll wheel events on spinboxes, to avoid accidental inputs
         self.toplevel.bind_class('TSpinbox', '<MouseWheel>', lambda event : "break")
@@ -425,7 +428,9 @@ class WindowActivity:
         Callback for when user closes the window
         """
         self._store_window_geometry()
-        if self.toplevel: self.toplevel.destroy()
+        if self.toplevel:
+            self._cancel_discord_field_update()
+            self.toplevel.destroy()
 
 
     def _store_window_geometry(self):
@@ -458,9 +463,33 @@ class WindowActivity:
 
 
     def _update_discord_field(self, activity: Activity):
+        """
+        Schedule an update of the contents of the Discord text field. Updates are delayed so that a burst of changes, such
+        as typing in the notes field, only renders the preview once
+        """
+        if self.toplevel is None or not self.toplevel.winfo_exists(): return
+
+        self._cancel_discord_field_update()
+        self.discord_preview_after_id = self.toplevel.after(TIME_DISCORD_PREVIEW_DELAY_MS, self._render_discord_field, activity)
+
+
+    def _cancel_discord_field_update(self):
+        """
+        Cancel any scheduled update of the Discord text field
+        """
+        if self.discord_preview_after_id is None: return
+
+        self.toplevel.after_cancel(self.discord_preview_after_id)
+        self.discord_preview_after_id = None
+
+
+    def _render_discord_field(self, activity: Activity):
         """
         Update the contents of the Discord text field
         """
+        self.discord_preview_after_id = None
+        if self.toplevel is None or not self.toplevel.winfo_exists(): return
+
         text: str = self.bgstally.formatter_manager.get_current_formatter().get_text(activity, self.bgstally.state.DiscordActivity.get(), lang=self.bgstally.state.discord_lang)
         text += self.bgstally.formatter_manager.get_current_formatter().get_text(activity, DiscordActivity.POWERPLAY, lang=self.bgstally.state.discord_lang)
 
@@ -13,7 +13,7 @@ from requests import Response
 from ttkHyperlinkLabel import HyperlinkLabel
 
 from bgstally.api import API
-from bgstally.constants import FOLDER_ASSETS, FONT_HEADING_2, FONT_SMALL
+from bgstally.constants import FOLDER_ASSETS, FONT_HEADING_2, FONT_SMALL, DataStore
 from bgstally.debug import Debug
 from bgstally.requestmanager import BGSTallyRequest
 from bgstally.utils import _, string_to_alphanumeric
@@ -212,6 +212,7 @@ class WindowAPI:
         self.api.key = string_to_alphanumeric(self.entry_apikey.get())[:128]
         self.api.activities_enabled = self.cb_apiactivities.instate(['selected'])
         self.api.events_enabled = self.cb_apievents.instate(['selected'])
+        self.bgstally.persistence_manager.mark_dirty(DataStore.APIS)
         self._update()
 
 
@@ -288,6 +289,7 @@ class WindowAPI:
         User has clicked the approve button
         """
         self.api.user_approved = True
+        self.bgstally.persistence_manager.mark_dirty(DataStore.APIS)
         self._update()
         self.toplevel.after(1000, partial(self.toplevel.destroy))
 
@@ -301,5 +303,6 @@ class WindowAPI:
         User has clicked the don't approve button
         """
         self.api.user_approved = False
+        self.bgstally.persistence_manager.mark_dirty(DataStore.APIS)
         self._update()
         self.toplevel.after(1000, partial(self.toplevel.destroy))
@@ -184,11 +184,8 @@ class WindowCMDRs:
         Delete the currently selected CMDRs
         """
         selected_items:list = treeview.selection()
+        self.bgstally.target_manager.delete_targets([int(selected_iid) for selected_iid in selected_items])
         for selected_iid in selected_items:
-           for i in range(len(self.target_data)):
-               if int(self.target_data[i]['index']) == int(selected_iid):
-                   self.target_data.pop(i) # Remove the corresponding item
-                   break
            treeview.delete(int(selected_iid))
 
         self.selected_cmdr = None
@@ -0,0 +1,136 @@
+import tkinter as tk
+from datetime import UTC, datetime, timedelta
+from tkinter import ttk
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.activitymanager import KEEP_CURRENT_ACTIVITIES
+from bgstally.constants import COLOUR_HEADING_1, FONT_HEADING_1
+from bgstally.journalimporter import JournalImportResult
+from bgstally.utils import _
+
+IMPORT_DAYS_MAX = 365
+
+
+class WindowJournalImport:
+    """
+    Handles the journal import window
+    """
+
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+
+        self.toplevel: tk.Toplevel = None
+        self.var_days: tk.IntVar = None
+        self.var_status: tk.StringVar = None
+        self.progressbar: ttk.Progressbar = None
+        self.btn_start: tk.Button = None
+        self.btn_cancel: tk.Button = None
+
+
+    def show(self):
+        """
+        Show our window
+        """
+        if self.toplevel is not None and self.toplevel.winfo_exists():
+            self.toplevel.lift()
+            return
+
+        self.toplevel = tk.Toplevel(self.bgstally.ui.frame)
+        self.toplevel.title(_("{plugin_name} - Import Journals").format(plugin_name=self.bgstally.plugin_name)) # LANG: Journal import window title
+        self.toplevel.iconphoto(False, self.bgstally.ui.image_logo_bgstally_32, self.bgstally.ui.image_logo_bgstally_16)
+        self.toplevel.resizable(False, False)
+
+        frm_container: ttk.Frame = ttk.Frame(self.toplevel)
+        frm_container.pack(fill=tk.BOTH, padx=5, pady=5, expand=1)
+
+        current_row: int = 0
+        ttk.Label(frm_container, text=_("Import Activity from Journals"), font=FONT_HEADING_1, foreground=COLOUR_HEADING_1).grid(row=current_row, column=0, columnspan=2, sticky=tk.W, pady=4); current_row += 1 # LANG: Heading on journal import window
+        ttk.Label(frm_container, wraplength=500, justify=tk.LEFT,
+                  text=_("Reconstruct your activity for past ticks from the game journal files, for example after a fresh install or when EDMC wasn't running. Ticks that were recorded while EDMC was running are not changed. Tick times for the imported period are estimated.")).grid(row=current_row, column=0, columnspan=2, sticky=tk.W, pady=4); current_row += 1 # LANG: Label on journal import window
+
+        ttk.Label(frm_container, text=_("Days to import")).grid(row=current_row, column=0, sticky=tk.W, pady=4) # LANG: Label on journal import window
+        self.var_days = tk.IntVar(value=KEEP_CURRENT_ACTIVITIES)
+        ttk.Spinbox(frm_container, from_=1, to=IMPORT_DAYS_MAX, textvariable=self.var_days, width=5).grid(row=current_row, column=1, sticky=tk.W, pady=4); current_row += 1
+
+        self.progressbar = ttk.Progressbar(frm_container, orient=tk.HORIZONTAL, mode='determinate', length=500)
+        self.progressbar.grid(row=current_row, column=0, columnspan=2, sticky=tk.EW, pady=4); current_row += 1
+
+        self.var_status = tk.StringVar(value="")
+        ttk.Label(frm_container, textvariable=self.var_status).grid(row=current_row, column=0, columnspan=2, sticky=tk.W, pady=4); current_row += 1
+
+        frm_buttons: ttk.Frame = ttk.Frame(frm_container)
+        frm_buttons.grid(row=current_row, column=0, columnspan=2, sticky=tk.E, pady=4)
+        self.btn_start = tk.Button(frm_buttons, text=_("Start Import"), command=self._start) # LANG: Button on journal import window
+        self.btn_start.pack(side=tk.LEFT, padx=5)
+        self.btn_cancel = tk.Button(frm_buttons, text=_("Cancel"), command=self._cancel) # LANG: Button on journal import window
+        self.btn_cancel.pack(side=tk.LEFT, padx=5)
+
+        self._update_buttons()
+
+
+    def _start(self):
+        """
+        Start the import
+        """
+        try:
+            days: int = max(1, min(IMPORT_DAYS_MAX, self.var_days.get()))
+        except tk.TclError:
+            days = KEEP_CURRENT_ACTIVITIES
+
+        self.progressbar['value'] = 0
+        self.var_status.set(_("Reading journal files...")) # LANG: Status on journal import window
+        self.bgstally.journal_importer.start(datetime.now(UTC) - timedelta(days=days), self._progress, self._complete)
+        self._update_buttons()
+
+
+    def _cancel(self):
+        """
+        Cancel the import, or close the window if not importing
+        """
+        if self.bgstally.journal_importer.running():
+            self.bgstally.journal_importer.cancel()
+            self.var_status.set(_("Cancelling...")) # LANG: Status on journal import window
+        else:
+            self.toplevel.destroy()
+
+
+    def _progress(self, done: int, total: int):
+        """
+        Progress has been made reading journal files
+        """
+        if self.toplevel is None or not self.toplevel.winfo_exists(): return
+
+        self.progressbar['maximum'] = max(total, 1)
+        self.progressbar['value'] = done
+        self.var_status.set(_("Read {done} of {total} journal files").format(done=done, total=total)) # LANG: Status on journal import window
+
+
+    def _complete(self, result: JournalImportResult):
+        """
+        The import has finished
+        """
+        if self.toplevel is None or not self.toplevel.winfo_exists(): return
+
+        if result.failed:
+            self.var_status.set(_("Import failed, please check the log for details")) # LANG: Status on journal import window
+        elif result.cancelled:
+            self.var_status.set(_("Import cancelled, nothing was changed")) # LANG: Status on journal import window
+        elif result.unchanged:
+            self.var_status.set(_("All journal files have already been imported")) # LANG: Status on journal import window
+        else:
+            self.progressbar['value'] = self.progressbar['maximum']
+            self.var_status.set(_("Imported {ticks} ticks from {files} journal files").format(ticks=len(result.activities), files=result.files)) # LANG: Status on journal import window
+
+        self._update_buttons()
+
+
+    def _update_buttons(self):
+        """
+        Enable and disable the buttons depending on whether an import is running
+        """
+        running: bool = self.bgstally.journal_importer.running()
+        self.btn_start.configure(state=tk.DISABLED if running else tk.NORMAL)
+        self.btn_cancel.configure(text=_("Cancel") if running else _("Close")) # LANG: Button on journal import window
@@ -0,0 +1,140 @@
+import tkinter as tk
+from tkinter import filedialog, ttk
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bgstally.bgstally import BGSTally
+
+from bgstally.constants import COLOUR_HEADING_1, FONT_HEADING_1
+from bgstally.debug import Debug
+from bgstally.profiler import HISTOGRAM_BUCKETS_MS
+from bgstally.utils import _
+from bgstally.widgets import TreeviewPlus
+
+TIME_REFRESH_MS = 2000
+DATETIME_FORMAT_PROFILER = "%Y-%m-%d %H:%M:%S"
+
+
+class WindowProfiler:
+    """
+    Handles the journal profiler window
+    """
+
+    def __init__(self, bgstally: 'BGSTally'):
+        self.bgstally: BGSTally = bgstally
+
+        self.toplevel: tk.Toplevel = None
+        self.treeview: TreeviewPlus = None
+        self.var_enabled: tk.BooleanVar = None
+
+
+    def show(self):
+        """
+        Show our window
+        """
+        if self.toplevel is not None and self.toplevel.winfo_exists():
+            self.toplevel.lift()
+            return
+
+        self.toplevel = tk.Toplevel(self.bgstally.ui.frame)
+        self.toplevel.title(_("{plugin_name} - Profiler").format(plugin_name=self.bgstally.plugin_name)) # LANG: Profiler window title
+        self.toplevel.iconphoto(False, self.bgstally.ui.image_logo_bgstally_32, self.bgstally.ui.image_logo_bgstally_16)
+        self.toplevel.geometry("1000x600")
+        self.toplevel.minsize(600, 300)
+
+        frm_container: ttk.Frame = ttk.Frame(self.toplevel)
+        frm_container.pack(fill=tk.BOTH, expand=1)
+
+        ttk.Label(frm_container, text=_("Journal Event Timings"), font=FONT_HEADING_1, foreground=COLOUR_HEADING_1).pack(anchor=tk.W, padx=5, pady=5) # LANG: Label on profiler window
+
+        frm_list: ttk.Frame = ttk.Frame(frm_container)
+        frm_list.pack(fill=tk.BOTH, padx=5, pady=5, expand=1)
+
+        frm_buttons: ttk.Frame = ttk.Frame(frm_container)
+        frm_buttons.pack(fill=tk.X, padx=5, pady=5, side=tk.BOTTOM)
+
+        histogram_title: str = " / ".join([f"{limit}" for limit in HISTOGRAM_BUCKETS_MS] + [">"])
+        column_info: list = [{'title': _("Event"), 'type': "name", 'align': tk.W, 'stretch': tk.YES, 'width': 150}, # LANG: Profiler window column title
+                             {'title': _("Handler"), 'type': "name", 'align': tk.W, 'stretch': tk.YES, 'width': 250}, # LANG: Profiler window column title
+                             {'title': _("Count"), 'type': "num", 'align': tk.E, 'stretch': tk.NO, 'width': 60}, # LANG: Profiler window column title
+                             {'title': _("Mean ms"), 'type': "num", 'align': tk.E, 'stretch': tk.NO, 'width': 70}, # LANG: Profiler window column title
+                             {'title': _("p50 ms"), 'type': "num", 'align': tk.E, 'stretch': tk.NO, 'width': 70}, # LANG: Profiler window column title
+                             {'title': _("p99 ms"), 'type': "num", 'align': tk.E, 'stretch': tk.NO, 'width': 70}, # LANG: Profiler window column title
+                             {'title': _("Max ms"), 'type': "num", 'align': tk.E, 'stretch': tk.NO, 'width': 70}, # LANG: Profiler window column title
+                             {'title': histogram_title + " ms", 'type': "name", 'align': tk.W, 'stretch': tk.YES, 'width': 250}]
+
+        self.treeview = TreeviewPlus(frm_list, columns=[d['title'] for d in column_info], show="headings", callback=None, datetime_format=DATETIME_FORMAT_PROFILER)
+        sb_treeview: tk.Scrollbar = tk.Scrollbar(frm_list, orient=tk.VERTICAL, command=self.treeview.yview)
+        sb_treeview.pack(fill=tk.Y, side=tk.RIGHT)
+        self.treeview.configure(yscrollcommand=sb_treeview.set)
+        self.treeview.pack(fill=tk.BOTH, expand=1)
+
+        for column in column_info:
+            self.treeview.heading(column['title'], text=column['title'], sort_by=column['type'])
+            self.treeview.column(column['title'], anchor=column['align'], stretch=column['stretch'], width=column['width'])
+
+        self.var_enabled = tk.BooleanVar(value=self.bgstally.profiler.enabled)
+        ttk.Checkbutton(frm_buttons, text=_("Profiling Enabled"), variable=self.var_enabled, command=self._enabled_changed).pack(side=tk.LEFT, padx=5, pady=5) # LANG: Checkbox on profiler window
+        tk.Button(frm_buttons, text=_("Reset"), command=self._reset).pack(side=tk.LEFT, padx=5, pady=5) # LANG: Button on profiler window
+        tk.Button(frm_buttons, text=_("Export CSV"), command=self._export_csv).pack(side=tk.RIGHT, padx=5, pady=5) # LANG: Button on profiler window
+        tk.Button(frm_buttons, text=_("Export JSON"), command=self._export_json).pack(side=tk.RIGHT, padx=5, pady=5) # LANG: Button on profiler window
+
+        self._refresh()
+
+
+    def _refresh(self):
+        """
+        Refresh the timings in the list, and schedule the next refresh while the window is open
+        """
+        if self.toplevel is None or not self.toplevel.winfo_exists(): return
+
+        self.treeview.delete(*self.treeview.get_children())
+        for stats in self.bgstally.profiler.get_stats():
+            self.treeview.insert("", 'end', values=[stats['event_type'], stats['handler'], stats['count'], stats['mean_ms'],
+                                                    stats['p50_ms'], stats['p99_ms'], stats['max_ms'],
+                                                    " / ".join([str(bucket) for bucket in stats['histogram']])])
+
+        self.toplevel.after(TIME_REFRESH_MS, self._refresh)
+
+
+    def _enabled_changed(self):
+        """
+        The profiling checkbox has been changed
+        """
+        self.bgstally.profiler.set_enabled(self.var_enabled.get())
+
+
+    def _reset(self):
+        """
+        Clear all timings
+        """
+        self.bgstally.profiler.reset()
+        self.treeview.delete(*self.treeview.get_children())
+
+
+    def _export_json(self):
+        """
+        Export all timings to a JSON file chosen by the user
+        """
+        filepath: str = filedialog.asksaveasfilename(parent=self.toplevel, defaultextension=".json", initialfile="bgstally-profile.json",
+                                                     filetypes=[(_("JSON files"), "*.json")]) # LANG: File type on profiler export dialog
+        if not filepath: return
+
+        try:
+            self.bgstally.profiler.dump_json(filepath)
+        except OSError as e:
+            Debug.logger.error(f"Unable to export profile to {filepath}", exc_info=e)
+
+
+    def _export_csv(self):
+        """
+        Export all timings to a CSV file chosen by the user
+        """
+        filepath: str = filedialog.asksaveasfilename(parent=self.toplevel, defaultextension=".csv", initialfile="bgstally-profile.csv",
+                                                     filetypes=[(_("CSV files"), "*.csv")]) # LANG: File type on profiler export dialog
+        if not filepath: return
+
+        try:
+            self.bgstally.profiler.dump_csv(filepath)
+        except OSError as e:
+            Debug.logger.error(f"Unable to export profile to {filepath}", exc_info=e)
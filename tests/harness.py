@@ -16,7 +16,9 @@ import tomllib
 from pathlib import Path
 from typing import Optional, Callable, Dict
 from datetime import datetime, timezone, timedelta, UTC
-from time import sleep, monotonic
+from time import sleep, monotonic, perf_counter
+from copy import deepcopy
+from math import ceil
 import logging
 import tkinter as tk
 import threading
@@ -58,12 +60,120 @@ STARTUP_ATTRS:dict = {
     'StationType': 'StationType'
 }
 
+BENCHMARK_TIMESTAMP_FORMAT:str = "%Y-%m-%dT%H:%M:%SZ" # The journal's own timestamp format
+BENCHMARK_LATENCY_FLOOR_S:float = 0.0005 # Latencies below this are treated as equal when checking for regressions
+BENCHMARK_THRESHOLD_DEFAULT:float = 1.25
+
 import tests.edmc.requests
 import tests.edmc.mocks as mocks
 from tests.edmc.TkScheduler import HarnessTkScheduler
 from tests.edmc.monitor import monitor
 
 
+class BenchmarkResult:
+    """ Per-event handler timings and resource usage from replaying journal events through the harness. """
+    __test__ = False
+
+    def __init__(self, name:str):
+        self.name:str = name
+        self.timings:dict[str, list[float]] = {}
+        self.elapsed_s:float = 0.0
+        self.bytes_written:int|None = None
+        self.peak_rss_kb:int|None = None
+
+    def record(self, event_type:str, seconds:float) -> None:
+        """ Record the handler time for a single event. """
+        self.timings.setdefault(event_type, []).append(seconds)
+
+    @property
+    def events(self) -> int:
+        return sum(len(t) for t in self.timings.values())
+
+    @property
+    def events_per_s(self) -> float:
+        return self.events / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def percentile(self, pct:float, event_type:str|None = None) -> float:
+        """ Return the nearest-rank percentile handler time in seconds, for one event type or for all events. """
+        timings:list[float] = sorted(self.timings.get(event_type, []) if event_type is not None else [t for ts in self.timings.values() for t in ts])
+        if not timings: return 0.0
+        return timings[max(0, min(len(timings), ceil(pct / 100 * len(timings))) - 1)]
+
+    def as_dict(self) -> dict:
+        """ Return the results in the format used for baseline files. """
+        return {'name': self.name,
+                'events': self.events,
+                'events_per_s': self.events_per_s,
+                'p50_ms': self.percentile(50) * 1000,
+                'p99_ms': self.percentile(99) * 1000,
+                'bytes_written': self.bytes_written,
+                'peak_rss_kb': self.peak_rss_kb,
+                'event_types': {event_type: {'count': len(timings),
+                                             'p50_ms': self.percentile(50, event_type) * 1000,
+                                             'p99_ms': self.percentile(99, event_type) * 1000}
+                                for event_type, timings in sorted(self.timings.items())}}
+
+    def report(self) -> str:
+        """ Return a human readable summary of the results. """
+        lines:list[str] = [f"{self.name}: {self.events} events in {self.elapsed_s:.3f}s, {self.events_per_s:.0f} events/s, "
+                           f"p50 {self.percentile(50) * 1000:.3f}ms, p99 {self.percentile(99) * 1000:.3f}ms, "
+                           f"{self.bytes_written if self.bytes_written is not None else 'unknown'} bytes written, "
+                           f"peak RSS {self.peak_rss_kb if self.peak_rss_kb is not None else 'unknown'} KB"]
+        for event_type, stats in self.as_dict()['event_types'].items():
+            lines.append(f"  {event_type:<30} {stats['count']:>6}  p50 {stats['p50_ms']:8.3f}ms  p99 {stats['p99_ms']:8.3f}ms")
+        return "\n".join(lines)
+
+    def save(self, path:Path) -> None:
+        """ Save the results as a baseline file. """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=4)
+
+    def regressions(self, baseline:dict, threshold:float = BENCHMARK_THRESHOLD_DEFAULT) -> list[str]:
+        """ Compare against a baseline and return a description of each measure that is worse by more than the threshold ratio. """
+        current:dict = self.as_dict()
+        found:list[str] = []
+
+        if baseline.get('events_per_s', 0) > 0 and current['events_per_s'] * threshold < baseline['events_per_s']:
+            found.append(f"events/s {current['events_per_s']:.0f} vs baseline {baseline['events_per_s']:.0f}")
+
+        for event_type, stats in current['event_types'].items():
+            base:dict|None = baseline.get('event_types', {}).get(event_type)
+            if base is None: continue
+            for measure in ['p50_ms', 'p99_ms']:
+                floor_ms:float = BENCHMARK_LATENCY_FLOOR_S * 1000
+                if max(stats[measure], floor_ms) > max(base[measure], floor_ms) * threshold:
+                    found.append(f"{event_type} {measure} {stats[measure]:.3f} vs baseline {base[measure]:.3f}")
+
+        for measure in ['bytes_written', 'peak_rss_kb']:
+            if current[measure] is None or not baseline.get(measure): continue
+            if current[measure] > baseline[measure] * threshold:
+                found.append(f"{measure} {current[measure]} vs baseline {baseline[measure]}")
+
+        return found
+
+
+def _process_bytes_written() -> int|None:
+    """ Return the bytes written by this process so far, or None where this isn't available (non-Linux). """
+    try:
+        with open("/proc/self/io", 'r') as f:
+            for line in f:
+                if line.startswith("wchar:"): return int(line.split(":")[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_kb() -> int|None:
+    """ Return the peak resident set size of this process in KB, or None where this isn't available (Windows). """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak:int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
 class TestHarness:
     """ Main test harness. """
     # Prevent pytest from trying to collect this helper class as a test class
@@ -97,6 +207,7 @@ class TestHarness:
 
         # Event handlers registered by plugins
         self.journal_handlers: list[Callable] = []
+        self.journal_bytes_written:int = 0 # Bytes written by the harness itself to simulate ED's journal files
         self.config = mocks.MockConfig()
         self.set_edmc_config() # Load config data into the mock config object
         self.events:Dict[str, list] = {}
@@ -307,8 +418,8 @@ class TestHarness:
         self.monitor.state['SystemName'] = system
         self.monitor.is_beta = is_beta
 
-    def fire_event(self, event:dict, state:dict = {}) -> None:
-        """ Fire a journal event through the harness. """
+    def fire_event(self, event:dict, state:dict = {}) -> float:
+        """ Fire a journal event through the harness. Returns the time spent in the journal handler(s) in seconds. """
 
         # Update monitor state with provided state data before firing the event
         self.monitor.state.update(state)
@@ -331,6 +442,7 @@ class TestHarness:
             self.monitor.parse_entry(json.dumps(event).encode("utf-8"))
 
         # Call registered handler(s)
+        start:float = perf_counter()
         for handler in self.journal_handlers:
             try:
                 handler(
@@ -344,8 +456,10 @@ class TestHarness:
             except Exception as e:
                 logging.error(f"Error in journal handler: {e}")
                 raise
+        handler_s:float = perf_counter() - start
 
         self.pump_ui()
+        return handler_s
 
     def play_sequence(self, name:str, delay:float = 0.5, state:dict = {}) -> None:
         """ Fire a sequence of events """
@@ -355,6 +469,41 @@ class TestHarness:
             sleep(delay)
             self.pump_ui()
 
+    def benchmark(self, sequences:list[str], repeat:int = 1, name:str = "benchmark") -> BenchmarkResult:
+        """ Replay loaded event sequences as fast as possible, timing the journal handler(s) for each event.
+
+        Events are fired without delays and given a current journal format timestamp if they don't have one. Logging
+        below WARNING is disabled while benchmarking so that log output isn't counted as data written.
+        """
+        result:BenchmarkResult = BenchmarkResult(name)
+        logging.disable(logging.INFO)
+
+        try:
+            bytes_start:int|None = _process_bytes_written()
+            journal_bytes_start:int = self.journal_bytes_written
+            start:float = perf_counter()
+
+            for _ in range(repeat):
+                for sequence in sequences:
+                    for event in self.events.get(sequence, []):
+                        event = deepcopy(event)
+                        if 'timestamp' not in event: event['timestamp'] = datetime.now(UTC).strftime(BENCHMARK_TIMESTAMP_FORMAT)
+                        result.record(event['event'], self.fire_event(event))
+
+            result.elapsed_s = perf_counter() - start
+
+            # Include data that is waiting to be saved in the background
+            if self.plugin is not None: self.plugin.persistence_manager.flush()
+
+            bytes_end:int|None = _process_bytes_written()
+            if bytes_start is not None and bytes_end is not None:
+                result.bytes_written = bytes_end - bytes_start - (self.journal_bytes_written - journal_bytes_start)
+            result.peak_rss_kb = _peak_rss_kb()
+        finally:
+            logging.disable(logging.NOTSET)
+
+        return result
+
     def _update_journal_files(self, event:dict, state:dict = {}) -> None:
         """ Simulate EDMC's journal file updates based on the event type. """
         # Update the separate journal files that ED maintains
@@ -398,6 +547,7 @@ class TestHarness:
 
                 with open(self.plugin_dir / "journal_folder" / CONFIG_FILES['Cargo'][0], 'w') as f:
                     json.dump(cargo, f)
+                    self.journal_bytes_written += f.tell()
 
             case _ if event['event'] in CONFIG_FILES.keys():
                 # Add empty elements where we're unable to infer them.
@@ -405,3 +555,4 @@ class TestHarness:
                      event[CONFIG_FILES[event['event']][1]] = state.get(CONFIG_FILES[event['event']][1], [])
                 with open(self.plugin_dir / "journal_folder" / CONFIG_FILES[event['event']][0], 'w') as f:
                     json.dump(event, f)
+                    self.journal_bytes_written += f.tell()
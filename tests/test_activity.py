@@ -0,0 +1,393 @@
+"""Test the activity aggregation code for BGS-Tally."""
+
+import json
+import logging
+from datetime import datetime, timedelta, UTC
+from functools import reduce
+from pathlib import Path
+from time import perf_counter
+from typing import Generator
+
+import pytest # type: ignore
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.utils import add_dicts, sum_dicts
+
+BENCHMARK_ACTIVITY_FILES = 24
+BENCHMARK_SYSTEMS = 60
+BENCHMARK_FACTIONS = 6
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    live = request.node.get_closest_marker('live_requests') is not None
+
+    test_harness: TestHarness = TestHarness(live_requests=live)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    if not live:
+        from tests.edmc.requests import queue_response, MockResponse
+        queue_response('get',
+                       MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                    json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                        url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Now we can import plugin modules
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    test_harness.register_journal_handler(journal_entry, 'Testy', 'Sol', False)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+def _make_activities(plugin, count: int, tmp_path: Path) -> list:
+    """ Create a set of large activities, one per day, newest first, round-tripped through activity files. """
+    from bgstally.activity import Activity
+    from bgstally.tick import Tick
+
+    activities: list = []
+    now: datetime = datetime.now(UTC).replace(microsecond=0)
+
+    for i in range(count):
+        activity: Activity = Activity(plugin, Tick(plugin))
+        activity.tick_id = f"benchmark{i:03}"
+        activity.tick_time = now - timedelta(days=i)
+
+        for s in range(BENCHMARK_SYSTEMS):
+            factions: dict = {}
+            for f in range(BENCHMARK_FACTIONS):
+                faction: dict = activity._get_new_faction_data(f"Faction {f}", "None", 10)
+                faction['Bounties'] = i * 1000 + s
+                faction['MissionPoints']['1'] = f + 1
+                factions[f"Faction {f}"] = faction
+
+            activity.systems[str(s)] = activity._get_new_system_data(f"System {s}", str(s), factions)
+
+        activity.dirty = True
+        filepath: Path = tmp_path / activity.get_filename()
+        activity.save(str(filepath))
+        loaded: Activity = Activity(plugin, Tick(plugin))
+        loaded.load(str(filepath))
+        activities.append(loaded)
+
+    return activities
+
+
+class TestActivityAggregation:
+    """Activity aggregation tests."""
+
+    def test_sum_dicts_matches_add_dicts(self) -> None:
+        dicts: list = [{'a': 1, 'b': {'c': 2, 'd': "first"}, 'e': [1]},
+                       {'a': 2, 'b': {'c': 3, 'd': "second", 'f': 4}},
+                       {'b': "not a dict", 'g': {'h': 5}}]
+
+        result: dict = sum_dicts(dicts)
+        assert result == reduce(add_dicts, dicts, {})
+        assert result == {'a': 3, 'b': {'c': 5, 'd': "first", 'f': 4}, 'e': [1], 'g': {'h': 5}}
+
+        # Nothing in the result is shared with the inputs
+        result['g']['h'] = 10
+        result['e'].append(2)
+        assert dicts[2]['g']['h'] == 5
+        assert dicts[0]['e'] == [1]
+
+    def test_query_activity_uses_rollups(self, harness, tmp_path) -> None:
+        activity_manager = harness.plugin.activity_manager
+        activity_manager.activity_data = _make_activities(harness.plugin, 3, tmp_path)
+        activity_manager.rollups.clear()
+        newest = activity_manager.activity_data[0]
+
+        result = activity_manager.query_activity(newest.tick_time - timedelta(days=1))
+        assert result.systems['0']['Factions']['Faction 0']['Bounties'] == 1000
+        assert set(activity_manager.rollups.keys()) == {"benchmark000", "benchmark001"}
+
+        # Changing an activity and marking it dirty invalidates its rollup
+        newest.systems['0']['Factions']['Faction 0']['Bounties'] += 50
+        newest.dirty = True
+        result = activity_manager.query_activity(newest.tick_time - timedelta(days=1))
+        assert result.systems['0']['Factions']['Faction 0']['Bounties'] == 1050
+
+        # The result is independent of the cache
+        result.systems['0']['Factions']['Faction 0']['Bounties'] = 0
+        result = activity_manager.query_activity(newest.tick_time - timedelta(days=1))
+        assert result.systems['0']['Factions']['Faction 0']['Bounties'] == 1050
+
+    def test_query_activity_benchmark(self, harness, tmp_path) -> None:
+        """ Compare the rollup aggregation with the previous fold using Activity.__add__ """
+        from bgstally.activity import Activity
+
+        activity_manager = harness.plugin.activity_manager
+        activity_manager.activity_data = _make_activities(harness.plugin, BENCHMARK_ACTIVITY_FILES, tmp_path)
+        activity_manager.rollups.clear()
+        start_date: datetime = activity_manager.activity_data[-1].tick_time
+
+        start: float = perf_counter()
+        previous: Activity = Activity(harness.plugin)
+        for activity in activity_manager.activity_data:
+            previous = previous + activity
+        previous_s: float = perf_counter() - start
+
+        start = perf_counter()
+        cold: Activity = activity_manager.query_activity(start_date)
+        cold_s: float = perf_counter() - start
+
+        start = perf_counter()
+        warm: Activity = activity_manager.query_activity(start_date)
+        warm_s: float = perf_counter() - start
+
+        logging.info(f"query_activity over {BENCHMARK_ACTIVITY_FILES} activities: Activity.__add__ {previous_s * 1000:.1f}ms, "
+                     f"rollups (cold) {cold_s * 1000:.1f}ms, rollups (warm) {warm_s * 1000:.1f}ms")
+
+        assert cold.systems == previous.systems
+        assert warm.systems == previous.systems
+
+    def test_startup_defers_previous_ticks(self, harness) -> None:
+        from bgstally.activitymanager import ActivityManager, FILE_ACTIVITY_INDEX, FOLDER_ACTIVITYDATA
+
+        activity_folder: Path = Path(harness.plugin.plugin_dir) / FOLDER_ACTIVITYDATA
+        activities: list = _make_activities(harness.plugin, 3, activity_folder)
+
+        try:
+            # First startup parses the new files and indexes them
+            ActivityManager(harness.plugin)
+            assert (activity_folder / FILE_ACTIVITY_INDEX).exists()
+
+            # Second startup only reads the index for previous ticks
+            activity_manager: ActivityManager = ActivityManager(harness.plugin)
+            stubs: dict = {a.tick_id: a for a in activity_manager.activity_data if a.tick_id.startswith("benchmark")}
+            assert len(stubs) == 3
+            assert all(not a.loaded for a in stubs.values())
+            assert stubs["benchmark001"].tick_time == activities[1].tick_time
+            assert activity_manager.index["benchmark001"]['summary']['systems'] == BENCHMARK_SYSTEMS
+
+            activity_manager.load_activity(stubs["benchmark001"])
+            assert stubs["benchmark001"].loaded
+            assert stubs["benchmark001"].systems == activities[1].systems
+
+            # A file changed on disk since it was indexed is parsed again
+            activities[2].systems = {}
+            activities[2].dirty = True
+            activities[2].save(str(activity_folder / activities[2].get_filename()))
+            activity_manager = ActivityManager(harness.plugin)
+            changed = next(a for a in activity_manager.activity_data if a.tick_id == "benchmark002")
+            assert changed.loaded
+            assert changed.systems == {}
+        finally:
+            for activity in activities:
+                (activity_folder / activity.get_filename()).unlink(missing_ok=True)
+
+
+class TestActivityStore:
+    """Historical activity store tests."""
+
+    def test_query_archived_activity(self, harness, monkeypatch, tmp_path) -> None:
+        from bgstally.activitystore import ActivityStore, available
+
+        if not available(): pytest.skip("SQLite is not available")
+
+        activity_manager = harness.plugin.activity_manager
+        store: ActivityStore = ActivityStore(harness.plugin, str(tmp_path))
+        monkeypatch.setattr(activity_manager, 'store', store)
+
+        activities: list = _make_activities(harness.plugin, 3, tmp_path)
+        store.save_activities(activity._as_dict() for activity in activities)
+        start_date: datetime = activities[-1].tick_time
+
+        activity_manager.activity_data = activities
+        activity_manager.rollups.clear()
+        in_memory = activity_manager.query_activity(start_date)
+
+        # Only the newest tick is held in memory, the older ticks come from the store
+        activity_manager.activity_data = activities[:1]
+        activity_manager.rollups.clear()
+        stored = activity_manager.query_activity(start_date)
+
+        for system_address in ['0', str(BENCHMARK_SYSTEMS - 1)]:
+            for faction_name in ['Faction 0', f"Faction {BENCHMARK_FACTIONS - 1}"]:
+                for key in ['Bounties', 'MissionPoints', 'Influence']:
+                    assert stored.systems[system_address]['Factions'][faction_name][key] == in_memory.systems[system_address]['Factions'][faction_name][key]
+        assert stored.get_system_by_name("System 1") is not None
+
+        totals: list = store.query_metrics(activities[1].tick_time, faction="Faction 2", system="System 5", metric="MissionPoints")
+        assert totals == [{'system': "System 5", 'systemaddress': "5", 'faction': "Faction 2", 'metric': "MissionPoints/1", 'value': 6}]
+        assert store.query_metrics(activities[1].tick_time, metric="Bounty") == []
+
+        # Storing a tick again updates, adds and removes only the metrics that have changed
+        activities[1].systems['5']['Factions']['Faction 2']['MissionPoints']['1'] = 10
+        del activities[1].systems['5']['Factions']['Faction 2']['Bounties']
+        store.save_activity(activities[1]._as_dict())
+        totals = store.query_metrics(activities[1].tick_time, faction="Faction 2", system="System 5", metric="MissionPoints")
+        assert totals[0]['value'] == 13
+        assert store.query_metrics(activities[1].tick_time, activities[0].tick_time, faction="Faction 2", system="System 5", metric="Bounties") == []
+
+        # Replacing a tick replaces all of its stored metrics
+        activities[1].systems = {}
+        store.save_activity(activities[1]._as_dict())
+        totals = store.query_metrics(activities[1].tick_time, faction="Faction 2", system="System 5", metric="MissionPoints")
+        assert totals[0]['value'] == 3
+        store.close()
+
+
+class TestTickRollover:
+    """New tick tests."""
+
+    def test_new_tick_matches_copy_and_clear(self, harness, monkeypatch, tmp_path) -> None:
+        from copy import deepcopy
+        from bgstally.activity import Activity
+        from bgstally.constants import DATETIME_FORMAT_JOURNAL
+        from bgstally.tick import Tick
+
+        plugin = harness.plugin
+        activity_manager = plugin.activity_manager
+        previous: Activity = _make_activities(plugin, 1, tmp_path)[0]
+        previous.systems['2']['TWReactivate'] = 3
+        previous.systems['3']['TWSandR']['bb']['scooped'] = 2
+        previous.systems['3']['TWSandR']['bb']['delivered'] = 1
+        previous.powerplay = {'power': "Test Power", 'merits': 100}
+        previous.recalculate_zero_activity()
+        monkeypatch.setattr(activity_manager, 'current_activity', previous)
+        monkeypatch.setattr(activity_manager, 'activity_data', [previous])
+        monkeypatch.setattr(plugin.state, 'current_system_id', "1")
+
+        plugin.mission_log.missionlog = []
+        plugin.mission_log.add_mission("Rollover Mission", "Faction 0", 333333, (datetime.now(UTC) + timedelta(days=1)).strftime(DATETIME_FORMAT_JOURNAL),
+                                       "System 2", "", "System 2", "Station", -1, -1, -1, "")
+
+        # The previous behaviour: copy the whole activity and clear it down
+        expected: Activity = deepcopy(previous)
+        expected.clear_activity(plugin.mission_log)
+        snapshot: dict = deepcopy(previous.systems)
+        revision: int = previous.revision
+
+        tick: Tick = Tick(plugin)
+        tick.tick_id = "rollover"
+        tick.tick_time = previous.tick_time + timedelta(days=1)
+        assert activity_manager.new_tick(tick, True)
+
+        current: Activity = activity_manager.get_current_activity()
+        assert current is not previous
+        assert current.tick_id == "rollover" and current.tick_time == tick.tick_time and current.tick_forced
+        assert current.systems == expected.systems
+        assert sorted(current.systems.keys()) == ['1', '2', '3']
+        assert current.systems['3']['TWSandR']['bb'] == {'scooped': 2, 'delivered': 0}
+        assert current.active_factions == expected.active_factions
+        assert current.powerplay == {} and current.discord_webhook_data == {} and current.discord_notes == ""
+        assert current.dirty
+        current.verify_zero_activity()
+
+        # The previous activity is unchanged and shares nothing with the new one
+        assert previous.systems == snapshot
+        assert previous.revision == revision
+        current.systems['1']['Factions']['Faction 0']['Bounties'] += 1
+        current.systems['3']['TWSandR']['bb']['scooped'] += 1
+        assert previous.systems == snapshot
+        assert activity_manager.activity_data == [current, previous]
+
+
+class TestZeroActivity:
+    """Zero activity detection tests."""
+
+    def test_incremental_zero_activity(self, harness, monkeypatch) -> None:
+        import bgstally.activity
+        monkeypatch.setattr(bgstally.activity, 'VERIFY_ZERO_ACTIVITY', True)
+
+        activity = harness.plugin.activity_manager.get_current_activity()
+        state = harness.plugin.state
+
+        activity.system_entered({'event': "FSDJump", 'StarSystem': "Zero Test", 'SystemAddress': 999999,
+                                 'Factions': [{'Name': "Zero Faction 1", 'FactionState': "None", 'Influence': 0.5},
+                                              {'Name': "Zero Faction 2", 'FactionState': "None", 'Influence': 0.5}]}, state)
+        system: dict = activity.systems["999999"]
+        assert system['zero_system_activity'] is True
+
+        state.station_type = "Coriolis"
+        activity.bv_redeemed({'event': "RedeemVoucher", 'Factions': [{'Faction': "Zero Faction 1", 'Amount': 1000}]}, state)
+        assert system['zero_system_activity'] is False
+        assert len(activity.active_factions["999999"]) == 1
+
+        # Edits outside the event handlers are picked up by a full recalculation
+        system['Factions']["Zero Faction 1"]['Bounties'] = 0
+        activity.recalculate_zero_activity()
+        assert system['zero_system_activity'] is True
+
+
+class TestRenderCache:
+    """Discord text render cache tests."""
+
+    def test_only_changed_systems_rendered(self, harness, monkeypatch, tmp_path) -> None:
+        from bgstally.constants import DiscordActivity
+        from bgstally.formatters.default import DefaultActivityFormatter
+
+        plugin = harness.plugin
+        activity = _make_activities(plugin, 1, tmp_path)[0]
+        formatter: DefaultActivityFormatter = DefaultActivityFormatter(plugin)
+
+        rendered: list = []
+        build_system = formatter._build_system
+        monkeypatch.setattr(formatter, '_build_system', lambda system, *args: rendered.append(system['System']) or build_system(system, *args))
+
+        text: str = formatter.get_text(activity, DiscordActivity.BOTH)
+        assert len(rendered) == BENCHMARK_SYSTEMS
+
+        # Nothing has changed, so nothing is rendered again
+        rendered.clear()
+        assert formatter.get_text(activity, DiscordActivity.BOTH) == text
+        assert rendered == []
+
+        # Only the edited system is rendered again
+        activity.systems["3"]['Factions']["Faction 0"]['Bounties'] += 1
+        assert formatter.get_text(activity, DiscordActivity.BOTH) != text
+        assert rendered == ["System 3"]
+
+        # Changing an option renders everything again
+        rendered.clear()
+        plugin.state.detailed_inf = not plugin.state.detailed_inf
+        formatter.get_text(activity, DiscordActivity.BOTH)
+        assert len(rendered) == BENCHMARK_SYSTEMS
+
+
+class TestActivityMigration:
+    """Activity file migration tests."""
+
+    @pytest.mark.parametrize('activity_file', ["activity-legacy.json", "activity-5.5.0.json"])
+    def test_migrate_on_load(self, harness, tmp_path, activity_file) -> None:
+        from bgstally.activity import ACTIVITY_SCHEMA_VERSION, Activity
+        from bgstally.tick import Tick
+
+        activity: Activity = Activity(harness.plugin, Tick(harness.plugin))
+        activity.load(str(Path(__file__).parent / "config" / activity_file))
+
+        # Migrated activity is marked for saving, and is in the latest structure
+        assert activity.dirty
+        new_system: dict = activity._get_new_system_data("New", "1", {})
+        new_faction: dict = activity._get_new_faction_data("New", "None", 0)
+        for system in activity.systems.values():
+            assert new_system.keys() <= system.keys()
+            for faction in system['Factions'].values():
+                assert new_faction.keys() <= faction.keys()
+                assert isinstance(faction['MissionPoints'], dict)
+                assert isinstance(faction['MissionPointsSecondary'], dict)
+        activity.verify_zero_activity()
+
+        # Once saved, the file is stamped with the schema version and isn't migrated again
+        activity.save(str(tmp_path / "migrated.json"))
+        with open(tmp_path / "migrated.json") as f:
+            assert json.load(f)['schemaversion'] == ACTIVITY_SCHEMA_VERSION
+
+        reloaded: Activity = Activity(harness.plugin, Tick(harness.plugin))
+        reloaded.load(str(tmp_path / "migrated.json"))
+        assert not reloaded.dirty
+        assert reloaded.systems == activity.systems
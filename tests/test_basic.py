@@ -60,3 +60,40 @@ class TestStartup:
         """Test basic harness initialization."""
         assert harness is not None
         assert harness.config.get_str('BGST_Status', default='On') == 'Yes'
+
+
+class TestEventRouter:
+    """Test routing of journal events to handlers."""
+
+    def test_unwanted_events_skipped(self, harness) -> None:
+        """Events with no handlers, that no API wants, are skipped before any work is done."""
+        router = harness.plugin.event_router
+        assert router.handles('FactionKillBond')
+        assert not router.handles('Music')
+
+        with patch.object(harness.plugin.activity_manager, 'get_current_activity', wraps=harness.plugin.activity_manager.get_current_activity) as get_activity:
+            harness.fire_event({'event': "Music", 'MusicTrack': "Exploration"})
+            get_activity.assert_not_called()
+
+            harness.fire_event({'event': "ReceiveText", 'From': "Someone", 'Message': "o7", 'Channel': "npc"})
+            get_activity.assert_called_once()
+
+    def test_guards(self, harness) -> None:
+        """Handlers are only called when their guards pass, in the order they subscribed."""
+        from bgstally.eventrouter import EventRouter, JournalContext
+
+        router: EventRouter = EventRouter(harness.plugin)
+        calls: list = []
+        router.subscribe(['RedeemVoucher'], "first", lambda entry, context: calls.append("first"))
+        router.subscribe(['RedeemVoucher'], "bounty", lambda entry, context: calls.append("bounty"), guard=lambda entry, context: entry.get('Type') == 'bounty', dirty=True)
+        router.subscribe(['RedeemVoucher', 'Bounty'], "last", lambda entry, context: calls.append("last"))
+
+        context: JournalContext = JournalContext('Testy', False, 'Sol', '', {}, None)
+        assert router.dispatch({'event': "RedeemVoucher", 'Type': "CombatBond"}, context) is False
+        assert calls == ["first", "last"]
+
+        calls.clear()
+        assert router.dispatch({'event': "RedeemVoucher", 'Type': "bounty"}, context) is True
+        assert calls == ["first", "bounty", "last"]
+
+        assert router.dispatch({'event': "Music"}, context) is False
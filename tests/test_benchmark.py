@@ -0,0 +1,123 @@
+"""
+Journal replay benchmarks for BGS-Tally.
+
+Each scenario streams a sequence of journal events through journal_entry with mocked requests and reports events/s,
+per event type p50/p99 handler latency, bytes written and peak RSS. The benchmarks are excluded from normal test runs,
+run them with: python -m pytest -m benchmark tests/test_benchmark.py
+
+The following environment variables control the runs:
+
+* BGSTALLY_BENCHMARK_REPEAT: The number of times each scenario is replayed. Defaults to 5.
+* BGSTALLY_BENCHMARK_BASELINE: A folder of baseline files. If a baseline exists for a scenario the results are compared
+  against it and the test fails on a regression.
+* BGSTALLY_BENCHMARK_THRESHOLD: The ratio by which a measure may be worse than its baseline. Defaults to 1.25.
+* BGSTALLY_BENCHMARK_SAVE: Set to 1 to write the results as the new baselines.
+"""
+
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Generator
+
+import pytest # type: ignore
+
+from harness import BENCHMARK_THRESHOLD_DEFAULT, BenchmarkResult, TestHarness
+
+BENCHMARK_REPEAT:int = int(os.environ.get('BGSTALLY_BENCHMARK_REPEAT', 5))
+BENCHMARK_BASELINE:str|None = os.environ.get('BGSTALLY_BENCHMARK_BASELINE')
+BENCHMARK_THRESHOLD:float = float(os.environ.get('BGSTALLY_BENCHMARK_THRESHOLD', BENCHMARK_THRESHOLD_DEFAULT))
+BENCHMARK_SAVE:bool = os.environ.get('BGSTALLY_BENCHMARK_SAVE') == '1'
+
+# Scenario name, sequences played once before timing starts, sequences that are timed
+SCENARIOS:list = [
+    ('combat_zone', [], ['combat_zone']),
+    ('trading', [], ['trading']),
+    ('colonisation', ['claim', 'visit_ship'], ['contribution', 'complete']),
+    ('carrier', ['trading'], ['carrier']),
+    ('missions', ['trading'], ['missions']),
+    ('mixed', [], ['combat_zone', 'trading', 'missions', 'carrier']),
+]
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """ Provide a fresh test harness for each test. """
+    test_harness:TestHarness = TestHarness(live_requests=False)
+
+    # Use the "normal" locations for assets and data
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    from tests.edmc.requests import queue_response, MockResponse
+    queue_response('get',
+                   MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                    url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Start from consistent colonisation and carrier data
+    for (init_file, data_file) in [("colonisation_init.json", "colonisation.json"), ("fleetcarrier_init.json", "fleetcarrier.json")]:
+        shutil.copy(Path(__file__).parent / "config" / init_file, Path(__file__).parent / "otherdata" / data_file)
+
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    test_harness.register_journal_handler(journal_entry, 'Testy', 'Sol', False)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+class TestJournalBenchmark:
+    """ Journal replay benchmarks. """
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('scenario, setup, sequences', SCENARIOS)
+    def test_journal_replay(self, harness, scenario:str, setup:list, sequences:list) -> None:
+        harness.events = harness.load_events("benchmark_events.json") | harness.load_events("colonisation_build.json")
+        for sequence in setup:
+            harness.play_sequence(sequence, 0)
+
+        result:BenchmarkResult = harness.benchmark(sequences, BENCHMARK_REPEAT, scenario)
+        logging.info(result.report())
+
+        assert result.events == BENCHMARK_REPEAT * sum(len(harness.events[s]) for s in sequences)
+        assert result.events_per_s > 0
+
+        if BENCHMARK_BASELINE is None: return
+        baseline_file:Path = Path(BENCHMARK_BASELINE) / f"{scenario}.json"
+
+        if BENCHMARK_SAVE:
+            result.save(baseline_file)
+        elif baseline_file.exists():
+            with open(baseline_file, 'r') as f:
+                regressions:list[str] = result.regressions(json.load(f), BENCHMARK_THRESHOLD)
+            assert regressions == [], f"{scenario} is slower than its baseline: {regressions}"
+
+    def test_regressions(self) -> None:
+        result:BenchmarkResult = BenchmarkResult("synthetic")
+        for i in range(100):
+            result.record('FSDJump', 0.002)
+            result.record('Bounty', 0.0001 * (i + 1))
+        result.elapsed_s = 1.0
+        result.bytes_written = 1000
+
+        assert result.percentile(50, 'Bounty') == pytest.approx(0.005)
+        assert result.percentile(99, 'Bounty') == pytest.approx(0.0099)
+        assert result.regressions(result.as_dict()) == []
+
+        baseline:dict = result.as_dict()
+        baseline['event_types']['FSDJump']['p99_ms'] = 1.0
+        baseline['bytes_written'] = 500
+        regressions:list[str] = result.regressions(baseline)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("FSDJump p99_ms")
+        assert regressions[1].startswith("bytes_written")
+
@@ -194,6 +194,35 @@ class TestColonisationMethods:
         c.remove_system(syscount)
         assert len(c.systems) == syscount
 
+    def test_system_index(self, harness) -> None:
+        """ Test the system index is kept up to date as systems change """
+        c = harness.plugin.colonisation
+        syscount:int = len(c.systems)
+        c.add_system({'Name': 'Indexed System', 'StarSystem': 'Indexed StarSystem'}, False, False)
+
+        assert c.find_system({'StarSystem': 'Indexed StarSystem'}) is c.systems[syscount]
+
+        c.modify_system(syscount, {'StarSystem': 'Moved StarSystem'})
+        assert c.find_system({'StarSystem': 'Indexed StarSystem'}) == None
+        assert c.find_system({'StarSystem': 'Moved StarSystem'}) is c.systems[syscount]
+
+        c.remove_system(syscount)
+        assert c.find_system({'StarSystem': 'Moved StarSystem'}) == None
+        assert c.get_system('Name', 'Indexed System') == None
+
+    def test_build_index(self, harness) -> None:
+        """ Test the build index is kept up to date as builds are changed and the build list is replaced """
+        c = harness.plugin.colonisation
+        system:dict = c.systems[0]
+        build:dict = system['Builds'][0]
+
+        c.modify_build(system, 0, {'MarketID': 987654321}, True)
+        assert c.find_build(system, {'MarketID': 987654321}) is build
+        assert c.find_build_any({'MarketID': 987654321}) == [system, build]
+
+        c.modify_system(system, {'Builds': system['Builds'][1:]})
+        assert c._find_indexed_build('MarketID', 987654321) == None
+
     def test_get_body(self, harness) -> None:
         c = harness.plugin.colonisation
         sys = c.systems[0]
@@ -510,6 +539,53 @@ class TestColonisationFullBuild:
 
 
 
+class TestServiceClient:
+    """Queued RavenColonial / EDSM / Spansh request tests."""
+
+    def test_duplicate_requests_sent_once(self, harness) -> None:
+        from tests.edmc.requests import queue_response, MockResponse, calls
+        from bgstally.constants import RequestMethod
+        from bgstally.ravencolonial import ServiceClient
+
+        url:str = "https://rc.example.com/api/v2/system/1"
+        queue_response('get', MockResponse(200, json_data={'id64': 1}), url=url, sticky=True)
+        client:ServiceClient = ServiceClient(harness.plugin)
+
+        results:list = []
+        # Holding the callback lock keeps the first request in flight while the second is made
+        with harness.plugin.request_manager.callback_lock:
+            client.request(url, RequestMethod.GET, callback=lambda success, response, request: results.append(response.json()))
+            client.request(url, RequestMethod.GET, callback=lambda success, response, request: results.append(response.json()))
+            sleep(0.5)
+        sleep(0.5)
+        harness.pump_ui()
+
+        assert results == [{'id64': 1}, {'id64': 1}]
+        assert len([c for c in calls if c['url'] == url]) == 1
+
+    def test_etag_revalidation(self, harness) -> None:
+        from tests.edmc.requests import queue_response, MockResponse, calls
+        from bgstally.constants import RequestMethod
+        from bgstally.ravencolonial import ServiceClient
+
+        url:str = "https://rc.example.com/api/v2/system/2"
+        queue_response('get', MockResponse(200, json_data={'rev': 5}, headers={'ETag': '"5"'}), url=url)
+        queue_response('get', MockResponse(304, reason='Not Modified'), url=url)
+        client:ServiceClient = ServiceClient(harness.plugin)
+
+        results:list = []
+        for _ in range(2):
+            client.request(url, RequestMethod.GET, callback=lambda success, response, request: results.append((success, response.json())))
+            sleep(0.5)
+            harness.pump_ui()
+
+        assert results == [(True, {'rev': 5}), (True, {'rev': 5})]
+        requested:list = [c for c in calls if c['url'] == url]
+        assert 'If-None-Match' not in requested[0]['headers']
+        assert requested[1]['headers']['If-None-Match'] == '"5"'
+
+
+
 # Unused tests that do some interesting things
     # def test_journal_entry_colonisation_contribution(self, harness) -> None:
     #     c = harness.plugin.colonisation
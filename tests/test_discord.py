@@ -0,0 +1,132 @@
+"""Test the Discord posting code for BGS-Tally."""
+
+import pytest # type: ignore
+from typing import Generator
+from time import sleep
+from datetime import datetime, UTC
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.constants import DiscordChannel
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    test_harness:TestHarness = TestHarness(live_requests=False)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    from tests.edmc.requests import queue_response, MockResponse
+    queue_response('get',
+                   MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                    url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Now we can start the plugin
+    from load import plugin_start3, plugin_app
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+def set_webhooks(plugin, monkeypatch, name:str, count:int) -> list[str]:
+    """ Set up a number of webhooks for the BGS channel, each with a mock response to a new post. Returns the webhook URLs. """
+    from tests.edmc.requests import queue_response, MockResponse
+
+    webhooks:list = []
+    for i in range(count):
+        url:str = f"https://discord.com/api/webhooks/{name}/{i}"
+        webhooks.append({'uuid': f"{name}-{i}", 'name': f"Webhook {i}", 'url': url, DiscordChannel.BGS: True})
+        queue_response('post', MockResponse(200, json_data={'id': f"{name}-message-{i}"}), url=url, sticky=True)
+        queue_response('patch', MockResponse(200, json_data={'id': f"{name}-message-{i}"}), url=f"{url}/messages/{name}-message-{i}", sticky=True)
+
+    monkeypatch.setitem(plugin.webhook_manager.data, 'webhooks', webhooks)
+    plugin.state.DiscordUsername.set("Testy")
+    return [webhook['url'] for webhook in webhooks]
+
+
+def calls(method:str, url_start:str) -> list[dict]:
+    """ Get the mock requests made with a method to URLs starting with a prefix """
+    from tests.edmc.requests import _mock_requests
+    return [call for call in _mock_requests.calls if call['method'] == method and call['url'].startswith(url_start)]
+
+
+class TestDiscord:
+    """Discord posting tests."""
+
+    def test_unchanged_post_skipped(self, harness, monkeypatch) -> None:
+        discord = harness.plugin.discord
+        set_webhooks(harness.plugin, monkeypatch, "unchanged", 2)
+        webhooks_data:dict = {}
+
+        def callback(channel:DiscordChannel, webhook_data:dict, messageid:str):
+            webhooks_data[webhook_data['uuid']] = webhook_data | {channel: messageid}
+
+        discord.post_plaintext("Some activity", webhooks_data, DiscordChannel.BGS, callback)
+        sleep(1)
+        assert len(calls('post', "https://discord.com/api/webhooks/unchanged/")) == 2
+        assert webhooks_data['unchanged-0'][DiscordChannel.BGS] == "unchanged-message-0"
+
+        # Posting the same content again doesn't update the messages
+        skipped:int = discord.get_stats()['skipped']
+        discord.post_plaintext("Some activity", webhooks_data, DiscordChannel.BGS, callback)
+        sleep(1)
+        assert len(calls('patch', "https://discord.com/api/webhooks/unchanged/")) == 0
+        assert discord.get_stats()['skipped'] == skipped + 2
+
+        discord.post_plaintext("More activity", webhooks_data, DiscordChannel.BGS, callback)
+        sleep(1)
+        assert len(calls('patch', "https://discord.com/api/webhooks/unchanged/")) == 2
+
+    def test_rate_limit(self, harness, monkeypatch) -> None:
+        from tests.edmc.requests import queue_response, MockResponse
+
+        discord = harness.plugin.discord
+        url:str = set_webhooks(harness.plugin, monkeypatch, "ratelimit", 1)[0]
+        webhooks_data:dict = {'ratelimit-0': {'uuid': "ratelimit-0", 'url': url, DiscordChannel.BGS: "ratelimit-message-0"}}
+
+        queue_response('patch', MockResponse(429, reason="Too Many Requests", headers={'Retry-After': "0.5"}), url=f"{url}/messages/ratelimit-message-0")
+        delayed:int = discord.get_stats()['delayed']
+
+        discord.post_plaintext("Rate limited activity", webhooks_data, DiscordChannel.BGS, None)
+        sleep(0.2)
+        assert len(calls('patch', url)) == 1
+
+        # Later updates wait for the rate limit to reset, and replace the waiting update so only the latest is sent
+        discord.post_plaintext("Rate limited activity 2", webhooks_data, DiscordChannel.BGS, None)
+        discord.post_plaintext("Rate limited activity 3", webhooks_data, DiscordChannel.BGS, None)
+        sleep(1.5)
+        patches:list = calls('patch', url)
+        assert len(patches) == 2
+        assert patches[-1]['json']['content'].startswith("Rate limited activity 3")
+        assert discord.get_stats()['delayed'] == delayed + 1
+        assert discord.get_stats()['pending'] == 0
+
+    def test_post_without_response_body(self, harness, monkeypatch) -> None:
+        from tests.edmc.requests import queue_response, MockResponse
+
+        discord = harness.plugin.discord
+        url:str = set_webhooks(harness.plugin, monkeypatch, "nobody", 1)[0]
+
+        # Posts that get a reply without a message aren't retried, and don't hold up later posts
+        queue_response('post', MockResponse(204, content=b'No content'), url=url)
+        queue_response('post', MockResponse(204, content=b'No content'), url=url)
+
+        discord.post_plaintext("First part", None, DiscordChannel.BGS, None)
+        discord.post_plaintext("Second part", None, DiscordChannel.BGS, None)
+        sleep(1)
+
+        posts:list = calls('post', url)
+        assert len(posts) == 2
+        assert posts[0]['params'] == {'wait': 'true'}
+        assert discord.get_stats()['pending'] == 0
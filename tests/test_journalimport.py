@@ -0,0 +1,142 @@
+"""Test the journal importer for BGS-Tally."""
+
+import json
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+from typing import Generator
+
+import pytest # type: ignore
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.constants import DATETIME_FORMAT_JOURNAL
+from bgstally.journalparser import list_journal_files, parse_journal_file
+from bgstally.tick import TICKID_PREFIX_IMPORTED
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    test_harness: TestHarness = TestHarness(live_requests=False)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    from tests.edmc.requests import queue_response, MockResponse
+    queue_response('get',
+                   MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                    url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    Path(Path(__file__).parent / "otherdata" / "journalimport.json").unlink(missing_ok=True)
+
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    test_harness.register_journal_handler(journal_entry, 'Testy', 'Sol', False)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+def write_journal(folder: Path, started: datetime, events: list[dict], gameversion: str = "4.0.0.1904") -> Path:
+    """Write a journal file, with a timestamp one minute apart on each event."""
+    filepath: Path = folder / f"Journal.{started.strftime('%Y-%m-%dT%H%M%S')}.01.log"
+    header: dict = {'event': "Fileheader", 'part': 1, 'gameversion': gameversion, 'build': "r000000/r0 "}
+
+    with open(filepath, 'w') as f:
+        for i, event in enumerate([header] + events):
+            f.write(json.dumps({'timestamp': (started + timedelta(minutes=i)).strftime(DATETIME_FORMAT_JOURNAL)} | event) + "\n")
+
+    return filepath
+
+
+SESSION: list[dict] = [
+    {'event': "LoadGame", 'Commander': "Testy", 'Odyssey': True},
+    {'event': "Music", 'MusicTrack': "MainMenu"},
+    {'event': "FSDJump", 'StarSystem': "Import War", 'SystemAddress': 800001, 'Population': 1000000,
+     'Factions': [{'Name': "Import Alliance", 'FactionState': "None", 'Influence': 0.6},
+                  {'Name': "Import Empire", 'FactionState': "None", 'Influence': 0.4}]},
+    {'event': "MissionAccepted", 'Faction': "Import Alliance", 'Name': "Mission_Courier", 'MissionID': 880000001,
+     'Expiry': "2099-01-01T00:00:00Z", 'DestinationSystem': "Import War"},
+    {'event': "Docked", 'StationName': "Import Port", 'StationType': "Coriolis", 'StarSystem': "Import War", 'SystemAddress': 800001,
+     'StationFaction': {'Name': "Import Alliance"}, 'Taxi': False},
+    {'event': "RedeemVoucher", 'Type': "CombatBond", 'Amount': 200000, 'Faction': "Import Alliance"},
+    {'event': "MissionCompleted", 'Faction': "Import Alliance", 'Name': "Mission_Courier_name", 'MissionID': 880000001,
+     'FactionEffects': [{'Faction': "Import Alliance", 'Influence': [{'SystemAddress': 800001, 'Trend': "UpGood", 'Influence': "++"}]}]},
+]
+
+
+class TestJournalParser:
+    """Journal file parsing tests."""
+
+    def test_parse_journal_file(self, tmp_path) -> None:
+        started: datetime = datetime(2025, 3, 1, 12, 0, 0, tzinfo=UTC)
+        filepath: Path = write_journal(tmp_path, started, SESSION)
+        (tmp_path / "Journal.250301110000.01.log").write_text("")
+        (tmp_path / "Status.json").write_text("{}")
+
+        files: list[dict] = list_journal_files(str(tmp_path))
+        assert [f['name'] for f in files] == ["Journal.250301110000.01.log", filepath.name]
+        assert files[1]['started'] == started
+
+        entries: list[dict] = parse_journal_file(str(filepath), frozenset(['FSDJump', 'RedeemVoucher']))
+        assert [e['event'] for e in entries] == ['FSDJump', 'RedeemVoucher']
+
+        since: str = (started + timedelta(minutes=5)).strftime(DATETIME_FORMAT_JOURNAL)
+        assert [e['event'] for e in parse_journal_file(str(filepath), frozenset(['FSDJump', 'RedeemVoucher']), since)] == ['RedeemVoucher']
+
+    def test_skip_legacy_and_beta(self, tmp_path) -> None:
+        started: datetime = datetime(2025, 3, 1, 12, 0, 0, tzinfo=UTC)
+        assert parse_journal_file(str(write_journal(tmp_path, started, SESSION, "3.8.0.407")), frozenset(['FSDJump'])) == []
+        assert parse_journal_file(str(write_journal(tmp_path, started, SESSION, "4.1.0.100 Beta")), frozenset(['FSDJump'])) == []
+
+
+class TestJournalImporter:
+    """Journal importer tests."""
+
+    def test_import(self, harness, tmp_path) -> None:
+        plugin = harness.plugin
+        started: datetime = plugin.tick.tick_time - timedelta(days=3) + timedelta(hours=2)
+        write_journal(tmp_path, started, SESSION)
+
+        result = plugin.journal_importer.run(plugin.tick.tick_time - timedelta(days=5), str(tmp_path))
+        assert not (result.unchanged or result.cancelled or result.failed)
+        assert result.files == 1
+        assert len(result.activities) == 1
+
+        activity = result.activities[0]
+        assert activity.tick_id.startswith(TICKID_PREFIX_IMPORTED)
+        assert activity.tick_time <= started < activity.tick_time + timedelta(hours=24)
+        assert activity.bgstally is plugin
+        assert activity.systems['800001']['Factions']['Import Alliance']['CombatBonds'] == 200000
+        assert activity in plugin.activity_manager.get_previous_activities()
+
+        # Replaying never changes live data
+        assert plugin.activity_manager.get_current_activity().get_system_by_address('800001') is None
+        assert plugin.mission_log.get_mission(880000001) is None
+        assert plugin.state.current_system_id != "800001"
+
+    def test_reimport(self, harness, tmp_path) -> None:
+        plugin = harness.plugin
+        since: datetime = plugin.tick.tick_time - timedelta(days=5)
+        write_journal(tmp_path, plugin.tick.tick_time - timedelta(days=3), SESSION)
+
+        first = plugin.journal_importer.run(since, str(tmp_path))
+        assert plugin.journal_importer.run(since, str(tmp_path)).unchanged
+
+        # A changed file is imported again, replacing the activity imported before
+        write_journal(tmp_path, plugin.tick.tick_time - timedelta(days=3), SESSION + [SESSION[-2]])
+        second = plugin.journal_importer.run(since, str(tmp_path))
+        assert not second.unchanged
+        assert [a.tick_id for a in second.activities] == [a.tick_id for a in first.activities]
+
+        imported: list = [a for a in plugin.activity_manager.activity_data if a.tick_id == first.activities[0].tick_id]
+        assert len(imported) == 1
+        assert imported[0].systems['800001']['Factions']['Import Alliance']['CombatBonds'] == 400000
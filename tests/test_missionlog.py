@@ -72,13 +72,13 @@ class TestMissionLogFunctions:
 
     def test_no_mission_log(self, harness) -> None:
         mission_log = harness.plugin.mission_log
-        mission_log.missionlog.clear()
+        mission_log.missionlog = []
 
         assert mission_log.get_missionlog() == []
 
     def test_add_and_retrieve_mission(self, harness) -> None:
         mission_log = harness.plugin.mission_log
-        mission_log.missionlog.clear()
+        mission_log.missionlog = []
 
         mission_log.add_mission(
             name="Test Mission",
@@ -166,6 +166,56 @@ class TestMissionLogFunctions:
         assert mission_log.get_mission(111111) is None
         assert mission_log.get_mission(222222) is not None
 
+    def test_active_systems_refcounted(self, harness) -> None:
+        mission_log = harness.plugin.mission_log
+        mission_log.missionlog = [
+            {"MissionID": 111111, "System": "Sol"},
+            {"MissionID": 222222, "System": "Sol"},
+            {"MissionID": 333333, "System": "Alpha Centauri"}
+        ]
+
+        mission_log.delete_mission_by_id(111111)
+        assert mission_log.get_active_systems() == ["Sol", "Alpha Centauri"]
+
+        mission_log.delete_mission_by_id(222222)
+        assert mission_log.get_active_systems() == ["Alpha Centauri"]
+
+        # Replacing the list replaces the indexes
+        mission_log.missionlog = []
+        assert mission_log.get_active_systems() == []
+        assert mission_log.get_mission(333333) is None
+
+    def test_expire_missions_added_after_startup(self, harness) -> None:
+        mission_log = harness.plugin.mission_log
+        mission_log.missionlog = []
+
+        mission_log.add_mission("Expired Mission", "Test Faction", 111111, (datetime.now(UTC) - timedelta(days=TIME_MISSION_EXPIRY_D + 1)).strftime(DATETIME_FORMAT_JOURNAL),
+                                "Sol", "", "Sol", "Abraham Lincoln", -1, -1, -1, "")
+        mission_log.add_mission("Active Mission", "Test Faction", 222222, (datetime.now(UTC) + timedelta(days=1)).strftime(DATETIME_FORMAT_JOURNAL),
+                                "Alpha", "", "Alpha", "Station", -1, -1, -1, "")
+
+        mission_log._expire_old_missions()
+
+        assert mission_log.get_mission(111111) is None
+        assert mission_log.get_mission(222222) is not None
+        assert mission_log.get_active_systems() == ["Alpha"]
+
+    def test_duplicate_mission_replaced_and_expired(self, harness) -> None:
+        mission_log = harness.plugin.mission_log
+        mission_log.missionlog = []
+        expired: str = (datetime.now(UTC) - timedelta(days=TIME_MISSION_EXPIRY_D + 1)).strftime(DATETIME_FORMAT_JOURNAL)
+
+        mission_log.add_mission("Mission", "Test Faction", 111111, expired, "Sol", "", "Sol", "Abraham Lincoln", -1, -1, -1, "")
+        mission_log.add_mission("Mission", "Test Faction", 111111, expired, "Alpha", "", "Alpha", "Station", -1, -1, -1, "")
+
+        assert len(mission_log.get_missionlog()) == 1
+        assert mission_log.get_active_systems() == ["Alpha"]
+
+        mission_log._expire_old_missions()
+
+        assert mission_log.get_missionlog() == []
+        assert mission_log.get_active_systems() == []
+
 class TestMissionLogEvents:
     """Tests for mission log event handling."""
 
@@ -0,0 +1,131 @@
+"""Test the durable outbox code for BGS-Tally."""
+
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Generator
+
+import pytest # type: ignore
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.outbox import Outbox
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    live = request.node.get_closest_marker('live_requests') is not None
+
+    test_harness: TestHarness = TestHarness(live_requests=live)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    if not live:
+        from tests.edmc.requests import queue_response, MockResponse
+        queue_response('get',
+                       MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                    json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                        url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    Path(Path(__file__).parent / "otherdata" / "outbox" / "test.jsonl").unlink(missing_ok=True)
+
+    # Now we can import plugin modules
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+def outbox_path(harness) -> str:
+    return str(Path(harness.plugin_dir) / "otherdata" / "outbox" / "test.jsonl")
+
+
+class TestOutbox:
+    """Outbox tests."""
+
+    def test_peek_does_not_remove(self, harness) -> None:
+        outbox = Outbox(outbox_path(harness))
+        for i in range(5): outbox.append({'event': 'Docked', 'i': i})
+
+        seq, items = outbox.peek(3)
+        assert seq == 3
+        assert [item['i'] for item in items] == [0, 1, 2]
+        assert len(outbox) == 5
+
+    def test_ack_removes_delivered(self, harness) -> None:
+        outbox = Outbox(outbox_path(harness))
+        for i in range(5): outbox.append({'event': 'Docked', 'i': i})
+
+        seq, _ = outbox.peek(3)
+        outbox.ack(seq)
+
+        assert len(outbox) == 2
+        assert outbox.peek(10)[1][0]['i'] == 3
+
+    def test_survives_restart_without_duplicates(self, harness) -> None:
+        outbox = Outbox(outbox_path(harness))
+        for i in range(5): outbox.append({'event': 'Docked', 'i': i})
+        outbox.ack(outbox.peek(2)[0])
+        outbox.flush()
+
+        # Simulate a partial line written as EDMC was closed
+        with open(outbox_path(harness), 'a') as file:
+            file.write('{"seq": 6, "da')
+
+        outbox2 = Outbox(outbox_path(harness))
+        assert [item['i'] for item in outbox2.peek(10)[1]] == [2, 3, 4]
+
+        # New items continue the sequence
+        outbox2.append({'event': 'Docked', 'i': 5})
+        assert outbox2.peek(10)[0] == 6
+
+    def test_size_cap(self, harness) -> None:
+        outbox = Outbox(outbox_path(harness), max_size_bytes=1000)
+        for i in range(100): outbox.append({'event': 'Docked', 'i': i})
+        outbox.flush()
+
+        assert len(outbox) < 100
+        assert Path(outbox_path(harness)).stat().st_size <= 1000
+        # The newest item is always kept
+        assert outbox.peek(100)[1][-1]['i'] == 99
+
+    def test_clear(self, harness) -> None:
+        outbox = Outbox(outbox_path(harness))
+        for i in range(5): outbox.append({'event': 'Docked', 'i': i})
+        outbox.flush()
+        outbox.clear()
+        outbox.flush()
+
+        assert len(outbox) == 0
+        assert len(Outbox(outbox_path(harness))) == 0
+
+    def test_writes_wait_for_flush(self, harness) -> None:
+        changes: list = []
+        outbox = Outbox(outbox_path(harness), on_changed=lambda: changes.append(True))
+        outbox.append({'event': 'Docked', 'i': 0})
+
+        # Queueing an item doesn't touch the file, the owner is told there's a change to flush instead
+        assert len(changes) == 1
+        assert len(Outbox(outbox_path(harness))) == 0
+
+        outbox.flush()
+        assert len(Outbox(outbox_path(harness))) == 1
+
+    def test_outbox_id_stable_until_saved(self, harness) -> None:
+        """ An API saved before it had an outbox ID finds the same outbox again if we're restarted before it's saved """
+        from bgstally.api import API
+
+        api: API = harness.plugin.api_manager.apis[0]
+        data: dict = api.as_dict() | {'url': "https://api.example.com/"}
+        del data['outbox_id']
+
+        assert API(harness.plugin, data).outbox_id == API(harness.plugin, data).outbox_id
@@ -0,0 +1,136 @@
+"""Test the overlay code for BGS-Tally."""
+
+import pytest # type: ignore
+from typing import Generator
+from datetime import datetime, UTC
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    test_harness:TestHarness = TestHarness(live_requests=False)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    from tests.edmc.requests import queue_response, MockResponse
+    queue_response('get',
+                   MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                    url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Now we can start the plugin
+    from load import plugin_start3, plugin_app
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+class TestOverlayPanel:
+    """Overlay panel tests."""
+
+    def test_panel_only_rendered_and_sent_on_change(self, harness, monkeypatch) -> None:
+        import bgstally.overlay
+        from bgstally.overlay import OverlayPanel
+
+        overlay = harness.plugin.overlay
+        monkeypatch.setattr(harness.plugin.state, 'enable_overlay', True)
+        now:list = [1000.0]
+        monkeypatch.setattr(bgstally.overlay, 'monotonic', lambda: now[0])
+
+        data:dict = {'version': 1, 'text': "First"}
+        panel:OverlayPanel = OverlayPanel(overlay, "objectives", lambda: {'message': data['text'], 'fit_to_text': True}, lambda: data['version'], 2)
+        ttl:int = overlay.get_frame_ttl("objectives")
+        assert ttl > 2
+
+        assert panel.update()
+        assert (panel.renders, panel.sends, panel.version) == (1, 1, 1)
+        assert overlay.edmcoverlay.messages["bgstally-msg-objectives-0"][1] == "First"
+
+        # Unchanged inputs are neither rendered nor sent
+        now[0] += 1
+        assert not panel.update()
+        assert (panel.renders, panel.sends) == (1, 1)
+
+        # Changed inputs that render the same text are not sent
+        data['version'] = 2
+        assert not panel.update()
+        assert (panel.renders, panel.sends, panel.version) == (2, 1, 1)
+
+        data['version'] = 3
+        data['text'] = "Second"
+        assert panel.update()
+        assert (panel.renders, panel.sends, panel.version) == (3, 2, 2)
+        assert overlay.edmcoverlay.messages["bgstally-msg-objectives-0"][1] == "Second"
+
+        # The message is sent again shortly before it expires, without rendering
+        now[0] += ttl - 3
+        assert not panel.update()
+        now[0] += 2
+        assert panel.update()
+        assert (panel.renders, panel.sends) == (3, 3)
+
+        # Invalidating sends the message again on the next update
+        panel.invalidate()
+        assert panel.update()
+        assert panel.sends == 4
+
+    def test_empty_panel_not_sent(self, harness, monkeypatch) -> None:
+        from bgstally.overlay import OverlayPanel
+
+        monkeypatch.setattr(harness.plugin.state, 'enable_overlay', True)
+        panel:OverlayPanel = OverlayPanel(harness.plugin.overlay, "colonisation", lambda: {'message': "", 'fit_to_text': True})
+
+        assert not panel.update()
+        assert not panel.update()
+        assert (panel.renders, panel.sends) == (2, 0)
+
+
+class TestOverlayLayout:
+    """Overlay layout tests."""
+
+    def test_frames_parsed_once(self, harness, monkeypatch) -> None:
+        overlay = harness.plugin.overlay
+        frame = overlay.get_frame("objectives")
+        assert frame is not None
+        assert frame.ttl == int(harness.plugin.config.overlay_frame("objectives")['ttl'])
+
+        # Displaying messages doesn't read the config again
+        monkeypatch.setattr(harness.plugin.config, 'overlay_frame', lambda name: None)
+        monkeypatch.setattr(harness.plugin.state, 'enable_overlay', True)
+        assert overlay.display_message("objectives", "Some objectives", fit_to_text=True)
+        assert overlay.get_frame("unknown") is None
+
+    def test_wrapped_messages_cached(self, harness, monkeypatch) -> None:
+        from bgstally.overlay import WRAP_CACHE_SIZE
+
+        overlay = harness.plugin.overlay
+        monkeypatch.setattr(harness.plugin.state, 'enable_overlay', True)
+        message:str = "A long line of overlay text " * 5 + "\nSecond line"
+
+        assert overlay.display_message("objectives", message, fit_to_text=True, title="Title")
+        layout = overlay.wrapped[("objectives", message, "Title")]
+        assert layout.segments[0] == "<H>Title"
+        assert len(layout.segments) == 4
+        assert overlay.edmcoverlay.messages["bgstally-msg-objectives-0"][1] == "Title"
+        assert overlay.edmcoverlay.messages["bgstally-msg-objectives-3"][1] == "Second line"
+
+        # Displaying the same message again reuses the wrapped lines
+        assert overlay.display_message("objectives", message, fit_to_text=True, title="Title")
+        assert overlay.wrapped[("objectives", message, "Title")] is layout
+
+        # The cache is limited in size, dropping the least recently displayed message first
+        for i in range(WRAP_CACHE_SIZE):
+            overlay.display_message("objectives", f"Message {i}", fit_to_text=True)
+        assert len(overlay.wrapped) == WRAP_CACHE_SIZE
+        assert ("objectives", message, "Title") not in overlay.wrapped
@@ -0,0 +1,132 @@
+"""Test the persistence manager code for BGS-Tally."""
+
+import json
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Generator
+
+import pytest # type: ignore
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, DataStore
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    live = request.node.get_closest_marker('live_requests') is not None
+
+    test_harness: TestHarness = TestHarness(live_requests=live)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    if not live:
+        from tests.edmc.requests import queue_response, MockResponse
+        queue_response('get',
+                       MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                    json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                        url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    Path(Path(__file__).parent / "otherdata" / "missionlog.json").unlink(missing_ok=True)
+
+    # Now we can import plugin modules
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    test_harness.register_journal_handler(journal_entry, 'Testy', 'Sol', False)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+class TestPersistenceManager:
+    """Persistence manager tests."""
+
+    def test_coalesced_writes(self, harness) -> None:
+        pm = harness.plugin.persistence_manager
+        saves:list = []
+        pm.register(DataStore.FACTIONS, lambda: 1, saves.append)
+
+        pm.mark_dirty(DataStore.FACTIONS)
+        pm.mark_dirty(DataStore.FACTIONS)
+        pm.mark_dirty(DataStore.FACTIONS)
+        pm.flush(DataStore.FACTIONS)
+
+        stats:dict = pm.get_stats()['stores'][DataStore.FACTIONS.value]
+        assert len(saves) == 1
+        assert stats['writes'] == 1
+        assert stats['writes_avoided'] == 2
+        assert stats['dirty'] is False
+
+    def test_clean_store_not_written(self, harness) -> None:
+        pm = harness.plugin.persistence_manager
+        saves:list = []
+        pm.register(DataStore.FACTIONS, lambda: 1, saves.append)
+
+        pm.flush()
+        assert saves == []
+
+        pm.flush(force=True)
+        assert saves == [1]
+
+    def test_failed_write_stays_dirty(self, harness) -> None:
+        pm = harness.plugin.persistence_manager
+
+        def failing_save(snapshot):
+            raise OSError("Disk full")
+
+        pm.register(DataStore.FACTIONS, lambda: None, failing_save)
+        pm.mark_dirty(DataStore.FACTIONS)
+        pm.flush(DataStore.FACTIONS)
+
+        stats:dict = pm.get_stats()['stores'][DataStore.FACTIONS.value]
+        assert stats['writes'] == 0
+        assert stats['dirty'] is True
+
+    def test_snapshot_written(self, harness) -> None:
+        """ The data is copied when the snapshot is taken, so later changes wait for the next write """
+        pm = harness.plugin.persistence_manager
+        factions:list = ["Faction 1"]
+        saves:list = []
+        pm.register(DataStore.FACTIONS, lambda: list(factions), saves.append)
+
+        pm.mark_dirty(DataStore.FACTIONS)
+        pm.flush(DataStore.FACTIONS)
+        factions.append("Faction 2")
+
+        assert saves == [["Faction 1"]]
+
+    def test_manager_marks_itself_dirty(self, harness) -> None:
+        pm = harness.plugin.persistence_manager
+        mission_log = harness.plugin.mission_log
+        saved_file = Path(harness.plugin.plugin_dir) / FOLDER_OTHER_DATA / "missionlog.json"
+
+        mission_log.add_mission("Test Mission", "Test Faction", 1001, datetime.now(UTC).strftime(DATETIME_FORMAT_JOURNAL),
+                                "Sol", "", "Sol", "Abraham Lincoln", -1, -1, -1, "")
+
+        # Nothing is written until the store is flushed
+        assert pm.get_stats()['stores'][DataStore.MISSIONLOG.value]['dirty'] is True
+        assert not saved_file.exists()
+
+        pm.flush()
+        with open(saved_file) as f:
+            assert json.load(f)[0]['MissionID'] == 1001
+
+    def test_shut_down_writes_all(self, harness) -> None:
+        pm = harness.plugin.persistence_manager
+        saves:list = []
+        pm.register(DataStore.FACTIONS, lambda: 1, saves.append)
+
+        pm.shut_down()
+
+        assert saves == [1]
+        assert not pm.thread.is_alive()
@@ -0,0 +1,78 @@
+"""Test the journal profiler for BGS-Tally."""
+
+import json
+from datetime import datetime, UTC
+from typing import Generator
+
+import pytest # type: ignore
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    test_harness: TestHarness = TestHarness(live_requests=False)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    from tests.edmc.requests import queue_response, MockResponse
+    queue_response('get',
+                   MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                    url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Now we can start the plugin
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    test_harness.register_journal_handler(journal_entry, 'Testy', 'Sol', False)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+class TestProfiler:
+    """Journal profiler tests."""
+
+    def test_profile_handlers(self, harness, tmp_path) -> None:
+        from bgstally.profiler import EVENT_TYPE_SAVE, HANDLER_TOTAL
+
+        profiler = harness.plugin.profiler
+        harness.events = harness.load_events("benchmark_events.json")
+
+        # Nothing is recorded while disabled
+        harness.play_sequence('combat_zone', 0)
+        assert profiler.get_stats() == []
+
+        profiler.set_enabled(True)
+        harness.play_sequence('combat_zone', 0)
+        harness.plugin.persistence_manager.flush()
+        profiler.set_enabled(False)
+
+        stats:dict = {(s['event_type'], s['handler']): s for s in profiler.get_stats()}
+        assert stats[('FactionKillBond', HANDLER_TOTAL)]['count'] == 2
+        assert stats[('FactionKillBond', "Activity.cb_received")]['count'] == 2
+        assert ('FSDJump', "Colonisation.journal_entry") in stats
+        assert ('FSDJump', "UI.show_system_info") in stats
+        assert (EVENT_TYPE_SAVE, "PersistenceManager.activity") in stats
+        assert sum(stats[('FactionKillBond', HANDLER_TOTAL)]['histogram']) == 2
+
+        profiler.dump_json(str(tmp_path / "profile.json"))
+        with open(tmp_path / "profile.json", 'r') as f:
+            assert len(json.load(f)['stats']) == len(stats)
+
+        profiler.dump_csv(str(tmp_path / "profile.csv"))
+        with open(tmp_path / "profile.csv", 'r') as f:
+            assert len(f.readlines()) == len(stats) + 1
+
+        profiler.reset()
+        assert profiler.get_stats() == []
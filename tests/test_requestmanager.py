@@ -0,0 +1,116 @@
+"""Test the request manager code for BGS-Tally."""
+
+import pytest # type: ignore
+from typing import Generator
+from threading import Event
+from time import sleep
+from datetime import datetime, UTC
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.constants import RequestMethod
+from bgstally.requestmanager import BGSTallyRequest
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    live = request.node.get_closest_marker('live_requests') is not None
+
+    test_harness:TestHarness = TestHarness(live_requests=live)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    if not live:
+        from tests.edmc.requests import queue_response, MockResponse
+        queue_response('get',
+                       MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                    json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                        url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Now we can start the plugin
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+class TestRequestManager:
+    """Request manager tests."""
+
+    def test_requests_to_multiple_hosts(self, harness) -> None:
+        from tests.edmc.requests import queue_response, MockResponse
+
+        queue_response('get', MockResponse(200, json_data={}), url="https://host-a.example.com/test", sticky=True)
+        queue_response('get', MockResponse(200, json_data={}), url="https://host-b.example.com/test", sticky=True)
+
+        results:list = []
+        def callback(success:bool, response, request:BGSTallyRequest):
+            results.append((request.host, success))
+
+        for _ in range(3):
+            harness.plugin.request_manager.queue_request("https://host-a.example.com/test", RequestMethod.GET, callback=callback)
+            harness.plugin.request_manager.queue_request("https://host-b.example.com/test", RequestMethod.GET, callback=callback)
+
+        sleep(1)
+
+        assert results.count(("host-a.example.com", True)) == 3
+        assert results.count(("host-b.example.com", True)) == 3
+
+        stats:dict = harness.plugin.request_manager.get_stats()
+        assert stats['host-a.example.com']['requests'] == 3
+        assert stats['host-a.example.com']['pending'] == 0
+        assert stats['host-b.example.com']['failures'] == 0
+
+    def test_failed_request_counted(self, harness) -> None:
+        results:list = []
+        def callback(success:bool, response, request:BGSTallyRequest):
+            results.append(success)
+
+        # No response is queued for this URL so the mock returns a 404
+        harness.plugin.request_manager.queue_request("https://host-c.example.com/missing", RequestMethod.GET, callback=callback)
+
+        sleep(1)
+
+        assert results == [False]
+        assert harness.plugin.request_manager.get_stats()['host-c.example.com']['failures'] == 1
+
+    def test_callbacks_run_one_at_a_time(self, harness) -> None:
+        """ Callbacks change shared state, so a callback for another host waits until the running callback finishes """
+        from tests.edmc.requests import queue_response, MockResponse
+
+        queue_response('get', MockResponse(200, json_data={}), url="https://host-d.example.com/test", sticky=True)
+        queue_response('get', MockResponse(200, json_data={}), url="https://host-e.example.com/test", sticky=True)
+
+        release:Event = Event()
+        results:list = []
+        def slow_callback(success:bool, response, request:BGSTallyRequest):
+            release.wait(5)
+            results.append(request.host)
+
+        def callback(success:bool, response, request:BGSTallyRequest):
+            results.append(request.host)
+
+        harness.plugin.request_manager.queue_request("https://host-d.example.com/test", RequestMethod.GET, callback=slow_callback)
+        sleep(0.2)
+        harness.plugin.request_manager.queue_request("https://host-e.example.com/test", RequestMethod.GET, callback=callback)
+        sleep(1)
+
+        assert results == []
+        release.set()
+        sleep(0.2)
+        assert results == ["host-d.example.com", "host-e.example.com"]
+
+    def test_invalid_url_not_queued(self, harness) -> None:
+        harness.plugin.request_manager.queue_request("not a url", RequestMethod.GET)
+
+        assert "" not in harness.plugin.request_manager.get_stats()
@@ -6,7 +6,7 @@ from typing import Generator
 from pathlib import Path
 import shutil
 from time import sleep
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
 from unittest.mock import patch
 
 from harness import TestHarness
@@ -191,3 +191,31 @@ class TestState:
         assert 'XCurrentSystemID' not in config.data
         assert 'XStationFaction' not in config.data
         assert 'XStationType' not in config.data
+
+
+    def test_ships_targeted_bounded(self, harness) -> None:
+        from bgstally.state import SHIPS_TARGETED_MAX, TIME_SHIPS_TARGETED_EXPIRY
+
+        state = harness.plugin.state
+        activity = harness.plugin.activity_manager.get_current_activity()
+        started:datetime = datetime(2025, 3, 1, 12, 0, 0, tzinfo=UTC)
+
+        def target(name:str, timestamp:datetime) -> None:
+            activity.ship_targeted({'timestamp': timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"), 'event': "ShipTargeted", 'TargetLocked': True, 'ScanStage': 3,
+                                    'Faction': "Test Faction", 'PilotName': f"$npc_name_decorate:#name={name};", 'PilotName_Localised': name}, state)
+
+        # Ships targeted a long time ago are forgotten
+        target("Old Pilot", started)
+        target("New Pilot", started + TIME_SHIPS_TARGETED_EXPIRY + timedelta(minutes=1))
+        assert 'Old Pilot' not in state.last_ships_targeted
+        assert state.last_ships_targeted.get('New Pilot')['Faction'] == "Test Faction"
+
+        # Only the most recently targeted ships are kept
+        for i in range(SHIPS_TARGETED_MAX + 5):
+            target(f"Pilot {i}", started + TIME_SHIPS_TARGETED_EXPIRY + timedelta(minutes=2, seconds=i))
+        assert len(state.last_ships_targeted) == SHIPS_TARGETED_MAX
+        assert 'Pilot 0' not in state.last_ships_targeted
+
+        stats:dict = state.get_memory_stats()['last_ships_targeted']
+        assert (stats['entries'], stats['peak'], stats['expired'], stats['evicted']) == (SHIPS_TARGETED_MAX, SHIPS_TARGETED_MAX, 1, 6)
+        assert stats['size_bytes'] > 0
@@ -0,0 +1,158 @@
+"""Test the target manager for BGS-Tally."""
+
+import pytest # type: ignore
+from typing import Generator
+from pathlib import Path
+from time import sleep, time
+from datetime import datetime, timedelta, UTC
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+from bgstally.cmdrlookup import CACHE_TTL_S, URL_INARA_API
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    test_harness:TestHarness = TestHarness(live_requests=False)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    from tests.edmc.requests import queue_response, MockResponse
+    queue_response('get',
+                   MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                    url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    for filename in ["cmdrcache.json", "targetlog.json", "targetlog.jsonl"]:
+        Path(Path(__file__).parent / "otherdata" / filename).unlink(missing_ok=True)
+
+    # Now we can start the plugin
+    from load import plugin_start3, plugin_app
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+def ship_targeted(cmdr_name:str, ship:str = "Imperial Cutter") -> dict:
+    """ Build a fully scanned ShipTargeted journal entry for a CMDR """
+    return {'timestamp': datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ"), 'event': "ShipTargeted", 'TargetLocked': True, 'Ship': "cutter",
+            'Ship_Localised': ship, 'ScanStage': 3, 'PilotName': f"$cmdr_decorate:#name={cmdr_name};", 'PilotName_Localised': f"CMDR {cmdr_name}",
+            'PilotRank': "Elite", 'SquadronID': "TEST", 'ShieldHealth': 100.0, 'HullHealth': 100.0, 'LegalStatus': "Clean"}
+
+
+def target(cmdr_name:str, timestamp:datetime|None = None) -> dict:
+    """ Build a target log entry for a CMDR """
+    return {'TargetName': cmdr_name, 'System': "Sol", 'SquadronID': "----", 'Ship': "----", 'LegalStatus': "----", 'Reason': 0,
+            'Timestamp': (timestamp or datetime.now(UTC)).strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+
+def inara_calls() -> list[dict]:
+    """ Get the mock requests made to the Inara API """
+    from tests.edmc.requests import _mock_requests
+    return [call for call in _mock_requests.calls if call['method'] == 'post' and call['url'] == URL_INARA_API]
+
+
+class TestCmdrLookup:
+    """CMDR lookup tests."""
+
+    def test_lookups_batched_and_deduplicated(self, harness, monkeypatch) -> None:
+        import bgstally.cmdrlookup
+        from tests.edmc.requests import queue_response, MockResponse
+
+        monkeypatch.setattr(bgstally.cmdrlookup, 'BATCH_DELAY_S', 0.2)
+        queue_response('post', MockResponse(200, json_data={'events': [
+                {'eventStatus': 200, 'eventData': {'commanderRanksPilot': [{'rankName': "combat", 'rankValue': 8}], 'inaraURL': "https://inara.cz/cmdr/1/"}},
+                {'eventStatus': 204, 'eventStatusText': "No results found"}]}), url=URL_INARA_API)
+
+        target_manager = harness.plugin.target_manager
+        calls:int = len(inara_calls())
+        target_manager.ship_targeted(ship_targeted("Alpha"), "Sol")
+        target_manager.ship_targeted(ship_targeted("Beta"), "Sol")
+        target_manager.ship_targeted(ship_targeted("Alpha"), "Sol")
+        sleep(1)
+
+        # Both CMDRs are looked up in a single request, and the repeated sighting of the same CMDR isn't logged twice
+        assert len(inara_calls()) == calls + 1
+        assert [event['eventData']['searchName'] for event in inara_calls()[-1]['json']['events']] == ["Alpha", "Beta"]
+        assert [target['TargetName'] for target in target_manager.targetlog[-2:]] == ["Alpha", "Beta"]
+        assert target_manager.get_target_info("Alpha")['inaraURL'] == "https://inara.cz/cmdr/1/"
+
+        # Profiles are cached, including CMDRs with no Inara profile
+        target_manager.cmdr_cache.clear()
+        target_manager.ship_targeted(ship_targeted("Beta", "Federal Corvette"), "Sol")
+        sleep(0.5)
+        assert len(inara_calls()) == calls + 1
+        assert target_manager.get_target_info("Beta")['Ship'] == "Federal Corvette"
+
+    def test_profiles_persisted(self, harness) -> None:
+        from bgstally.cmdrlookup import CmdrLookup
+
+        lookup:CmdrLookup = harness.plugin.target_manager.cmdr_lookup
+        lookup.profiles['Saved'] = {'profile': {'squadron': {'squadronName': "Test Squadron"}}, 'fetched': time()}
+        lookup.profiles['Expired'] = {'profile': {}, 'fetched': time() - CACHE_TTL_S - 1}
+        lookup.save()
+
+        loaded:CmdrLookup = CmdrLookup(harness.plugin)
+        assert loaded.lookup('Saved', None) == {'squadron': {'squadronName': "Test Squadron"}}
+        assert 'Expired' not in loaded.profiles
+
+
+class TestTargetLog:
+    """Target log tests."""
+
+    def test_log_appended_and_compacted(self, harness) -> None:
+        from bgstally.targetmanager import FILENAME, TargetManager
+
+        target_manager:TargetManager = TargetManager(harness.plugin)
+        file:Path = harness.plugin_dir / "otherdata" / FILENAME
+        for cmdr_name in ["Alpha", "Beta", "Alpha"]:
+            target_manager._add_to_log(target(cmdr_name))
+        target_manager.save()
+        assert len(file.read_text().splitlines()) == 3
+
+        # New entries are appended to the file
+        target_manager._add_to_log(target("Gamma"))
+        target_manager.save()
+        assert len(file.read_text().splitlines()) == 4
+        assert target_manager.get_target_info("Alpha") is target_manager.targetlog[2]
+
+        # Deleting entries rewrites the file, and the latest entry for each CMDR is kept up to date
+        targetlog:list = target_manager.get_targetlog()
+        target_manager.delete_targets([targetlog[2]['index'], targetlog[3]['index']])
+        target_manager.save()
+        assert len(file.read_text().splitlines()) == 2
+        assert target_manager.get_target_info("Alpha") is targetlog[0]
+        assert target_manager.get_target_info("Gamma") is None
+
+        loaded:TargetManager = TargetManager(harness.plugin)
+        assert [target['TargetName'] for target in loaded.get_targetlog()] == ["Alpha", "Beta"]
+
+    def test_expiry_and_size_limit(self, harness, monkeypatch) -> None:
+        import bgstally.targetmanager
+        from bgstally.targetmanager import TIME_TARGET_LOG_EXPIRY_D, TargetManager
+
+        monkeypatch.setattr(bgstally.targetmanager, 'TARGET_LOG_MAX', 10)
+        target_manager:TargetManager = TargetManager(harness.plugin)
+        target_manager.targetlog.append(target("Old", datetime.now(UTC) - timedelta(days=TIME_TARGET_LOG_EXPIRY_D + 1)) | {'index': -1})
+
+        # Old entries expire as new ones are added
+        target_manager._add_to_log(target("New 0"))
+        assert [target['TargetName'] for target in target_manager.targetlog] == ["New 0"]
+
+        # Once the log is over its maximum size, the oldest entries are dropped
+        for i in range(1, 12):
+            target_manager._add_to_log(target(f"New {i}"))
+        assert len(target_manager.targetlog) == 10
+        assert target_manager.targetlog[0]['TargetName'] == "New 2"
+        assert target_manager.get_target_info("New 1") is None
+        assert target_manager.get_target_info("New 11")['index'] == target_manager.targetlog[-1]['index']
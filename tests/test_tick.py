@@ -5,7 +5,7 @@ from typing import Generator
 from pathlib import Path
 import shutil
 from time import sleep
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
 from unittest.mock import patch
 
 # Config is already mocked by conftest.py
@@ -104,3 +104,65 @@ class TestTick:
 
         assert current_activity.systems[current_system_id]['TickTime'] == datetime.strptime(timestamp, DATETIME_FORMAT_TICK_DETECTOR_SYSTEM).replace(tzinfo=UTC).strftime(DATETIME_FORMAT_ACTIVITY)
         assert current_activity.dirty is True
+
+    def test_fetch_tick_not_modified(self, harness) -> None:
+        from tests.edmc.requests import queue_response, MockResponse, _mock_requests
+
+        tick = harness.plugin.tick
+        tick.tick_time = datetime(2000, 1, 1, tzinfo=UTC)
+
+        queue_response('get', MockResponse(200, url=URL_GALAXY_TICK_DETECTOR, headers={'ETag': '"tick-1"'},
+                                           json_data={'lastGalaxyTick': datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                       url=URL_GALAXY_TICK_DETECTOR)
+        assert tick.fetch_tick() is True
+        tick_id:str = tick.tick_id
+
+        # The next poll is conditional, and an unchanged tick isn't parsed again
+        queue_response('get', MockResponse(304, url=URL_GALAXY_TICK_DETECTOR), url=URL_GALAXY_TICK_DETECTOR)
+        assert tick.fetch_tick() is False
+        assert _mock_requests.calls[-1]['headers']['If-None-Match'] == '"tick-1"'
+        assert tick.tick_id == tick_id
+
+    def test_poll_due(self, harness) -> None:
+        from bgstally.tick import TIME_TICK_POLL_IDLE, TIME_TICK_POLL_WINDOW
+
+        tick = harness.plugin.tick
+        now:datetime = datetime.now(UTC)
+        tick.tick_id = "zoy-test"
+
+        # Long before the next predicted tick, poll rarely
+        tick.tick_time = now - timedelta(hours=2)
+        tick.last_polled = now - timedelta(minutes=1)
+        assert not tick.poll_due()
+        tick.last_polled = now - TIME_TICK_POLL_IDLE
+        assert tick.poll_due()
+
+        # Close to or after the next predicted tick, poll every time
+        tick.tick_time = now - timedelta(hours=24) + TIME_TICK_POLL_WINDOW - timedelta(minutes=1)
+        tick.last_polled = now - timedelta(minutes=1)
+        assert tick.poll_due()
+        tick.tick_time = now - timedelta(hours=30)
+        assert tick.poll_due()
+
+    def test_system_tick_cached_and_deduplicated(self, harness, monkeypatch) -> None:
+        from tests.edmc.requests import MockResponse
+
+        tick = harness.plugin.tick
+        queued:list = []
+        monkeypatch.setattr(harness.plugin.request_manager, 'queue_request', lambda *args, **kwargs: queued.append(kwargs))
+        monkeypatch.setattr(harness.plugin.state, 'current_system_id', "23456")
+
+        # Only one fetch per system is made while it is in flight
+        assert tick.fetch_system_tick("23456") is None
+        assert tick.fetch_system_tick("23456") is None
+        assert len(queued) == 1
+
+        system_tick:datetime = (tick.tick_time + timedelta(minutes=5)).replace(microsecond=0)
+        request = BGSTallyRequest(URL_SYSTEM_TICK_DETECTOR, RequestMethod.POST, callback=None, params={}, headers={}, stream=False,
+                                  payload=None, data=queued[0]['data'], attempts=0)
+        tick._system_tick_received(True, MockResponse(200, json_data={'timestamp': system_tick.strftime(DATETIME_FORMAT_TICK_DETECTOR_SYSTEM)}), request)
+
+        # Once fetched, the tick is returned without another request
+        assert tick.fetch_system_tick("23456") == system_tick
+        assert len(queued) == 1
+        assert "23456" not in tick.system_ticks_in_flight
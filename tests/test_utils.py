@@ -0,0 +1,124 @@
+"""Test the utility code for BGS-Tally."""
+
+import logging
+import re
+from datetime import datetime, UTC
+from pathlib import Path
+from time import perf_counter
+from typing import Generator
+
+import pytest # type: ignore
+
+# Config is already mocked by conftest.py
+from harness import TestHarness
+
+FOLDER_L10N = Path(__file__).parent.parent / "L10n"
+
+
+@pytest.fixture
+def harness(request) -> Generator:
+    """Provide a fresh test harness for each test."""
+    live = request.node.get_closest_marker('live_requests') is not None
+
+    test_harness: TestHarness = TestHarness(live_requests=live)
+
+    import bgstally.constants
+    bgstally.constants.FOLDER_ASSETS = "../assets"
+    bgstally.constants.FOLDER_DATA = "../data"
+
+    # Put in a response for the update manager so it doesn't error
+    if not live:
+        from tests.edmc.requests import queue_response, MockResponse
+        queue_response('get',
+                       MockResponse(200, url='http://tick.infomancer.uk/galtick.json',
+                                    json_data={"lastGalaxyTick": datetime.now(UTC).isoformat(timespec='milliseconds').replace('+00:00', 'Z')}),
+                        url='http://tick.infomancer.uk/galtick.json', sticky=True)
+
+    # Now we can start the plugin
+    from load import plugin_start3, plugin_app, journal_entry
+    import bgstally.globals
+    test_harness.plugin = bgstally.globals.this
+
+    plugin_start3(str(test_harness.plugin_dir))
+    plugin_app(test_harness.parent)
+
+    yield test_harness
+    test_harness.assert_no_unhandled_exceptions()
+
+
+class FileTranslations:
+    """ Translations that are read from the strings file on every lookup, in the same way as EDMC. """
+    FALLBACK = 'en'
+
+    def __init__(self) -> None:
+        self.loads: int = 0
+
+    def contents(self, lang: str, plugin_path) -> dict:
+        self.loads += 1
+        with open(FOLDER_L10N / f"{lang}.strings", encoding='utf-8') as f:
+            return dict(re.findall(r'^"(.*)" = "(.*)";$', f.read(), re.MULTILINE))
+
+    def translate(self, x: str, context: str|None = None, lang: str|None = None) -> str:
+        return self.contents(lang, FOLDER_L10N).get(x, x)
+
+
+class TestTranslations:
+    """Translation table tests."""
+
+    def test_translation_table(self, harness, monkeypatch) -> None:
+        import bgstally.utils
+        from bgstally.utils import __, clear_translation_cache
+
+        translations: FileTranslations = FileTranslations()
+        monkeypatch.setattr(bgstally.utils, 'translations_obj', translations)
+        clear_translation_cache()
+
+        assert __("Add", "de") == "Hinzufügen"
+        assert __("Add Plan", "de") == "Plan hinzufügen"
+        assert __("Not a translated string", "de") == "Not a translated string"
+        assert __("Add", "en") == "Add"
+        assert translations.loads == 1
+
+        clear_translation_cache()
+        assert __("Add", "de") == "Hinzufügen"
+        assert translations.loads == 2
+
+    def test_prefs_saved_clears_current_language(self, harness) -> None:
+        """ The EDMC UI language is changed in the preferences, so saving them forgets translations into the current language """
+        from bgstally.utils import __, _translate_current
+
+        __("Add", "")
+        assert _translate_current.cache_info().currsize > 0
+
+        harness.plugin.ui.save_prefs()
+        assert _translate_current.cache_info().currsize == 0
+
+    def test_translation_benchmark(self, harness, monkeypatch) -> None:
+        """ Compare building a report in English and German, with and without the translation table """
+        import bgstally.utils
+        from bgstally.activity import Activity
+        from bgstally.constants import DiscordActivity
+        from bgstally.formatters.default import DefaultActivityFormatter
+        from bgstally.utils import clear_translation_cache
+
+        translations: FileTranslations = FileTranslations()
+        monkeypatch.setattr(bgstally.utils, 'translations_obj', translations)
+        clear_translation_cache()
+        activity: Activity = Activity(harness.plugin, sample=True)
+
+        def build(lang: str) -> float:
+            # A new formatter each time, so nothing is taken from its render cache
+            start: float = perf_counter()
+            DefaultActivityFormatter(harness.plugin).get_text(activity, DiscordActivity.BOTH, lang=lang)
+            return perf_counter() - start
+
+        english_s: float = build("en")
+        build("de")
+        german_s: float = build("de")
+
+        monkeypatch.setattr(bgstally.utils, '_load_translation_table', lambda lang: {})
+        clear_translation_cache()
+        uncached_s: float = build("de")
+
+        logging.info(f"Sample report: English {english_s * 1000:.1f}ms, German {german_s * 1000:.1f}ms, "
+                     f"German without translation table {uncached_s * 1000:.1f}ms")